@@ -0,0 +1,169 @@
+"""
+Diaco MES - Quality Alerts Store
+===================================
+نگهداری و خواندن جدول QualityAlert.
+
+منطق:
+─────
+  نوشتن (post_save سیگنال‌های winding / tfo / heatset):
+    sync_alerts(section, instance, alerts) هشدارهای فعلی بچ را بعد از commit
+    جایگزین هشدارهای قبلی همان بچ می‌کند؛ اگر چیزی عوض نشده باشد نوشتنی
+    انجام نمی‌شود. حذف بچ → delete_alerts.
+    پرکردن اولیه از رکوردهای موجود: python manage.py rebuild_quality_alerts
+
+  خواندن (QualityAlertsView):
+    alerts_page() — ترتیب (level، date، id) یعنی critical اول؛ صفحه‌بندی
+    keyset با cursor (بدون OFFSET) تا صفحه‌های عمیق هم فقط از ایندکس
+    خوانده شوند.
+"""
+import base64
+import json
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import QualityAlert
+
+ALERTS_PAGE_SIZE = 100
+ALERTS_MAX_PAGE_SIZE = 500
+ALERT_ORDER = ('level', 'date', 'id')
+
+
+# ═══════════════════════════════════════════════════════════════
+# نوشتن
+# ═══════════════════════════════════════════════════════════════
+
+def alert_rows(section, instance, alerts):
+    """ردیف‌های QualityAlert یک بچ از لیست هشدارهای quality_alerts (ذخیره‌نشده)."""
+    return [
+        QualityAlert(
+            section=section,
+            batch_id=instance.pk,
+            batch_number=instance.batch_number,
+            machine_id=instance.machine_id,
+            date=instance.production_date,
+            level=alert['level'],
+            code=alert['code'],
+            message=alert['msg'][:255],
+        )
+        for alert in alerts
+    ]
+
+
+def _signature(rows):
+    return sorted((r.code, r.level, r.message, r.batch_number, r.machine_id, r.date) for r in rows)
+
+
+def write_alerts(section, batch_id, rows):
+    """جایگزینی هشدارهای یک بچ (فقط اگر تغییر کرده باشند)."""
+    current = QualityAlert.objects.filter(section=section, batch_id=batch_id)
+    if _signature(current) == _signature(rows):
+        return
+    with transaction.atomic():
+        current.delete()
+        QualityAlert.objects.bulk_create(rows)
+
+
+def replace_alerts(section, rows_by_batch):
+    """
+    نسخه گروهی write_alerts برای پردازش‌های دسته‌ای: {batch_id: rows}.
+    یک کوئری خواندن؛ فقط بچ‌هایی که هشدارشان تغییر کرده حذف و دوباره درج می‌شوند.
+    """
+    current = {}
+    for row in QualityAlert.objects.filter(section=section, batch_id__in=list(rows_by_batch)):
+        current.setdefault(row.batch_id, []).append(row)
+    changed = [
+        batch_id for batch_id, rows in rows_by_batch.items()
+        if _signature(current.get(batch_id, [])) != _signature(rows)
+    ]
+    if not changed:
+        return 0
+    with transaction.atomic():
+        QualityAlert.objects.filter(section=section, batch_id__in=changed).delete()
+        QualityAlert.objects.bulk_create(
+            [row for batch_id in changed for row in rows_by_batch[batch_id]], batch_size=1000,
+        )
+    return len(changed)
+
+
+def sync_alerts(section, instance, alerts):
+    """هشدارهای فعلی بچ بعد از commit در جدول نوشته می‌شوند."""
+    rows = alert_rows(section, instance, alerts)
+    batch_id = instance.pk
+    transaction.on_commit(lambda: write_alerts(section, batch_id, rows))
+
+
+def delete_alerts(section, batch_id):
+    transaction.on_commit(
+        lambda: QualityAlert.objects.filter(section=section, batch_id=batch_id).delete()
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن
+# ═══════════════════════════════════════════════════════════════
+
+def encode_cursor(alert):
+    raw = json.dumps([alert['level'], alert['date'].isoformat(), alert['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(level, date, id) از cursor؛ ValueError اگر نامعتبر باشد."""
+    try:
+        level, day, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(level), date.fromisoformat(day), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('cursor نامعتبر')
+
+
+def alerts_queryset(date_from, date_to, level=None, section=None):
+    qs = QualityAlert.objects.filter(date__range=(date_from, date_to))
+    if level:
+        qs = qs.filter(level=level)
+    if section:
+        qs = qs.filter(section=section)
+    return qs
+
+
+def alert_counts(qs):
+    return qs.aggregate(
+        total=Count('id'),
+        critical=Count('id', filter=Q(level=QualityAlert.Level.CRITICAL)),
+        warning=Count('id', filter=Q(level=QualityAlert.Level.WARNING)),
+    )
+
+
+def alerts_page(qs, cursor=None, limit=ALERTS_PAGE_SIZE):
+    """
+    یک صفحه هشدار بعد از cursor.
+    Returns: (لیست dict، cursor صفحه بعد یا None)
+    """
+    if cursor:
+        level, day, pk = decode_cursor(cursor)
+        qs = qs.filter(
+            Q(level__gt=level)
+            | Q(level=level, date__gt=day)
+            | Q(level=level, date=day, id__gt=pk)
+        )
+    rows = list(qs.order_by(*ALERT_ORDER).values(
+        'id', 'section', 'batch_id', 'batch_number', 'machine__code',
+        'date', 'level', 'code', 'message',
+    )[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    labels = dict(QualityAlert.Section.choices)
+    return [
+        {
+            'section':       r['section'],
+            'section_label': labels.get(r['section'], r['section']),
+            'batch_id':      r['batch_id'],
+            'batch_number':  r['batch_number'],
+            'machine':       r['machine__code'],
+            'date':          str(r['date']),
+            'level':         r['level'],
+            'code':          r['code'],
+            'message':       r['message'],
+        }
+        for r in rows[:limit]
+    ], next_cursor
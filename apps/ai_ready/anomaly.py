@@ -0,0 +1,237 @@
+"""
+Diaco MES - Statistical Anomaly Detection
+============================================
+تشخیص آنومالی آماری روی سری زمانی تولید هر ماشین (خط پایه تطبیقی).
+
+منطق:
+─────
+  هر سری (SERIES) با یک کوئری values_list (مرتب بر اساس ماشین و تاریخ)
+  خوانده و به ماتریس ماشین × نوبت (padding با NaN) تبدیل می‌شود؛ همه
+  ماشین‌ها با هم محاسبه می‌شوند:
+
+    خط پایه — میانگین/انحراف معیار ZSCORE_WINDOW مقدار همان ماشین که
+              BASELINE_GAP نوبت قبل از نقطه جاری تمام می‌شود (مجموع تجمعی،
+              بدون حلقه روی رکوردها)؛ کمتر از MIN_HISTORY مقدار → بدون داوری
+    zscore  — |x − μ| / σ > Z_LIMIT
+    ewma    — میانگین نمایی (λ = EWMA_LAMBDA) خارج از μ ± L·σ·√(λ/(2−λ))
+              (انحراف تدریجی که تک‌نقطه‌ای دیده نمی‌شود)
+    cusum   — CUSUM جدولی روی z (k = CUSUM_K، h = CUSUM_H)؛ بعد از هر
+              هشدار صفر می‌شود (جابه‌جایی پایدار کوچک)
+
+  EWMA و CUSUM بازگشتی‌اند: حلقه فقط روی ستون زمان است و هر گام برای همه
+  ماشین‌ها برداری اجرا می‌شود.
+
+  جهت هر سری (direction) تعیین می‌کند کدام سمت آنومالی است؛ مثلاً راندمان
+  فقط وقتی پایین بیاید و پارگی فقط وقتی بالا برود.
+
+  خروجی در جدول AnomalyFlag (ai_ready/models.py) — هر اجرا پرچم‌های بازه
+  خودش را با یک delete + bulk_create جایگزین می‌کند.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+
+from apps.blowroom.models import Batch as BlowroomBatch
+from apps.heatset.models import Batch as HeatsetBatch
+from apps.spinning.models import Production as SpinningProd
+from apps.winding.models import Production as WindingProd
+
+from .models import AnomalyFlag
+
+ANOMALY_WINDOW_DAYS = 365
+
+ZSCORE_WINDOW = 50      # تعداد مقادیر قبلی برای خط پایه
+BASELINE_GAP = 10       # فاصله خط پایه از نقطه جاری (تا جابه‌جایی تازه جذب خط پایه نشود)
+MIN_HISTORY = 10
+STD_FLOOR = 1e-6        # سری ثابت → بدون داوری
+Z_LIMIT = 3.0
+EWMA_LAMBDA = 0.2
+EWMA_L = 3.0
+CUSUM_K = 0.5
+CUSUM_H = 5.0
+
+# name → {stage, model, field, direction}
+#   direction: high (فقط افزایش) | low (فقط کاهش) | both
+SERIES = {
+    'spinning_efficiency': {'stage': 'spinning', 'model': SpinningProd,  'field': 'efficiency_pct',  'direction': 'low'},
+    'spinning_breakage':   {'stage': 'spinning', 'model': SpinningProd,  'field': 'breakage_count',  'direction': 'high'},
+    'winding_cuts':        {'stage': 'winding',  'model': WindingProd,   'field': 'cuts_per_100km',  'direction': 'high'},
+    'winding_efficiency':  {'stage': 'winding',  'model': WindingProd,   'field': 'efficiency_pct',  'direction': 'low'},
+    'blowroom_waste':      {'stage': 'blowroom', 'model': BlowroomBatch, 'field': 'waste_pct',       'direction': 'high'},
+    'heatset_temperature': {'stage': 'heatset',  'model': HeatsetBatch,  'field': 'temperature_c',   'direction': 'both'},
+}
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن سری‌ها
+# ═══════════════════════════════════════════════════════════════
+
+def load_series(name, since):
+    """
+    سری یک شاخص برای همه ماشین‌ها از since با یک کوئری.
+
+    Returns: dict با ماتریس‌های (ماشین × نوبت) — value (NaN = خالی)، pk،
+             و آرایه‌های machine_ids / dates (dates هم‌شکل value، object)
+             None اگر داده‌ای نباشد.
+    """
+    entry = SERIES[name]
+    field = entry['field']
+    rows = list(entry['model'].objects.filter(
+        production_date__gte=since, machine__isnull=False, **{f'{field}__isnull': False},
+    ).order_by('machine_id', 'production_date', 'pk').values_list(
+        'pk', 'machine_id', 'production_date', field,
+    ))
+    if not rows:
+        return None
+
+    pks, mids, dates, values = zip(*rows)
+    mids = np.array(mids)
+    # شماره گروه (ماشین) و جایگاه هر رکورد در سری ماشین خودش
+    new_group = np.concatenate(([True], mids[1:] != mids[:-1]))
+    group = np.cumsum(new_group) - 1
+    starts = np.flatnonzero(new_group)
+    pos = np.arange(len(mids)) - starts[group]
+    shape = (len(starts), int(pos.max()) + 1)
+
+    value = np.full(shape, np.nan)
+    value[group, pos] = np.array(values, dtype=np.float64)
+    pk = np.zeros(shape, dtype=np.int64)
+    pk[group, pos] = pks
+    day = np.empty(shape, dtype=object)
+    day[group, pos] = dates
+    return {'value': value, 'pk': pk, 'date': day, 'machine_ids': mids[starts]}
+
+
+# ═══════════════════════════════════════════════════════════════
+# آماره‌ها (برداری روی همه ماشین‌ها)
+# ═══════════════════════════════════════════════════════════════
+
+def rolling_baseline(x, window=ZSCORE_WINDOW, gap=BASELINE_GAP):
+    """میانگین، انحراف معیار و تعداد window مقدار هر خانه که gap نوبت قبل از آن تمام می‌شود."""
+    valid = ~np.isnan(x)
+    v = np.where(valid, x, 0.0)
+    zeros = np.zeros((x.shape[0], 1))
+    cs = np.hstack((zeros, np.cumsum(v, axis=1)))
+    cs2 = np.hstack((zeros, np.cumsum(v * v, axis=1)))
+    cn = np.hstack((zeros, np.cumsum(valid, axis=1)))
+
+    idx = np.maximum(np.arange(x.shape[1]) - gap, 0)
+    lo = np.maximum(idx - window, 0)
+    n = cn[:, idx] - cn[:, lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (cs[:, idx] - cs[:, lo]) / n
+        var = (cs2[:, idx] - cs2[:, lo]) / n - mean * mean
+    return mean, np.sqrt(np.maximum(var, 0.0)), n
+
+
+def detect(x):
+    """
+    z-score، EWMA و CUSUM برای ماتریس x (ماشین × نوبت).
+
+    Returns: {'baseline', 'zscore', 'ewma', 'cusum_high', 'cusum_low'} — هم‌شکل x؛
+             NaN جایی که خط پایه کافی نیست.
+    """
+    mean, std, n = rolling_baseline(x)
+    ready = ~np.isnan(x) & (n >= MIN_HISTORY) & (std > STD_FLOOR)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(ready, (x - mean) / std, np.nan)
+
+    ewma = np.empty_like(x)
+    cusum_high = np.zeros_like(x)
+    cusum_low = np.zeros_like(x)
+    level = x[:, 0].copy()
+    s_high = np.zeros(x.shape[0])
+    s_low = np.zeros(x.shape[0])
+    for t in range(x.shape[1]):
+        live = ~np.isnan(x[:, t])
+        level = np.where(live, EWMA_LAMBDA * x[:, t] + (1 - EWMA_LAMBDA) * level, level)
+        ewma[:, t] = level
+        zt = np.nan_to_num(z[:, t])
+        s_high = np.maximum(0.0, s_high + zt - CUSUM_K)
+        s_low = np.maximum(0.0, s_low - zt - CUSUM_K)
+        cusum_high[:, t] = s_high
+        cusum_low[:, t] = s_low
+        s_high[s_high > CUSUM_H] = 0.0
+        s_low[s_low > CUSUM_H] = 0.0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ewma_score = np.where(
+            ready, (ewma - mean) / (std * np.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA))), np.nan,
+        )
+    return {
+        'baseline': mean,
+        'zscore': z,
+        'ewma': ewma_score,
+        'cusum_high': np.where(ready, cusum_high, np.nan),
+        'cusum_low': np.where(ready, cusum_low, np.nan),
+    }
+
+
+def _signals(stats, direction):
+    """(method, direction, mask, score) هر روش با توجه به جهت سری."""
+    z, e = stats['zscore'], stats['ewma']
+    with np.errstate(invalid='ignore'):
+        out = []
+        if direction in ('high', 'both'):
+            out += [
+                (AnomalyFlag.Method.ZSCORE, AnomalyFlag.Direction.HIGH, z > Z_LIMIT, z),
+                (AnomalyFlag.Method.EWMA, AnomalyFlag.Direction.HIGH, e > EWMA_L, e),
+                (AnomalyFlag.Method.CUSUM, AnomalyFlag.Direction.HIGH,
+                 stats['cusum_high'] > CUSUM_H, stats['cusum_high']),
+            ]
+        if direction in ('low', 'both'):
+            out += [
+                (AnomalyFlag.Method.ZSCORE, AnomalyFlag.Direction.LOW, z < -Z_LIMIT, z),
+                (AnomalyFlag.Method.EWMA, AnomalyFlag.Direction.LOW, e < -EWMA_L, e),
+                (AnomalyFlag.Method.CUSUM, AnomalyFlag.Direction.LOW,
+                 stats['cusum_low'] > CUSUM_H, -stats['cusum_low']),
+            ]
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+# اجرا و ذخیره
+# ═══════════════════════════════════════════════════════════════
+
+def series_flags(name, since):
+    """پرچم‌های یک سری از since (ذخیره‌نشده)؛ لیست AnomalyFlag."""
+    data = load_series(name, since)
+    if data is None:
+        return []
+    entry = SERIES[name]
+    x = data['value']
+    stats = detect(x)
+
+    flags = []
+    for method, direction, mask, score in _signals(stats, entry['direction']):
+        for g, t in zip(*np.nonzero(mask)):
+            flags.append(AnomalyFlag(
+                stage=entry['stage'],
+                record_id=int(data['pk'][g, t]),
+                machine_id=int(data['machine_ids'][g]),
+                date=data['date'][g, t],
+                metric=name,
+                method=method,
+                direction=direction,
+                value=float(x[g, t]),
+                baseline=round(float(stats['baseline'][g, t]), 4),
+                score=round(float(score[g, t]), 3),
+            ))
+    return flags
+
+
+def detect_anomalies(names=None, since=None):
+    """
+    اجرای تشخیص برای سری‌ها و جایگزینی پرچم‌های بازه (از since) در دیتابیس.
+    خروجی: {name: تعداد پرچم}
+    """
+    since = since or date.today() - timedelta(days=ANOMALY_WINDOW_DAYS)
+    result = {}
+    for name in names or SERIES:
+        flags = series_flags(name, since)
+        with transaction.atomic():
+            AnomalyFlag.objects.filter(metric=name, date__gte=since).delete()
+            AnomalyFlag.objects.bulk_create(flags, batch_size=1000)
+        result[name] = len(flags)
+    return result
@@ -0,0 +1,218 @@
+"""
+Diaco MES - Downtime Analytics
+=================================
+تحلیل توقفات ماشین‌ها (Predictive Maintenance).
+
+منطق:
+─────
+  خلاصه (تعداد خرابی، دقیقه توقف، MTBF، MTTR، ریسک، روند هفتگی):
+    از MachineHealthCounter (maintenance/counters.py) — ردیف‌های روزانه
+    هر ماشین؛ fleet health فقط همین خلاصه را می‌خواند (downtime_summary).
+      mtbf_hours   — زمان کارکرد (بازه − مجموع توقف) ÷ تعداد خرابی
+      mttr_minutes — مجموع دقیقه توقف ÷ تعداد خرابی
+      weekly_trend — هیستوگرام هفتگی (np.bincount) — هفته‌ها هم‌پوشانی ندارند
+    توقف باز (end_time خالی) در تعداد خرابی شمرده می‌شود ولی دقیقه‌ای ندارد.
+
+  جزئیات (analyze_downtime): لاگ خام همه ماشین‌ها با یک کوئری values_list
+  (مرتب بر اساس ماشین و شروع) به آرایه‌های NumPy تبدیل می‌شود:
+      tbf_hours         — فاصله واقعی پایان هر توقف تا شروع توقف بعدی
+      mttr_percentiles  — صدک‌های ۵۰/۹۰/۹۵ مدت تعمیر (توقف باز حساب نمی‌شود)
+      by_reason         — پارتو دلایل (سهم و سهم تجمعی از کل دقیقه توقف)
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from apps.maintenance.counters import daily_counts, window_start
+from apps.maintenance.models import DowntimeLog
+
+MTTR_PERCENTILES = (50, 90, 95)
+
+# سطح ریسک بر اساس MTBF (ساعت): اولین آستانه‌ای که MTBF از آن کمتر باشد
+RISK_THRESHOLDS = (
+    (48, 'critical'),
+    (120, 'high'),
+    (240, 'medium'),
+)
+
+
+def mtbf_risk_level(mtbf_hours):
+    """سطح ریسک ماشین از روی MTBF (RISK_THRESHOLDS)."""
+    for limit, level in RISK_THRESHOLDS:
+        if mtbf_hours < limit:
+            return level
+    return 'low'
+
+
+# ═══════════════════════════════════════════════════════════════
+# خلاصه از شمارنده‌ها
+# ═══════════════════════════════════════════════════════════════
+
+def _window_hours(days, now):
+    """طول پنجره (ساعت) از ابتدای روز window_start تا اکنون."""
+    start = datetime.combine(window_start(days), datetime.min.time()).timestamp()
+    return (now - start) / 3600
+
+
+def machine_summary(counts, window_hours):
+    """خلاصه یک ماشین از {day: (count, minutes)} شمارنده‌ها در پنجره window_hours ساعته."""
+    failures = sum(c for c, _m in counts.values())
+    minutes = sum(m for _c, m in counts.values())
+    uptime_hours = max(window_hours - minutes / 60, 0.0)
+    mtbf = round(uptime_hours / max(failures, 1), 1)
+    return {
+        'total_failures': failures,
+        'downtime_min': minutes,
+        'mtbf_hours': mtbf,
+        'mttr_minutes': round(minutes / max(failures, 1), 1),
+        'risk_level': mtbf_risk_level(mtbf),
+    }
+
+
+def downtime_summary(machine_ids, days=30):
+    """خلاصه توقفات چند ماشین با یک کوئری روی شمارنده‌ها؛ {machine_id: dict}."""
+    machine_ids = list(machine_ids)
+    hours = _window_hours(days, datetime.now().timestamp())
+    daily = daily_counts(machine_ids, window_start(days))
+    return {mid: machine_summary(daily.get(mid, {}), hours) for mid in machine_ids}
+
+
+def _weekly_trend(counts, today, weeks):
+    """تعداد توقف هر هفته (قدیم → جدید)؛ هفته ۰ = هفت روز منتهی به امروز."""
+    days_ago = np.array([(today - d).days for d in counts], dtype=int)
+    per_day = np.array([c for c, _m in counts.values()], dtype=int)
+    keep = days_ago < weeks * 7
+    week_counts = np.bincount(days_ago[keep] // 7, weights=per_day[keep], minlength=weeks)[:weeks]
+    return [
+        {
+            'week_start': (today - timedelta(days=(w + 1) * 7 - 1)).isoformat(),
+            'count': int(week_counts[w]),
+        }
+        for w in reversed(range(weeks))
+    ]
+
+
+# ═══════════════════════════════════════════════════════════════
+# جزئیات از لاگ خام
+# ═══════════════════════════════════════════════════════════════
+
+def _seconds(values):
+    return np.array([v.timestamp() if v else np.nan for v in values], dtype=np.float64)
+
+
+def downtime_arrays(machine_ids, since):
+    """
+    توقفات از ابتدای روز since تا اکنون با یک کوئری.
+
+    Returns: {machine_id: {'start', 'end', 'duration', 'reason'}} — np.ndarray
+    (ماشین بدون توقف در خروجی نیست)
+    """
+    rows = list(DowntimeLog.objects.filter(
+        machine_id__in=list(machine_ids),
+        start_time__date__gte=since,
+    ).order_by('machine_id', 'start_time').values_list(
+        'machine_id', 'start_time', 'end_time', 'duration_min', 'reason_category',
+    ))
+    if not rows:
+        return {}
+
+    mids, starts, ends, durations, reasons = zip(*rows)
+    mids = np.array(mids)
+    start = _seconds(starts)
+    end = _seconds(ends)
+    duration = np.array([np.nan if d is None else d for d in durations], dtype=np.float64)
+    # مدت ثبت‌نشده ولی پایان‌دار → از اختلاف زمان‌ها
+    missing = np.isnan(duration) & ~np.isnan(end)
+    duration[missing] = (end[missing] - start[missing]) / 60
+    reason = np.array(reasons)
+
+    # مرزهای هر ماشین در آرایه مرتب
+    cuts = np.flatnonzero(np.diff(mids)) + 1
+    bounds = zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(mids)])))
+    return {
+        int(mids[a]): {
+            'start': start[a:b], 'end': end[a:b],
+            'duration': duration[a:b], 'reason': reason[a:b],
+        }
+        for a, b in bounds
+    }
+
+
+def _empty_arrays():
+    empty = np.array([], dtype=np.float64)
+    return {'start': empty, 'end': empty, 'duration': empty, 'reason': np.array([], dtype=str)}
+
+
+def _reason_pareto(reason, duration):
+    """پارتو دلایل توقف بر اساس مجموع دقیقه (نزولی)."""
+    if not len(reason):
+        return []
+    labels, inverse = np.unique(reason, return_inverse=True)
+    minutes = np.bincount(inverse, weights=np.nan_to_num(duration), minlength=len(labels))
+    counts = np.bincount(inverse, minlength=len(labels))
+    order = np.lexsort((labels, -minutes))
+    total = minutes.sum()
+    cumulative = np.cumsum(minutes[order])
+    return [
+        {
+            'reason_category': str(labels[k]),
+            'count': int(counts[k]),
+            'total_min': int(minutes[k]),
+            'share_pct': round(float(minutes[k] / total * 100), 1) if total else 0.0,
+            'cumulative_pct': round(float(cumulative[n] / total * 100), 1) if total else 0.0,
+        }
+        for n, k in enumerate(order)
+    ]
+
+
+def _round_or_none(value, ndigits=1):
+    return None if value is None or np.isnan(value) else round(float(value), ndigits)
+
+
+def analyze_machine(machine_id, counts, arrays, days, now):
+    """الگوی توقفات یک ماشین: خلاصه از شمارنده‌ها + جزئیات از آرایه‌های downtime_arrays."""
+    start, end, duration = arrays['start'], arrays['end'], arrays['duration']
+    summary = machine_summary(counts, _window_hours(days, now))
+
+    # فاصله واقعی بین خرابی‌ها: پایان توقف i تا شروع توقف i+1 (توقف باز تا اکنون)
+    open_end = np.where(np.isnan(end), now, end)
+    tbf = np.maximum(start[1:] - open_end[:-1], 0) / 3600 if len(start) > 1 else np.array([])
+
+    repaired = duration[~np.isnan(duration)]
+    if len(repaired):
+        percentiles = np.percentile(repaired, MTTR_PERCENTILES)
+    else:
+        percentiles = [np.nan] * len(MTTR_PERCENTILES)
+
+    return {
+        'machine_id': machine_id,
+        'period_days': days,
+        'total_failures': summary['total_failures'],
+        'mtbf_hours': summary['mtbf_hours'],
+        'mttr_minutes': summary['mttr_minutes'],
+        'mttr_percentiles': {
+            f'p{p}': _round_or_none(v) for p, v in zip(MTTR_PERCENTILES, percentiles)
+        },
+        'tbf_hours': {
+            'mean': _round_or_none(tbf.mean()) if len(tbf) else None,
+            'median': _round_or_none(np.median(tbf)) if len(tbf) else None,
+            'min': _round_or_none(tbf.min()) if len(tbf) else None,
+        },
+        'hours_since_last_failure': round(float((now - open_end[-1]) / 3600), 1) if len(start) else None,
+        'risk_level': summary['risk_level'],
+        'by_reason': _reason_pareto(arrays['reason'], duration),
+        'weekly_trend': _weekly_trend(counts, date.today(), days // 7),
+    }
+
+
+def analyze_downtime(machine_ids, days=90):
+    """الگوی توقفات چند ماشین (یک کوئری شمارنده + یک کوئری لاگ)؛ خروجی: {machine_id: dict}."""
+    machine_ids = list(machine_ids)
+    since = window_start(days)
+    now = datetime.now().timestamp()
+    daily = daily_counts(machine_ids, since)
+    arrays = downtime_arrays(machine_ids, since)
+    return {
+        mid: analyze_machine(mid, daily.get(mid, {}), arrays.get(mid) or _empty_arrays(), days, now)
+        for mid in machine_ids
+    }
@@ -0,0 +1,274 @@
+"""
+Diaco MES - AI Metadata Enrichers
+====================================
+توابع خالص محاسبه metadata (JSON) رکوردهای تولید: instance → dict.
+بدون نوشتن در دیتابیس — هم سیگنال‌ها (ai_ready/signals.py) و هم
+بازسازی گروهی (rebuild_metadata) از همین توابع استفاده می‌کنند.
+
+ساختار metadata:
+{
+  "ai_version": "1.0",
+  "computed_at": "2026-02-16T12:00:00",
+  "oee": { ... },
+  "quality_metrics": { ... },
+  "anomaly_flags": [ ... ]
+}
+
+ENRICHERS: name → {model, enrich, date_field, context}
+  context (اختیاری): تابعی که برای یک دسته رکورد، داده مشترک را با یک کوئری
+  آماده می‌کند (مثلاً توقفات ۳۰ روزه ماشین‌ها)؛ enrich(instance, context).
+  بدون context (در سیگنال pre_save) همان داده برای یک رکورد خوانده می‌شود —
+  با احتساب خود رکورد که هنوز ذخیره نشده است.
+  پنجره ۳۰ روزه توقفات از MachineHealthCounter (حداکثر ۳۰ ردیف) خوانده می‌شود.
+"""
+from datetime import datetime
+
+from apps.blowroom.models import Batch as BlowroomBatch
+from apps.carding.models import Production as CardingProd
+from apps.passage.models import Production as PassageProd
+from apps.finisher.models import Production as FinisherProd
+from apps.spinning.models import Production as SpinningProd
+from apps.dyeing.models import Batch as DyeingBatch
+from apps.maintenance.models import DowntimeLog
+from apps.maintenance.counters import window_start, window_totals
+from apps.winding.models import Production as WindingProd
+from apps.tfo.models import Production as TFOProd
+from apps.heatset.models import Batch as HeatsetBatch
+from apps.winding.signals import build_metadata as winding_metadata
+from apps.tfo.signals import build_metadata as tfo_metadata
+from apps.heatset.signals import build_metadata as heatset_metadata
+
+
+def _base_metadata():
+    return {
+        'ai_version': '1.0',
+        'computed_at': datetime.now().isoformat(),
+    }
+
+
+def metadata_changed(old, new):
+    """گارد قبل از نوشتن: مقایسه بدون computed_at (که در هر محاسبه عوض می‌شود)."""
+    def strip(meta):
+        return {k: v for k, v in meta.items() if k != 'computed_at'} if isinstance(meta, dict) else meta
+    return strip(old) != strip(new)
+
+
+def _safe_float(val):
+    try:
+        return float(val) if val is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+# ── حلاجی ────────────────────────────────────────────────
+
+def enrich_blowroom(instance, context=None):
+    meta = _base_metadata()
+    inp = _safe_float(instance.total_input_weight)
+    out = _safe_float(instance.output_weight)
+    waste = _safe_float(instance.waste_weight)
+
+    if inp and inp > 0:
+        meta['yield_pct'] = round(((out or 0) / inp) * 100, 2) if out else None
+        meta['waste_pct'] = round(((waste or 0) / inp) * 100, 2) if waste else None
+
+    meta['anomaly_flags'] = []
+    if meta.get('waste_pct') and meta['waste_pct'] > 8:
+        meta['anomaly_flags'].append('HIGH_WASTE')
+    return meta
+
+
+# ── کاردینگ ──────────────────────────────────────────────
+
+def enrich_carding(instance, context=None):
+    meta = _base_metadata()
+    inp = _safe_float(instance.input_weight)
+    out = _safe_float(instance.output_weight)
+
+    if inp and inp > 0 and out:
+        meta['yield_pct'] = round((out / inp) * 100, 2)
+
+    meta['quality_metrics'] = {}
+    meta['anomaly_flags'] = []
+    neps = instance.neps_count
+    if neps is not None:
+        meta['quality_metrics']['neps'] = neps
+        if neps > 200:
+            meta['anomaly_flags'].append('HIGH_NEPS')
+    return meta
+
+
+# ── پاساژ ───────────────────────────────────────────────
+
+def enrich_passage(instance, context=None):
+    meta = _base_metadata()
+    cv = _safe_float(instance.evenness_cv)
+
+    meta['quality_metrics'] = {}
+    meta['anomaly_flags'] = []
+
+    if cv is not None:
+        meta['quality_metrics']['evenness_cv'] = cv
+        if cv > 5.0:
+            meta['anomaly_flags'].append('HIGH_CV')
+
+    draft = _safe_float(instance.draft_ratio)
+    if draft:
+        meta['quality_metrics']['draft_ratio'] = draft
+    return meta
+
+
+# ── فینیشر ──────────────────────────────────────────────
+
+def enrich_finisher(instance, context=None):
+    meta = _base_metadata()
+    inp = _safe_float(instance.input_weight)
+    out = _safe_float(instance.output_weight)
+
+    if inp and inp > 0 and out:
+        meta['yield_pct'] = round((out / inp) * 100, 2)
+
+    meta['anomaly_flags'] = []
+    return meta
+
+
+# ── رینگ (بحرانی‌ترین برای AI) ──────────────────────────
+
+def enrich_spinning(instance, context=None):
+    meta = _base_metadata()
+    inp = _safe_float(instance.input_weight)
+    out = _safe_float(instance.output_weight)
+    eff = _safe_float(instance.efficiency_pct)
+    brk = instance.breakage_count or 0
+    spindles = instance.num_spindles_active or 0
+
+    # بازده وزنی
+    if inp and inp > 0 and out:
+        meta['yield_pct'] = round((out / inp) * 100, 2)
+
+    # OEE ساده
+    meta['oee'] = {}
+    if eff:
+        meta['oee']['performance'] = eff
+    if spindles > 0:
+        total = instance.num_spindles_total or spindles
+        meta['oee']['availability'] = round((spindles / total) * 100, 2)
+    if eff and spindles > 0:
+        avail = meta['oee'].get('availability', 100)
+        meta['oee']['oee_simple'] = round((avail * eff) / 10000 * 100, 2)
+
+    # کیفیت
+    meta['quality_metrics'] = {
+        'breakage_count': brk,
+        'breakage_per_1000_spindle_hr': round((brk / max(spindles, 1)) * 1000, 1),
+    }
+
+    # هشدار آنومالی
+    meta['anomaly_flags'] = []
+    if eff and eff < 70:
+        meta['anomaly_flags'].append('LOW_EFFICIENCY')
+    if brk > 50:
+        meta['anomaly_flags'].append('HIGH_BREAKAGE')
+    if meta['oee'].get('oee_simple') and meta['oee']['oee_simple'] < 60:
+        meta['anomaly_flags'].append('LOW_OEE')
+    return meta
+
+
+# ── رنگرزی ──────────────────────────────────────────────
+
+def enrich_dyeing(instance, context=None):
+    meta = _base_metadata()
+
+    meta['process_params'] = {
+        'temperature': _safe_float(instance.temperature),
+        'ph': _safe_float(instance.ph_value),
+        'liquor_ratio': _safe_float(instance.liquor_ratio),
+        'duration_min': instance.duration_min,
+    }
+
+    meta['anomaly_flags'] = []
+    if instance.quality_result == 'fail':
+        meta['anomaly_flags'].append('QUALITY_FAIL')
+    temp = _safe_float(instance.temperature)
+    if temp and temp > 130:
+        meta['anomaly_flags'].append('HIGH_TEMPERATURE')
+    ph = _safe_float(instance.ph_value)
+    if ph and (ph < 3 or ph > 11):
+        meta['anomaly_flags'].append('EXTREME_PH')
+    return meta
+
+
+# ── توقفات (Predictive Maintenance) ─────────────────────
+
+def downtime_context(objs):
+    """توقفات ۳۰ روز اخیر ماشین‌های یک دسته از MachineHealthCounter: {machine_id: (count, total_min)}."""
+    return window_totals({obj.machine_id for obj in objs}, days=30)
+
+
+def _downtime_recent(instance):
+    """
+    توقفات ۳۰ روز اخیر ماشین با احتساب instance (قبل از ذخیره): (count, total_min).
+    شمارنده‌ها هنوز مقدار قبلی این توقف را دارند → کم و مقدار جدید اضافه می‌شود.
+    """
+    since = window_start(30)
+    count, total_min = window_totals([instance.machine_id], days=30).get(instance.machine_id, (0, 0))
+    if instance.pk:
+        old = DowntimeLog.objects.filter(pk=instance.pk).values_list(
+            'machine_id', 'start_time', 'duration_min',
+        ).first()
+        if old and old[0] == instance.machine_id and old[1].date() >= since:
+            count -= 1
+            total_min -= old[2] or 0
+    if instance.start_time and instance.start_time.date() >= since:
+        count += 1
+        total_min += instance.duration_min or 0
+    return count, total_min
+
+
+def enrich_downtime(instance, context=None):
+    meta = _base_metadata()
+
+    # تعداد توقفات اخیر همین ماشین (۳۰ روز)
+    if context is None:
+        count, total_min = _downtime_recent(instance)
+    else:
+        count, total_min = context.get(instance.machine_id, (0, 0))
+
+    meta['machine_health'] = {
+        'downtime_count_30d': count,
+        'downtime_total_min_30d': total_min,
+    }
+
+    meta['anomaly_flags'] = []
+    if count > 10:
+        meta['anomaly_flags'].append('FREQUENT_DOWNTIME')
+    if total_min > 500:
+        meta['anomaly_flags'].append('EXCESSIVE_DOWNTIME')
+    return meta
+
+
+# ═══════════════════════════════════════════════════════════════
+# رجیستری
+# ═══════════════════════════════════════════════════════════════
+
+def _stage_enricher(build):
+    """build_metadata مراحل v2.0 (winding/tfo/heatset) با امضای enrich(instance, context)."""
+    def enrich(instance, context=None):
+        return build(instance)
+    return enrich
+
+
+ENRICHERS = {
+    'blowroom': {'model': BlowroomBatch,  'enrich': enrich_blowroom, 'date_field': 'production_date'},
+    'carding':  {'model': CardingProd,    'enrich': enrich_carding,  'date_field': 'production_date'},
+    'passage':  {'model': PassageProd,    'enrich': enrich_passage,  'date_field': 'production_date'},
+    'finisher': {'model': FinisherProd,   'enrich': enrich_finisher, 'date_field': 'production_date'},
+    'spinning': {'model': SpinningProd,   'enrich': enrich_spinning, 'date_field': 'production_date'},
+    'dyeing':   {'model': DyeingBatch,    'enrich': enrich_dyeing,   'date_field': 'production_date'},
+    'downtime': {'model': DowntimeLog,    'enrich': enrich_downtime, 'date_field': 'start_time',
+                 'context': downtime_context},
+    # ── v2.0 خط تولید نخ فرش ────────────────────────
+    'winding':  {'model': WindingProd,    'enrich': _stage_enricher(winding_metadata), 'date_field': 'production_date'},
+    'tfo':      {'model': TFOProd,        'enrich': _stage_enricher(tfo_metadata),     'date_field': 'production_date'},
+    'heatset':  {'model': HeatsetBatch,   'enrich': _stage_enricher(heatset_metadata), 'date_field': 'production_date'},
+}
@@ -0,0 +1,221 @@
+"""
+Diaco MES - ML Feature Store
+===============================
+نگهداری و خروجی جدول BatchFeature (یک ردیف با ستون‌های ثابت برای هر بچ).
+
+منطق:
+─────
+  FEATURE_STAGES: stage → (Model، {ستون: فیلد مبدأ}، فیلد خط، (مرحله قبلی، فیلد FK))
+  ستون‌های مشتق (yield_pct، waste_pct) از همان مقادیر محاسبه می‌شوند.
+
+  نگهداری (ai_ready/signals.py):
+    ذخیره/حذف بچ → ردیف همان بچ بعد از commit از داده خام دوباره ساخته
+    یا حذف می‌شود (refresh_feature — idempotent).
+    rebuild() بازسازی گروهی یک مرحله (values در دسته‌های pk + bulk_create).
+
+  خروجی (export_features):
+    feature_arrays() ستون‌ها را مستقیم از values_list به آرایه‌های NumPy
+    تبدیل می‌کند (عدد → float64 با NaN، شناسه → int64 با ۰، تاریخ →
+    datetime64[D]، متن → رشته)؛ write_npz / write_csv_gz.
+"""
+import csv
+import gzip
+
+import numpy as np
+from django.db import transaction
+
+from apps.blowroom.models import Batch as BlowroomBatch
+from apps.carding.models import Production as CardingProd
+from apps.passage.models import Production as PassageProd
+from apps.finisher.models import Production as FinisherProd
+from apps.spinning.models import Production as SpinningProd
+from apps.dyeing.models import Batch as DyeingBatch
+from apps.winding.models import Production as WindingProd
+from apps.tfo.models import Production as TFOProd
+from apps.heatset.models import Batch as HeatsetBatch
+
+from .models import BatchFeature
+
+
+# ═══════════════════════════════════════════════════════════════
+# تعریف مراحل
+# ═══════════════════════════════════════════════════════════════
+
+# stage: (Model, {ستون: فیلد}, فیلد خط, (مرحله قبلی, فیلد FK) | None)
+FEATURE_STAGES = {
+    'blowroom': (BlowroomBatch, {'input_kg': 'total_input_weight', 'output_kg': 'output_weight',
+                                 'waste_kg': 'waste_weight'},
+                 'production_line_id', None),
+    'carding':  (CardingProd, {'input_kg': 'input_weight', 'output_kg': 'output_weight',
+                               'waste_kg': 'waste_weight'},
+                 'production_line_id', ('blowroom', 'blowroom_batch_id')),
+    'passage':  (PassageProd, {'input_kg': 'input_total_weight', 'output_kg': 'output_weight'},
+                 'production_line_id', None),
+    'finisher': (FinisherProd, {'input_kg': 'input_weight', 'output_kg': 'output_weight',
+                                'twist_tpm': 'twist_tpm'},
+                 'production_line_id', ('passage', 'passage_production_id')),
+    'spinning': (SpinningProd, {'input_kg': 'input_weight', 'output_kg': 'output_weight',
+                                'efficiency_pct': 'efficiency_pct', 'breakage_count': 'breakage_count',
+                                'twist_tpm': 'twist_tpm'},
+                 'production_line_id', ('finisher', 'finisher_production_id')),
+    'winding':  (WindingProd, {'input_kg': 'input_weight_kg', 'output_kg': 'output_weight_kg',
+                               'waste_kg': 'waste_weight_kg', 'efficiency_pct': 'efficiency_pct',
+                               'cuts_per_100km': 'cuts_per_100km'},
+                 'production_line_id', ('spinning', 'spinning_production_id')),
+    'tfo':      (TFOProd, {'input_kg': 'input_weight_kg', 'output_kg': 'output_weight_kg',
+                           'waste_kg': 'waste_weight_kg', 'efficiency_pct': 'efficiency_pct',
+                           'breakage_count': 'breakage_count', 'twist_tpm': 'twist_tpm'},
+                 'production_line_id', ('winding', 'winding_production_id')),
+    'heatset':  (HeatsetBatch, {'input_kg': 'batch_weight_kg', 'temperature_c': 'temperature_c',
+                                'duration_min': 'duration_min', 'quality_result': 'quality_result'},
+                 'production_line_id', ('tfo', 'tfo_production_id')),
+    'dyeing':   (DyeingBatch, {'input_kg': 'fiber_weight', 'temperature_c': 'temperature',
+                               'duration_min': 'duration_min', 'quality_result': 'quality_result'},
+                 None, None),
+}
+
+FEATURE_STAGE_FOR_MODEL = {entry[0]: stage for stage, entry in FEATURE_STAGES.items()}
+
+NUMERIC_COLUMNS = (
+    'input_kg', 'output_kg', 'waste_kg', 'efficiency_pct', 'breakage_count',
+    'cuts_per_100km', 'twist_tpm', 'temperature_c', 'duration_min', 'yield_pct', 'waste_pct',
+)
+ID_COLUMNS = ('record_id', 'machine_id', 'production_line_id', 'shift_id', 'upstream_id')
+EXPORT_COLUMNS = ('stage', 'record_id', 'batch_number', 'production_date') + ID_COLUMNS[1:4] + (
+    'status', 'quality_result', 'upstream_stage', 'upstream_id') + NUMERIC_COLUMNS
+
+
+def _source_fields(stage):
+    _Model, columns, line_field, upstream = FEATURE_STAGES[stage]
+    fields = ['pk', 'batch_number', 'production_date', 'machine_id', 'shift_id', 'status']
+    fields += [f for f in columns.values() if f not in fields]
+    if line_field:
+        fields.append(line_field)
+    if upstream:
+        fields.append(upstream[1])
+    return fields
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def feature_values(stage, row):
+    """ستون‌های BatchFeature از یک ردیف values() مبدأ (بدون pk/stage)."""
+    _Model, columns, line_field, upstream = FEATURE_STAGES[stage]
+    out = {
+        'batch_number': row['batch_number'] or '',
+        'production_date': row['production_date'],
+        'machine_id': row['machine_id'],
+        'shift_id': row['shift_id'],
+        'production_line_id': row[line_field] if line_field else None,
+        'status': row['status'] or '',
+        'quality_result': '',
+        'upstream_stage': '',
+        'upstream_id': None,
+    }
+    for column, field in columns.items():
+        out[column] = (row[field] or '') if column == 'quality_result' else _float(row[field])
+    if upstream and row[upstream[1]]:
+        out['upstream_stage'], out['upstream_id'] = upstream[0], row[upstream[1]]
+
+    inp, output, waste = out.get('input_kg'), out.get('output_kg'), out.get('waste_kg')
+    out['yield_pct'] = round(output / inp * 100, 3) if inp and output is not None else None
+    out['waste_pct'] = round(waste / inp * 100, 3) if inp and waste is not None else None
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+# نگهداری
+# ═══════════════════════════════════════════════════════════════
+
+def refresh_feature(stage, pk):
+    """ساخت دوباره ردیف یک بچ از داده خام؛ بچ حذف‌شده → ردیف حذف می‌شود."""
+    Model = FEATURE_STAGES[stage][0]
+    row = Model.objects.filter(pk=pk).values(*_source_fields(stage)).first()
+    if row is None:
+        BatchFeature.objects.filter(stage=stage, record_id=pk).delete()
+        return
+    BatchFeature.objects.update_or_create(
+        stage=stage, record_id=pk, defaults=feature_values(stage, row),
+    )
+
+
+def rebuild(stage, since=None, chunk=5000):
+    """
+    بازسازی ردیف‌های یک مرحله (یا از تاریخ since) — دسته‌های pk + bulk_create.
+    خروجی: تعداد ردیف ساخته‌شده.
+    """
+    Model = FEATURE_STAGES[stage][0]
+    source = Model.objects.order_by('pk')
+    target = BatchFeature.objects.filter(stage=stage)
+    if since:
+        source = source.filter(production_date__gte=since)
+        target = target.filter(production_date__gte=since)
+    fields = _source_fields(stage)
+
+    count, last_pk = 0, 0
+    with transaction.atomic():
+        target.delete()
+        while True:
+            rows = list(source.filter(pk__gt=last_pk).values(*fields)[:chunk])
+            if not rows:
+                break
+            BatchFeature.objects.bulk_create([
+                BatchFeature(stage=stage, record_id=row['pk'], **feature_values(stage, row))
+                for row in rows
+            ], batch_size=1000)
+            last_pk = rows[-1]['pk']
+            count += len(rows)
+    return count
+
+
+# ═══════════════════════════════════════════════════════════════
+# خروجی ستونی
+# ═══════════════════════════════════════════════════════════════
+
+def feature_queryset(stages=None, since=None, until=None):
+    qs = BatchFeature.objects.order_by('stage', 'production_date', 'record_id')
+    if stages:
+        qs = qs.filter(stage__in=stages)
+    if since:
+        qs = qs.filter(production_date__gte=since)
+    if until:
+        qs = qs.filter(production_date__lte=until)
+    return qs
+
+
+def feature_arrays(qs):
+    """{ستون: np.ndarray} برای EXPORT_COLUMNS از یک کوئری values_list."""
+    rows = list(qs.values_list(*EXPORT_COLUMNS).iterator(chunk_size=5000))
+    columns = list(zip(*rows)) if rows else [()] * len(EXPORT_COLUMNS)
+    arrays = {}
+    for name, values in zip(EXPORT_COLUMNS, columns):
+        if name in NUMERIC_COLUMNS:
+            arrays[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        elif name in ID_COLUMNS:
+            arrays[name] = np.array([v or 0 for v in values], dtype=np.int64)
+        elif name == 'production_date':
+            arrays[name] = np.array(values, dtype='datetime64[D]')
+        else:
+            arrays[name] = np.array(values, dtype=str)
+    return arrays
+
+
+def write_npz(path, qs):
+    """خروجی فشرده NumPy؛ هر ستون یک آرایه. خروجی: تعداد ردیف."""
+    arrays = feature_arrays(qs)
+    np.savez_compressed(path, **arrays)
+    return len(arrays['record_id'])
+
+
+def write_csv_gz(path, qs):
+    """خروجی CSV فشرده (gzip) با سرستون EXPORT_COLUMNS. خروجی: تعداد ردیف."""
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in qs.values_list(*EXPORT_COLUMNS).iterator(chunk_size=5000):
+            writer.writerow(['' if v is None else v for v in row])
+            count += 1
+    return count
@@ -0,0 +1,101 @@
+"""
+Diaco MES - Fleet Health Engine
+==================================
+سلامت همه ماشین‌های فعال (OEE امروز، MTBF، MTTR، تعداد خرابی، سطح ریسک)
+با تعداد ثابت کوئری — مستقل از تعداد ماشین.
+
+منطق:
+─────
+  ۱. ماشین‌ها + خط تولید (select_related)                    → ۱ کوئری
+  ۲. OEE امروز همه ماشین‌ها (calculate_oee_bulk)              → ۲ کوئری
+  ۳. آخرین امتیاز ریسک شبانه (MachineRiskScore — score_machine_risk) → ۲ کوئری
+     ریسک از احتمال خرابی ۷ روزه (ai_ready/risk.py) و MTBF/MTTR همان اجرا
+  ۴. ماشین بدون امتیاز (قبل از اولین اجرا یا ماشین تازه فعال):
+     خلاصه توقفات از MachineHealthCounter (downtime_summary)  → ۱ کوئری
+
+  خروجی برای هر (خط، روز) به مدت FLEET_HEALTH_TTL ثانیه کش می‌شود تا
+  داشبورد با هر بار بارگذاری، محاسبه را تکرار نکند.
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.core.models import Machine
+
+from .downtime import downtime_summary
+from .risk import latest_scores
+from .utils import calculate_oee_bulk, oee_bulk_day
+
+FLEET_HEALTH_TTL = 60  # ثانیه
+FLEET_WINDOW_DAYS = 30
+KEY_PREFIX = 'ai:fleet_health'
+
+RISK_ORDER = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+
+def compute_fleet_health(line_id=None, days=FLEET_WINDOW_DAYS):
+    """سلامت ماشین‌های فعال (بدون کش)؛ مرتب بر اساس ریسک."""
+    machines = Machine.objects.filter(status='active').select_related('production_line')
+    if line_id:
+        machines = machines.filter(production_line_id=line_id)
+    machines = list(machines)
+    ids = [m.id for m in machines]
+    today = date.today()
+
+    oee = calculate_oee_bulk(ids, today, today)
+    scores = latest_scores(ids)
+    unscored = [mid for mid in ids if mid not in scores]
+    patterns = downtime_summary(unscored, days) if unscored else {}
+
+    results = []
+    for i, m in enumerate(machines):
+        day = oee_bulk_day(oee, i, 0)
+        row = {
+            'machine_id': m.id,
+            'code': m.code,
+            'name': m.name,
+            'section': m.get_machine_type_display(),
+            'line': m.production_line.code if m.production_line else None,
+            'oee_today': day['oee'],
+            'availability': day['availability'],
+        }
+        score = scores.get(m.id)
+        if score is not None:
+            row.update({
+                'risk_level': score.risk_level,
+                'risk_score': score.risk_score,
+                'failure_probability_7d': score.hazard_7d,
+                'mtbf_hours': score.mtbf_hours,
+                'mttr_minutes': score.mttr_minutes,
+                'failures_30d': score.failures_30d,
+                'scored_at': score.date.isoformat(),
+            })
+        else:
+            pattern = patterns[m.id]
+            row.update({
+                'risk_level': pattern['risk_level'],
+                'risk_score': None,
+                'failure_probability_7d': None,
+                'mtbf_hours': pattern['mtbf_hours'],
+                'mttr_minutes': pattern['mttr_minutes'],
+                'failures_30d': pattern['total_failures'],
+                'scored_at': None,
+            })
+        results.append(row)
+
+    results.sort(key=lambda x: (RISK_ORDER.get(x['risk_level'], 4), -(x['risk_score'] or 0)))
+    return results
+
+
+def fleet_health(line_id=None):
+    """سلامت ماشین‌ها از کش کوتاه‌مدت (snapshot) یا محاسبه و ذخیره."""
+    key = f'{KEY_PREFIX}:{line_id or "all"}:{date.today().isoformat()}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = {
+            'machines': compute_fleet_health(line_id),
+            'generated_at': timezone.now().isoformat(timespec='seconds'),
+        }
+        cache.set(key, snapshot, FLEET_HEALTH_TTL)
+    return snapshot
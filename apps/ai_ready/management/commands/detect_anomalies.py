@@ -0,0 +1,58 @@
+"""
+Diaco MES - Detect Statistical Anomalies
+===========================================
+تشخیص آنومالی آماری (z-score غلتان، EWMA، CUSUM) روی سری تولید همه
+ماشین‌ها و ثبت گروهی در جدول AnomalyFlag (ai_ready/anomaly.py).
+برای cron شبانه یا اجرای دستی.
+
+Usage:
+    python manage.py detect_anomalies
+    python manage.py detect_anomalies --series spinning_efficiency,winding_cuts
+    python manage.py detect_anomalies --days 90
+    python manage.py detect_anomalies --since 2026-01-01
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai_ready.anomaly import ANOMALY_WINDOW_DAYS, SERIES, detect_anomalies
+
+
+class Command(BaseCommand):
+    help = 'تشخیص آنومالی آماری سری‌های تولید (خط پایه تطبیقی هر ماشین) و ثبت پرچم‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--series', type=str, default='all',
+            help=f'سری‌ها با کاما ({"/".join(SERIES)}) یا all',
+        )
+        parser.add_argument(
+            '--days', type=int, default=ANOMALY_WINDOW_DAYS,
+            help=f'طول بازه به روز (پیش‌فرض: {ANOMALY_WINDOW_DAYS})',
+        )
+        parser.add_argument('--since', type=str, help='از تاریخ (YYYY-MM-DD) — به‌جای --days')
+
+    def handle(self, *args, **options):
+        target = options['series']
+        names = list(SERIES) if target == 'all' else [n.strip() for n in target.split(',')]
+        invalid = [n for n in names if n not in SERIES]
+        if invalid:
+            raise CommandError(f'سری نامعتبر: {", ".join(invalid)}')
+
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f'تاریخ نامعتبر: {options["since"]}')
+        else:
+            since = date.today() - timedelta(days=max(1, options['days']))
+
+        started = time.monotonic()
+        result = detect_anomalies(names, since)
+        for name, count in result.items():
+            self.stdout.write(f'    {name}: {count} پرچم')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {sum(result.values())} پرچم آنومالی از {since} ثبت شد '
+            f'({time.monotonic() - started:.1f} ثانیه)'
+        ))
@@ -0,0 +1,54 @@
+"""
+Diaco MES - Export Feature Store
+===================================
+خروجی ستونی جدول BatchFeature برای آموزش مدل‌ها.
+
+  npz    — np.savez_compressed، هر ستون یک آرایه (np.load(path)['yield_pct'])
+  csv.gz — CSV فشرده با سرستون (pandas.read_csv(path))
+
+Usage:
+    python manage.py export_features --output features.npz
+    python manage.py export_features --output features.csv.gz --stage spinning,winding
+    python manage.py export_features --output q1.npz --from 2026-01-01 --to 2026-03-31
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai_ready.features import FEATURE_STAGES, feature_queryset, write_csv_gz, write_npz
+
+
+class Command(BaseCommand):
+    help = 'خروجی ستونی Feature Store (npz یا csv.gz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, required=True, help='مسیر فایل (.npz یا .csv.gz)')
+        parser.add_argument(
+            '--stage', type=str, default='all',
+            help=f'مراحل با کاما ({"/".join(FEATURE_STAGES)}) یا all',
+        )
+        parser.add_argument('--from', dest='date_from', type=str, help='از تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, help='تا تاریخ (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if output.endswith('.npz'):
+            writer = write_npz
+        elif output.endswith('.csv.gz'):
+            writer = write_csv_gz
+        else:
+            raise CommandError('پسوند خروجی باید .npz یا .csv.gz باشد')
+
+        target = options['stage']
+        stages = None if target == 'all' else [s.strip() for s in target.split(',')]
+        invalid = [s for s in stages or [] if s not in FEATURE_STAGES]
+        if invalid:
+            raise CommandError(f'مرحله نامعتبر: {", ".join(invalid)}')
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as exc:
+            raise CommandError(f'تاریخ نامعتبر: {exc}')
+
+        count = writer(output, feature_queryset(stages, date_from, date_to))
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} ردیف در {output} نوشته شد'))
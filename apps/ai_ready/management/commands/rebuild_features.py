@@ -0,0 +1,46 @@
+"""
+Diaco MES - Rebuild Feature Store
+====================================
+پرکردن اولیه یا ترمیم جدول BatchFeature از داده خام مراحل تولید.
+برای اجرای یکباره بعد از migrate یا cron شبانه (ترمیم).
+
+Usage:
+    python manage.py rebuild_features
+    python manage.py rebuild_features --stage spinning,winding
+    python manage.py rebuild_features --since 2026-01-01
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai_ready.features import FEATURE_STAGES, rebuild
+
+
+class Command(BaseCommand):
+    help = 'بازسازی Feature Store بچ‌های تولید (BatchFeature)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stage', type=str, default='all',
+            help=f'مراحل با کاما ({"/".join(FEATURE_STAGES)}) یا all',
+        )
+        parser.add_argument('--since', type=str, help='فقط بچ‌های از این تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--chunk', type=int, default=5000, help='اندازه هر دسته')
+
+    def handle(self, *args, **options):
+        target = options['stage']
+        stages = list(FEATURE_STAGES) if target == 'all' else [s.strip() for s in target.split(',')]
+        invalid = [s for s in stages if s not in FEATURE_STAGES]
+        if invalid:
+            raise CommandError(f'مرحله نامعتبر: {", ".join(invalid)}')
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+        except ValueError:
+            raise CommandError(f'تاریخ نامعتبر: {options["since"]}')
+
+        total = 0
+        for stage in stages:
+            count = rebuild(stage, since, chunk=max(1, options['chunk']))
+            total += count
+            self.stdout.write(f'    {stage}: {count} ردیف')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {total} ردیف BatchFeature بازسازی شد'))
@@ -4,58 +4,180 @@ Diaco MES - Rebuild AI Metadata
 بروزرسانی metadata تمام رکوردهای تولید.
 برای اجرای یکباره یا cron job.
 
+منطق:
+─────
+  رکوردها به ترتیب pk در دسته‌های --chunk خوانده می‌شوند؛ metadata با
+  توابع خالص ai_ready/enrichers.py محاسبه و فقط ردیف‌های تغییرکرده
+  (metadata_changed — بدون computed_at) با bulk_update نوشته می‌شوند
+  (بدون save و سیگنال‌ها).
+  هر مدل در یک پروسه جدا (--workers) پردازش می‌شود و بعد از هر دسته
+  آخرین pk در tmp/rebuild_metadata/<model>.json ثبت می‌شود؛
+  --resume اجرای قطع‌شده را از همان نقطه ادامه می‌دهد.
+
 Usage:
     python manage.py rebuild_metadata
     python manage.py rebuild_metadata --model spinning
+    python manage.py rebuild_metadata --model winding,tfo,heatset --workers 3
+    python manage.py rebuild_metadata --since 2026-01-01
+    python manage.py rebuild_metadata --resume
 """
-from django.core.management.base import BaseCommand
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# ═══════════════════════════════════════════════════════════════
+# Checkpoint
+# ═══════════════════════════════════════════════════════════════
+
+def _checkpoint_dir():
+    return settings.BASE_DIR / 'tmp' / 'rebuild_metadata'
+
+
+def _checkpoint_path(name):
+    return _checkpoint_dir() / f'{name}.json'
+
+
+def read_checkpoint(name):
+    try:
+        return json.loads(_checkpoint_path(name).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_checkpoint(name, state):
+    _checkpoint_dir().mkdir(parents=True, exist_ok=True)
+    tmp = _checkpoint_path(name).with_suffix('.tmp')
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, _checkpoint_path(name))
+
 
-from apps.blowroom.models import Batch as BlowroomBatch
-from apps.carding.models import Production as CardingProd
-from apps.passage.models import Production as PassageProd
-from apps.finisher.models import Production as FinisherProd
-from apps.spinning.models import Production as SpinningProd
-from apps.dyeing.models import Batch as DyeingBatch
-from apps.maintenance.models import DowntimeLog
+# ═══════════════════════════════════════════════════════════════
+# پردازش یک مدل (در پروسه worker یا همین پروسه)
+# ═══════════════════════════════════════════════════════════════
+# پروسه‌ها با spawn ساخته می‌شوند و این ماژول قبل از django.setup()
+# import می‌شود، پس import مدل‌ها و enricherها داخل توابع است.
 
+def _init_worker():
+    import django
+    django.setup()
 
-MODEL_MAP = {
-    'blowroom': BlowroomBatch,
-    'carding': CardingProd,
-    'passage': PassageProd,
-    'finisher': FinisherProd,
-    'spinning': SpinningProd,
-    'dyeing': DyeingBatch,
-    'downtime': DowntimeLog,
-}
+
+def rebuild_model(name, since=None, last_pk=0, chunk=1000):
+    """بازسازی metadata یک مدل از pk بعد از last_pk؛ خروجی: (name, خوانده‌شده، نوشته‌شده)."""
+    from django.db import transaction
+    from apps.ai_ready.enrichers import ENRICHERS, metadata_changed
+
+    entry = ENRICHERS[name]
+    Model = entry['model']
+    qs = Model.objects.order_by('pk')
+    if since:
+        field = entry['date_field']
+        lookup = f'{field}__date__gte' if field == 'start_time' else f'{field}__gte'
+        qs = qs.filter(**{lookup: since})
+
+    state = {'since': since, 'last_pk': last_pk, 'read': 0, 'written': 0}
+    checkpoint = read_checkpoint(name)
+    if last_pk and checkpoint:
+        state.update(read=checkpoint.get('read', 0), written=checkpoint.get('written', 0))
+
+    while True:
+        objs = list(qs.filter(pk__gt=state['last_pk'])[:chunk])
+        if not objs:
+            break
+        context = entry['context'](objs) if entry.get('context') else None
+        changed = []
+        for obj in objs:
+            meta = entry['enrich'](obj, context)
+            if metadata_changed(obj.metadata, meta):
+                obj.metadata = meta
+                changed.append(obj)
+        with transaction.atomic():
+            Model.objects.bulk_update(changed, ['metadata'], batch_size=chunk)
+        state['last_pk'] = objs[-1].pk
+        state['read'] += len(objs)
+        state['written'] += len(changed)
+        write_checkpoint(name, state)
+
+    state['done'] = True
+    write_checkpoint(name, state)
+    return name, state['read'], state['written']
 
 
 class Command(BaseCommand):
-    help = 'بروزرسانی metadata تمام رکوردهای تولید برای AI'
+    help = 'بروزرسانی metadata تمام رکوردهای تولید برای AI (bulk_update، موازی، قابل ادامه)'
 
     def add_arguments(self, parser):
+        from apps.ai_ready.enrichers import ENRICHERS
         parser.add_argument(
             '--model', type=str, default='all',
-            help='مدل مشخص (blowroom/carding/passage/finisher/spinning/dyeing/downtime) یا all',
+            help=f'مدل‌ها با کاما ({"/".join(ENRICHERS)}) یا all',
         )
+        parser.add_argument('--since', type=str, help='فقط رکوردهای از این تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--resume', action='store_true', help='ادامه از آخرین checkpoint')
+        parser.add_argument('--chunk', type=int, default=1000, help='اندازه هر دسته')
+        parser.add_argument('--workers', type=int, default=1, help='تعداد پروسه‌های موازی')
 
     def handle(self, *args, **options):
+        from apps.ai_ready.enrichers import ENRICHERS
+
         target = options['model']
-        models_to_process = MODEL_MAP if target == 'all' else {target: MODEL_MAP.get(target)}
-
-        if None in models_to_process.values():
-            self.stderr.write(self.style.ERROR(f'مدل نامعتبر: {target}'))
-            return
-
-        total = 0
-        for name, Model in models_to_process.items():
-            count = 0
-            qs = Model.objects.all()
-            self.stdout.write(f'  پردازش {name} ({qs.count()} رکورد)...')
-            for obj in qs.iterator():
-                obj.save()  # signal فعال می‌شود و metadata پر می‌شود
-                count += 1
-            total += count
-            self.stdout.write(self.style.SUCCESS(f'    ✓ {count} رکورد بروز شد'))
-
-        self.stdout.write(self.style.SUCCESS(f'\n✓ کل: {total} رکورد metadata بروزرسانی شد'))
+        names = list(ENRICHERS) if target == 'all' else [n.strip() for n in target.split(',')]
+        invalid = [n for n in names if n not in ENRICHERS]
+        if invalid:
+            raise CommandError(f'مدل نامعتبر: {", ".join(invalid)}')
+
+        since = options['since']
+        if since:
+            try:
+                since = date.fromisoformat(since).isoformat()
+            except ValueError:
+                raise CommandError(f'تاریخ نامعتبر: {since}')
+
+        # وظیفه هر مدل: (name, since, last_pk)
+        tasks = []
+        for name in names:
+            checkpoint = read_checkpoint(name) if options['resume'] else None
+            if checkpoint:
+                if checkpoint.get('done'):
+                    self.stdout.write(f'  {name}: قبلاً کامل شده — رد شد')
+                    continue
+                if since and checkpoint.get('since') != since:
+                    raise CommandError(f'{name}: --since با checkpoint ({checkpoint.get("since")}) یکی نیست')
+                tasks.append((name, checkpoint.get('since'), checkpoint['last_pk']))
+                self.stdout.write(f'  {name}: ادامه از pk > {checkpoint["last_pk"]}')
+            else:
+                tasks.append((name, since, 0))
+
+        chunk = max(1, options['chunk'])
+        workers = max(1, min(options['workers'], len(tasks) or 1))
+        total_read = total_written = 0
+
+        if workers == 1:
+            results = (rebuild_model(*task, chunk=chunk) for task in tasks)
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            futures = [pool.submit(rebuild_model, *task, chunk=chunk) for task in tasks]
+            results = (future.result() for future in as_completed(futures))
+
+        try:
+            for name, read, written in results:
+                total_read += read
+                total_written += written
+                self.stdout.write(self.style.SUCCESS(f'    ✓ {name}: {read} رکورد، {written} بروز شد'))
+        finally:
+            if workers > 1:
+                pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ کل: {total_read} رکورد بررسی و {total_written} رکورد metadata بروزرسانی شد'
+        ))
@@ -0,0 +1,80 @@
+"""
+Diaco MES - Rebuild Quality Alerts
+=====================================
+پرکردن اولیه یا ترمیم جدول QualityAlert از رکوردهای بوبین‌پیچی، دولاتابی
+و هیت‌ست با همان قواعد quality_alerts سیگنال هر مرحله.
+برای اجرای یکباره بعد از migrate یا بعد از تغییر آستانه‌ها.
+
+Usage:
+    python manage.py rebuild_quality_alerts
+    python manage.py rebuild_quality_alerts --section heatset
+    python manage.py rebuild_quality_alerts --since 2026-01-01
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+def _sources():
+    from apps.heatset.models import Batch as HeatsetBatch
+    from apps.heatset.signals import quality_alerts as heatset_alerts
+    from apps.tfo.models import Production as TFOProd
+    from apps.tfo.signals import quality_alerts as tfo_alerts
+    from apps.winding.models import Production as WindingProd
+    from apps.winding.signals import quality_alerts as winding_alerts
+    return {
+        'winding': (WindingProd.objects.all(), winding_alerts),
+        'tfo':     (TFOProd.objects.all(), tfo_alerts),
+        # هشدارهای PROFILE_* از نتیجه تطابق پروفایل (heatset/conformance.py)
+        'heatset': (HeatsetBatch.objects.select_related('cycle_conformance'), heatset_alerts),
+    }
+
+
+class Command(BaseCommand):
+    help = 'بازسازی جدول هشدارهای کیفی (QualityAlert)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', type=str, default='all', help='winding / tfo / heatset یا all')
+        parser.add_argument('--since', type=str, help='فقط بچ‌های از این تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--chunk', type=int, default=2000, help='اندازه هر دسته')
+
+    def handle(self, *args, **options):
+        from apps.ai_ready.alerts import alert_rows
+        from apps.ai_ready.models import QualityAlert
+
+        sources = _sources()
+        target = options['section']
+        sections = list(sources) if target == 'all' else [s.strip() for s in target.split(',')]
+        invalid = [s for s in sections if s not in sources]
+        if invalid:
+            raise CommandError(f'بخش نامعتبر: {", ".join(invalid)}')
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+        except ValueError:
+            raise CommandError(f'تاریخ نامعتبر: {options["since"]}')
+        chunk = max(1, options['chunk'])
+
+        total = 0
+        for section in sections:
+            queryset, quality_alerts = sources[section]
+            source = queryset.order_by('pk')
+            target_qs = QualityAlert.objects.filter(section=section)
+            if since:
+                source = source.filter(production_date__gte=since)
+                target_qs = target_qs.filter(date__gte=since)
+
+            count, last_pk = 0, 0
+            with transaction.atomic():
+                target_qs.delete()
+                while True:
+                    batches = list(source.filter(pk__gt=last_pk)[:chunk])
+                    if not batches:
+                        break
+                    rows = [row for b in batches for row in alert_rows(section, b, quality_alerts(b))]
+                    QualityAlert.objects.bulk_create(rows, batch_size=1000)
+                    last_pk = batches[-1].pk
+                    count += len(rows)
+            total += count
+            self.stdout.write(f'    {section}: {count} هشدار')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {total} هشدار کیفی بازسازی شد'))
@@ -0,0 +1,47 @@
+"""
+Diaco MES - Score Machine Risk
+=================================
+امتیازدهی ریسک خرابی ۷ روز آینده همه ماشین‌های فعال و ثبت گروهی در
+جدول MachineRiskScore (ai_ready/risk.py). برای cron شبانه یا اجرای دستی؛
+داشبورد و fleet health آخرین امتیاز ذخیره‌شده را می‌خوانند.
+
+Usage:
+    python manage.py score_machine_risk
+    python manage.py score_machine_risk --date 2026-10-01
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai_ready.models import MachineRiskScore
+from apps.ai_ready.risk import score_fleet
+from apps.dashboard.kpi import bump_block
+
+
+class Command(BaseCommand):
+    help = 'امتیازدهی ریسک خرابی ماشین‌ها (احتمال خرابی ۷ روز آینده) و ثبت در MachineRiskScore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, help='روز امتیازدهی (YYYY-MM-DD، پیش‌فرض: امروز)')
+
+    def handle(self, *args, **options):
+        day = date.today()
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f'تاریخ نامعتبر: {options["date"]}')
+            if day > date.today():
+                raise CommandError('امتیازدهی برای روز آینده ممکن نیست.')
+
+        started = time.monotonic()
+        result = score_fleet(day)
+        bump_block('maintenance')
+
+        for level, label in MachineRiskScore.Level.choices:
+            self.stdout.write(f'    {label}: {result.get(level, 0)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {sum(result.values())} ماشین برای {day} امتیازدهی شد '
+            f'({time.monotonic() - started:.1f} ثانیه)'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0003_machine_type_v2_carpet_yarn'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=20, verbose_name='مرحله')),
+                ('record_id', models.PositiveBigIntegerField(verbose_name='شناسه رکورد')),
+                ('date', models.DateField(verbose_name='تاریخ تولید')),
+                ('metric', models.CharField(max_length=30, verbose_name='شاخص')),
+                ('method', models.CharField(choices=[('zscore', 'z-score غلتان'), ('ewma', 'EWMA'), ('cusum', 'CUSUM')], max_length=10, verbose_name='روش')),
+                ('direction', models.CharField(choices=[('high', 'بالاتر از خط پایه'), ('low', 'پایین\u200cتر از خط پایه')], max_length=4, verbose_name='جهت')),
+                ('value', models.FloatField(verbose_name='مقدار')),
+                ('baseline', models.FloatField(verbose_name='خط پایه (میانگین غلتان)')),
+                ('score', models.FloatField(help_text='z / انحراف EWMA (σ) / آماره CUSUM', verbose_name='امتیاز')),
+                ('detected_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان تشخیص')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly_flags', to='core.machine', verbose_name='ماشین')),
+            ],
+            options={
+                'verbose_name': 'پرچم آنومالی',
+                'verbose_name_plural': 'پرچم\u200cهای آنومالی',
+                'db_table': 'ai_anomaly_flag',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['machine', 'date'], name='idx_af_machine_date'), models.Index(fields=['date', 'metric'], name='idx_af_date_metric'), models.Index(fields=['stage', 'record_id'], name='idx_af_record')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='anomalyflag',
+            constraint=models.UniqueConstraint(fields=('stage', 'record_id', 'metric', 'method'), name='uq_anomaly_flag_key'),
+        ),
+    ]
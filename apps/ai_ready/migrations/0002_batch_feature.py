@@ -0,0 +1,55 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_machine_type_v2_carpet_yarn'),
+        ('ai_ready', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=20, verbose_name='مرحله')),
+                ('record_id', models.PositiveBigIntegerField(verbose_name='شناسه رکورد')),
+                ('batch_number', models.CharField(blank=True, default='', max_length=50, verbose_name='شماره بچ')),
+                ('production_date', models.DateField(verbose_name='تاریخ تولید')),
+                ('status', models.CharField(max_length=20, verbose_name='وضعیت')),
+                ('quality_result', models.CharField(blank=True, default='', max_length=20, verbose_name='نتیجه کیفی')),
+                ('input_kg', models.FloatField(blank=True, null=True, verbose_name='وزن ورودی (kg)')),
+                ('output_kg', models.FloatField(blank=True, null=True, verbose_name='وزن خروجی (kg)')),
+                ('waste_kg', models.FloatField(blank=True, null=True, verbose_name='ضایعات (kg)')),
+                ('efficiency_pct', models.FloatField(blank=True, null=True, verbose_name='راندمان (%)')),
+                ('breakage_count', models.FloatField(blank=True, null=True, verbose_name='تعداد پارگی')),
+                ('cuts_per_100km', models.FloatField(blank=True, null=True, verbose_name='برش در ۱۰۰ کیلومتر')),
+                ('twist_tpm', models.FloatField(blank=True, null=True, verbose_name='تاب (TPM)')),
+                ('temperature_c', models.FloatField(blank=True, null=True, verbose_name='دما (°C)')),
+                ('duration_min', models.FloatField(blank=True, null=True, verbose_name='مدت (دقیقه)')),
+                ('upstream_stage', models.CharField(blank=True, default='', max_length=20, verbose_name='مرحله قبلی')),
+                ('upstream_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='شناسه بچ مرحله قبلی')),
+                ('yield_pct', models.FloatField(blank=True, null=True, verbose_name='بازده وزنی (%)')),
+                ('waste_pct', models.FloatField(blank=True, null=True, verbose_name='درصد ضایعات')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_features', to='core.machine', verbose_name='ماشین')),
+                ('production_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='batch_features', to='core.productionline', verbose_name='خط تولید')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='batch_features', to='core.shift', verbose_name='شیفت')),
+            ],
+            options={
+                'verbose_name': 'ویژگی بچ',
+                'verbose_name_plural': 'ویژگی\u200cهای بچ (Feature Store)',
+                'db_table': 'ai_batch_feature',
+                'ordering': ['stage', 'record_id'],
+                'indexes': [models.Index(fields=['stage', 'production_date'], name='idx_bf_stage_date'), models.Index(fields=['machine', 'production_date'], name='idx_bf_machine_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='batchfeature',
+            constraint=models.UniqueConstraint(fields=('stage', 'record_id'), name='uq_batch_feature_key'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_machine_type_v2_carpet_yarn'),
+        ('ai_ready', '0002_batch_feature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QualityAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(choices=[('winding', 'بوبین\u200cپیچی'), ('tfo', 'دولاتابی'), ('heatset', 'هیت\u200cست')], max_length=10, verbose_name='بخش')),
+                ('batch_id', models.PositiveBigIntegerField(verbose_name='شناسه بچ')),
+                ('batch_number', models.CharField(max_length=50, verbose_name='شماره بچ')),
+                ('date', models.DateField(verbose_name='تاریخ تولید')),
+                ('level', models.CharField(choices=[('critical', 'بحرانی'), ('warning', 'هشدار')], max_length=10, verbose_name='سطح')),
+                ('code', models.CharField(max_length=40, verbose_name='کد')),
+                ('message', models.CharField(max_length=255, verbose_name='پیام')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ثبت')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quality_alerts', to='core.machine', verbose_name='ماشین')),
+            ],
+            options={
+                'verbose_name': 'هشدار کیفی',
+                'verbose_name_plural': 'هشدارهای کیفی',
+                'db_table': 'ai_quality_alert',
+                'ordering': ['level', 'date', 'id'],
+                'indexes': [models.Index(fields=['date', 'level', 'section'], name='idx_qa_date_level_section'), models.Index(fields=['level', 'date'], name='idx_qa_level_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='qualityalert',
+            constraint=models.UniqueConstraint(fields=('section', 'batch_id', 'code'), name='uq_quality_alert_key'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_machine_type_v2_carpet_yarn'),
+        ('ai_ready', '0003_quality_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineRiskScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ امتیازدهی')),
+                ('hazard_7d', models.FloatField(verbose_name='احتمال خرابی ۷ روز آینده')),
+                ('risk_score', models.PositiveSmallIntegerField(verbose_name='امتیاز ریسک (۰ تا ۱۰۰)')),
+                ('risk_level', models.CharField(choices=[('critical', 'بحرانی'), ('high', 'بالا'), ('medium', 'متوسط'), ('low', 'پایین')], max_length=10, verbose_name='سطح ریسک')),
+                ('failures_30d', models.PositiveIntegerField(default=0, verbose_name='خرابی ۳۰ روزه')),
+                ('failures_90d', models.PositiveIntegerField(default=0, verbose_name='خرابی ۹۰ روزه')),
+                ('mtbf_hours', models.FloatField(verbose_name='MTBF (ساعت، ۳۰ روزه)')),
+                ('mttr_minutes', models.FloatField(verbose_name='MTTR (دقیقه، ۳۰ روزه)')),
+                ('hours_since_failure', models.FloatField(blank=True, null=True, verbose_name='ساعت از آخرین خرابی')),
+                ('days_since_service', models.PositiveIntegerField(blank=True, null=True, verbose_name='روز از آخرین سرویس')),
+                ('service_overdue_days', models.PositiveIntegerField(default=0, verbose_name='تأخیر سرویس (روز)')),
+                ('traveler_replacements_30d', models.PositiveIntegerField(default=0, verbose_name='تعویض غیربرنامه\u200cای شیطانک (۳۰ روزه)')),
+                ('load_ratio', models.FloatField(default=1.0, verbose_name='نسبت بار ۷ روزه به میانگین')),
+                ('factors', models.JSONField(default=dict, verbose_name='ضرایب مدل')),
+                ('computed_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان محاسبه')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='risk_scores', to='core.machine', verbose_name='ماشین')),
+            ],
+            options={
+                'verbose_name': 'امتیاز ریسک ماشین',
+                'verbose_name_plural': 'امتیازهای ریسک ماشین',
+                'db_table': 'ai_machine_risk_score',
+                'ordering': ['-date', '-risk_score'],
+                'indexes': [models.Index(fields=['date', 'risk_level'], name='idx_mrs_date_level')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='machineriskscore',
+            constraint=models.UniqueConstraint(fields=('machine', 'date'), name='uq_machine_risk_day'),
+        ),
+    ]
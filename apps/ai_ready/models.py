@@ -0,0 +1,228 @@
+"""
+Diaco MES - AI Ready Models
+==============================
+خروجی‌های محاسباتی لایه AI که جدا از metadata رکوردها نگه داشته می‌شوند.
+
+AnomalyFlag (پرچم آنومالی آماری):
+  خروجی detect_anomalies (ai_ready/anomaly.py) — z-score غلتان، EWMA و
+  CUSUM روی سری هر ماشین. برخلاف anomaly_flags داخل metadata (آستانه ثابت،
+  رکورد به رکورد) این پرچم‌ها نسبت به خط پایه همان ماشین سنجیده می‌شوند.
+  هر اجرا پرچم‌های بازه خودش را کامل جایگزین می‌کند.
+
+BatchFeature (Feature Store):
+  یک ردیف با ستون‌های ثابت و عددی برای هر بچ تولید همه مراحل — ورودی
+  آموزش مدل‌ها بدون اسکن و decode کردن metadata (ai_ready/features.py).
+  سیگنال‌ها بعد از commit بروز نگه می‌دارند؛ rebuild_features بازسازی
+  گروهی و export_features خروجی ستونی (.npz / .csv.gz).
+
+QualityAlert (هشدار کیفی):
+  هشدارهای قواعد کیفی بوبین‌پیچی/دولاتابی/هیت‌ست (quality_alerts سیگنال
+  هر مرحله) — یک ردیف برای هر هشدار، با ایندکس (تاریخ، سطح، بخش) به‌جای
+  فیلتر metadata__has_alerts و پیمایش JSON (ai_ready/alerts.py).
+
+MachineRiskScore (ریسک خرابی پیش‌بینی‌شده):
+  خروجی score_machine_risk (ai_ready/risk.py) — احتمال خرابی ۷ روز آینده
+  هر ماشین از نرخ خرابی، سرویس، تعویض شیطانک و بار تولید. یک ردیف برای هر
+  (ماشین، روز)؛ داشبورد و fleet health آخرین امتیاز ذخیره‌شده را می‌خوانند.
+"""
+from django.db import models
+
+
+class AnomalyFlag(models.Model):
+    """پرچم آنومالی آماری یک رکورد تولید (یک ردیف برای هر شاخص و روش)."""
+
+    class Method(models.TextChoices):
+        ZSCORE = 'zscore', 'z-score غلتان'
+        EWMA = 'ewma', 'EWMA'
+        CUSUM = 'cusum', 'CUSUM'
+
+    class Direction(models.TextChoices):
+        HIGH = 'high', 'بالاتر از خط پایه'
+        LOW = 'low', 'پایین‌تر از خط پایه'
+
+    stage = models.CharField(max_length=20, verbose_name='مرحله')
+    record_id = models.PositiveBigIntegerField(verbose_name='شناسه رکورد')
+    machine = models.ForeignKey(
+        'core.Machine', on_delete=models.CASCADE,
+        verbose_name='ماشین', related_name='anomaly_flags',
+    )
+    date = models.DateField(verbose_name='تاریخ تولید')
+    metric = models.CharField(max_length=30, verbose_name='شاخص')
+    method = models.CharField(max_length=10, choices=Method.choices, verbose_name='روش')
+    direction = models.CharField(max_length=4, choices=Direction.choices, verbose_name='جهت')
+    value = models.FloatField(verbose_name='مقدار')
+    baseline = models.FloatField(verbose_name='خط پایه (میانگین غلتان)')
+    score = models.FloatField(verbose_name='امتیاز', help_text='z / انحراف EWMA (σ) / آماره CUSUM')
+    detected_at = models.DateTimeField(auto_now_add=True, verbose_name='زمان تشخیص')
+
+    class Meta:
+        db_table = 'ai_anomaly_flag'
+        verbose_name = 'پرچم آنومالی'
+        verbose_name_plural = 'پرچم‌های آنومالی'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stage', 'record_id', 'metric', 'method'],
+                name='uq_anomaly_flag_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['machine', 'date'], name='idx_af_machine_date'),
+            models.Index(fields=['date', 'metric'], name='idx_af_date_metric'),
+            models.Index(fields=['stage', 'record_id'], name='idx_af_record'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage}#{self.record_id} | {self.metric} | {self.method}"
+
+
+class BatchFeature(models.Model):
+    """ویژگی‌های یک بچ تولید (یک ردیف برای هر رکورد هر مرحله)."""
+
+    stage = models.CharField(max_length=20, verbose_name='مرحله')
+    record_id = models.PositiveBigIntegerField(verbose_name='شناسه رکورد')
+    batch_number = models.CharField(max_length=50, blank=True, default='', verbose_name='شماره بچ')
+    production_date = models.DateField(verbose_name='تاریخ تولید')
+    machine = models.ForeignKey(
+        'core.Machine', on_delete=models.CASCADE,
+        verbose_name='ماشین', related_name='batch_features',
+    )
+    production_line = models.ForeignKey(
+        'core.ProductionLine', on_delete=models.SET_NULL,
+        blank=True, null=True,
+        verbose_name='خط تولید', related_name='batch_features',
+    )
+    shift = models.ForeignKey(
+        'core.Shift', on_delete=models.SET_NULL,
+        blank=True, null=True,
+        verbose_name='شیفت', related_name='batch_features',
+    )
+    status = models.CharField(max_length=20, verbose_name='وضعیت')
+    quality_result = models.CharField(max_length=20, blank=True, default='', verbose_name='نتیجه کیفی')
+
+    # ── مقادیر اندازه‌گیری‌شده ──
+    input_kg = models.FloatField(blank=True, null=True, verbose_name='وزن ورودی (kg)')
+    output_kg = models.FloatField(blank=True, null=True, verbose_name='وزن خروجی (kg)')
+    waste_kg = models.FloatField(blank=True, null=True, verbose_name='ضایعات (kg)')
+    efficiency_pct = models.FloatField(blank=True, null=True, verbose_name='راندمان (%)')
+    breakage_count = models.FloatField(blank=True, null=True, verbose_name='تعداد پارگی')
+    cuts_per_100km = models.FloatField(blank=True, null=True, verbose_name='برش در ۱۰۰ کیلومتر')
+    twist_tpm = models.FloatField(blank=True, null=True, verbose_name='تاب (TPM)')
+    temperature_c = models.FloatField(blank=True, null=True, verbose_name='دما (°C)')
+    duration_min = models.FloatField(blank=True, null=True, verbose_name='مدت (دقیقه)')
+
+    # ── ردیابی زنجیره ──
+    upstream_stage = models.CharField(max_length=20, blank=True, default='', verbose_name='مرحله قبلی')
+    upstream_id = models.PositiveBigIntegerField(blank=True, null=True, verbose_name='شناسه بچ مرحله قبلی')
+
+    # ── مشتق‌شده ──
+    yield_pct = models.FloatField(blank=True, null=True, verbose_name='بازده وزنی (%)')
+    waste_pct = models.FloatField(blank=True, null=True, verbose_name='درصد ضایعات')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
+
+    class Meta:
+        db_table = 'ai_batch_feature'
+        verbose_name = 'ویژگی بچ'
+        verbose_name_plural = 'ویژگی‌های بچ (Feature Store)'
+        ordering = ['stage', 'record_id']
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'record_id'], name='uq_batch_feature_key'),
+        ]
+        indexes = [
+            models.Index(fields=['stage', 'production_date'], name='idx_bf_stage_date'),
+            models.Index(fields=['machine', 'production_date'], name='idx_bf_machine_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage}#{self.record_id} | {self.production_date}"
+
+
+class QualityAlert(models.Model):
+    """هشدار کیفی یک بچ (یک ردیف برای هر کد هشدار)."""
+
+    class Section(models.TextChoices):
+        WINDING = 'winding', 'بوبین‌پیچی'
+        TFO = 'tfo', 'دولاتابی'
+        HEATSET = 'heatset', 'هیت‌ست'
+
+    class Level(models.TextChoices):
+        CRITICAL = 'critical', 'بحرانی'
+        WARNING = 'warning', 'هشدار'
+
+    section = models.CharField(max_length=10, choices=Section.choices, verbose_name='بخش')
+    batch_id = models.PositiveBigIntegerField(verbose_name='شناسه بچ')
+    batch_number = models.CharField(max_length=50, verbose_name='شماره بچ')
+    machine = models.ForeignKey(
+        'core.Machine', on_delete=models.CASCADE,
+        verbose_name='ماشین', related_name='quality_alerts',
+    )
+    date = models.DateField(verbose_name='تاریخ تولید')
+    level = models.CharField(max_length=10, choices=Level.choices, verbose_name='سطح')
+    code = models.CharField(max_length=40, verbose_name='کد')
+    message = models.CharField(max_length=255, verbose_name='پیام')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='زمان ثبت')
+
+    class Meta:
+        db_table = 'ai_quality_alert'
+        verbose_name = 'هشدار کیفی'
+        verbose_name_plural = 'هشدارهای کیفی'
+        ordering = ['level', 'date', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'batch_id', 'code'], name='uq_quality_alert_key'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'level', 'section'], name='idx_qa_date_level_section'),
+            # ترتیب API (critical اول، بعد تاریخ، بعد id) برای صفحه‌بندی keyset
+            models.Index(fields=['level', 'date'], name='idx_qa_level_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.section}#{self.batch_id} | {self.level} | {self.code}"
+
+
+class MachineRiskScore(models.Model):
+    """امتیاز ریسک خرابی یک ماشین در یک روز (اجرای شبانه)."""
+
+    class Level(models.TextChoices):
+        CRITICAL = 'critical', 'بحرانی'
+        HIGH = 'high', 'بالا'
+        MEDIUM = 'medium', 'متوسط'
+        LOW = 'low', 'پایین'
+
+    machine = models.ForeignKey(
+        'core.Machine', on_delete=models.CASCADE,
+        verbose_name='ماشین', related_name='risk_scores',
+    )
+    date = models.DateField(verbose_name='تاریخ امتیازدهی')
+    hazard_7d = models.FloatField(verbose_name='احتمال خرابی ۷ روز آینده')
+    risk_score = models.PositiveSmallIntegerField(verbose_name='امتیاز ریسک (۰ تا ۱۰۰)')
+    risk_level = models.CharField(max_length=10, choices=Level.choices, verbose_name='سطح ریسک')
+
+    # ── ورودی‌های مدل ──
+    failures_30d = models.PositiveIntegerField(default=0, verbose_name='خرابی ۳۰ روزه')
+    failures_90d = models.PositiveIntegerField(default=0, verbose_name='خرابی ۹۰ روزه')
+    mtbf_hours = models.FloatField(verbose_name='MTBF (ساعت، ۳۰ روزه)')
+    mttr_minutes = models.FloatField(verbose_name='MTTR (دقیقه، ۳۰ روزه)')
+    hours_since_failure = models.FloatField(blank=True, null=True, verbose_name='ساعت از آخرین خرابی')
+    days_since_service = models.PositiveIntegerField(blank=True, null=True, verbose_name='روز از آخرین سرویس')
+    service_overdue_days = models.PositiveIntegerField(default=0, verbose_name='تأخیر سرویس (روز)')
+    traveler_replacements_30d = models.PositiveIntegerField(default=0, verbose_name='تعویض غیربرنامه‌ای شیطانک (۳۰ روزه)')
+    load_ratio = models.FloatField(default=1.0, verbose_name='نسبت بار ۷ روزه به میانگین')
+    factors = models.JSONField(default=dict, verbose_name='ضرایب مدل')
+    computed_at = models.DateTimeField(auto_now_add=True, verbose_name='زمان محاسبه')
+
+    class Meta:
+        db_table = 'ai_machine_risk_score'
+        verbose_name = 'امتیاز ریسک ماشین'
+        verbose_name_plural = 'امتیازهای ریسک ماشین'
+        ordering = ['-date', '-risk_score']
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'date'], name='uq_machine_risk_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'risk_level'], name='idx_mrs_date_level'),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id} | {self.date} | {self.risk_score}"
@@ -0,0 +1,106 @@
+"""
+Diaco MES - OEE Range Series
+===============================
+سری OEE روزانه/هفتگی/ماهانه یک یا چند ماشین برای نمودار.
+
+منطق:
+─────
+  مقادیر روزانه از نتیجه جزئی 'oee_machines' کش روزهای بسته
+  (reports/daycache.py) خوانده می‌شوند:
+      روزهای بسته → ردیف‌های ReportDayCache (برای همه ماشین‌ها مشترک)
+      دنباله باز  → calculate_oee_bulk (دو کوئری گروه‌بندی‌شده)
+  ماشین بدون توقف و تولید در یک روز: Availability=100، Quality=100،
+  Performance=OEE=0 (همان خروجی calculate_oee).
+
+  بازه بلند به سطل هفتگی/ماهانه (reports/timeseries.pick_bucket) تجمیع می‌شود:
+  شاخص‌ها = میانگین روزهای سطل، توقف و تعداد بچ = مجموع.
+  طول بازه به OEE_RANGE_MAX_DAYS و تعداد ماشین به OEE_RANGE_MAX_MACHINES محدود است.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from apps.reports.daycache import OEE_DAY_KEYS, day_partials
+from apps.reports.timeseries import BUCKET_LABELS, bucket_keys, bucket_start, pick_bucket
+
+OEE_RANGE_MAX_DAYS = 1096       # سه سال (سطل ماهانه)
+OEE_RANGE_MAX_MACHINES = 200
+
+OEE_SERIES_KEYS = ('oee', 'availability', 'performance', 'quality')
+# مقدار روز بدون توقف و تولید (ترتیب OEE_DAY_KEYS)
+OEE_IDLE_DAY = {
+    'downtime_min': 0, 'batch_count': 0,
+    'availability': 100.0, 'performance': 0.0, 'quality': 100.0, 'oee': 0.0,
+}
+
+
+def clamp_days(value, default=30):
+    """تعداد روز درخواستی محدود به ۱ تا OEE_RANGE_MAX_DAYS (مقدار نامعتبر → default)."""
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        days = default
+    return min(max(days, 1), OEE_RANGE_MAX_DAYS)
+
+
+def oee_daily_arrays(machine_ids, date_from, date_to):
+    """{key: np.ndarray (M×D)} برای OEE_DAY_KEYS + 'dates'."""
+    row = {mid: i for i, mid in enumerate(machine_ids)}
+    n_days = (date_to - date_from).days + 1
+    arrays = {
+        key: np.full((len(machine_ids), n_days), OEE_IDLE_DAY[key], dtype=np.float64)
+        for key in OEE_DAY_KEYS
+    }
+    for day, rows in day_partials('oee_machines', date_from, date_to).items():
+        j = (day - date_from).days
+        for mid, *values in rows:
+            i = row.get(mid)
+            if i is None:
+                continue
+            for key, value in zip(OEE_DAY_KEYS, values):
+                arrays[key][i, j] = value
+    arrays['dates'] = [date_from + timedelta(days=k) for k in range(n_days)]
+    return arrays
+
+
+def oee_range(machine_ids, date_from, date_to, bucket=None):
+    """
+    سری OEE ماشین‌ها در سطل‌های بازه.
+
+    Returns: dict
+      bucket, dates (شروع هر سطل، سطل اول محدود به date_from)
+      series — {machine_id: {oee, availability, performance, quality,
+                             downtime_min, batch_count: list}}
+    """
+    machine_ids = list(machine_ids)
+    bucket = bucket if bucket in BUCKET_LABELS else pick_bucket(date_from, date_to)
+    daily = oee_daily_arrays(machine_ids, date_from, date_to)
+
+    keys = bucket_keys(date_from, date_to, bucket)
+    index = {key: k for k, key in enumerate(keys)}
+    col = np.array([index[bucket_start(d, bucket)] for d in daily['dates']], dtype=int)
+    days_in = np.bincount(col, minlength=len(keys))
+
+    def per_bucket(values):
+        sums = np.zeros((len(machine_ids), len(keys)))
+        np.add.at(sums, (slice(None), col), values)
+        return sums
+
+    out = {key: np.round(per_bucket(daily[key]) / days_in, 2) for key in OEE_SERIES_KEYS}
+    for key in ('downtime_min', 'batch_count'):
+        out[key] = per_bucket(daily[key]).astype(int)
+
+    return {
+        'bucket': bucket,
+        'dates': [max(key, date_from).isoformat() for key in keys],
+        'series': {
+            mid: {key: out[key][i].tolist() for key in out}
+            for i, mid in enumerate(machine_ids)
+        },
+    }
+
+
+def oee_range_days(machine_ids, days, bucket=None):
+    """oee_range برای days روز منتهی به امروز."""
+    today = date.today()
+    return oee_range(machine_ids, today - timedelta(days=days - 1), today, bucket)
@@ -0,0 +1,295 @@
+"""
+Diaco MES - Machine Risk Scoring
+===================================
+امتیازدهی شبانه ریسک خرابی همه ماشین‌های فعال (Predictive Maintenance).
+
+منطق:
+─────
+  ورودی‌ها برای همه ماشین‌ها با تعداد ثابت کوئری خوانده و به آرایه‌های
+  NumPy (یک خانه برای هر ماشین) تبدیل می‌شوند:
+    توقفات        — MachineHealthCounter (RISK_WINDOW_DAYS روز) + آخرین شروع توقف
+    سرویس         — آخرین service_date / next_service از MachineServiceDate
+    شیطانک        — تعویض غیربرنامه‌ای (فرسوده/شکستگی/کیفی) ۳۰ روز اخیر
+    بار تولید     — خروجی روزانه ۷ روز اخیر ÷ میانگین روزانه بازه از DailyStageRollup
+                    (از اولین روز تولید ماشین در بازه — ماشین تازه کم‌بار دیده نشود)
+
+  نرخ خرابی پایه (λ، در ساعت):
+    خرابی‌ها با نیمه‌عمر DECAY_HALF_LIFE_DAYS وزن می‌گیرند (خرابی تازه
+    مهم‌تر) و نرخ هر ماشین به سمت نرخ هم‌نوع‌هایش جمع می‌شود (پیشین گاما
+    با وزن PRIOR_HOURS ساعت) تا ماشین کم‌سابقه صفر یا اغراق‌آمیز نشود.
+
+  ضرایب (RISK_FACTORS) نرخ را تعدیل می‌کنند:
+    سرویس عقب‌افتاده، سرویس‌نشده، تعویض شیطانک، بار بالاتر/پایین‌تر از معمول
+
+  hazard_7d = 1 − exp(−λ · 168 · ضرایب)  — احتمال حداقل یک خرابی در ۷ روز
+  سطح ریسک با HAZARD_THRESHOLDS (معادل آستانه‌های MTBF در downtime.py
+  برای ماشینی با نرخ ثابت).
+
+  خروجی در جدول MachineRiskScore — هر اجرا ردیف‌های همان روز را با یک
+  delete + bulk_create جایگزین می‌کند.
+"""
+import math
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from apps.core.models import Machine
+from apps.maintenance.counters import daily_counts
+from apps.maintenance.models import DowntimeLog, MachineServiceDate
+from apps.reports.models import DailyStageRollup
+from apps.spinning.models import TravelerReplacement
+
+from .downtime import RISK_THRESHOLDS, machine_summary
+from .models import MachineRiskScore
+
+RISK_WINDOW_DAYS = 90
+SUMMARY_DAYS = 30
+LOAD_DAYS = 7
+HORIZON_HOURS = 7 * 24
+
+DECAY_HALF_LIFE_DAYS = 30
+PRIOR_HOURS = 720          # وزن نرخ هم‌نوع‌ها (معادل ۳۰ روز سابقه)
+RATE_FLOOR = 1 / 8760      # حداقل نرخ: یک خرابی در سال
+
+# ضرایب نرخ خرابی
+RISK_FACTORS = {
+    'service_overdue_per_day': 0.02,   # هر روز تأخیر سرویس
+    'service_overdue_max': 2.0,
+    'never_serviced': 1.25,            # بدون سابقه سرویس
+    'traveler_per_replacement': 0.15,  # هر تعویض غیربرنامه‌ای شیطانک
+    'traveler_max': 1.6,
+    'load_min': 0.5,                   # بار نسبی (بریده‌شده)
+    'load_max': 1.5,
+}
+
+UNPLANNED_TRAVELER_REASONS = (
+    TravelerReplacement.Reason.WORN,
+    TravelerReplacement.Reason.BREAKAGE,
+    TravelerReplacement.Reason.QUALITY,
+)
+
+# سطح ریسک از hazard_7d: اولین آستانه‌ای که hazard از آن بیشتر باشد —
+# از RISK_THRESHOLDS (downtime.py) با hazard = 1 − exp(−168 / MTBF) برای نرخ ثابت
+#   MTBF 48h → 0.970، 120h → 0.753، 240h → 0.503
+HAZARD_THRESHOLDS = tuple(
+    (1 - math.exp(-HORIZON_HOURS / mtbf), MachineRiskScore.Level(level))
+    for mtbf, level in RISK_THRESHOLDS
+)
+
+
+def hazard_level(hazard):
+    for limit, level in HAZARD_THRESHOLDS:
+        if hazard > limit:
+            return level
+    return MachineRiskScore.Level.LOW
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن ورودی‌ها (همه ماشین‌ها)
+# ═══════════════════════════════════════════════════════════════
+
+def _fill(index, rows, default=0.0):
+    """آرایه هم‌اندازه index از (machine_id, value)؛ None → default."""
+    out = np.full(len(index), default, dtype=np.float64)
+    for mid, value in rows:
+        if mid in index and value is not None:
+            out[index[mid]] = float(value)
+    return out
+
+
+def load_inputs(machine_ids, day):
+    """
+    ورودی‌های مدل برای ماشین‌ها تا روز day.
+
+    Returns: dict آرایه‌ها (ترتیب machine_ids) + 'counts' ({mid: {day: (count, min)}})
+    """
+    index = {mid: i for i, mid in enumerate(machine_ids)}
+    since = day - timedelta(days=RISK_WINDOW_DAYS)
+    counts = daily_counts(machine_ids, since)
+
+    # خرابی‌های وزن‌دار (نیمه‌عمر) و شمارش ۹۰ روزه
+    decayed = np.zeros(len(index))
+    f90 = np.zeros(len(index), dtype=np.int64)
+    for mid, per_day in counts.items():
+        ago = np.array([(day - d).days for d in per_day], dtype=np.float64)
+        n = np.array([c for c, _m in per_day.values()], dtype=np.float64)
+        keep = ago >= 0
+        i = index[mid]
+        decayed[i] = (n[keep] * 0.5 ** (ago[keep] / DECAY_HALF_LIFE_DAYS)).sum()
+        f90[i] = n[keep].sum()
+
+    last_failure = DowntimeLog.objects.filter(
+        machine_id__in=machine_ids, start_time__date__lte=day,
+    ).values('machine_id').annotate(last=Max('start_time')).order_by()
+
+    service = MachineServiceDate.objects.filter(
+        machine_id__in=machine_ids, service_date__lte=day,
+    ).values('machine_id').annotate(
+        last=Max('service_date'), next=Max('next_service'),
+    ).order_by()
+    service = list(service)
+
+    travelers = TravelerReplacement.objects.filter(
+        machine_id__in=machine_ids,
+        replaced_at__date__gt=day - timedelta(days=SUMMARY_DAYS),
+        replaced_at__date__lte=day,
+        reason__in=UNPLANNED_TRAVELER_REASONS,
+    ).values('machine_id').annotate(n=Count('id')).order_by()
+
+    load = DailyStageRollup.objects.filter(
+        machine_id__in=machine_ids, date__gt=since, date__lte=day,
+    ).values('machine_id').annotate(
+        first=Min('date'),
+        total=Sum('output_kg'),
+        recent=Sum('output_kg', filter=Q(date__gt=day - timedelta(days=LOAD_DAYS))),
+    ).order_by()
+    load = list(load)
+
+    day_ord = day.toordinal()
+    return {
+        'counts': counts,
+        'decayed_failures': decayed,
+        'failures_90d': f90,
+        'last_failure': _fill(index, (
+            (r['machine_id'], r['last'].timestamp()) for r in last_failure
+        ), np.nan),
+        'last_service': _fill(index, (
+            (r['machine_id'], r['last'].toordinal()) for r in service
+        ), np.nan),
+        'service_overdue_days': np.maximum(_fill(index, (
+            (r['machine_id'], day_ord - r['next'].toordinal() if r['next'] else None) for r in service
+        )), 0),
+        'traveler_replacements': _fill(index, ((r['machine_id'], r['n']) for r in travelers)),
+        'output_total': _fill(index, ((r['machine_id'], r['total']) for r in load)),
+        'output_recent': _fill(index, ((r['machine_id'], r['recent']) for r in load)),
+        'output_days': _fill(index, ((r['machine_id'], day_ord - r['first'].toordinal() + 1) for r in load)),
+        'day_ord': day_ord,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# مدل (برداری روی همه ماشین‌ها)
+# ═══════════════════════════════════════════════════════════════
+
+def base_rate(decayed, machine_types):
+    """نرخ خرابی (در ساعت) با جمع‌شدن به سمت نرخ هم‌نوع‌ها."""
+    ages = np.arange(RISK_WINDOW_DAYS + 1)
+    exposure = 24 * (0.5 ** (ages / DECAY_HALF_LIFE_DAYS)).sum()  # ساعت وزن‌دار
+
+    _types, group = np.unique(machine_types, return_inverse=True)
+    type_rate = np.bincount(group, weights=decayed) / (np.bincount(group) * exposure)
+    fleet_rate = decayed.sum() / (len(decayed) * exposure) if len(decayed) else 0.0
+    prior = np.maximum(np.where(type_rate > 0, type_rate, fleet_rate)[group], RATE_FLOOR)
+    return (decayed + prior * PRIOR_HOURS) / (exposure + PRIOR_HOURS)
+
+
+def risk_multipliers(inputs):
+    """ضرایب سرویس، شیطانک و بار؛ {name: np.ndarray}."""
+    f = RISK_FACTORS
+    overdue = inputs['service_overdue_days']
+    service = np.minimum(1 + f['service_overdue_per_day'] * overdue, f['service_overdue_max'])
+    service = np.where(np.isnan(inputs['last_service']), f['never_serviced'], service)
+
+    traveler = np.minimum(
+        1 + f['traveler_per_replacement'] * inputs['traveler_replacements'], f['traveler_max'],
+    )
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily_avg = inputs['output_total'] / inputs['output_days']
+        ratio = np.where(daily_avg > 0, inputs['output_recent'] / LOAD_DAYS / daily_avg, 1.0)
+    load = np.clip(ratio, f['load_min'], f['load_max'])
+    return {'service': service, 'traveler': traveler, 'load': load, 'load_ratio': ratio}
+
+
+def score(inputs, machine_types):
+    """(rate, multipliers, hazard_7d) برای همه ماشین‌ها."""
+    rate = base_rate(inputs['decayed_failures'], machine_types)
+    mult = risk_multipliers(inputs)
+    hazard = 1 - np.exp(-rate * HORIZON_HOURS * mult['service'] * mult['traveler'] * mult['load'])
+    return rate, mult, hazard
+
+
+# ═══════════════════════════════════════════════════════════════
+# اجرا و ذخیره
+# ═══════════════════════════════════════════════════════════════
+
+def _optional(value, ndigits=1):
+    return None if np.isnan(value) else round(float(value), ndigits)
+
+
+def score_fleet(day=None):
+    """
+    امتیازدهی همه ماشین‌های فعال برای روز day (پیش‌فرض امروز) و جایگزینی
+    ردیف‌های همان روز. خروجی: {risk_level: تعداد}
+    """
+    day = day or date.today()
+    machines = list(Machine.objects.filter(status='active').values_list('id', 'machine_type'))
+    if not machines:
+        return {}
+    ids = [mid for mid, _t in machines]
+    inputs = load_inputs(ids, day)
+    rate, mult, hazard = score(inputs, np.array([t for _m, t in machines]))
+
+    # پایان روز امتیازدهی (یا اکنون برای امروز) — مبنای MTBF و «ساعت از آخرین خرابی»
+    now = min(datetime.now(), datetime.combine(day + timedelta(days=1), datetime.min.time())).timestamp()
+    since_30 = day - timedelta(days=SUMMARY_DAYS)
+    window_hours = (now - datetime.combine(since_30, datetime.min.time()).timestamp()) / 3600
+    since_failure = (now - inputs['last_failure']) / 3600
+    since_service = inputs['day_ord'] - inputs['last_service']
+
+    rows = []
+    for i, mid in enumerate(ids):
+        counts = {d: v for d, v in inputs['counts'].get(mid, {}).items() if since_30 <= d <= day}
+        summary = machine_summary(counts, window_hours)
+        h = float(hazard[i])
+        rows.append(MachineRiskScore(
+            machine_id=mid,
+            date=day,
+            hazard_7d=round(h, 4),
+            risk_score=int(round(h * 100)),
+            risk_level=hazard_level(h),
+            failures_30d=summary['total_failures'],
+            failures_90d=int(inputs['failures_90d'][i]),
+            mtbf_hours=summary['mtbf_hours'],
+            mttr_minutes=summary['mttr_minutes'],
+            hours_since_failure=_optional(since_failure[i]),
+            days_since_service=None if np.isnan(since_service[i]) else int(since_service[i]),
+            service_overdue_days=int(inputs['service_overdue_days'][i]),
+            traveler_replacements_30d=int(inputs['traveler_replacements'][i]),
+            load_ratio=round(float(mult['load_ratio'][i]), 3),
+            factors={
+                'rate_per_1000h': round(float(rate[i]) * 1000, 3),
+                'service': round(float(mult['service'][i]), 3),
+                'traveler': round(float(mult['traveler'][i]), 3),
+                'load': round(float(mult['load'][i]), 3),
+            },
+        ))
+
+    with transaction.atomic():
+        MachineRiskScore.objects.filter(date=day).delete()
+        MachineRiskScore.objects.bulk_create(rows, batch_size=1000)
+
+    result = {}
+    for row in rows:
+        result[row.risk_level] = result.get(row.risk_level, 0) + 1
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن امتیازها
+# ═══════════════════════════════════════════════════════════════
+
+def latest_scores(machine_ids=None):
+    """
+    آخرین امتیاز ذخیره‌شده هر ماشین (آخرین روز اجرا)؛ {machine_id: MachineRiskScore}.
+    ماشینی که در آن اجرا نبوده در خروجی نیست.
+    """
+    latest = MachineRiskScore.objects.aggregate(day=Max('date'))['day']
+    if latest is None:
+        return {}
+    qs = MachineRiskScore.objects.filter(date=latest)
+    if machine_ids is not None:
+        qs = qs.filter(machine_id__in=list(machine_ids))
+    return {s.machine_id: s for s in qs}
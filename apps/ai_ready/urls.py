@@ -7,6 +7,7 @@ urlpatterns = [
     # OEE
     path('oee/<int:machine_id>/', views.api_oee, name='oee'),
     path('oee/<int:machine_id>/range/', views.api_oee_range, name='oee_range'),
+    path('oee/range/', views.api_oee_range_multi, name='oee_range_multi'),
     # سری زمانی
     path('timeseries/<int:machine_id>/', views.api_timeseries, name='timeseries'),
     # الگوی توقفات
@@ -2,14 +2,26 @@
 Diaco MES - AI-Ready Utility Functions
 =========================================
 محاسبه OEE، استخراج داده سری زمانی، تحلیل الگو.
+
+OEE چندماشینه/چندروزه (calculate_oee_bulk):
+  دو کوئری گروه‌بندی‌شده بر اساس (ماشین، روز) — توقفات و تولید رینگ —
+  و محاسبه Availability/Performance/Quality به‌صورت آرایه NumPy (ماشین × روز).
+  تعداد کوئری مستقل از تعداد ماشین و روز است.
 """
 from datetime import date, timedelta
 from decimal import Decimal
+
+import numpy as np
 from django.db.models import Sum, Count, Avg, Q
+from django.db.models.functions import TruncDate
 
 from apps.spinning.models import Production as SpinningProd
 from apps.maintenance.models import DowntimeLog
 
+from .downtime import analyze_downtime
+
+PLANNED_MINUTES = 480  # ۸ ساعت = یک شیفت
+
 
 def calculate_oee(machine_id, target_date=None):
     """
@@ -25,49 +37,92 @@ def calculate_oee(machine_id, target_date=None):
     """
     if target_date is None:
         target_date = date.today()
+    bulk = calculate_oee_bulk([machine_id], target_date, target_date)
+    return oee_bulk_day(bulk, 0, 0)
 
-    planned_minutes = 480  # ۸ ساعت = یک شیفت
 
-    # توقفات روز
-    downtime = DowntimeLog.objects.filter(
-        machine_id=machine_id,
-        start_time__date=target_date,
-    ).aggregate(total=Sum('duration_min'))['total'] or 0
-
-    availability = max(0, ((planned_minutes - downtime) / planned_minutes) * 100)
-
-    # عملکرد (میانگین راندمان)
-    spinning_qs = SpinningProd.objects.filter(
-        machine_id=machine_id,
-        production_date=target_date,
-        status='completed',
-    )
-    perf_agg = spinning_qs.aggregate(
-        avg_eff=Avg('efficiency_pct'),
-        total_breakage=Sum('breakage_count'),
-        total_spindles=Sum('num_spindles_active'),
-    )
+def calculate_oee_bulk(machine_ids, date_from, date_to):
+    """
+    OEE همه ماشین‌ها در همه روزهای بازه با دو کوئری.
 
-    performance = float(perf_agg['avg_eff'] or 0)
+    Returns: dict
+      machine_ids, dates      — ترتیب سطرها و ستون‌ها
+      availability, performance, quality, oee, breakage_rate — np.ndarray (M×D)
+      downtime_min, batch_count — np.ndarray صحیح (M×D)
+    """
+    machine_ids = list(machine_ids)
+    n_days = max(0, (date_to - date_from).days + 1)
+    dates = [date_from + timedelta(days=i) for i in range(n_days)]
+    row = {mid: i for i, mid in enumerate(machine_ids)}
+    shape = (len(machine_ids), n_days)
+
+    downtime = np.zeros(shape)
+    avg_eff = np.zeros(shape)
+    breakage = np.zeros(shape)
+    spindles = np.zeros(shape)
+    batch_count = np.zeros(shape, dtype=int)
+
+    if machine_ids and n_days:
+        # ۱. توقفات به تفکیک (ماشین، روز)
+        dt_rows = DowntimeLog.objects.filter(
+            machine_id__in=machine_ids,
+            start_time__date__range=(date_from, date_to),
+        ).annotate(day=TruncDate('start_time')).values('machine_id', 'day').annotate(
+            total=Sum('duration_min'),
+        ).order_by()
+        for r in dt_rows:
+            downtime[row[r['machine_id']], (r['day'] - date_from).days] = r['total'] or 0
+
+        # ۲. تولید رینگ تکمیل‌شده به تفکیک (ماشین، روز)
+        sp_rows = SpinningProd.objects.filter(
+            machine_id__in=machine_ids,
+            production_date__range=(date_from, date_to),
+            status='completed',
+        ).values('machine_id', 'production_date').annotate(
+            avg_eff=Avg('efficiency_pct'),
+            total_breakage=Sum('breakage_count'),
+            total_spindles=Sum('num_spindles_active'),
+            batch_count=Count('id'),
+        ).order_by()
+        for r in sp_rows:
+            i, j = row[r['machine_id']], (r['production_date'] - date_from).days
+            avg_eff[i, j] = float(r['avg_eff'] or 0)
+            breakage[i, j] = r['total_breakage'] or 0
+            spindles[i, j] = r['total_spindles'] or 0
+            batch_count[i, j] = r['batch_count']
+
+    availability = np.maximum(0, (PLANNED_MINUTES - downtime) / PLANNED_MINUTES * 100)
+    performance = avg_eff
+    # کیفیت (بر اساس نرخ پارگی): هر ۱ پارگی/۱۰۰۰ دوک = ۱% کاهش
+    breakage_rate = breakage / np.where(spindles > 0, spindles, 1) * 1000
+    quality = np.clip(100 - breakage_rate, 0, 100)
+    oee = availability * performance * quality / 10000
 
-    # کیفیت (بر اساس نرخ پارگی)
-    total_brk = perf_agg['total_breakage'] or 0
-    total_sp = perf_agg['total_spindles'] or 1
-    breakage_rate = (total_brk / total_sp) * 1000  # پارگی در هر ۱۰۰۰ دوک
-    quality = max(0, min(100, 100 - breakage_rate))  # هر ۱ پارگی/۱۰۰۰ = ۱% کاهش
+    return {
+        'machine_ids': machine_ids,
+        'dates': dates,
+        'availability': availability,
+        'performance': performance,
+        'quality': quality,
+        'oee': oee,
+        'breakage_rate': breakage_rate,
+        'downtime_min': downtime.astype(int),
+        'batch_count': batch_count,
+    }
 
-    oee = (availability * performance * quality) / 10000
 
+def oee_bulk_day(bulk, i, j):
+    """یک خانه (ماشین i، روز j) از خروجی calculate_oee_bulk — همان ساختار calculate_oee."""
     return {
-        'machine_id': machine_id,
-        'date': target_date.isoformat(),
-        'availability': round(availability, 2),
-        'performance': round(performance, 2),
-        'quality': round(quality, 2),
-        'oee': round(oee, 2),
-        'downtime_min': downtime,
-        'breakage_rate_per_1000': round(breakage_rate, 1),
-        'batch_count': spinning_qs.count(),
+        'machine_id': bulk['machine_ids'][i],
+        'date': bulk['dates'][j].isoformat(),
+        'availability': round(float(bulk['availability'][i, j]), 2),
+        'performance': round(float(bulk['performance'][i, j]), 2),
+        'quality': round(float(bulk['quality'][i, j]), 2),
+        'oee': round(float(bulk['oee'][i, j]), 2),
+        'downtime_min': int(bulk['downtime_min'][i, j]),
+        'breakage_rate_per_1000': round(float(bulk['breakage_rate'][i, j]), 1),
+        'batch_count': int(bulk['batch_count'][i, j]),
     }
 
 
@@ -96,56 +151,8 @@ def get_timeseries_data(machine_id, days=30, metric='output_weight'):
 def get_downtime_pattern(machine_id, days=90):
     """
     الگوی توقفات ماشین برای Predictive Maintenance.
+    (محاسبه در ai_ready/downtime.py — برای چند ماشین analyze_downtime)
 
     Returns: dict با تحلیل الگو
     """
-    start = date.today() - timedelta(days=days)
-    qs = DowntimeLog.objects.filter(
-        machine_id=machine_id,
-        start_time__date__gte=start,
-    )
-
-    by_reason = qs.values('reason_category').annotate(
-        count=Count('id'),
-        total_min=Sum('duration_min'),
-    ).order_by('-total_min')
-
-    # تعداد توقفات هفتگی
-    weekly = []
-    for week in range(days // 7):
-        w_start = date.today() - timedelta(days=(week + 1) * 7)
-        w_end = date.today() - timedelta(days=week * 7)
-        cnt = qs.filter(start_time__date__range=(w_start, w_end)).count()
-        weekly.append({
-            'week_start': w_start.isoformat(),
-            'count': cnt,
-        })
-
-    # MTBF (Mean Time Between Failures)
-    total_failures = qs.count()
-    total_hours = days * 24
-    mtbf = round(total_hours / max(total_failures, 1), 1)
-
-    # MTTR (Mean Time To Repair)
-    total_repair_min = qs.aggregate(t=Sum('duration_min'))['t'] or 0
-    mttr = round(total_repair_min / max(total_failures, 1), 1)
-
-    # هشدار
-    risk_level = 'low'
-    if mtbf < 48:
-        risk_level = 'critical'
-    elif mtbf < 120:
-        risk_level = 'high'
-    elif mtbf < 240:
-        risk_level = 'medium'
-
-    return {
-        'machine_id': machine_id,
-        'period_days': days,
-        'total_failures': total_failures,
-        'mtbf_hours': mtbf,
-        'mttr_minutes': mttr,
-        'risk_level': risk_level,
-        'by_reason': list(by_reason),
-        'weekly_trend': list(reversed(weekly)),
-    }
+    return analyze_downtime([machine_id], days)[machine_id]
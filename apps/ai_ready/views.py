@@ -9,6 +9,8 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 
 from .utils import calculate_oee, get_timeseries_data, get_downtime_pattern
+from .fleet import fleet_health
+from .oee_range import OEE_RANGE_MAX_MACHINES, OEE_SERIES_KEYS, clamp_days, oee_range_days
 from apps.core.models import Machine
 
 
@@ -27,24 +29,51 @@ def api_oee(request, machine_id):
 
 @login_required
 def api_oee_range(request, machine_id):
-    """OEE محدوده‌ای برای نمودار.
-    GET /ai/oee/<machine_id>/range/?days=30
+    """OEE محدوده‌ای برای نمودار (بازه بلند → سطل هفتگی/ماهانه).
+    GET /ai/oee/<machine_id>/range/?days=30&bucket=week
     """
-    from datetime import timedelta
-    days = int(request.GET.get('days', 30))
-    results = []
-    for i in range(days):
-        d = date.today() - timedelta(days=i)
-        oee_data = calculate_oee(machine_id, d)
-        results.append({
-            'date': oee_data['date'],
-            'oee': oee_data['oee'],
-            'availability': oee_data['availability'],
-            'performance': oee_data['performance'],
-            'quality': oee_data['quality'],
-        })
-    results.reverse()
-    return JsonResponse({'machine_id': machine_id, 'days': days, 'data': results})
+    days = clamp_days(request.GET.get('days', 30))
+    data = oee_range_days([machine_id], days, request.GET.get('bucket'))
+    series = data['series'][machine_id]
+    results = [
+        {'date': d, **{key: series[key][k] for key in OEE_SERIES_KEYS}}
+        for k, d in enumerate(data['dates'])
+    ]
+    return JsonResponse({
+        'machine_id': machine_id, 'days': days, 'bucket': data['bucket'], 'data': results,
+    })
+
+
+@login_required
+def api_oee_range_multi(request):
+    """OEE محدوده‌ای چند ماشین (ستونی، برای نمودار مقایسه‌ای).
+    GET /ai/oee/range/?machines=1,2,3&days=365
+    GET /ai/oee/range/?line=1&days=90      (همه ماشین‌های فعال خط)
+    """
+    machines = Machine.objects.all()
+    ids = request.GET.get('machines')
+    if ids:
+        try:
+            machines = machines.filter(pk__in=[int(x) for x in ids.split(',') if x.strip()])
+        except ValueError:
+            return JsonResponse({'error': 'شناسه ماشین نامعتبر است'}, status=400)
+    else:
+        machines = machines.filter(status='active')
+        if request.GET.get('line'):
+            machines = machines.filter(production_line_id=request.GET['line'])
+    machines = list(machines.order_by('code').values('id', 'code')[:OEE_RANGE_MAX_MACHINES])
+
+    days = clamp_days(request.GET.get('days', 30))
+    data = oee_range_days([m['id'] for m in machines], days, request.GET.get('bucket'))
+    return JsonResponse({
+        'days': days,
+        'bucket': data['bucket'],
+        'dates': data['dates'],
+        'machines': [
+            {'machine_id': m['id'], 'code': m['code'], **data['series'][m['id']]}
+            for m in machines
+        ],
+    })
 
 
 @login_required
@@ -73,32 +102,12 @@ def api_downtime_pattern(request, machine_id):
 
 @login_required
 def api_fleet_health(request):
-    """سلامت کلی ماشین‌آلات.
+    """سلامت کلی ماشین‌آلات (snapshot کش‌شده — ai_ready/fleet.py).
     GET /ai/fleet-health/?line=1
     """
-    machines = Machine.objects.filter(status='active')
-    line_id = request.GET.get('line')
-    if line_id:
-        machines = machines.filter(production_line_id=line_id)
-    results = []
-    for m in machines:
-        oee = calculate_oee(m.id)
-        pattern = get_downtime_pattern(m.id, days=30)
-        results.append({
-            'machine_id': m.id,
-            'code': m.code,
-            'name': m.name,
-            'section': m.get_machine_type_display(),
-            'line': m.production_line.code if m.production_line else None,
-            'oee_today': oee['oee'],
-            'availability': oee['availability'],
-            'risk_level': pattern['risk_level'],
-            'mtbf_hours': pattern['mtbf_hours'],
-            'failures_30d': pattern['total_failures'],
-        })
-
-    # مرتب‌سازی بر اساس ریسک
-    risk_order = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
-    results.sort(key=lambda x: risk_order.get(x['risk_level'], 4))
-
-    return JsonResponse({'machines': results, 'total': len(results)})
+    snapshot = fleet_health(request.GET.get('line') or None)
+    return JsonResponse({
+        'machines': snapshot['machines'],
+        'total': len(snapshot['machines']),
+        'generated_at': snapshot['generated_at'],
+    })
@@ -0,0 +1,186 @@
+"""
+Diaco MES - Dashboard KPI Cache
+==================================
+کش بلوک‌های KPI داشبورد اصلی با کلید نسخه‌دار.
+
+منطق:
+─────
+  هر بلوک KPI (سفارشات، انبار، نگهداری، تکمیل نخ v2.0) جداگانه کش می‌شود:
+    dashboard:kpi:<block>:<version>:<date>
+  سیگنال‌های post_save/post_delete مدل‌های مرتبط (dashboard/signals.py)
+  فقط نسخه همان بلوک را عوض می‌کنند → کلید قبلی دیگر خوانده نمی‌شود.
+  تعویض نسخه بعد از commit تراکنش انجام می‌شود تا داده قدیمی
+  زیر نسخه جدید ذخیره نشود.
+
+  نسخه یک مقدار یکتا (time_ns) است نه شمارنده؛ اگر کلید نسخه از کش
+  پاک شود، نسخه جدید ساخته می‌شود و هیچ‌وقت با داده قدیمی برخورد نمی‌کند.
+
+  KPI_CACHE_TTL فقط سقف عمر است (برای شاخص‌های وابسته به ساعت مثل PM عقب‌افتاده).
+"""
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, DecimalField, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.ai_ready.models import MachineRiskScore
+from apps.orders.models import Order
+from apps.inventory.models import FiberStock, DyeStock, ChemicalStock
+from apps.maintenance.models import WorkOrder, Schedule
+from apps.winding.models import Production as WindingProduction
+from apps.tfo.models import Production as TFOProduction
+from apps.heatset.models import Batch as HeatsetBatch
+
+KPI_CACHE_TTL = 300  # ثانیه
+KEY_PREFIX = 'dashboard:kpi'
+
+
+# ═══════════════════════════════════════════════════════════════
+# محاسبه بلوک‌ها
+# ═══════════════════════════════════════════════════════════════
+
+def _orders_block(today):
+    orders_qs = Order.objects.all()
+    stats = orders_qs.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status__in=['confirmed', 'in_production', 'quality_check'])),
+        draft=Count('id', filter=Q(status='draft')),
+        delivered=Count('id', filter=Q(status='delivered')),
+        overdue=Count('id', filter=Q(delivery_date__lt=today) & ~Q(status__in=['delivered', 'cancelled'])),
+    )
+    recent = list(Order.objects.select_related('customer').order_by('-created_at')[:5])
+    return {'orders_stats': stats, 'recent_orders': recent}
+
+
+def _inventory_block(today):
+    fiber_total = FiberStock.objects.filter(status='available').aggregate(
+        total_weight=Sum('current_weight')
+    )['total_weight'] or 0
+    return {
+        'inventory_stats': {
+            'fiber_weight': fiber_total,
+            'dye_count': DyeStock.objects.filter(status='available').count(),
+            'chemical_count': ChemicalStock.objects.filter(status='available').count(),
+        },
+    }
+
+
+def _maintenance_block(today):
+    wo_open = WorkOrder.objects.filter(status__in=['open', 'in_progress']).count()
+    pm_overdue = Schedule.objects.filter(
+        is_active=True,
+        next_due_at__lt=timezone.now()
+    ).count()
+    open_workorders = list(WorkOrder.objects.select_related('machine').filter(
+        status__in=['open', 'in_progress']
+    ).order_by('-created_at')[:5])
+    # ماشین‌های پرخطر (بحرانی/بالا) در آخرین امتیازدهی شبانه (score_machine_risk)
+    scored_day = MachineRiskScore.objects.aggregate(day=Max('date'))['day']
+    machines_at_risk = MachineRiskScore.objects.filter(
+        date=scored_day,
+        risk_level__in=[MachineRiskScore.Level.CRITICAL, MachineRiskScore.Level.HIGH],
+    ).count() if scored_day else 0
+    return {
+        'maintenance_stats': {
+            'wo_open': wo_open, 'pm_overdue': pm_overdue, 'machines_at_risk': machines_at_risk,
+        },
+        'open_workorders': open_workorders,
+    }
+
+
+def _v2_block(today):
+    """KPI تکمیل نخ v2.0 (امروز) — یک aggregate به‌ازای هر مرحله."""
+    zero = Decimal('0')
+    wd = WindingProduction.objects.filter(production_date=today).aggregate(
+        batches=Count('id'),
+        output_kg=Coalesce(Sum('output_weight_kg'), zero, output_field=DecimalField()),
+        avg_cuts=Avg('cuts_per_100km'),
+        avg_eff=Avg('efficiency_pct'),
+    )
+    tfo = TFOProduction.objects.filter(production_date=today).aggregate(
+        batches=Count('id'),
+        output_kg=Coalesce(Sum('output_weight_kg'), zero, output_field=DecimalField()),
+        avg_eff=Avg('efficiency_pct'),
+        breakage=Coalesce(Sum('breakage_count'), 0),
+    )
+    hs = HeatsetBatch.objects.filter(production_date=today).aggregate(
+        batches=Count('id'),
+        passed=Count('id', filter=Q(quality_result='pass')),
+        failed=Count('id', filter=Q(quality_result='fail')),
+        total_kg=Coalesce(Sum('batch_weight_kg'), zero, output_field=DecimalField()),
+    )
+
+    v2_kpi = {
+        # بوبین‌پیچی
+        'wd_batches':        wd['batches'],
+        'wd_output_kg':      float(wd['output_kg']),
+        'wd_avg_cuts':       round(float(wd['avg_cuts'] or 0), 1),
+        'wd_avg_efficiency': round(float(wd['avg_eff'] or 0), 1),
+        # دولاتابی TFO
+        'tfo_batches':        tfo['batches'],
+        'tfo_output_kg':      float(tfo['output_kg']),
+        'tfo_avg_efficiency': round(float(tfo['avg_eff'] or 0), 1),
+        'tfo_total_breakage': tfo['breakage'] or 0,
+        # هیت‌ست
+        'hs_batches':  hs['batches'],
+        'hs_pass':     hs['passed'],
+        'hs_fail':     hs['failed'],
+        'hs_total_kg': float(hs['total_kg']),
+    }
+    total_hs = v2_kpi['hs_batches']
+    v2_kpi['hs_pass_rate'] = (
+        round(v2_kpi['hs_pass'] / total_hs * 100, 1) if total_hs > 0 else None
+    )
+    return {'v2_kpi': v2_kpi}
+
+
+KPI_BLOCKS = {
+    'orders':      _orders_block,
+    'inventory':   _inventory_block,
+    'maintenance': _maintenance_block,
+    'v2':          _v2_block,
+}
+
+
+# ═══════════════════════════════════════════════════════════════
+# کش نسخه‌دار
+# ═══════════════════════════════════════════════════════════════
+
+def _version_key(block):
+    return f'{KEY_PREFIX}:{block}:version'
+
+
+def _block_version(block):
+    version = cache.get(_version_key(block))
+    if version is None:
+        version = time.time_ns()
+        cache.set(_version_key(block), version, None)
+    return version
+
+
+def get_block(block, today):
+    """مقدار بلوک از کش؛ در صورت نبود، محاسبه و ذخیره."""
+    key = f'{KEY_PREFIX}:{block}:{_block_version(block)}:{today.isoformat()}'
+    data = cache.get(key)
+    if data is None:
+        data = KPI_BLOCKS[block](today)
+        cache.set(key, data, KPI_CACHE_TTL)
+    return data
+
+
+def get_dashboard_kpis(today):
+    """همه بلوک‌ها در یک dict برای context قالب."""
+    context = {}
+    for block in KPI_BLOCKS:
+        context.update(get_block(block, today))
+    return context
+
+
+def bump_block(block):
+    """باطل‌کردن بلوک — پس از commit تراکنش جاری."""
+    transaction.on_commit(
+        lambda: cache.set(_version_key(block), time.time_ns(), None)
+    )
@@ -0,0 +1,211 @@
+"""
+Diaco MES - Live Push Channel (SSE)
+=====================================
+کانال Server-Sent Events برای مانیتور خطوط و نقشه کارگاه.
+
+منطق:
+─────
+  ۱. اتصال جدید → رویداد snapshot (داده کامل، همان خروجی API فعلی)
+  ۲. هر STREAM_POLL_SECONDS یک کوئری سبک روی فید LiveChange (id > cursor)
+  ۳. اگر تغییری بود → فقط همان خطوط/ماشین‌ها محاسبه و در رویداد delta ارسال می‌شوند
+  ۴. بدون تغییر → هیچ کوئری سنگینی اجرا نمی‌شود؛ فقط keep-alive
+  ۵. بعد از STREAM_LIFETIME_SECONDS اتصال بسته می‌شود تا worker آزاد شود؛
+     EventSource مرورگر خودکار با Last-Event-ID وصل می‌شود و از همان cursor ادامه می‌دهد.
+
+  تغییر روز یا شیفت → snapshot کامل دوباره.
+
+  ظرفیت worker:
+    زیر Passenger/WSGI همزمان هر استریم یک worker را تمام مدت اتصال نگه
+    می‌دارد. استریم فقط با LIVE_STREAM_ENABLED روشن است و حداکثر
+    LIVE_STREAM_MAX استریم همزمان (جای خالی در کش مشترک پروسه‌ها —
+    acquire_stream_slot) باز می‌شود؛ درخواست بیشتر پاسخ 204 می‌گیرد و
+    صفحه روی polling قبلی می‌ماند (EventSource بعد از 204 وصل نمی‌شود).
+    اندازه لازم: تعداد worker (PassengerMaxPoolSize) ≥ LIVE_STREAM_MAX +
+    درخواست‌های عادی همزمان؛ جای گرفته‌شده با بسته‌شدن استریم آزاد و در
+    بدترین حالت (قطع پروسه) بعد از STREAM_LIFETIME_SECONDS + STREAM_SLOT_GRACE_SECONDS منقضی می‌شود.
+"""
+import json
+import time
+from datetime import date, timedelta
+
+import jdatetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import LiveChange
+from .snapshots import (
+    build_line_snapshot, build_floor_map, floor_map_summary, current_shift_name,
+)
+
+STREAM_POLL_SECONDS = 2
+STREAM_LIFETIME_SECONDS = 300
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 3000
+LIVE_CHANGE_RETENTION = timedelta(hours=1)
+STREAM_SLOT_KEY = 'live_stream_slot:{}'
+STREAM_SLOT_GRACE_SECONDS = 60
+
+
+# ═══════════════════════════════════════════════════════════════
+# فید تغییرات
+# ═══════════════════════════════════════════════════════════════
+
+def record_change(line_id=None, machine_id=None, source=''):
+    """ثبت تغییر بعد از commit — استریم هرگز داده commit‌نشده را نمی‌خواند."""
+    if line_id is None and machine_id is None:
+        return
+    transaction.on_commit(lambda: LiveChange.objects.create(
+        line_id=line_id, machine_id=machine_id, source=source,
+    ))
+
+
+def prune_changes():
+    LiveChange.objects.filter(
+        created_at__lt=timezone.now() - LIVE_CHANGE_RETENTION
+    ).delete()
+
+
+def _resume_cursor(last_event_id):
+    """
+    cursor ادامه از Last-Event-ID؛ اگر نامعتبر یا قدیمی‌تر از فید
+    نگهداری‌شده باشد None (یعنی snapshot کامل لازم است).
+    """
+    bounds = LiveChange.objects.aggregate(first=Min('id'), last=Max('id'))
+    latest = bounds['last'] or 0
+    try:
+        cursor = int(last_event_id)
+    except (TypeError, ValueError):
+        return None, latest
+    if cursor > latest or (bounds['first'] and cursor < bounds['first'] - 1):
+        return None, latest
+    return cursor, latest
+
+
+def _changes_since(cursor):
+    return list(
+        LiveChange.objects.filter(id__gt=cursor)
+        .order_by('id')
+        .values_list('id', 'line_id', 'machine_id')
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# payload ها
+# ═══════════════════════════════════════════════════════════════
+
+def line_monitor_payload(line_ids=None):
+    return {
+        'lines': build_line_snapshot(date.today(), line_ids=line_ids),
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def floor_map_payload(machine_ids=None):
+    today = date.today()
+    now = timezone.now()
+    shift_name = current_shift_name(now)
+    result = build_floor_map(today, shift_name, machine_ids=machine_ids)
+    payload = {
+        'machines': result,
+        'timestamp': now.isoformat(),
+        'jalali_date': jdatetime.date.fromgregorian(date=today).strftime('%Y/%m/%d'),
+        'shift': shift_name,
+    }
+    if machine_ids is None:
+        payload['summary'] = floor_map_summary(result)
+    return payload
+
+
+def _line_period():
+    return date.today()
+
+
+def _floor_period():
+    return date.today(), current_shift_name(timezone.now())
+
+
+# ═══════════════════════════════════════════════════════════════
+# استریم
+# ═══════════════════════════════════════════════════════════════
+
+def acquire_stream_slot():
+    """یک جای خالی از LIVE_STREAM_MAX استریم همزمان (کلید کش)؛ None اگر پر یا خاموش باشد."""
+    if not settings.LIVE_STREAM_ENABLED:
+        return None
+    timeout = STREAM_LIFETIME_SECONDS + STREAM_SLOT_GRACE_SECONDS
+    for i in range(settings.LIVE_STREAM_MAX):
+        key = STREAM_SLOT_KEY.format(i)
+        if cache.add(key, 1, timeout):
+            return key
+    return None
+
+
+def _sse(event, data, event_id=None):
+    out = ''
+    if event_id is not None:
+        out += f'id: {event_id}\n'
+    out += f'event: {event}\n'
+    out += f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    return out
+
+
+def _event_stream(build, period, pick_ids, last_event_id, slot):
+    try:
+        yield from _stream_events(build, period, pick_ids, last_event_id)
+    finally:
+        # بسته‌شدن پاسخ (پایان عمر یا قطع کاربر) → جای استریم آزاد
+        cache.delete(slot)
+
+
+def _stream_events(build, period, pick_ids, last_event_id):
+    prune_changes()
+    cursor, latest = _resume_cursor(last_event_id)
+
+    yield f'retry: {RETRY_MS}\n\n'
+    if cursor is None:
+        cursor = latest
+        yield _sse('snapshot', build(None), cursor)
+
+    current_period = period()
+    deadline = time.monotonic() + STREAM_LIFETIME_SECONDS
+    last_sent = time.monotonic()
+
+    while time.monotonic() < deadline:
+        time.sleep(STREAM_POLL_SECONDS)
+
+        if period() != current_period:
+            current_period = period()
+            cursor = LiveChange.objects.aggregate(m=Max('id'))['m'] or cursor
+            yield _sse('snapshot', build(None), cursor)
+            last_sent = time.monotonic()
+            continue
+
+        changes = _changes_since(cursor)
+        if changes:
+            cursor = changes[-1][0]
+            ids = {pk for pk in (pick_ids(row) for row in changes) if pk is not None}
+            if ids:
+                yield _sse('delta', build(sorted(ids)), cursor)
+                last_sent = time.monotonic()
+                continue
+
+        if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
+
+
+def line_monitor_events(slot, last_event_id=None):
+    return _event_stream(
+        line_monitor_payload, _line_period,
+        lambda row: row[1], last_event_id, slot,
+    )
+
+
+def floor_map_events(slot, last_event_id=None):
+    return _event_stream(
+        floor_map_payload, _floor_period,
+        lambda row: row[2], last_event_id, slot,
+    )
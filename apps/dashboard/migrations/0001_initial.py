@@ -0,0 +1,30 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_id', models.BigIntegerField(blank=True, null=True, verbose_name='شناسه خط')),
+                ('machine_id', models.BigIntegerField(blank=True, null=True, verbose_name='شناسه ماشین')),
+                ('source', models.CharField(blank=True, default='', max_length=30, verbose_name='منبع')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='زمان ثبت')),
+            ],
+            options={
+                'verbose_name': 'تغییر زنده',
+                'verbose_name_plural': 'فید تغییرات زنده',
+                'db_table': 'dashboard_livechange',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+"""
+Diaco MES - Dashboard Models
+==============================
+LiveChange: فید سبک تغییرات برای کانال زنده (SSE) مانیتور خطوط و نقشه کارگاه.
+
+منطق:
+─────
+  سیگنال‌های ذخیره/حذف تولید و ماشین (dashboard/signals.py) بعد از commit
+  فقط شناسه خط و ماشین تغییرکرده را اینجا ثبت می‌کنند.
+  استریم SSE با یک کوئری سبک (id > cursor) تغییرات جدید را می‌خواند
+  و فقط همان خطوط/ماشین‌ها را دوباره محاسبه و ارسال می‌کند.
+  شناسه‌ها عمداً FK نیستند تا فید بدون join و cascade بماند؛
+  ردیف‌های قدیمی‌تر از LIVE_CHANGE_RETENTION پاک می‌شوند (dashboard/live.py).
+"""
+from django.db import models
+
+
+class LiveChange(models.Model):
+    """یک رویداد تغییر در فید زنده."""
+
+    line_id = models.BigIntegerField(blank=True, null=True, verbose_name='شناسه خط')
+    machine_id = models.BigIntegerField(blank=True, null=True, verbose_name='شناسه ماشین')
+    source = models.CharField(max_length=30, blank=True, default='', verbose_name='منبع')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='زمان ثبت')
+
+    class Meta:
+        db_table = 'dashboard_livechange'
+        verbose_name = 'تغییر زنده'
+        verbose_name_plural = 'فید تغییرات زنده'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.source} | خط {self.line_id} | ماشین {self.machine_id}"
@@ -0,0 +1,89 @@
+"""
+Diaco MES - Dashboard Signals
+===============================
+باطل‌سازی رویدادمحور کش KPI داشبورد (dashboard/kpi.py).
+
+هر ذخیره/حذف فقط نسخه بلوک مرتبط را عوض می‌کند:
+  orders      ← Order, Customer
+  inventory   ← FiberStock, DyeStock, ChemicalStock
+  maintenance ← WorkOrder, Schedule, Machine
+  v2          ← بوبین‌پیچی، دولاتابی TFO، هیت‌ست
+
+به‌علاوه فید تغییرات زنده (LiveChange) برای کانال SSE:
+  هر ذخیره/حذف بچ تولید (۹ مرحله) یا ماشین → ثبت شناسه خط و ماشین.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.core.models import Machine
+from apps.orders.models import Order, Customer
+from apps.inventory.models import FiberStock, DyeStock, ChemicalStock
+from apps.maintenance.models import WorkOrder, Schedule
+from apps.winding.models import Production as WindingProduction
+from apps.tfo.models import Production as TFOProduction
+from apps.heatset.models import Batch as HeatsetBatch
+
+from .kpi import bump_block
+from .live import record_change
+from .snapshots import LINE_STAGES
+
+KPI_SIGNALS = [post_save, post_delete]
+
+
+@receiver(KPI_SIGNALS, sender=Order)
+@receiver(KPI_SIGNALS, sender=Customer)
+def invalidate_orders_kpi(sender, **kwargs):
+    bump_block('orders')
+
+
+@receiver(KPI_SIGNALS, sender=FiberStock)
+@receiver(KPI_SIGNALS, sender=DyeStock)
+@receiver(KPI_SIGNALS, sender=ChemicalStock)
+def invalidate_inventory_kpi(sender, **kwargs):
+    bump_block('inventory')
+
+
+@receiver(KPI_SIGNALS, sender=WorkOrder)
+@receiver(KPI_SIGNALS, sender=Schedule)
+@receiver(KPI_SIGNALS, sender=Machine)
+def invalidate_maintenance_kpi(sender, **kwargs):
+    """Machine: کد ماشین در جدول دستور کارهای باز نمایش داده می‌شود."""
+    bump_block('maintenance')
+
+
+@receiver(KPI_SIGNALS, sender=WindingProduction)
+@receiver(KPI_SIGNALS, sender=TFOProduction)
+@receiver(KPI_SIGNALS, sender=HeatsetBatch)
+def invalidate_v2_kpi(sender, **kwargs):
+    bump_block('v2')
+
+
+# ═══════════════════════════════════════════════════════════════
+# فید تغییرات زنده (SSE)
+# ═══════════════════════════════════════════════════════════════
+
+def record_production_change(sender, instance, **kwargs):
+    """بچ تولید ذخیره/حذف شد → خط و ماشین آن در فید زنده."""
+    line_id = getattr(instance, 'production_line_id', None)
+    machine_id = instance.machine_id
+    if line_id is None and machine_id is not None:
+        # رنگرزی خط ندارد — خط از ماشین
+        line_id = Machine.objects.filter(pk=machine_id).values_list(
+            'production_line_id', flat=True
+        ).first()
+    record_change(line_id, machine_id, sender._meta.app_label)
+
+
+for _stage in LINE_STAGES:
+    _Model = _stage[4]
+    for _signal in KPI_SIGNALS:
+        _signal.connect(
+            record_production_change, sender=_Model,
+            dispatch_uid=f'live_change_{_Model._meta.label_lower}',
+        )
+
+
+@receiver(KPI_SIGNALS, sender=Machine)
+def record_machine_change(sender, instance, **kwargs):
+    """تغییر وضعیت ماشین → شمارش ماشین‌های خط و خانه نقشه کارگاه."""
+    record_change(instance.production_line_id, instance.pk, 'machine')
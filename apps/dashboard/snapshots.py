@@ -0,0 +1,387 @@
+"""
+Diaco MES - Live Line Snapshot Engine
+========================================
+ساخت داده مانیتورینگ زنده خطوط با تعداد ثابت کوئری.
+
+منطق:
+─────
+  نسخه قبلی برای هر خط و هر مرحله چند کوئری جداگانه اجرا می‌کرد
+  (حدود ۴۰ کوئری به‌ازای هر خط در هر رفرش).
+  این ماژول برای هر مدل مرحله فقط دو کوئری اجرا می‌کند:
+    ۱. یک aggregate شرطی گروه‌بندی‌شده بر اساس production_line (تولید امروز)
+    ۲. آخرین بچ هر خط با یک subquery (latest-id)
+  به‌علاوه یک شمارش گروه‌بندی‌شده وضعیت ماشین‌ها.
+  تعداد کوئری مستقل از تعداد خطوط است (۲۰ کوئری ثابت).
+
+  نقشه کارگاه (floor map) هم به همین شکل ساخته می‌شود:
+  برای هر نوع ماشین یک aggregate گروه‌بندی‌شده بر اساس machine
+  و یک کوئری آخرین بچ امروز هر ماشین؛ heat_level در حافظه محاسبه می‌شود.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+import jdatetime
+from django.db.models import Avg, Count, OuterRef, Q, Subquery, Sum
+
+from apps.core.models import ProductionLine, Machine
+from apps.blowroom.models import Batch as BlowroomBatch
+from apps.carding.models import Production as CardingProduction
+from apps.passage.models import Production as PassageProduction
+from apps.finisher.models import Production as FinisherProduction
+from apps.spinning.models import Production as SpinningProduction
+from apps.dyeing.models import Batch as DyeingBatch
+from apps.winding.models import Production as WindingProduction
+from apps.tfo.models import Production as TFOProduction
+from apps.heatset.models import Batch as HeatsetBatch
+
+
+# ═══════════════════════════════════════════════════════════════
+# تعریف مراحل زنجیره (۹ مرحله نخ فرش)
+# ═══════════════════════════════════════════════════════════════
+
+# name, key, icon, color, Model, line_field, active_statuses, extra_fields, output_field, count_key
+LINE_STAGES = [
+    # حلاجی — باز کردن و مخلوط الیاف خام با هوا (tornado = گردباد هوا)
+    ('حلاجی',      'blowroom', 'ti ti-tornado',                '#6366f1', BlowroomBatch,      'production_line',         ['in_progress'], {}, 'output_weight', 'blowroom'),
+    # کاردینگ — شانه‌زنی الیاف با سوزن‌های ریز روی سیلندر
+    ('کاردینگ',    'carding',  'ti ti-needle',                 '#8b5cf6', CardingProduction,  'production_line',         ['in_progress'], {}, None, None),
+    # پاساژ — ادغام و کشش چند فتیله روی هم (layers)
+    ('پاساژ',      'passage',  'ti ti-layers-intersect',       '#a855f7', PassageProduction,  'production_line',         ['in_progress'], {}, None, None),
+    # فینیشر — آخرین تنظیم ضخامت فتیله قبل از رینگ
+    ('فینیشر',     'finisher', 'ti ti-adjustments-horizontal', '#ec4899', FinisherProduction, 'production_line',         ['in_progress'], {}, None, None),
+    # رینگ — چرخش اسپیندل و تابیدن نخ (fidget-spinner = اسپیندل چرخان)
+    ('رینگ',       'spinning', 'ti ti-fidget-spinner',         '#ef4444', SpinningProduction, 'production_line',         ['in_progress'], {}, 'output_weight', 'spinning'),
+    # بوبین‌پیچی — پیچیدن نخ دور بوبین استوانه‌ای
+    ('بوبین‌پیچی', 'winding',  'ti ti-cylinder',               '#f97316', WindingProduction,  'production_line',         ['in_progress'], {'speed': 'winding_speed_mpm', 'efficiency': 'efficiency_pct'}, 'output_weight_kg', 'winding'),
+    # دولاتابی TFO — تاب دوگانه (infinity = حرکت ∞ شکل)
+    ('دولاتابی',   'tfo',      'ti ti-infinity',               '#eab308', TFOProduction,      'production_line',         ['in_progress'], {'tpm': 'twist_tpm', 'efficiency': 'efficiency_pct'}, 'output_weight_kg', 'tfo'),
+    # هیت‌ست — تثبیت تاب با بخار/حرارت در اتوکلاو
+    ('هیت‌ست',     'heatset',  'ti ti-flame',                  '#f43f5e', HeatsetBatch,       'production_line',         ['processing', 'loading', 'cooling'], {'temp': 'temperature_c'}, 'batch_weight_kg', 'heatset'),
+    # رنگرزی — غوطه‌ور در محلول رنگ (droplet-filled)
+    ('رنگرزی',     'dyeing',   'ti ti-droplet-filled',         '#06b6d4', DyeingBatch,        'machine__production_line', ['in_progress'], {}, 'fiber_weight', 'dyeing'),
+]
+
+# مراحلی که خروجی آن‌ها در «کل تولید امروز» خط حساب می‌شود
+TOTAL_OUTPUT_KEYS = ('spinning', 'winding', 'tfo', 'heatset')
+
+# نوع ماشین → (مدل تولید، فیلد وزن خروجی، آیا راندمان دارد)
+FLOOR_MAP_TYPES = {
+    'blowroom': (BlowroomBatch,      'output_weight',    False),
+    'carding':  (CardingProduction,  'output_weight',    False),
+    'passage':  (PassageProduction,  'output_weight',    False),
+    'finisher': (FinisherProduction, 'output_weight',    False),
+    'ring':     (SpinningProduction, 'output_weight',    True),
+    'winding':  (WindingProduction,  'output_weight_kg', True),
+    'tfo':      (TFOProduction,      'output_weight_kg', True),
+    'heatset':  (HeatsetBatch,       'batch_weight_kg',  False),
+}
+
+RUNNING_STATUSES = ('in_progress', 'processing', 'loading', 'cooling')
+
+
+# ═══════════════════════════════════════════════════════════════
+# API عمومی
+# ═══════════════════════════════════════════════════════════════
+
+def build_line_snapshot(today, line_ids=None):
+    """
+    داده کامل مانیتورینگ زنده همه خطوط (یا فقط line_ids).
+    خروجی دقیقاً همان ساختار قبلی line_monitor_api است.
+    """
+    lines = ProductionLine.objects.all().order_by('code')
+    if line_ids is not None:
+        lines = lines.filter(pk__in=line_ids)
+    lines = list(lines)
+    if not lines:
+        return []
+    ids = [line.id for line in lines]
+
+    machine_counts = _machine_status_counts(ids)
+    stage_today = {}
+    stage_last = {}
+    for stage in LINE_STAGES:
+        key = stage[1]
+        stage_today[key] = _stage_today_aggregates(stage, today, ids)
+        stage_last[key] = _stage_latest_batches(stage, ids)
+
+    data = []
+    for line in lines:
+        stages = []
+        for name, key, icon, color, _Model, _lf, active_statuses, extra, _of, _ck in LINE_STAGES:
+            last = stage_last[key].get(line.id)
+            stages.append(_stage_info(name, key, icon, color, last, today, active_statuses, extra))
+
+        line_data = {
+            'id': line.id,
+            'code': line.code,
+            'name': line.name,
+            'status': line.status,
+            'status_display': line.get_status_display(),
+            'product_type': line.product_type or '-',
+            'target_capacity_kg': float(line.target_capacity_kg) if line.target_capacity_kg else 0,
+            'machines': machine_counts[line.id],
+            'stages': stages,
+            'today_production': _today_production(line.id, stage_today),
+        }
+        if line.target_capacity_kg and line.target_capacity_kg > 0:
+            total_produced = line_data['today_production']['total_output_kg']
+            line_data['capacity_pct'] = min(
+                round(float(total_produced) / float(line.target_capacity_kg) * 100, 1), 100
+            )
+        else:
+            line_data['capacity_pct'] = 0
+        data.append(line_data)
+    return data
+
+
+# ═══════════════════════════════════════════════════════════════
+# کوئری‌های گروه‌بندی‌شده
+# ═══════════════════════════════════════════════════════════════
+
+def _machine_status_counts(line_ids):
+    """یک کوئری: تعداد ماشین‌ها به تفکیک خط و وضعیت."""
+    counts = defaultdict(lambda: {'total': 0, 'active': 0, 'maintenance': 0, 'inactive': 0})
+    rows = Machine.objects.filter(production_line_id__in=line_ids).values(
+        'production_line_id', 'status'
+    ).annotate(n=Count('id')).order_by()
+    for row in rows:
+        bucket = counts[row['production_line_id']]
+        bucket['total'] += row['n']
+        if row['status'] in bucket:
+            bucket[row['status']] += row['n']
+    return counts
+
+
+def _stage_today_aggregates(stage, today, line_ids):
+    """یک کوئری به‌ازای هر مرحله: شمارش، بچ فعال و وزن خروجی امروز به تفکیک خط."""
+    _name, _key, _icon, _color, Model, line_field, active_statuses, _extra, output_field, _ck = stage
+    annotations = {
+        'count': Count('id'),
+        'active': Count('id', filter=Q(status__in=active_statuses)),
+    }
+    if output_field:
+        annotations['kg'] = Sum(output_field)
+    rows = Model.objects.filter(
+        production_date=today, **{f'{line_field}__in': line_ids}
+    ).values(line_field).annotate(**annotations).order_by()
+    return {row[line_field]: row for row in rows}
+
+
+def _stage_latest_batches(stage, line_ids):
+    """یک کوئری به‌ازای هر مرحله: آخرین بچ هر خط (latest-id subquery)."""
+    _name, _key, _icon, _color, Model, line_field, _active, _extra, _of, _ck = stage
+    latest_id = Subquery(
+        Model.objects.filter(**{line_field: OuterRef('pk')})
+        .order_by('-production_date', '-created_at')
+        .values('pk')[:1]
+    )
+    latest_ids = ProductionLine.objects.filter(pk__in=line_ids).annotate(
+        last_id=latest_id
+    ).values('last_id')
+    batches = Model.objects.filter(pk__in=latest_ids).select_related('machine')
+
+    result = {}
+    for batch in batches:
+        if line_field == 'production_line':
+            line_id = batch.production_line_id
+        else:
+            line_id = batch.machine.production_line_id
+        result[line_id] = batch
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════
+# ساخت خروجی
+# ═══════════════════════════════════════════════════════════════
+
+def _stage_info(name, key, icon, color, last_batch, today, active_statuses, extra_fields):
+    if last_batch:
+        prod_date = last_batch.production_date
+        is_active = prod_date == today and last_batch.status in active_statuses
+        machine = getattr(last_batch, 'machine', None)
+        machine_code = machine.code if machine else '-'
+
+        # اطلاعات اضافه بر اساس نوع مرحله
+        extra_data = {}
+        for label, field in extra_fields.items():
+            val = getattr(last_batch, field, None)
+            extra_data[label] = float(val) if val is not None else None
+
+        # اطلاعات کیفی هیت‌ست
+        quality = None
+        if hasattr(last_batch, 'quality_result'):
+            quality = last_batch.quality_result
+
+        return {
+            'name': name, 'key': key, 'icon': icon, 'color': color,
+            'has_data': True, 'active_now': is_active,
+            'last_batch': last_batch.batch_number,
+            'last_status': last_batch.status,
+            'last_status_display': last_batch.get_status_display(),
+            'last_date': jdatetime.date.fromgregorian(date=prod_date).strftime('%Y/%m/%d'),
+            'machine_code': machine_code,
+            'quality': quality,
+            'extra': extra_data,
+        }
+    return {
+        'name': name, 'key': key, 'icon': icon, 'color': color,
+        'has_data': False, 'active_now': False,
+        'last_batch': '-', 'last_status': 'idle',
+        'last_status_display': 'بدون تولید',
+        'last_date': '-', 'machine_code': '-',
+        'quality': None, 'extra': {},
+    }
+
+
+def _today_production(line_id, stage_today):
+    result = {}
+    active = 0
+    for stage in LINE_STAGES:
+        key, output_field, count_key = stage[1], stage[8], stage[9]
+        row = stage_today[key].get(line_id) or {}
+        active += row.get('active', 0)
+        if output_field:
+            result[f'{count_key}_kg'] = float(row.get('kg') or Decimal('0'))
+    for stage in LINE_STAGES:
+        count_key = stage[9]
+        if count_key:
+            row = stage_today[stage[1]].get(line_id) or {}
+            result[f'{count_key}_count'] = row.get('count', 0)
+
+    result['active_batches'] = active
+    result['total_output_kg'] = sum(result[f'{k}_kg'] for k in TOTAL_OUTPUT_KEYS)
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════
+# FLOOR MAP (نقشه کارگاه)
+# ═══════════════════════════════════════════════════════════════
+
+def current_shift_name(now):
+    h = now.hour
+    if 6 <= h < 14:
+        return 'شیفت صبح'
+    if 14 <= h < 22:
+        return 'شیفت عصر'
+    return 'شیفت شب'
+
+
+def build_floor_map(today, shift_name, machine_ids=None):
+    """
+    داده heatmap همه ماشین‌ها (یا فقط machine_ids).
+    به‌ازای هر نوع ماشین دو کوئری؛ مستقل از تعداد ماشین‌ها.
+    """
+    machines = Machine.objects.select_related('production_line').all()
+    if machine_ids is not None:
+        machines = machines.filter(pk__in=machine_ids)
+    machines = list(machines)
+
+    active_by_type = defaultdict(list)
+    for m in machines:
+        if m.status == 'active' and m.machine_type in FLOOR_MAP_TYPES:
+            active_by_type[m.machine_type].append(m.id)
+
+    today_stats = {}
+    for machine_type, ids in active_by_type.items():
+        today_stats.update(_machine_today_stats(machine_type, ids, today))
+
+    result = []
+    for m in machines:
+        data = {
+            'id': m.id, 'code': m.code, 'name': m.name,
+            'type': m.machine_type, 'status': m.status,
+            'status_display': m.get_status_display(),
+            'line_code': m.production_line.code if m.production_line else '-',
+            'shift': shift_name, 'efficiency': 0, 'output_kg': 0,
+            'last_batch': '-', 'batch_status': 'idle', 'heat_level': 'idle',
+        }
+
+        if m.status == 'maintenance':
+            data['heat_level'] = 'maintenance'
+            result.append(data)
+            continue
+        if m.status != 'active':
+            result.append(data)
+            continue
+
+        stats = today_stats.get(m.id)
+        if stats:
+            data['last_batch'] = stats['last_batch']
+            data['batch_status'] = stats['batch_status']
+            data['output_kg'] = stats['output_kg']
+            data['efficiency'] = stats['efficiency']
+
+        data['heat_level'] = _heat_level(data)
+        result.append(data)
+    return result
+
+
+def floor_map_summary(result):
+    return {
+        'total': len(result),
+        'active': sum(1 for r in result if r['heat_level'] == 'good'),
+        'warning': sum(1 for r in result if r['heat_level'] == 'warning'),
+        'critical': sum(1 for r in result if r['heat_level'] == 'critical'),
+        'maintenance': sum(1 for r in result if r['heat_level'] == 'maintenance'),
+        'idle': sum(1 for r in result if r['heat_level'] == 'idle'),
+    }
+
+
+def _machine_today_stats(machine_type, machine_ids, today):
+    """
+    دو کوئری برای یک نوع ماشین:
+      ۱. آخرین بچ امروز هر ماشین (latest-id subquery)
+      ۲. جمع خروجی و میانگین راندمان امروز به تفکیک ماشین
+    """
+    Model, output_field, has_efficiency = FLOOR_MAP_TYPES[machine_type]
+    today_qs = Model.objects.filter(machine_id__in=machine_ids, production_date=today)
+
+    latest_id = Subquery(
+        Model.objects.filter(machine=OuterRef('pk'), production_date=today)
+        .order_by('-created_at')
+        .values('pk')[:1]
+    )
+    latest_ids = Machine.objects.filter(pk__in=machine_ids).annotate(
+        last_id=latest_id
+    ).values('last_id')
+    last_fields = ['machine_id', 'batch_number', 'status']
+    if has_efficiency:
+        last_fields.append('efficiency_pct')
+    latest = {
+        row['machine_id']: row
+        for row in Model.objects.filter(pk__in=latest_ids).values(*last_fields)
+    }
+    if not latest:
+        return {}
+
+    annotations = {'output_kg': Sum(output_field)}
+    if has_efficiency:
+        annotations['efficiency'] = Avg('efficiency_pct')
+    totals = {
+        row['machine_id']: row
+        for row in today_qs.values('machine_id').annotate(**annotations).order_by()
+    }
+
+    stats = {}
+    for machine_id, last in latest.items():
+        agg = totals.get(machine_id, {})
+        efficiency = 0
+        # مانند قبل: میانگین راندمان فقط وقتی آخرین بچ راندمان ثبت‌شده دارد
+        if has_efficiency and last.get('efficiency_pct'):
+            efficiency = round(float(agg.get('efficiency') or 0), 1)
+        stats[machine_id] = {
+            'last_batch': last['batch_number'],
+            'batch_status': last['status'],
+            'output_kg': float(agg.get('output_kg') or 0),
+            'efficiency': efficiency,
+        }
+    return stats
+
+
+def _heat_level(data):
+    eff = data['efficiency']
+    if data['batch_status'] in RUNNING_STATUSES:
+        return 'good' if eff >= 90 else ('warning' if eff >= 70 else 'critical')
+    if data['batch_status'] == 'completed' and (eff > 0 or data['output_kg'] > 0):
+        return 'good'
+    return 'idle'
@@ -7,6 +7,8 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('line-monitor/', views.line_monitor, name='line_monitor'),
     path('api/line-status/', views.line_monitor_api, name='line_monitor_api'),
+    path('api/line-status/stream/', views.line_monitor_stream, name='line_monitor_stream'),
     path('floor-map/', views.floor_map, name='floor_map'),
     path('api/floor-map-data/', views.floor_map_api, name='floor_map_api'),
+    path('api/floor-map-data/stream/', views.floor_map_stream, name='floor_map_stream'),
 ]
@@ -3,7 +3,7 @@ Diaco MES - HeatSet Admin (هیت‌ست)
 """
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Batch, CycleLog
+from .models import Batch, CycleArchive, CycleConformance, CycleLog, CycleMetrics
 
 
 class CycleLogInline(admin.TabularInline):
@@ -103,3 +103,26 @@ class CycleLogAdmin(admin.ModelAdmin):
     list_display = ['heatset_batch', 'log_time', 'phase', 'temperature_c', 'pressure_bar', 'humidity_pct']
     list_filter = ['phase', 'heatset_batch']
     readonly_fields = ['created_at']
+
+
+@admin.register(CycleArchive)
+class CycleArchiveAdmin(admin.ModelAdmin):
+    list_display = ['heatset_batch', 'point_count', 'first_log_at', 'last_log_at', 'archived_at']
+    search_fields = ['heatset_batch__batch_number']
+    exclude = ['payload']
+    readonly_fields = ['heatset_batch', 'point_count', 'first_log_at', 'last_log_at', 'format_version', 'archived_at']
+
+
+@admin.register(CycleMetrics)
+class CycleMetricsAdmin(admin.ModelAdmin):
+    list_display = ['heatset_batch', 'peak_temperature_c', 'time_above_setpoint_min', 'pressure_cv_pct', 'computed_at']
+    search_fields = ['heatset_batch__batch_number']
+    readonly_fields = [f.name for f in CycleMetrics._meta.fields]
+
+
+@admin.register(CycleConformance)
+class CycleConformanceAdmin(admin.ModelAdmin):
+    list_display = ['heatset_batch', 'profile', 'result', 'temp_out_of_band_min', 'conformance_pct', 'scored_at']
+    list_filter = ['result', 'profile']
+    search_fields = ['heatset_batch__batch_number']
+    readonly_fields = [f.name for f in CycleConformance._meta.fields]
@@ -0,0 +1,192 @@
+"""
+Diaco MES - HeatSet Cycle Analytics
+======================================
+شاخص‌های خلاصه منحنی چرخه (CycleMetrics) — یک بار هنگام تکمیل بچ.
+
+منطق:
+─────
+  ورودی: منحنی کامل بچ از curves.cycle_arrays (آرشیو + لاگ زنده).
+  محور زمان: elapsed_min اگر کامل باشد، وگرنه دقیقه از اولین log_time.
+
+  دمای اوج / زمان اوج        — بیشینه temperature_c
+  زمان در دمای تثبیت        — جمع فاصله نقاطی که دما ≥ نقطه تنظیم بچ
+                               منهای SETPOINT_BAND_C است (مجموع ریمان چپ)
+  انتگرال دما                — ذوزنقه‌ای ∫T dt (°C·min)
+  نرخ گرم‌شدن               — شروع → اولین نقطه در دمای تثبیت
+  نرخ سردشدن                — آخرین نقطه در دمای تثبیت → پایان
+  بیشترین شیب                — روی منحنی درون‌یابی‌شده با گام RAMP_STEP_MIN
+                               (نویز نمونه‌برداری فشرده شیب را بزرگ نمی‌کند)
+  پایداری فشار               — میانگین، انحراف معیار و CV در HOLD_PHASES
+                               (اگر نقطه‌ای در این مراحل نباشد: کل منحنی)
+
+  همه محاسبات برداری (NumPy) و بدون حلقه روی نقاط است.
+  نقطه‌ای که دمای خالی دارد در شاخص‌های دما شرکت نمی‌کند.
+
+  نوشتن: refresh_metrics(batch_id) — هنگام رسیدن بچ به وضعیت completed،
+  لاگ دیررس بچ تکمیل‌شده و آرشیو منحنی (conformance.refresh_cycle)؛
+  بازسازی گروهی: python manage.py rebuild_cycle_metrics
+"""
+import numpy as np
+from django.db.models import F
+
+from .curves import cycle_arrays
+from .models import Batch, CycleMetrics
+
+SETPOINT_BAND_C = 1.0          # «در دمای تثبیت» = حداکثر ۱°C زیر نقطه تنظیم
+RAMP_STEP_MIN = 5.0            # گام درون‌یابی برای شیب دما (= فاصله لاگ استاندارد)
+HOLD_PHASES = ('steam', 'dwell')
+
+METRIC_FIELDS = (
+    'point_count', 'duration_min', 'setpoint_c',
+    'peak_temperature_c', 'peak_at_min', 'time_above_setpoint_min',
+    'temperature_integral_c_min', 'heat_up_rate_c_min', 'cool_down_rate_c_min',
+    'max_ramp_c_min', 'pressure_mean_bar', 'pressure_std_bar', 'pressure_cv_pct',
+)
+
+
+def minutes_axis(arrays):
+    """محور زمان منحنی (دقیقه): elapsed_min اگر کامل باشد، وگرنه از اولین log_time."""
+    elapsed = arrays['elapsed_min']
+    if not np.isnan(elapsed).any():
+        return elapsed
+    times = arrays['log_time']
+    return (times - times[0]) / np.timedelta64(1, 'm')
+
+
+def _round(value, digits=3):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _temperature_metrics(x, temp, setpoint):
+    peak = int(np.argmax(temp))
+    metrics = {
+        'peak_temperature_c': temp[peak],
+        'peak_at_min': x[peak],
+        'temperature_integral_c_min': np.trapezoid(temp, x) if len(x) > 1 else None,
+    }
+
+    if len(x) > 1 and x[-1] > x[0]:
+        grid = np.arange(x[0], x[-1] + RAMP_STEP_MIN / 2, RAMP_STEP_MIN)
+        if len(grid) > 1:
+            metrics['max_ramp_c_min'] = np.abs(np.diff(np.interp(grid, x, temp))).max() / RAMP_STEP_MIN
+
+    if setpoint is None:
+        return metrics
+    hold = np.flatnonzero(temp >= setpoint - SETPOINT_BAND_C)
+    metrics['time_above_setpoint_min'] = 0.0
+    if not len(hold):
+        return metrics
+    in_band = np.zeros(len(temp), dtype=bool)
+    in_band[hold] = True
+    metrics['time_above_setpoint_min'] = np.diff(x)[in_band[:-1]].sum()
+    first, last = hold[0], hold[-1]
+    if x[first] > x[0]:
+        metrics['heat_up_rate_c_min'] = (temp[first] - temp[0]) / (x[first] - x[0])
+    if x[-1] > x[last]:
+        metrics['cool_down_rate_c_min'] = (temp[last] - temp[-1]) / (x[-1] - x[last])
+    return metrics
+
+
+def _pressure_metrics(pressure, phase):
+    valid = ~np.isnan(pressure)
+    held = valid & np.isin(phase, HOLD_PHASES)
+    values = pressure[held] if held.any() else pressure[valid]
+    if not len(values):
+        return {}
+    mean, std = values.mean(), values.std()
+    return {
+        'pressure_mean_bar': mean,
+        'pressure_std_bar': std,
+        'pressure_cv_pct': std / mean * 100 if mean > 0 else None,
+    }
+
+
+def compute_metrics(arrays, setpoint=None):
+    """
+    شاخص‌های یک منحنی (تابع خالص).
+    arrays: خروجی curves.cycle_arrays — setpoint: دمای تثبیت بچ (°C)
+    Returns: dict با کلیدهای METRIC_FIELDS (مقدار ناموجود = None)
+    """
+    metrics = dict.fromkeys(METRIC_FIELDS)
+    n = len(arrays['pk'])
+    metrics.update(point_count=n, setpoint_c=setpoint)
+    if not n:
+        return metrics
+
+    x = minutes_axis(arrays)
+    order = np.argsort(x, kind='stable')
+    x = x[order]
+    metrics['duration_min'] = x[-1] - x[0]
+
+    temp = arrays['temperature_c'][order]
+    valid = ~np.isnan(temp)
+    if valid.any():
+        metrics.update(_temperature_metrics(x[valid], temp[valid], setpoint))
+    metrics.update(_pressure_metrics(arrays['pressure_bar'][order], arrays['phase'][order]))
+
+    return {
+        k: (v if k == 'point_count' else _round(v))
+        for k, v in metrics.items()
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# نوشتن
+# ═══════════════════════════════════════════════════════════════
+
+def refresh_metrics(batch_id, arrays=None):
+    """
+    محاسبه و ذخیره CycleMetrics یک بچ؛ بچ بدون لاگ → ردیف حذف می‌شود.
+    arrays: منحنی از قبل خوانده‌شده (آرشیو) — پیش‌فرض: cycle_arrays(batch_id)
+    """
+    setpoint = Batch.objects.filter(pk=batch_id).values_list('temperature_c', flat=True).first()
+    if arrays is None:
+        arrays = cycle_arrays(batch_id)
+    if not len(arrays['pk']):
+        CycleMetrics.objects.filter(heatset_batch_id=batch_id).delete()
+        return None
+    metrics = compute_metrics(arrays, float(setpoint) if setpoint is not None else None)
+    CycleMetrics.objects.update_or_create(heatset_batch_id=batch_id, defaults=metrics)
+    return metrics
+
+
+# ═══════════════════════════════════════════════════════════════
+# فیلتر و مرتب‌سازی (گزارش هیت‌ست و API)
+# ═══════════════════════════════════════════════════════════════
+
+# ستون‌های قابل فیلتر (?<field>_min= / ?<field>_max=) و مرتب‌سازی (?metric_sort=[-]<field>)
+METRIC_LABELS = {
+    'peak_temperature_c':         'دمای اوج (°C)',
+    'time_above_setpoint_min':    'زمان در دمای تثبیت (دقیقه)',
+    'temperature_integral_c_min': 'انتگرال دما (°C·min)',
+    'heat_up_rate_c_min':         'نرخ گرم‌شدن (°C/min)',
+    'cool_down_rate_c_min':       'نرخ سردشدن (°C/min)',
+    'max_ramp_c_min':             'بیشترین شیب دما (°C/min)',
+    'pressure_cv_pct':            'ضریب تغییرات فشار (%)',
+}
+DEFAULT_METRIC_SORT = '-peak_temperature_c'
+
+
+def metric_filters(params):
+    """lookupهای فیلتر Batch از پارامترهای GET؛ ValueError اگر مقدار عددی نباشد."""
+    lookups = {}
+    for field in METRIC_LABELS:
+        for suffix, lookup in (('_min', 'gte'), ('_max', 'lte')):
+            raw = params.get(field + suffix)
+            if raw in (None, ''):
+                continue
+            try:
+                lookups[f'cycle_metrics__{field}__{lookup}'] = float(raw)
+            except ValueError:
+                raise ValueError(f'{field}{suffix} باید عدد باشد')
+    return lookups
+
+
+def metric_ordering(sort):
+    """ترتیب Batch بر اساس یک شاخص (بچ بدون شاخص آخر)؛ ValueError اگر نامعتبر باشد."""
+    sort = sort or DEFAULT_METRIC_SORT
+    field = sort.lstrip('-')
+    if field not in METRIC_LABELS:
+        raise ValueError(f'metric_sort نامعتبر: {sort}')
+    column = F(f'cycle_metrics__{field}')
+    return column.desc(nulls_last=True) if sort.startswith('-') else column.asc(nulls_last=True)
@@ -2,7 +2,8 @@
 Diaco MES - HeatSet API Serializers (هیت‌ست)
 """
 from rest_framework import serializers
-from apps.heatset.models import Batch, CycleLog
+from apps.heatset.curves import cycle_arrays, logs_from_arrays
+from apps.heatset.models import Batch, CycleConformance, CycleLog, CycleMetrics
 
 
 class CycleLogSerializer(serializers.ModelSerializer):
@@ -18,6 +19,23 @@ class CycleLogSerializer(serializers.ModelSerializer):
         ]
 
 
+class CycleMetricsSerializer(serializers.ModelSerializer):
+    """شاخص‌های منحنی چرخه (محاسبه هنگام تکمیل بچ — heatset/analytics.py)."""
+
+    class Meta:
+        model   = CycleMetrics
+        exclude = ['id', 'heatset_batch']
+
+
+class CycleConformanceSerializer(serializers.ModelSerializer):
+    """تطابق منحنی با پوش پروفایل دستور کار (heatset/conformance.py)."""
+    result_display = serializers.CharField(source='get_result_display', read_only=True)
+
+    class Meta:
+        model   = CycleConformance
+        exclude = ['id', 'heatset_batch']
+
+
 class HeatsetBatchSerializer(serializers.ModelSerializer):
     """سریالایزر کامل بچ هیت‌ست."""
     status_display          = serializers.CharField(source='get_status_display',            read_only=True)
@@ -29,7 +47,9 @@ class HeatsetBatchSerializer(serializers.ModelSerializer):
     line_code               = serializers.CharField(source='production_line.code',          read_only=True, default=None)
     operator_name           = serializers.SerializerMethodField()
     is_passed               = serializers.BooleanField(read_only=True)
-    cycle_logs              = CycleLogSerializer(many=True, read_only=True)
+    cycle_metrics           = CycleMetricsSerializer(read_only=True, default=None)
+    cycle_conformance       = CycleConformanceSerializer(read_only=True, default=None)
+    cycle_logs              = serializers.SerializerMethodField()
 
     class Meta:
         model  = Batch
@@ -38,12 +58,19 @@ class HeatsetBatchSerializer(serializers.ModelSerializer):
     def get_operator_name(self, obj):
         return obj.operator.get_full_name() if obj.operator else None
 
+    def get_cycle_logs(self, obj):
+        """لاگ‌های چرخه از آرشیو فشرده + ردیف‌های زنده (heatset/curves.py)."""
+        return CycleLogSerializer(logs_from_arrays(cycle_arrays(obj.pk)), many=True).data
+
 
 class HeatsetBatchListSerializer(serializers.ModelSerializer):
     """سریالایزر سبک برای لیست."""
     status_display         = serializers.CharField(source='get_status_display',          read_only=True)
     quality_result_display = serializers.CharField(source='get_quality_result_display',  read_only=True)
     machine_code           = serializers.CharField(source='machine.code',                read_only=True)
+    peak_temperature_c     = serializers.FloatField(source='cycle_metrics.peak_temperature_c',      read_only=True, default=None)
+    time_above_setpoint_min = serializers.FloatField(source='cycle_metrics.time_above_setpoint_min', read_only=True, default=None)
+    pressure_cv_pct        = serializers.FloatField(source='cycle_metrics.pressure_cv_pct',         read_only=True, default=None)
 
     class Meta:
         model  = Batch
@@ -54,4 +81,5 @@ class HeatsetBatchListSerializer(serializers.ModelSerializer):
             'status', 'status_display',
             'quality_result', 'quality_result_display',
             'shrinkage_pct', 'twist_stability',
+            'peak_temperature_c', 'time_above_setpoint_min', 'pressure_cv_pct',
         ]
@@ -0,0 +1,131 @@
+"""
+Diaco MES - HeatSet Cycle Archive
+====================================
+بسته‌بندی منحنی چرخه بچ‌های تکمیل‌شده در یک ردیف CycleArchive.
+
+منطق:
+─────
+  قالب (format_version = 1): یک فایل np.savez_compressed با آرایه‌های نوع‌دار
+    pk، log_time، created_at — int64 (زمان‌ها µs)، ذخیره تفاضلی (np.diff)
+    elapsed_min / temperature_c / pressure_bar / humidity_pct
+                            — int32 مقیاس‌شده به دقت فیلد DecimalField
+                              (×۱۰۰ یا ×۱۰۰۰)؛ خالی = NULL_CODE
+    phase                   — uint8، اندیس جدول phase_labels همان آرشیو
+  مقیاس‌گذاری عدد صحیح مقدار Decimal را دقیقاً برمی‌گرداند و ستون‌های
+  تفاضلی/کم‌تغییر خوب فشرده می‌شوند.
+
+  archive_batch: آرایه‌های منحنی (آرشیو قبلی + ردیف‌های زنده) در یک تراکنش
+  ذخیره، شاخص منحنی و تطابق بچ تکمیل‌شده از همان آرایه‌ها دوباره محاسبه
+  و ردیف‌های CycleLog همان بچ حذف می‌شوند؛ لاگ دیررس بعد از آرشیو در اجرای
+  بعدی به همان ردیف اضافه می‌شود.
+  خواندن برای همه مصرف‌کننده‌ها از heatset/curves.py (cycle_arrays).
+"""
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Batch, CycleArchive, CycleLog
+
+FORMAT_VERSION = 1
+ARCHIVE_GRACE_DAYS = 7      # فاصله تکمیل بچ تا آرشیو (اصلاحات دیرهنگام)
+DELETE_CHUNK = 5000
+
+NULL_CODE = np.iinfo(np.int32).min
+SERIES_SCALE = {
+    'elapsed_min':   100,
+    'temperature_c': 100,
+    'pressure_bar':  1000,
+    'humidity_pct':  100,
+}
+
+
+# ═══════════════════════════════════════════════════════════════
+# کدگذاری
+# ═══════════════════════════════════════════════════════════════
+
+def _delta(values):
+    return np.diff(values, prepend=np.int64(0))
+
+
+def encode(arrays):
+    """آرایه‌های منحنی (خروجی curves.cycle_arrays) → bytes فشرده."""
+    packed = {
+        'pk': _delta(arrays['pk'].astype(np.int64)),
+        'log_time': _delta(arrays['log_time'].astype('datetime64[us]').astype(np.int64)),
+        'created_at': _delta(arrays['created_at'].astype('datetime64[us]').astype(np.int64)),
+    }
+    for name, scale in SERIES_SCALE.items():
+        values = arrays[name]
+        packed[name] = np.where(
+            np.isnan(values), NULL_CODE, np.round(np.nan_to_num(values) * scale),
+        ).astype(np.int32)
+    labels, codes = np.unique(arrays['phase'], return_inverse=True)
+    packed['phase_labels'] = labels.astype(str)
+    packed['phase'] = codes.astype(np.uint8)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **packed)
+    return buffer.getvalue()
+
+
+def decode(payload):
+    """bytes آرشیو → آرایه‌های منحنی (همان کلیدهای curves.cycle_arrays)."""
+    with np.load(io.BytesIO(bytes(payload))) as packed:
+        arrays = {
+            'pk': np.cumsum(packed['pk']),
+            'log_time': np.cumsum(packed['log_time']).astype('datetime64[us]'),
+            'created_at': np.cumsum(packed['created_at']).astype('datetime64[us]'),
+            'phase': packed['phase_labels'][packed['phase']],
+        }
+        for name, scale in SERIES_SCALE.items():
+            values = packed[name]
+            arrays[name] = np.where(values == NULL_CODE, np.nan, values / scale)
+    return arrays
+
+
+# ═══════════════════════════════════════════════════════════════
+# آرشیو
+# ═══════════════════════════════════════════════════════════════
+
+def archive_batch(batch_id):
+    """
+    انتقال لاگ‌های زنده یک بچ به آرشیو (ادغام با آرشیو قبلی).
+    خروجی: تعداد ردیف CycleLog حذف‌شده.
+    """
+    # curves (و conformance از طریق آن) خودش decode این ماژول را می‌خواند
+    from .conformance import refresh_cycle
+    from .curves import cycle_arrays
+
+    with transaction.atomic():
+        # قفل بچ: درج لاگ جدید (کلید خارجی) تا پایان تراکنش منتظر می‌ماند
+        status = Batch.objects.select_for_update().filter(pk=batch_id).values_list('status', flat=True).first()
+        pks = list(CycleLog.objects.filter(heatset_batch_id=batch_id).values_list('pk', flat=True))
+        if not pks:
+            return 0
+        arrays = cycle_arrays(batch_id)
+        first, last = arrays['log_time'][[0, -1]].astype(datetime).tolist()
+        CycleArchive.objects.update_or_create(heatset_batch_id=batch_id, defaults={
+            'point_count': len(arrays['pk']),
+            'first_log_at': first,
+            'last_log_at': last,
+            'format_version': FORMAT_VERSION,
+            'payload': encode(arrays),
+        })
+        if status == Batch.BatchStatus.COMPLETED:
+            refresh_cycle(batch_id, arrays)
+        for i in range(0, len(pks), DELETE_CHUNK):
+            CycleLog.objects.filter(pk__in=pks[i:i + DELETE_CHUNK]).delete()
+    return len(pks)
+
+
+def archivable_batches(grace_days=ARCHIVE_GRACE_DAYS):
+    """بچ‌های تکمیل‌شده (قدیمی‌تر از grace_days) که هنوز لاگ زنده دارند."""
+    cutoff = datetime.now() - timedelta(days=grace_days)
+    return Batch.objects.filter(
+        Q(completed_at__lte=cutoff) | Q(completed_at__isnull=True, production_date__lte=cutoff.date()),
+        status=Batch.BatchStatus.COMPLETED,
+        cycle_logs__isnull=False,
+    ).distinct().order_by('pk').values_list('pk', flat=True)
@@ -0,0 +1,308 @@
+"""
+Diaco MES - HeatSet Recipe-Profile Conformance
+=================================================
+مقایسه منحنی دما/فشار هر بچ با پوش (envelope) مورد انتظار دستور کار.
+
+منطق:
+─────
+  پروفایل = (نوع الیاف، نوع چرخه):
+    محدوده دمای نگه‌داری    ← FIBER_TEMP_RANGES (heatset/signals.py)
+    زمان‌بندی و فشار بخار   ← CYCLE_PROFILES بر اساس cycle_type
+
+  پوش دما روی محور دقیقه (نقاط شکست، بین آن‌ها خطی):
+         0 ───── R+S ════════ R+H ── R+H+S ─────── R+H+C+S
+    حداقل: محیط ↗ حداقل الیاف ═ نگه‌داری ═ ↘ محیط ──────────── محیط
+    حداکثر: حداکثر الیاف ════════════════════════ ↘ دمای تخلیه
+    R: گرم‌شدن، H: پایان نگه‌داری، C: سردشدن، S: رواداری زمانی (TIME_SLACK_MIN)
+  پوش فشار: در نگه‌داری [p_min, p_max]، بیرون آن [0, p_max] (تخلیه بخار تا S
+  دقیقه قبل از پایان نگه‌داری مجاز)؛ برای دستگاه حرارت خشک (Suessen) فشار
+  ارزیابی نمی‌شود.
+
+  امتیاز (همه برداری — np.interp پوش روی نقاط منحنی):
+    excess = max(مقدار − حداکثر، 0) + max(حداقل − مقدار، 0)
+    مساحت انحراف      — ذوزنقه‌ای ∫excess dt
+    دقایق خارج از پوش — جمع فاصله نقاطی که excess > 0 (مجموع ریمان چپ)
+    درصد تطابق        — ۱۰۰ × (۱ − دقایق خارج / طول منحنی)
+  نتیجه با PROFILE_RULES به هشدار PROFILE_* تبدیل و از مسیر quality_alerts
+  هیت‌ست در QualityAlert نوشته می‌شود؛ بعد از ارزیابی همان لیست هشدار در
+  metadata['ai_quality'] بچ هم (با UPDATE جدا، فقط اگر تغییر کرده) نوشته می‌شود.
+
+  score_batch: یک بچ — score_batches: گروهی با دو کوئری برای منحنی‌ها و
+  یک bulk_create (دستور score_cycle_profiles).
+  refresh_cycle: شاخص منحنی + تطابق یک بچ؛ بعد از commit در تکمیل بچ و هر
+  لاگ تازه بچ تکمیل‌شده (refresh_after_commit)، و در آرشیو قبل از حذف لاگ زنده.
+"""
+from functools import lru_cache
+
+import numpy as np
+from django.db import transaction
+
+from apps.ai_ready.alerts import alert_rows, replace_alerts, write_alerts
+
+from .analytics import minutes_axis, refresh_metrics
+from .curves import bulk_cycle_arrays, cycle_arrays
+from .models import Batch, CycleConformance
+
+# نوع چرخه: (گرم‌شدن R، نگه‌داری، سردشدن C — دقیقه، فشار نگه‌داری bar)
+CYCLE_PROFILES = {
+    'standard':  (60, 120, 60, (1.2, 2.5)),
+    'intensive': (60, 180, 60, (1.8, 3.0)),
+    'gentle':    (90, 90, 90, (0.8, 1.8)),
+}
+AMBIENT_MIN_C = 10          # حداقل دمای شروع/پایان
+DISCHARGE_MAX_C = 60        # حداکثر دمای تخلیه بعد از سردشدن
+TIME_SLACK_MIN = 15         # رواداری زمانی لبه‌های گرم‌شدن و سردشدن
+DRY_HEAT_MACHINES = ('suessen',)
+
+# (کد، سطح، شاخص، آستانه) — از بالا به پایین؛ برای هر شاخص اولین قاعده برقرار
+PROFILE_RULES = (
+    ('PROFILE_TEMP_CRITICAL',  'critical', 'temp_out_of_band_min',     30),
+    ('PROFILE_TEMP_DEVIATION', 'warning',  'temp_out_of_band_min',     10),
+    ('PROFILE_PRESSURE',       'warning',  'pressure_out_of_band_min', 10),
+)
+RULE_LABELS = {
+    'temp_out_of_band_min':     'دما',
+    'pressure_out_of_band_min': 'فشار',
+}
+
+SCORE_CHUNK = 500
+
+
+# ═══════════════════════════════════════════════════════════════
+# پوش پروفایل
+# ═══════════════════════════════════════════════════════════════
+
+def profile_key(batch):
+    return f'{batch.fiber_type}/{batch.cycle_type}'
+
+
+@lru_cache(maxsize=None)
+def recipe_envelope(fiber_type, cycle_type, with_pressure=True):
+    """
+    پوش یک پروفایل — {'temp': (x, lo, hi), 'pressure': (x, lo, hi) یا None}
+    None اگر نوع الیاف یا چرخه پروفایل نداشته باشد.
+    """
+    from .signals import FIBER_TEMP_RANGES  # signals خودش profile_alerts این ماژول را می‌خواند
+
+    if fiber_type not in FIBER_TEMP_RANGES or cycle_type not in CYCLE_PROFILES:
+        return None
+    t_min, t_max = FIBER_TEMP_RANGES[fiber_type]
+    ramp, hold, cool, (p_min, p_max) = CYCLE_PROFILES[cycle_type]
+    hold_end, slack = ramp + hold, TIME_SLACK_MIN
+
+    temp_x = np.array([0, ramp + slack, hold_end, hold_end + slack, hold_end + cool + slack], dtype=np.float64)
+    temp_lo = np.array([AMBIENT_MIN_C, t_min, t_min, AMBIENT_MIN_C, AMBIENT_MIN_C], dtype=np.float64)
+    temp_hi = np.array([t_max, t_max, t_max, t_max, DISCHARGE_MAX_C], dtype=np.float64)
+
+    pressure = None
+    if with_pressure:
+        pressure = (
+            np.array([0, ramp, ramp + slack, hold_end - slack, hold_end], dtype=np.float64),
+            np.array([0, 0, p_min, p_min, 0], dtype=np.float64),
+            np.full(5, p_max, dtype=np.float64),
+        )
+    return {'temp': (temp_x, temp_lo, temp_hi), 'pressure': pressure}
+
+
+def batch_envelope(batch):
+    return recipe_envelope(
+        batch.fiber_type, batch.cycle_type,
+        with_pressure=batch.machine_type_hs not in DRY_HEAT_MACHINES,
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# امتیاز
+# ═══════════════════════════════════════════════════════════════
+
+def _band_deviation(x, values, band):
+    """(مساحت انحراف، دقایق خارج از پوش، بیشترین انحراف) — نقاط خالی حذف می‌شوند."""
+    valid = ~np.isnan(values)
+    x, values = x[valid], values[valid]
+    if len(x) < 2:
+        return None
+    env_x, lo, hi = band
+    excess = (
+        np.maximum(values - np.interp(x, env_x, hi), 0)
+        + np.maximum(np.interp(x, env_x, lo) - values, 0)
+    )
+    outside = np.diff(x)[excess[:-1] > 0].sum()
+    return float(np.trapezoid(excess, x)), float(outside), float(excess.max())
+
+
+def score_curve(arrays, envelope):
+    """
+    امتیاز یک منحنی (تابع خالص).
+    Returns: dict فیلدهای CycleConformance (بدون profile/result) یا None اگر
+             منحنی کمتر از دو نقطه دما داشته باشد
+    """
+    if len(arrays['pk']) < 2:
+        return None
+    x = minutes_axis(arrays)
+    order = np.argsort(x, kind='stable')
+    x = x[order]
+    temp = _band_deviation(x, arrays['temperature_c'][order], envelope['temp'])
+    if temp is None:
+        return None
+    pressure = None
+    if envelope['pressure'] is not None:
+        pressure = _band_deviation(x, arrays['pressure_bar'][order], envelope['pressure'])
+
+    duration = float(x[-1] - x[0])
+    return {
+        'point_count': len(x),
+        'duration_min': round(duration, 2),
+        'temp_deviation_area': round(temp[0], 3),
+        'temp_out_of_band_min': round(temp[1], 2),
+        'temp_max_deviation_c': round(temp[2], 2),
+        'pressure_deviation_area': round(pressure[0], 4) if pressure else None,
+        'pressure_out_of_band_min': round(pressure[1], 2) if pressure else None,
+        'conformance_pct': round(100 * (1 - temp[1] / duration), 2) if duration > 0 else 100.0,
+    }
+
+
+def profile_findings(scores):
+    """[(کد، سطح، شاخص، آستانه)] قواعد برقرار — برای هر شاخص حداکثر یکی."""
+    findings, seen = [], set()
+    for code, level, metric, limit in PROFILE_RULES:
+        value = scores.get(metric)
+        if metric in seen or value is None or value <= limit:
+            continue
+        seen.add(metric)
+        findings.append((code, level, metric, limit))
+    return findings
+
+
+def _result(findings):
+    levels = {level for _code, level, _m, _l in findings}
+    if 'critical' in levels:
+        return CycleConformance.Result.CRITICAL
+    return CycleConformance.Result.WARNING if levels else CycleConformance.Result.OK
+
+
+def build_conformance(batch, arrays):
+    """CycleConformance ذخیره‌نشده یک بچ؛ None اگر پروفایل یا داده کافی نباشد."""
+    envelope = batch_envelope(batch)
+    scores = score_curve(arrays, envelope) if envelope else None
+    if scores is None:
+        return None
+    return CycleConformance(
+        heatset_batch=batch, profile=profile_key(batch),
+        result=_result(profile_findings(scores)), **scores,
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# هشدار کیفی
+# ═══════════════════════════════════════════════════════════════
+
+def profile_alerts(instance):
+    """هشدارهای PROFILE_* از نتیجه ذخیره‌شده (فقط بچ تکمیل‌شده — قالب quality_alerts)."""
+    if not instance.pk or instance.status != Batch.BatchStatus.COMPLETED:
+        return []
+    conformance = getattr(instance, 'cycle_conformance', None)
+    if conformance is None:
+        return []
+    scores = {metric: getattr(conformance, metric) for metric in RULE_LABELS}
+    return [
+        {
+            'level': level,
+            'code':  code,
+            'msg':   f'منحنی {RULE_LABELS[metric]} {scores[metric]:.0f} دقیقه خارج از پوش پروفایل '
+                     f'{conformance.profile} (حد {limit} دقیقه)',
+        }
+        for code, level, metric, limit in profile_findings(scores)
+    ]
+
+
+def _cache_conformance(batch, conformance):
+    # کش رابطه معکوس (مانند select_related) تا profile_alerts کوئری دوباره نزند
+    Batch.cycle_conformance.related.set_cached_value(batch, conformance)
+
+
+def _refresh_batch_alerts(batch):
+    """
+    هشدارهای کیفی بعد از ارزیابی: metadata['ai_quality'] بچ همان‌جا بروز و
+    ردیف‌های QualityAlert همان لیست برگردانده می‌شوند.
+    """
+    from .signals import metadata_with_alerts, quality_alerts
+
+    alerts = quality_alerts(batch)
+    meta = metadata_with_alerts(batch.metadata, alerts)
+    if meta != batch.metadata:
+        batch.metadata = meta
+        Batch.objects.filter(pk=batch.pk).update(metadata=meta)
+    return alert_rows('heatset', batch, alerts)
+
+
+# ═══════════════════════════════════════════════════════════════
+# نوشتن
+# ═══════════════════════════════════════════════════════════════
+
+def score_batch(batch_id, arrays=None):
+    """ارزیابی و ذخیره یک بچ + همگام‌سازی هشدارهای کیفی آن (arrays مانند refresh_metrics)."""
+    batch = Batch.objects.filter(pk=batch_id).first()
+    if batch is None:
+        return None
+    if arrays is None:
+        arrays = cycle_arrays(batch_id)
+    conformance = build_conformance(batch, arrays)
+    with transaction.atomic():
+        CycleConformance.objects.filter(heatset_batch_id=batch_id).delete()
+        if conformance is not None:
+            conformance.save()
+    _cache_conformance(batch, conformance)
+    write_alerts('heatset', batch_id, _refresh_batch_alerts(batch))
+    return conformance
+
+
+def refresh_cycle(batch_id, arrays=None):
+    """شاخص‌های منحنی و تطابق پروفایل یک بچ از یک بار خواندن منحنی."""
+    if arrays is None:
+        arrays = cycle_arrays(batch_id)
+    refresh_metrics(batch_id, arrays)
+    score_batch(batch_id, arrays)
+
+
+def refresh_after_commit(batch_ids):
+    """بعد از commit: refresh_cycle برای بچ‌های تکمیل‌شده از این شناسه‌ها (لاگ دیررس)."""
+    batch_ids = set(batch_ids)
+    if not batch_ids:
+        return
+
+    def run():
+        completed = Batch.objects.filter(
+            pk__in=batch_ids, status=Batch.BatchStatus.COMPLETED,
+        ).values_list('pk', flat=True)
+        for batch_id in completed:
+            refresh_cycle(batch_id)
+
+    transaction.on_commit(run)
+
+
+def score_batches(batch_ids, chunk=SCORE_CHUNK):
+    """
+    ارزیابی گروهی — در هر دسته: منحنی‌ها با bulk_cycle_arrays، نتایج با
+    یک bulk_create و هشدارها با replace_alerts.
+    Returns: (تعداد ارزیابی‌شده، {result: تعداد})
+    """
+    batch_ids = list(batch_ids)
+    scored, results = 0, {}
+    for i in range(0, len(batch_ids), chunk):
+        ids = batch_ids[i:i + chunk]
+        batches = list(Batch.objects.filter(pk__in=ids))
+        curves = bulk_cycle_arrays(ids)
+        rows = []
+        for batch in batches:
+            arrays = curves.get(batch.pk)
+            conformance = build_conformance(batch, arrays) if arrays is not None else None
+            _cache_conformance(batch, conformance)
+            if conformance is not None:
+                rows.append(conformance)
+                results[conformance.result] = results.get(conformance.result, 0) + 1
+        with transaction.atomic():
+            CycleConformance.objects.filter(heatset_batch_id__in=ids).delete()
+            CycleConformance.objects.bulk_create(rows, batch_size=1000)
+        replace_alerts('heatset', {batch.pk: _refresh_batch_alerts(batch) for batch in batches})
+        scored += len(rows)
+    return scored, results
@@ -0,0 +1,235 @@
+"""
+Diaco MES - HeatSet Cycle Curves
+===================================
+خواندن منحنی چرخه (CycleLog) به‌صورت آرایه و کاهش نقاط برای نمودار.
+
+منطق:
+─────
+  cycle_arrays(batch_id): منحنی یک بچ به‌صورت آرایه‌های NumPy (عدد → float64
+  با NaN برای خالی) — از آرشیو فشرده (CycleArchive، یک ردیف) به‌علاوه
+  ردیف‌های زنده CycleLog (values_list)؛ مصرف‌کننده منبع را نمی‌بیند.
+  bulk_cycle_arrays همان خروجی را برای چند بچ با دو کوئری می‌سازد.
+  logs_from_arrays همان نقاط را به اشیای CycleLog (ذخیره‌نشده) برمی‌گرداند
+  تا سریالایزر و قالب بدون تغییر کار کنند.
+
+  downsample_indices(arrays, max_points): اندیس نقاط باقی‌مانده (مرتب)
+    ۱. نقاط اجباری: اول و آخر، دو طرف هر مرز مرحله (phase)، و بیشینه/کمینه
+       هر سری — قله دما و فشار هرگز حذف نمی‌شود
+    ۲. باقی بودجه بین سری‌ها (CURVE_SERIES) تقسیم و برای هر سری
+       Largest-Triangle-Three-Buckets اجرا می‌شود؛ اجتماع اندیس‌ها خروجی است
+    حلقه LTTB فقط روی سطل‌هاست (حداکثر max_points) و هر سطل برداری است.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+
+from .archive import SERIES_SCALE, decode
+from .models import CycleArchive, CycleLog
+
+MIN_POINTS = 10
+MAX_POINTS_LIMIT = 10000
+
+CURVE_SERIES = ('temperature_c', 'pressure_bar', 'humidity_pct')
+PHASE_LABELS = dict(CycleLog.Phase.choices)
+
+
+def parse_max_points(value):
+    """مقدار ?max_points (None = بدون کاهش)؛ ValueError اگر نامعتبر باشد."""
+    if value in (None, ''):
+        return None
+    try:
+        points = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('max_points باید عدد صحیح باشد')
+    if not MIN_POINTS <= points <= MAX_POINTS_LIMIT:
+        raise ValueError(f'max_points باید بین {MIN_POINTS} و {MAX_POINTS_LIMIT} باشد')
+    return points
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def live_arrays(logs, with_batch=False):
+    """
+    ردیف‌های یک کوئری CycleLog با یک values_list.
+    Returns: {'pk', 'log_time', 'created_at', 'elapsed_min', *CURVE_SERIES, 'phase'} — np.ndarray
+             (+ 'batch' اگر with_batch)
+    """
+    fields = ('pk', 'log_time', 'created_at', 'elapsed_min', *CURVE_SERIES, 'phase')
+    rows = list(logs.values_list(*fields, *(('heatset_batch_id',) if with_batch else ())))
+    columns = list(zip(*rows)) if rows else [()] * (len(fields) + with_batch)
+    if with_batch:
+        *columns, batches = columns
+    pks, times, created, elapsed, *series, phases = columns
+    arrays = {
+        'pk': np.array(pks, dtype=np.int64),
+        'log_time': np.array(times, dtype='datetime64[us]'),
+        'created_at': np.array(created, dtype='datetime64[us]'),
+        'elapsed_min': _floats(elapsed),
+        'phase': np.array(phases, dtype=str),
+    }
+    for name, values in zip(CURVE_SERIES, series):
+        arrays[name] = _floats(values)
+    if with_batch:
+        arrays['batch'] = np.array(batches, dtype=np.int64)
+    return arrays
+
+
+def _ordered(arrays, order):
+    if order == 'elapsed':
+        # خالی اول (مانند ORDER BY در MySQL)
+        keys = (arrays['pk'], arrays['log_time'], np.nan_to_num(arrays['elapsed_min'], nan=-np.inf))
+    else:
+        keys = (arrays['pk'], arrays['log_time'])
+    idx = np.lexsort(keys)
+    return {k: v[idx] for k, v in arrays.items()}
+
+
+def cycle_arrays(batch_id, order='time'):
+    """
+    منحنی کامل یک بچ (آرشیو + ردیف‌های زنده).
+    order: 'time' → (log_time, pk) | 'elapsed' → (elapsed_min, log_time)
+    """
+    arrays = live_arrays(CycleLog.objects.filter(heatset_batch_id=batch_id))
+    payload = CycleArchive.objects.filter(heatset_batch_id=batch_id).values_list('payload', flat=True).first()
+    if payload is not None:
+        archived = decode(payload)
+        arrays = {k: np.concatenate((archived[k], arrays[k])) for k in arrays}
+    return _ordered(arrays, order)
+
+
+def bulk_cycle_arrays(batch_ids, order='time'):
+    """
+    منحنی چند بچ با دو کوئری (لاگ زنده + آرشیو) — برای پردازش گروهی.
+    Returns: {batch_id: arrays} — بچ بدون هیچ نقطه در خروجی نیست
+    """
+    live = live_arrays(CycleLog.objects.filter(heatset_batch_id__in=batch_ids), with_batch=True)
+    batches = live.pop('batch')
+    idx = np.argsort(batches, kind='stable')
+    ids, starts = np.unique(batches[idx], return_index=True)
+    curves = {
+        batch_id: {k: v[part] for k, v in live.items()}
+        for batch_id, part in zip(ids.tolist(), np.split(idx, starts[1:]))
+    }
+    for batch_id, payload in CycleArchive.objects.filter(heatset_batch_id__in=batch_ids).values_list(
+        'heatset_batch_id', 'payload',
+    ):
+        archived = decode(payload)
+        current = curves.get(batch_id)
+        curves[batch_id] = archived if current is None else {
+            k: np.concatenate((archived[k], current[k])) for k in archived
+        }
+    return {batch_id: _ordered(arrays, order) for batch_id, arrays in curves.items()}
+
+
+# ═══════════════════════════════════════════════════════════════
+# کاهش نقاط
+# ═══════════════════════════════════════════════════════════════
+
+def lttb_indices(x, y, n_out):
+    """اندیس‌های Largest-Triangle-Three-Buckets (شامل اول و آخر)."""
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], max(edges[k + 1], edges[k] + 1)
+        # میانگین سطل بعدی (برای سطل آخر: نقطه آخر)
+        nlo, nhi = hi, (edges[k + 2] if k + 2 < len(edges) else n)
+        cx, cy = x[nlo:max(nhi, nlo + 1)].mean(), y[nlo:max(nhi, nlo + 1)].mean()
+        # مساحت مثلث (a، هر نقطه سطل، میانگین سطل بعد)
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[k + 1] = a
+    return selected
+
+
+def _axis(arrays):
+    """محور x برای LTTB: elapsed_min اگر کامل باشد، وگرنه ثانیه از اولین لاگ."""
+    elapsed = arrays['elapsed_min']
+    if len(elapsed) and not np.isnan(elapsed).any():
+        return elapsed
+    seconds = arrays['log_time'].astype(np.int64).astype(np.float64)
+    return seconds - seconds[0] if len(seconds) else seconds
+
+
+def downsample_indices(arrays, max_points):
+    """اندیس مرتب حداکثر max_points نقطه (قله‌ها و مرز مراحل حفظ می‌شوند)."""
+    n = len(arrays['pk'])
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+
+    phase = arrays['phase']
+    change = np.flatnonzero(phase[1:] != phase[:-1])
+    keep = [np.array([0, n - 1]), change, change + 1]
+    series = []
+    for name in CURVE_SERIES:
+        y = arrays[name]
+        valid = ~np.isnan(y)
+        if not valid.any():
+            continue
+        peaks = np.flatnonzero(valid)
+        keep.append(peaks[[np.argmax(y[valid]), np.argmin(y[valid])]])
+        series.append(np.where(valid, y, np.nanmean(y)))
+    mandatory = np.unique(np.concatenate(keep))
+
+    budget = max_points - len(mandatory)
+    if budget <= 0 or not series:
+        # مرزها و قله‌ها به‌تنهایی بیش از بودجه‌اند → همه آن‌ها (بدون LTTB)
+        return mandatory
+
+    x = _axis(arrays)
+    per_series = max(budget // len(series), 3)
+    picks = [lttb_indices(x, y, per_series) for y in series]
+    selected = np.union1d(mandatory, np.concatenate(picks))
+    if len(selected) > max_points:
+        # هم‌پوشانی کم بوده → حذف یکنواخت از نقاط LTTB (نقاط اجباری می‌مانند)
+        extra = np.setdiff1d(selected, mandatory)
+        step = np.linspace(0, len(extra) - 1, max_points - len(mandatory)).astype(np.int64)
+        selected = np.union1d(mandatory, extra[step])
+    return selected
+
+
+# ═══════════════════════════════════════════════════════════════
+# خروجی نمودار
+# ═══════════════════════════════════════════════════════════════
+
+def _json_values(values):
+    return [None if np.isnan(v) else v for v in values.tolist()]
+
+
+def _decimal(value, scale):
+    return None if np.isnan(value) else Decimal(round(value * scale)).scaleb(-len(str(scale)) + 1)
+
+
+def logs_from_arrays(arrays, indices=None):
+    """اشیای CycleLog (ذخیره‌نشده، با pk اصلی) برای سریالایزر/قالب."""
+    indices = np.arange(len(arrays['pk'])) if indices is None else indices
+    times = arrays['log_time'][indices].astype(datetime).tolist()
+    created = arrays['created_at'][indices].astype(datetime).tolist()
+    series = {name: arrays[name][indices].tolist() for name in SERIES_SCALE}
+    return [
+        CycleLog(
+            pk=pk, log_time=times[i], created_at=created[i], phase=phase,
+            **{name: _decimal(series[name][i], scale) for name, scale in SERIES_SCALE.items()},
+        )
+        for i, (pk, phase) in enumerate(zip(arrays['pk'][indices].tolist(), arrays['phase'][indices].tolist()))
+    ]
+
+
+def chart_series(arrays, indices):
+    """سری‌های نمودار ApexCharts (elapsed/temperature/pressure/humidity/phases)."""
+    return {
+        'elapsed': _json_values(arrays['elapsed_min'][indices]),
+        'temperature': _json_values(arrays['temperature_c'][indices]),
+        'pressure': _json_values(arrays['pressure_bar'][indices]),
+        'humidity': _json_values(arrays['humidity_pct'][indices]),
+        'phases': [PHASE_LABELS.get(p, p) for p in arrays['phase'][indices].tolist()],
+    }
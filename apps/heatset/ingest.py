@@ -0,0 +1,340 @@
+"""
+Diaco MES - HeatSet CycleLog Ingestion
+=========================================
+دریافت گروهی داده لحظه‌ای کنترلرهای اتوکلاو (دما/فشار/رطوبت) در CycleLog.
+
+منطق:
+─────
+  ورودی ستونی است — برای هر بچ یک آرایه به‌ازای هر فیلد:
+    {"batches": [
+       {"batch": 12,                      (یا "batch_number": "HS-...")
+        "log_time":      ["2026-10-18T10:00:00", ...],   (اختیاری — پیش‌فرض: اکنون)
+        "elapsed_min":   [0, 0.5, ...],
+        "temperature_c": [25.1, 26.0, ...],
+        "pressure_bar":  [...],                           (اختیاری)
+        "humidity_pct":  [...],                           (اختیاری)
+        "phase":         ["preheat", ...] یا "preheat"}   (یک مقدار = همه ردیف‌ها)
+    ]}
+
+  اعتبارسنجی برداری (NumPy) — هر ستون یک‌جا به آرایه float64 (null → NaN)
+  تبدیل و با READING_LIMITS مقایسه می‌شود؛ بدون حلقه روی ردیف‌ها.
+  شناسه بچ: batch عدد صحیح (یا رشته رقمی)، batch_number رشته (یا عدد).
+  log_time زمان محلی بدون منطقه زمانی است (USE_TZ=False)؛ زمان با پسوند
+  Z یا ±hh:mm رد می‌شود تا جابه‌جایی ساعت بی‌صدا ثبت نشود.
+  هر خطا (ناقص بودن طول آرایه، مقدار خارج از بازه، مرحله نامعتبر، بچ
+  ناموجود) کل درخواست را رد می‌کند: یا همه ردیف‌ها ثبت می‌شوند یا هیچ‌کدام.
+
+  نوشتن: یک تراکنش + bulk_create در دسته‌های INGEST_CHUNK؛ برای بچ تکمیل‌شده
+  شاخص منحنی و تطابق بعد از commit دوباره محاسبه می‌شود (bulk_create سیگنال ندارد).
+
+  CycleLogBuffer: نویسنده بافر‌دار asyncio برای فرایند جمع‌آوری (دستور
+  ingest_cycle_logs) — بسته‌های پشت سر هم تا FLUSH_ROWS ردیف یا
+  FLUSH_SECONDS ثانیه جمع و با یک write (یک تراکنش) نوشته می‌شوند؛
+  نوشتن در thread جدا (sync_to_async) تا دریافت داده متوقف نشود.
+"""
+import asyncio
+import logging
+import re
+from datetime import datetime
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from .conformance import refresh_after_commit
+from .models import Batch, CycleLog
+
+logger = logging.getLogger(__name__)
+
+INGEST_MAX_READINGS = 50000   # سقف ردیف هر درخواست
+INGEST_CHUNK = 2000
+MAX_ERRORS = 20               # تعداد خطای گزارش‌شده
+
+# field: (حداقل، حداکثر، رقم اعشار) — بازه فیزیکی معتبر و دقت فیلد مدل
+READING_LIMITS = {
+    'elapsed_min':   (0, 9999.99, 2),
+    'temperature_c': (-20, 250, 2),
+    'pressure_bar':  (0, 999.999, 3),
+    'humidity_pct':  (0, 100, 2),
+}
+REQUIRED_FIELDS = ('temperature_c',)
+PHASES = frozenset(CycleLog.Phase.values)
+TZ_SUFFIX = re.compile(r'[T ]\S*?(Z|[+-]\d{2}:?\d{2})$', re.IGNORECASE)
+
+FLUSH_ROWS = 20000
+FLUSH_SECONDS = 2.0
+
+
+class IngestError(ValueError):
+    """درخواست نامعتبر؛ errors: لیست {batch, index, field, error}."""
+
+    def __init__(self, errors):
+        super().__init__(errors[0]['error'] if errors else 'ورودی نامعتبر')
+        self.errors = errors[:MAX_ERRORS]
+
+
+# ═══════════════════════════════════════════════════════════════
+# اعتبارسنجی برداری
+# ═══════════════════════════════════════════════════════════════
+
+def _error(batch_ref, field, message, index=None):
+    return {'batch': batch_ref, 'index': index, 'field': field, 'error': message}
+
+
+def _column(values):
+    """آرایه float64 از لیست (None → NaN)؛ None اگر قابل تبدیل نباشد."""
+    try:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+
+def _check_block(ref, block, now):
+    """
+    اعتبارسنجی ستون‌های یک بچ.
+    Returns: (columns, errors) — columns: {field: np.ndarray} + 'log_time' و 'phase'
+    """
+    lengths = {
+        f: len(block[f]) for f in ('log_time', 'phase', *READING_LIMITS)
+        if isinstance(block.get(f), list)
+    }
+    if not lengths:
+        return None, [_error(ref, None, 'آرایه‌ای از داده ارسال نشده است')]
+    n = max(lengths.values())
+    short = [f for f, size in lengths.items() if size != n]
+    if short:
+        return None, [_error(ref, f, f'طول آرایه باید {n} باشد') for f in short]
+
+    errors, columns = [], {}
+    for field, (low, high, digits) in READING_LIMITS.items():
+        values = block.get(field)
+        if values is None:
+            if field in REQUIRED_FIELDS:
+                errors.append(_error(ref, field, 'فیلد الزامی است'))
+            columns[field] = np.full(n, np.nan)
+            continue
+        col = _column(values)
+        if col is None:
+            errors.append(_error(ref, field, 'مقدار غیرعددی'))
+            continue
+        if field in REQUIRED_FIELDS:
+            errors += [_error(ref, field, 'مقدار خالی', int(i)) for i in np.flatnonzero(np.isnan(col))[:MAX_ERRORS]]
+        with np.errstate(invalid='ignore'):
+            bad = (col < low) | (col > high) | np.isinf(col)
+        errors += [
+            _error(ref, field, f'خارج از بازه {low} تا {high}', int(i))
+            for i in np.flatnonzero(bad)[:MAX_ERRORS]
+        ]
+        columns[field] = np.round(col, digits)
+
+    phase = block.get('phase')
+    phases = np.array(phase if isinstance(phase, list) else [phase] * n, dtype=str)
+    bad = ~np.isin(phases, sorted(PHASES))
+    errors += [_error(ref, 'phase', 'مرحله نامعتبر', int(i)) for i in np.flatnonzero(bad)[:MAX_ERRORS]]
+    columns['phase'] = phases
+
+    times = block.get('log_time')
+    aware = [i for i, t in enumerate(times or ()) if isinstance(t, str) and TZ_SUFFIX.search(t.strip())]
+    if times is None:
+        columns['log_time'] = np.full(n, np.datetime64(now, 'ms'))
+    elif aware:
+        errors += [
+            _error(ref, 'log_time', 'زمان با منطقه زمانی پذیرفته نیست (زمان محلی بدون Z یا ±hh:mm)', i)
+            for i in aware[:MAX_ERRORS]
+        ]
+    else:
+        try:
+            columns['log_time'] = np.array(times, dtype='datetime64[ms]')
+        except (TypeError, ValueError):
+            errors.append(_error(ref, 'log_time', 'زمان نامعتبر (ISO 8601 بدون منطقه زمانی)'))
+        else:
+            bad = np.isnat(columns['log_time'])
+            errors += [_error(ref, 'log_time', 'زمان خالی', int(i)) for i in np.flatnonzero(bad)[:MAX_ERRORS]]
+    return columns, errors
+
+
+def _batch_ref(block):
+    """
+    شناسه بچ یک بلوک: int از batch یا str از batch_number.
+    Returns: (ref, error) — ref=None و پیام خطا اگر نوع مقدار مجاز نباشد.
+    """
+    batch = block.get('batch')
+    if batch is not None:
+        if isinstance(batch, str) and batch.strip().isdigit():
+            batch = int(batch)
+        if isinstance(batch, bool) or not isinstance(batch, int):
+            return None, 'batch باید شناسه عددی بچ باشد'
+        return batch, None
+    number = block.get('batch_number')
+    if isinstance(number, int) and not isinstance(number, bool):
+        number = str(number)
+    if not isinstance(number, str) or not number.strip():
+        return None, 'batch یا batch_number (رشته) الزامی است'
+    return number.strip(), None
+
+
+def _resolve_batches(refs):
+    """{ref: batch_id} برای همه شناسه‌ها با حداکثر دو کوئری."""
+    ids = {ref for ref in refs if isinstance(ref, int)}
+    numbers = {ref for ref in refs if isinstance(ref, str)}
+    found = {}
+    if ids:
+        found.update({pk: pk for pk in Batch.objects.filter(pk__in=ids).values_list('pk', flat=True)})
+    if numbers:
+        found.update(dict(Batch.objects.filter(batch_number__in=numbers).values_list('batch_number', 'pk')))
+    return found
+
+
+def validate(payload, now=None):
+    """
+    اعتبارسنجی کامل یک درخواست (بدون نوشتن).
+    Returns: لیست (batch_id, columns) — IngestError در صورت هر خطا.
+    """
+    blocks = payload.get('batches') if isinstance(payload, dict) else None
+    if not isinstance(blocks, list) or not blocks:
+        raise IngestError([_error(None, 'batches', 'لیست batches الزامی است')])
+    if not all(isinstance(b, dict) for b in blocks):
+        raise IngestError([_error(None, 'batches', 'هر عضو batches باید یک شیء باشد')])
+
+    now = now or datetime.now()
+    refs = [_batch_ref(block) for block in blocks]
+    found = _resolve_batches([ref for ref, message in refs if message is None])
+    errors, parsed, total = [], [], 0
+    for position, (block, (ref, message)) in enumerate(zip(blocks, refs)):
+        if message:
+            errors.append(_error(None, 'batch', f'{message} (عضو {position} از batches)'))
+            continue
+        batch_id = found.get(ref)
+        if batch_id is None:
+            errors.append(_error(ref, 'batch', 'بچ هیت‌ست یافت نشد'))
+            continue
+        columns, block_errors = _check_block(ref, block, now)
+        errors += block_errors
+        if columns is not None and not block_errors:
+            parsed.append((batch_id, columns))
+            total += len(columns['phase'])
+
+    if total > INGEST_MAX_READINGS:
+        errors.append(_error(None, None, f'حداکثر {INGEST_MAX_READINGS} ردیف در هر درخواست'))
+    if errors:
+        raise IngestError(errors)
+    return parsed
+
+
+# ═══════════════════════════════════════════════════════════════
+# نوشتن
+# ═══════════════════════════════════════════════════════════════
+
+def _optional(values):
+    return [None if np.isnan(v) else float(v) for v in values.tolist()]
+
+
+def build_logs(batch_id, columns):
+    """اشیای CycleLog (ذخیره‌نشده) از ستون‌های اعتبارسنجی‌شده یک بچ."""
+    times = columns['log_time'].astype(datetime).tolist()
+    elapsed = _optional(columns['elapsed_min'])
+    temperature = _optional(columns['temperature_c'])
+    pressure = _optional(columns['pressure_bar'])
+    humidity = _optional(columns['humidity_pct'])
+    phases = columns['phase'].tolist()
+    return [
+        CycleLog(
+            heatset_batch_id=batch_id, log_time=times[i], elapsed_min=elapsed[i],
+            temperature_c=temperature[i], pressure_bar=pressure[i], humidity_pct=humidity[i],
+            phase=phases[i],
+        )
+        for i in range(len(times))
+    ]
+
+
+def write(parsed):
+    """نوشتن بلوک‌های اعتبارسنجی‌شده در یک تراکنش؛ خروجی: {batch_id: تعداد}."""
+    counts = {}
+    with transaction.atomic():
+        for batch_id, columns in parsed:
+            logs = build_logs(batch_id, columns)
+            CycleLog.objects.bulk_create(logs, batch_size=INGEST_CHUNK)
+            counts[batch_id] = counts.get(batch_id, 0) + len(logs)
+        refresh_after_commit(counts)
+    return counts
+
+
+def ingest(payload):
+    """اعتبارسنجی + نوشتن یک درخواست؛ خروجی: {batch_id: تعداد ردیف ثبت‌شده}."""
+    return write(validate(payload))
+
+
+# ═══════════════════════════════════════════════════════════════
+# نویسنده بافردار (asyncio)
+# ═══════════════════════════════════════════════════════════════
+
+class CycleLogBuffer:
+    """
+    جمع‌کردن بسته‌های ورودی و نوشتن گروهی.
+
+        buffer = CycleLogBuffer()
+        await buffer.start()
+        await buffer.put(payload)      # اعتبارسنجی فوری؛ IngestError به فرستنده
+        ...
+        await buffer.close()           # نوشتن باقی‌مانده
+
+    نوشتن هر flush یک تراکنش است؛ خطای نوشتن ثبت و شمرده می‌شود و
+    فرایند ادامه می‌دهد (written / failed).
+    """
+
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.pending = []
+        self.pending_rows = 0
+        self.written = 0
+        self.failed = 0
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, payload):
+        parsed = await sync_to_async(validate, thread_sensitive=True)(payload)
+        self.pending += parsed
+        self.pending_rows += sum(len(c['phase']) for _b, c in parsed)
+        if self.pending_rows >= self.flush_rows:
+            self._full.set()
+        return self.pending_rows
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return 0
+            parsed, rows = self.pending, self.pending_rows
+            self.pending, self.pending_rows = [], 0
+            self._full.clear()
+            try:
+                await sync_to_async(write, thread_sensitive=True)(parsed)
+            except Exception:
+                self.failed += rows
+                raise
+            self.written += rows
+            return rows
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('CycleLog buffer flush failed')
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
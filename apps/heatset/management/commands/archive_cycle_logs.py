@@ -0,0 +1,49 @@
+"""
+Diaco MES - Archive HeatSet Cycle Logs
+=========================================
+انتقال لاگ‌های چرخه بچ‌های تکمیل‌شده از جدول CycleLog به آرشیو فشرده
+(یک ردیف CycleArchive برای هر بچ — apps/heatset/archive.py). برای cron
+شبانه؛ نمودار و API منحنی را از هر دو منبع یکسان می‌خوانند.
+
+Usage:
+    python manage.py archive_cycle_logs
+    python manage.py archive_cycle_logs --days 30
+    python manage.py archive_cycle_logs --batch 145
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heatset.archive import ARCHIVE_GRACE_DAYS, archivable_batches, archive_batch
+from apps.heatset.models import Batch
+
+
+class Command(BaseCommand):
+    help = 'آرشیو فشرده لاگ چرخه بچ‌های هیت‌ست تکمیل‌شده'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=ARCHIVE_GRACE_DAYS,
+            help=f'حداقل روز از تکمیل بچ (پیش‌فرض: {ARCHIVE_GRACE_DAYS})',
+        )
+        parser.add_argument('--batch', type=int, help='فقط یک بچ (شناسه) — باید تکمیل شده باشد')
+
+    def handle(self, *args, **options):
+        if options['batch']:
+            status = Batch.objects.filter(pk=options['batch']).values_list('status', flat=True).first()
+            if status is None:
+                raise CommandError(f'بچ {options["batch"]} یافت نشد.')
+            if status != Batch.BatchStatus.COMPLETED:
+                raise CommandError('فقط بچ تکمیل‌شده آرشیو می‌شود.')
+            batch_ids = [options['batch']]
+        else:
+            batch_ids = list(archivable_batches(max(0, options['days'])))
+
+        started = time.monotonic()
+        rows = 0
+        for batch_id in batch_ids:
+            rows += archive_batch(batch_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(batch_ids)} بچ آرشیو شد — {rows} ردیف لاگ منتقل شد '
+            f'({time.monotonic() - started:.1f} ثانیه)'
+        ))
@@ -0,0 +1,72 @@
+"""
+Diaco MES - Ingest HeatSet Cycle Logs
+========================================
+فرایند جمع‌آوری داده لحظه‌ای کنترلرهای اتوکلاو: هر خط ورودی یک بسته JSON
+(همان قالب POST /api/v1/heatset/cycles/bulk/) است. بسته‌ها در CycleLogBuffer
+(apps/heatset/ingest.py) جمع و هر FLUSH_ROWS ردیف یا FLUSH_SECONDS ثانیه
+با یک تراکنش نوشته می‌شوند. بسته نامعتبر رد و در stderr گزارش می‌شود.
+
+Usage:
+    controller-gateway | python manage.py ingest_cycle_logs
+    python manage.py ingest_cycle_logs --file readings.ndjson
+    python manage.py ingest_cycle_logs --flush-rows 5000 --flush-seconds 1
+"""
+import asyncio
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heatset.ingest import FLUSH_ROWS, FLUSH_SECONDS, CycleLogBuffer, IngestError
+
+
+class Command(BaseCommand):
+    help = 'دریافت پیوسته لاگ چرخه هیت‌ست (JSON خط‌به‌خط) و نوشتن گروهی بافر‌دار'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=str, help='فایل ورودی (پیش‌فرض: stdin)')
+        parser.add_argument('--flush-rows', type=int, default=FLUSH_ROWS,
+                            help=f'نوشتن پس از این تعداد ردیف (پیش‌فرض: {FLUSH_ROWS})')
+        parser.add_argument('--flush-seconds', type=float, default=FLUSH_SECONDS,
+                            help=f'حداکثر فاصله دو نوشتن (پیش‌فرض: {FLUSH_SECONDS})')
+
+    def handle(self, *args, **options):
+        if options['flush_rows'] < 1 or options['flush_seconds'] <= 0:
+            raise CommandError('--flush-rows و --flush-seconds باید مثبت باشند.')
+        try:
+            stream = open(options['file'], encoding='utf-8') if options['file'] else sys.stdin
+        except OSError as exc:
+            raise CommandError(f'خواندن فایل ممکن نیست: {exc}')
+
+        try:
+            buffer, rejected = asyncio.run(self._consume(stream, options))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {buffer.written} ردیف ثبت شد — {rejected} بسته رد شد'
+            + (f'، {buffer.failed} ردیف در نوشتن ناموفق' if buffer.failed else '')
+        ))
+
+    async def _consume(self, stream, options):
+        buffer = CycleLogBuffer(options['flush_rows'], options['flush_seconds'])
+        await buffer.start()
+        loop = asyncio.get_running_loop()
+        rejected, line_no = 0, 0
+        try:
+            while True:
+                line = await loop.run_in_executor(None, stream.readline)
+                if not line:
+                    break
+                line_no += 1
+                if not line.strip():
+                    continue
+                try:
+                    await buffer.put(json.loads(line))
+                except (json.JSONDecodeError, IngestError) as exc:
+                    rejected += 1
+                    self.stderr.write(f'خط {line_no}: {exc}')
+        finally:
+            await buffer.close()
+        return buffer, rejected
@@ -0,0 +1,55 @@
+"""
+Diaco MES - Rebuild HeatSet Cycle Metrics
+============================================
+پرکردن اولیه یا ترمیم جدول CycleMetrics برای بچ‌های تکمیل‌شده
+(apps/heatset/analytics.py) — بعد از migrate یا وقتی لاگ دیرهنگام به
+بچ تکمیل‌شده اضافه شده است.
+
+Usage:
+    python manage.py rebuild_cycle_metrics
+    python manage.py rebuild_cycle_metrics --missing
+    python manage.py rebuild_cycle_metrics --since 2026-01-01
+    python manage.py rebuild_cycle_metrics --batch 145
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heatset.analytics import refresh_metrics
+from apps.heatset.models import Batch
+
+
+class Command(BaseCommand):
+    help = 'بازسازی شاخص‌های منحنی چرخه بچ‌های هیت‌ست تکمیل‌شده (CycleMetrics)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, help='فقط بچ‌های از این تاریخ تولید (YYYY-MM-DD)')
+        parser.add_argument('--batch', type=int, help='فقط یک بچ (شناسه)')
+        parser.add_argument('--missing', action='store_true', help='فقط بچ‌هایی که هنوز شاخص ندارند')
+
+    def handle(self, *args, **options):
+        qs = Batch.objects.filter(status=Batch.BatchStatus.COMPLETED)
+        if options['batch']:
+            if not Batch.objects.filter(pk=options['batch']).exists():
+                raise CommandError(f'بچ {options["batch"]} یافت نشد.')
+            qs = Batch.objects.filter(pk=options['batch'])
+        if options['since']:
+            try:
+                qs = qs.filter(production_date__gte=date.fromisoformat(options['since']))
+            except ValueError:
+                raise CommandError(f'تاریخ نامعتبر: {options["since"]}')
+        if options['missing']:
+            qs = qs.filter(cycle_metrics__isnull=True)
+
+        started = time.monotonic()
+        computed = skipped = 0
+        for batch_id in qs.order_by('pk').values_list('pk', flat=True).iterator():
+            if refresh_metrics(batch_id) is None:
+                skipped += 1
+            else:
+                computed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ شاخص {computed} بچ محاسبه شد — {skipped} بچ بدون لاگ چرخه '
+            f'({time.monotonic() - started:.1f} ثانیه)'
+        ))
@@ -0,0 +1,62 @@
+"""
+Diaco MES - Score HeatSet Cycle Profiles
+===========================================
+ارزیابی گروهی منحنی چرخه بچ‌های تکمیل‌شده در برابر پوش پروفایل دستور کار
+(نوع الیاف × نوع چرخه — apps/heatset/conformance.py). نتیجه در
+CycleConformance و هشدارهای PROFILE_* در QualityAlert نوشته می‌شود.
+برای پرکردن اولیه سوابق یا بعد از تغییر پوش‌ها.
+
+Usage:
+    python manage.py score_cycle_profiles
+    python manage.py score_cycle_profiles --since 2026-01-01
+    python manage.py score_cycle_profiles --missing --chunk 1000
+    python manage.py score_cycle_profiles --batch 145
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heatset.conformance import SCORE_CHUNK, score_batches
+from apps.heatset.models import Batch, CycleConformance
+
+
+class Command(BaseCommand):
+    help = 'ارزیابی تطابق منحنی چرخه بچ‌های هیت‌ست با پروفایل دستور کار'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, help='فقط بچ‌های از این تاریخ تولید (YYYY-MM-DD)')
+        parser.add_argument('--batch', type=int, help='فقط یک بچ (شناسه) — باید تکمیل شده باشد')
+        parser.add_argument('--missing', action='store_true', help='فقط بچ‌هایی که هنوز ارزیابی نشده‌اند')
+        parser.add_argument('--chunk', type=int, default=SCORE_CHUNK,
+                            help=f'تعداد بچ هر دسته (پیش‌فرض: {SCORE_CHUNK})')
+
+    def handle(self, *args, **options):
+        qs = Batch.objects.filter(status=Batch.BatchStatus.COMPLETED)
+        if options['batch']:
+            status = Batch.objects.filter(pk=options['batch']).values_list('status', flat=True).first()
+            if status is None:
+                raise CommandError(f'بچ {options["batch"]} یافت نشد.')
+            if status != Batch.BatchStatus.COMPLETED:
+                raise CommandError('فقط بچ تکمیل‌شده ارزیابی می‌شود.')
+            qs = qs.filter(pk=options['batch'])
+        if options['since']:
+            try:
+                qs = qs.filter(production_date__gte=date.fromisoformat(options['since']))
+            except ValueError:
+                raise CommandError(f'تاریخ نامعتبر: {options["since"]}')
+        if options['missing']:
+            qs = qs.filter(cycle_conformance__isnull=True)
+
+        batch_ids = list(qs.order_by('pk').values_list('pk', flat=True))
+        started = time.monotonic()
+        scored, results = score_batches(batch_ids, chunk=max(1, options['chunk']))
+        elapsed = time.monotonic() - started
+
+        labels = dict(CycleConformance.Result.choices)
+        for result, count in sorted(results.items()):
+            self.stdout.write(f'    {labels.get(result, result)}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {scored} بچ از {len(batch_ids)} ارزیابی شد '
+            f'({elapsed:.1f} ثانیه، {scored / elapsed if elapsed else 0:.0f} بچ در ثانیه)'
+        ))
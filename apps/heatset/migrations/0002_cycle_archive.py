@@ -0,0 +1,32 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('heatset', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CycleArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('point_count', models.PositiveIntegerField(verbose_name='تعداد نقاط')),
+                ('first_log_at', models.DateTimeField(blank=True, null=True, verbose_name='اولین لاگ')),
+                ('last_log_at', models.DateTimeField(blank=True, null=True, verbose_name='آخرین لاگ')),
+                ('format_version', models.PositiveSmallIntegerField(default=1, verbose_name='نسخه قالب')),
+                ('payload', models.BinaryField(verbose_name='آرایه‌های فشرده')),
+                ('archived_at', models.DateTimeField(auto_now=True, verbose_name='زمان آرشیو')),
+                ('heatset_batch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cycle_archive', to='heatset.batch', verbose_name='بچ هیت‌ست')),
+            ],
+            options={
+                'verbose_name': 'آرشیو چرخه هیت‌ست',
+                'verbose_name_plural': 'آرشیو چرخه‌های هیت‌ست',
+                'db_table': 'heatset_cyclearchive',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.21 on 2026-10-18 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('heatset', '0002_cycle_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CycleMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('point_count', models.PositiveIntegerField(verbose_name='تعداد نقاط')),
+                ('duration_min', models.FloatField(blank=True, null=True, verbose_name='طول منحنی (دقیقه)')),
+                ('setpoint_c', models.FloatField(blank=True, null=True, verbose_name='دمای تثبیت مبنا (°C)')),
+                ('peak_temperature_c', models.FloatField(blank=True, null=True, verbose_name='دمای اوج (°C)')),
+                ('peak_at_min', models.FloatField(blank=True, null=True, verbose_name='زمان دمای اوج (دقیقه)')),
+                ('time_above_setpoint_min', models.FloatField(blank=True, null=True, verbose_name='زمان در دمای تثبیت (دقیقه)')),
+                ('temperature_integral_c_min', models.FloatField(blank=True, null=True, verbose_name='انتگرال دما (°C·min)')),
+                ('heat_up_rate_c_min', models.FloatField(blank=True, help_text='از شروع تا رسیدن به دمای تثبیت', null=True, verbose_name='نرخ گرم‌شدن (°C/min)')),
+                ('cool_down_rate_c_min', models.FloatField(blank=True, help_text='از آخرین نقطه در دمای تثبیت تا پایان', null=True, verbose_name='نرخ سردشدن (°C/min)')),
+                ('max_ramp_c_min', models.FloatField(blank=True, null=True, verbose_name='بیشترین شیب دما (°C/min)')),
+                ('pressure_mean_bar', models.FloatField(blank=True, null=True, verbose_name='میانگین فشار (bar)')),
+                ('pressure_std_bar', models.FloatField(blank=True, null=True, verbose_name='انحراف معیار فشار (bar)')),
+                ('pressure_cv_pct', models.FloatField(blank=True, null=True, verbose_name='ضریب تغییرات فشار (%)')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='زمان محاسبه')),
+                ('heatset_batch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cycle_metrics', to='heatset.batch', verbose_name='بچ هیت‌ست')),
+            ],
+            options={
+                'verbose_name': 'شاخص منحنی چرخه',
+                'verbose_name_plural': 'شاخص‌های منحنی چرخه',
+                'db_table': 'heatset_cyclemetrics',
+                'indexes': [models.Index(fields=['peak_temperature_c'], name='idx_cm_peak'), models.Index(fields=['time_above_setpoint_min'], name='idx_cm_above'), models.Index(fields=['pressure_cv_pct'], name='idx_cm_pressure_cv')],
+            },
+        ),
+    ]
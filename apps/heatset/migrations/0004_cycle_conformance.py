@@ -0,0 +1,38 @@
+# Generated by Django 4.2.21 on 2026-10-18 14:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('heatset', '0003_cycle_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CycleConformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile', models.CharField(help_text='نوع الیاف/نوع چرخه', max_length=40, verbose_name='پروفایل')),
+                ('point_count', models.PositiveIntegerField(verbose_name='تعداد نقاط')),
+                ('duration_min', models.FloatField(verbose_name='طول منحنی (دقیقه)')),
+                ('temp_deviation_area', models.FloatField(verbose_name='مساحت انحراف دما (°C·min)')),
+                ('temp_out_of_band_min', models.FloatField(verbose_name='دما خارج از پوش (دقیقه)')),
+                ('temp_max_deviation_c', models.FloatField(verbose_name='بیشترین انحراف دما (°C)')),
+                ('pressure_deviation_area', models.FloatField(blank=True, null=True, verbose_name='مساحت انحراف فشار (bar·min)')),
+                ('pressure_out_of_band_min', models.FloatField(blank=True, null=True, verbose_name='فشار خارج از پوش (دقیقه)')),
+                ('conformance_pct', models.FloatField(verbose_name='درصد تطابق دما')),
+                ('result', models.CharField(choices=[('ok', 'منطبق'), ('warning', 'هشدار'), ('critical', 'بحرانی')], max_length=10, verbose_name='نتیجه')),
+                ('scored_at', models.DateTimeField(auto_now=True, verbose_name='زمان ارزیابی')),
+                ('heatset_batch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cycle_conformance', to='heatset.batch', verbose_name='بچ هیت‌ست')),
+            ],
+            options={
+                'verbose_name': 'تطابق پروفایل چرخه',
+                'verbose_name_plural': 'تطابق پروفایل چرخه‌ها',
+                'db_table': 'heatset_cycleconformance',
+                'indexes': [models.Index(fields=['result'], name='idx_cc_result'), models.Index(fields=['temp_out_of_band_min'], name='idx_cc_out_of_band')],
+            },
+        ),
+    ]
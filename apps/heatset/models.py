@@ -36,6 +36,21 @@ CycleLog (لاگ چرخه — AI-Ready):
   هر ۵ دقیقه یک رکورد از دما و فشار ذخیره می‌شود.
   این داده برای رسم منحنی چرخه و تحلیل AI استفاده می‌شود.
 
+CycleArchive (آرشیو منحنی چرخه):
+  بعد از تکمیل بچ، ردیف‌های CycleLog آن در یک ردیف با آرایه‌های فشرده
+  (heatset/archive.py) جمع و از جدول لاگ حذف می‌شوند؛ خواندن منحنی از
+  هر دو منبع یکسان است (heatset/curves.py).
+
+CycleMetrics (شاخص‌های منحنی چرخه):
+  هنگام تکمیل بچ یک بار از منحنی کامل محاسبه می‌شود (heatset/analytics.py):
+  دمای اوج، زمان در دمای تثبیت، نرخ گرم/سردشدن، انتگرال دما و پایداری
+  فشار — گزارش و API روی همین ستون‌ها فیلتر و مرتب می‌کنند.
+
+CycleConformance (تطابق با پروفایل دستور کار):
+  منحنی دما/فشار بچ با پوش مورد انتظار نوع الیاف و نوع چرخه مقایسه می‌شود
+  (heatset/conformance.py) — مساحت انحراف و دقایق خارج از پوش؛ نتیجه
+  هشدار کیفی PROFILE_* می‌سازد.
+
 شماره‌گذاری: HS-YYMMDD-NNN (مثال: HS-041130-001)
 """
 from datetime import datetime
@@ -408,3 +423,219 @@ class CycleLog(models.Model):
 
     def __str__(self):
         return f"{self.heatset_batch.batch_number} | {self.get_phase_display()} | {self.temperature_c}°C"
+
+
+class CycleArchive(models.Model):
+    """منحنی فشرده چرخه یک بچ تکمیل‌شده — جایگزین ردیف‌های CycleLog آن."""
+
+    heatset_batch = models.OneToOneField(
+        Batch,
+        on_delete=models.CASCADE,
+        verbose_name='بچ هیت‌ست',
+        related_name='cycle_archive',
+    )
+    point_count = models.PositiveIntegerField(
+        verbose_name='تعداد نقاط',
+    )
+    first_log_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='اولین لاگ',
+    )
+    last_log_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='آخرین لاگ',
+    )
+    format_version = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='نسخه قالب',
+    )
+    payload = models.BinaryField(
+        verbose_name='آرایه‌های فشرده',
+    )
+    archived_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='زمان آرشیو',
+    )
+
+    class Meta:
+        db_table = 'heatset_cyclearchive'
+        verbose_name = 'آرشیو چرخه هیت‌ست'
+        verbose_name_plural = 'آرشیو چرخه‌های هیت‌ست'
+
+    def __str__(self):
+        return f"{self.heatset_batch_id} | {self.point_count} نقطه"
+
+
+class CycleMetrics(models.Model):
+    """شاخص‌های محاسبه‌شده منحنی چرخه یک بچ تکمیل‌شده."""
+
+    heatset_batch = models.OneToOneField(
+        Batch,
+        on_delete=models.CASCADE,
+        verbose_name='بچ هیت‌ست',
+        related_name='cycle_metrics',
+    )
+    point_count = models.PositiveIntegerField(
+        verbose_name='تعداد نقاط',
+    )
+    duration_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='طول منحنی (دقیقه)',
+    )
+    setpoint_c = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='دمای تثبیت مبنا (°C)',
+    )
+
+    # ── دما ──────────────────────────────────────────────
+    peak_temperature_c = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='دمای اوج (°C)',
+    )
+    peak_at_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='زمان دمای اوج (دقیقه)',
+    )
+    time_above_setpoint_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='زمان در دمای تثبیت (دقیقه)',
+    )
+    temperature_integral_c_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='انتگرال دما (°C·min)',
+    )
+    heat_up_rate_c_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='نرخ گرم‌شدن (°C/min)',
+        help_text='از شروع تا رسیدن به دمای تثبیت',
+    )
+    cool_down_rate_c_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='نرخ سردشدن (°C/min)',
+        help_text='از آخرین نقطه در دمای تثبیت تا پایان',
+    )
+    max_ramp_c_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='بیشترین شیب دما (°C/min)',
+    )
+
+    # ── فشار (مراحل تزریق بخار و نگه‌داری) ─────────────────
+    pressure_mean_bar = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='میانگین فشار (bar)',
+    )
+    pressure_std_bar = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='انحراف معیار فشار (bar)',
+    )
+    pressure_cv_pct = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='ضریب تغییرات فشار (%)',
+    )
+
+    computed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='زمان محاسبه',
+    )
+
+    class Meta:
+        db_table = 'heatset_cyclemetrics'
+        verbose_name = 'شاخص منحنی چرخه'
+        verbose_name_plural = 'شاخص‌های منحنی چرخه'
+        indexes = [
+            models.Index(fields=['peak_temperature_c'], name='idx_cm_peak'),
+            models.Index(fields=['time_above_setpoint_min'], name='idx_cm_above'),
+            models.Index(fields=['pressure_cv_pct'], name='idx_cm_pressure_cv'),
+        ]
+
+    def __str__(self):
+        return f"{self.heatset_batch_id} | اوج {self.peak_temperature_c}°C"
+
+
+class CycleConformance(models.Model):
+    """نتیجه مقایسه منحنی چرخه یک بچ با پوش پروفایل دستور کار."""
+
+    class Result(models.TextChoices):
+        OK = 'ok', 'منطبق'
+        WARNING = 'warning', 'هشدار'
+        CRITICAL = 'critical', 'بحرانی'
+
+    heatset_batch = models.OneToOneField(
+        Batch,
+        on_delete=models.CASCADE,
+        verbose_name='بچ هیت‌ست',
+        related_name='cycle_conformance',
+    )
+    profile = models.CharField(
+        max_length=40,
+        verbose_name='پروفایل',
+        help_text='نوع الیاف/نوع چرخه',
+    )
+    point_count = models.PositiveIntegerField(
+        verbose_name='تعداد نقاط',
+    )
+    duration_min = models.FloatField(
+        verbose_name='طول منحنی (دقیقه)',
+    )
+
+    # ── دما ──────────────────────────────────────────────
+    temp_deviation_area = models.FloatField(
+        verbose_name='مساحت انحراف دما (°C·min)',
+    )
+    temp_out_of_band_min = models.FloatField(
+        verbose_name='دما خارج از پوش (دقیقه)',
+    )
+    temp_max_deviation_c = models.FloatField(
+        verbose_name='بیشترین انحراف دما (°C)',
+    )
+
+    # ── فشار (برای دستگاه‌های بخاری) ──────────────────────
+    pressure_deviation_area = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='مساحت انحراف فشار (bar·min)',
+    )
+    pressure_out_of_band_min = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='فشار خارج از پوش (دقیقه)',
+    )
+
+    conformance_pct = models.FloatField(
+        verbose_name='درصد تطابق دما',
+    )
+    result = models.CharField(
+        max_length=10,
+        choices=Result.choices,
+        verbose_name='نتیجه',
+    )
+    scored_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='زمان ارزیابی',
+    )
+
+    class Meta:
+        db_table = 'heatset_cycleconformance'
+        verbose_name = 'تطابق پروفایل چرخه'
+        verbose_name_plural = 'تطابق پروفایل چرخه‌ها'
+        indexes = [
+            models.Index(fields=['result'], name='idx_cc_result'),
+            models.Index(fields=['temp_out_of_band_min'], name='idx_cc_out_of_band'),
+        ]
+
+    def __str__(self):
+        return f"{self.heatset_batch_id} | {self.profile} | {self.get_result_display()}"
@@ -16,12 +16,28 @@ F.1 — شاخص‌های کیفی خودکار:
   مخلوط:      110-135°C (محافظه‌کارانه)
 
 محدوده shrinkage قابل قبول: 0.5-3.5%
+
+metadata و هشدارها در pre_save مسیر مشترک ai_ready/signals.py (رجیستری
+ENRICHERS) با build_metadata همین ماژول محاسبه می‌شوند — ردیف یک بار نوشته
+می‌شود؛ post_save این ماژول هشدارهای بحرانی را لاگ و هشدارها را در جدول
+QualityAlert (ai_ready/alerts.py) همگام می‌کند.
+
+شاخص‌های منحنی چرخه: وقتی بچ به وضعیت completed می‌رسد (تغییر وضعیت در
+pre_save تشخیص داده می‌شود) CycleMetrics بعد از commit از منحنی کامل
+محاسبه می‌شود (heatset/analytics.py) و منحنی با پوش پروفایل دستور کار
+مقایسه می‌شود (heatset/conformance.py)؛ هشدارهای PROFILE_* بچ تکمیل‌شده
+بخشی از quality_alerts هستند. CycleLog تازه بچ تکمیل‌شده (فرم، تبلت،
+admin — و ingest گروهی در ingest.write) هر دو را دوباره محاسبه می‌کند.
 """
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Batch
+from apps.ai_ready.alerts import delete_alerts, sync_alerts
+
+from .conformance import profile_alerts, refresh_after_commit, refresh_cycle
+from .models import Batch, CycleLog
 
 logger = logging.getLogger(__name__)
 
@@ -39,35 +55,8 @@ SHRINKAGE_MIN = 0.5
 SHRINKAGE_MAX = 3.5
 
 
-@receiver(pre_save, sender=Batch)
-def heatset_pre_save(sender, instance, **kwargs):
-    """
-    قبل از ذخیره:
-    ✦ مقداردهی اولیه metadata با ساختار AI-Ready
-    ✦ محاسبه duration_min (جمع مراحل) — مدل save() هم این کار را می‌کند
-    """
-    if not instance.metadata or not isinstance(instance.metadata, dict):
-        instance.metadata = {}
-
-    # skeleton AI-Ready
-    if 'ai_quality' not in instance.metadata:
-        instance.metadata['ai_quality'] = {
-            'temp_curve':     [],   # منحنی دما (از CycleLog پر می‌شود)
-            'pressure_curve': [],   # منحنی فشار
-            'humidity_log':   [],   # لاگ رطوبت
-            'alerts':         [],
-        }
-
-
-@receiver(post_save, sender=Batch)
-def heatset_post_save(sender, instance, created, **kwargs):
-    """
-    بعد از ذخیره:
-    ✦ بررسی quality_result = fail → هشدار بحرانی
-    ✦ بررسی دما در محدوده مجاز
-    ✦ بررسی shrinkage_pct
-    ✦ تکمیل metadata
-    """
+def quality_alerts(instance):
+    """هشدارهای کیفی بچ (بدون تغییر instance؛ برای بچ تکمیل‌شده نتیجه CycleConformance را می‌خواند)."""
     alerts = []
 
     # ── هشدار رد کیفی ──────────────────────────────────────
@@ -77,11 +66,6 @@ def heatset_post_save(sender, instance, created, **kwargs):
             'code':  'QUALITY_FAIL',
             'msg':   f'بچ {instance.batch_number} رد شد — نیاز به بررسی فوری',
         })
-        logger.warning(
-            'HEATSET QUALITY FAIL | batch=%s | machine=%s | fiber=%s | temp=%s',
-            instance.batch_number, instance.machine.code,
-            instance.fiber_type, instance.temperature_c
-        )
 
     # ── بررسی دما در محدوده مجاز ──────────────────────────
     fiber = instance.fiber_type
@@ -100,10 +84,6 @@ def heatset_post_save(sender, instance, created, **kwargs):
                 'code':  'HIGH_TEMPERATURE',
                 'msg':   f'دما {temp}°C بالاتر از حداکثر {t_max}°C برای {fiber} — خطر آسیب به الیاف!',
             })
-            logger.error(
-                'HEATSET HIGH TEMP | batch=%s | fiber=%s | temp=%s (max=%s)',
-                instance.batch_number, fiber, temp, t_max
-            )
 
     # ── بررسی shrinkage ─────────────────────────────────────
     if instance.shrinkage_pct is not None:
@@ -121,16 +101,96 @@ def heatset_post_save(sender, instance, created, **kwargs):
                 'msg':   f'آنکاژ {shrink}% بالاتر از حد مجاز ({SHRINKAGE_MAX}%) — آسیب احتمالی',
             })
 
-    # ── ذخیره metadata ──────────────────────────────────────
-    meta  = instance.metadata or {}
-    ai_q  = meta.get('ai_quality', {'temp_curve': [], 'pressure_curve': [], 'humidity_log': [], 'alerts': []})
+    # ── تطابق منحنی با پروفایل دستور کار ────────────────────
+    alerts += profile_alerts(instance)
+    return alerts
+
+
+def metadata_with_alerts(metadata, alerts):
+    """کپی metadata با هشدارهای ai_quality و has_alerts (ساختار AI-Ready اگر نباشد)."""
+    meta = dict(metadata) if isinstance(metadata, dict) else {}
+    ai_q = dict(meta.get('ai_quality') or {
+        'temp_curve':     [],
+        'pressure_curve': [],
+        'humidity_log':   [],
+    })
     ai_q['alerts'] = alerts
     meta['ai_quality']  = ai_q
     meta['has_alerts']  = bool(alerts)
+    return meta
+
+
+def build_metadata(instance):
+    """
+    metadata کامل بچ (instance.metadata تغییر نمی‌کند):
+    ✦ ساختار AI-Ready و هشدارهای کیفی فعلی
+    ✦ خلاصه پارامترهای فرآیند (quality_result، fiber_type، دما، آنکاژ)
+    هشدارها روی instance نگه داشته می‌شوند تا post_save دوباره محاسبه نکند.
+    """
+    alerts = quality_alerts(instance)
+    instance._quality_alerts = alerts
+    meta = metadata_with_alerts(instance.metadata, alerts)
     meta['quality_result'] = instance.quality_result
     meta['fiber_type']     = instance.fiber_type
     meta['temperature_c']  = str(instance.temperature_c)
     if instance.shrinkage_pct:
         meta['shrinkage_pct'] = str(instance.shrinkage_pct)
+    return meta
+
+
+def _log_alerts(instance, alerts):
+    for alert in alerts:
+        if alert['code'] == 'QUALITY_FAIL':
+            logger.warning(
+                'HEATSET QUALITY FAIL | batch=%s | machine=%s | fiber=%s | temp=%s',
+                instance.batch_number, instance.machine.code,
+                instance.fiber_type, instance.temperature_c
+            )
+        elif alert['code'] == 'HIGH_TEMPERATURE':
+            logger.error(
+                'HEATSET HIGH TEMP | batch=%s | fiber=%s | temp=%s (max=%s)',
+                instance.batch_number, instance.fiber_type,
+                float(instance.temperature_c), FIBER_TEMP_RANGES[instance.fiber_type][1]
+            )
 
-    Batch.objects.filter(pk=instance.pk).update(metadata=meta)
+
+@receiver(pre_save, sender=Batch)
+def heatset_pre_save(sender, instance, raw=False, **kwargs):
+    """علامت‌گذاری گذار به completed (فقط برای بچ تکمیل‌شده یک کوئری)."""
+    if raw or instance.status != Batch.BatchStatus.COMPLETED:
+        return
+    previous = None
+    if instance.pk:
+        previous = Batch.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    instance._cycle_completed = previous != Batch.BatchStatus.COMPLETED
+
+
+@receiver(post_save, sender=Batch)
+def heatset_post_save(sender, instance, created, **kwargs):
+    """
+    بعد از ذخیره:
+    ✦ لاگ رد کیفی و دمای بیش از حد (metadata و هشدارها قبلاً در pre_save
+      محاسبه شده‌اند — build_metadata)
+    ✦ همگام‌سازی جدول QualityAlert
+    ✦ محاسبه شاخص‌های منحنی و تطابق پروفایل هنگام تکمیل بچ
+    """
+    alerts = instance.__dict__.pop('_quality_alerts', None)
+    if alerts is None:  # ذخیره raw یا بدون مسیر pre_save
+        alerts = quality_alerts(instance)
+    _log_alerts(instance, alerts)
+    sync_alerts('heatset', instance, alerts)
+    if instance.__dict__.pop('_cycle_completed', False):
+        batch_id = instance.pk
+        transaction.on_commit(lambda: refresh_cycle(batch_id))
+
+
+@receiver(post_save, sender=CycleLog)
+def cycle_log_post_save(sender, instance, created, raw=False, **kwargs):
+    """لاگ دیررس بچ تکمیل‌شده → شاخص منحنی و تطابق بعد از commit."""
+    if created and not raw:
+        refresh_after_commit([instance.heatset_batch_id])
+
+
+@receiver(post_delete, sender=Batch)
+def heatset_post_delete(sender, instance, **kwargs):
+    delete_alerts('heatset', instance.pk)
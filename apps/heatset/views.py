@@ -16,6 +16,9 @@ from apps.core.models import Machine, Shift, ProductionLine
 from apps.core.batch_utils import next_batch_number
 from apps.tfo.models import Production as TFOProduction
 from apps.orders.models import Order
+from .curves import (
+    chart_series, cycle_arrays, downsample_indices, logs_from_arrays, parse_max_points,
+)
 from .models import Batch, CycleLog
 
 
@@ -193,12 +196,13 @@ def batch_detail(request, pk):
         ),
         pk=pk
     )
-    cycle_logs = batch.cycle_logs.order_by('log_time')
+    # آرشیو + ردیف‌های زنده (heatset/curves.py)
+    cycle_logs = logs_from_arrays(cycle_arrays(batch.pk))
 
     return render(request, 'heatset/detail.html', {
         'batch': batch,
         'cycle_logs': cycle_logs,
-        'log_count': cycle_logs.count(),
+        'log_count': len(cycle_logs),
         'page_title': f'هیت‌ست {batch.batch_number}',
         'breadcrumb_parent': 'هیت‌ست',
         'quality_choices': Batch.QualityResult.choices,
@@ -337,22 +341,17 @@ def cycle_log_add(request, pk):
 
 @login_required
 def cycle_log_data(request, pk):
-    """دریافت داده‌های لاگ چرخه برای نمودار ApexCharts — JSON"""
+    """دریافت داده‌های لاگ چرخه برای نمودار ApexCharts — JSON
+    ?max_points=N → کاهش نقاط با LTTB (قله‌ها و مرز مراحل حفظ می‌شوند — heatset/curves.py)
+    """
     batch = get_object_or_404(Batch, pk=pk)
-    logs = batch.cycle_logs.order_by('elapsed_min', 'log_time')
-
-    data = {
-        'elapsed': [],
-        'temperature': [],
-        'pressure': [],
-        'humidity': [],
-        'phases': [],
-    }
-    for log in logs:
-        data['elapsed'].append(float(log.elapsed_min) if log.elapsed_min else None)
-        data['temperature'].append(float(log.temperature_c) if log.temperature_c else None)
-        data['pressure'].append(float(log.pressure_bar) if log.pressure_bar else None)
-        data['humidity'].append(float(log.humidity_pct) if log.humidity_pct else None)
-        data['phases'].append(log.get_phase_display())
-
+    try:
+        max_points = parse_max_points(request.GET.get('max_points'))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    arrays = cycle_arrays(batch.pk, order='elapsed')
+    indices = downsample_indices(arrays, max_points)
+    data = chart_series(arrays, indices)
+    data['total_points'] = len(arrays['pk'])
     return JsonResponse(data)
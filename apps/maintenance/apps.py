@@ -4,3 +4,6 @@ class MaintenanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.maintenance'
     verbose_name = 'نگهداری و تعمیرات'
+
+    def ready(self):
+        import apps.maintenance.signals  # noqa: F401
@@ -0,0 +1,166 @@
+"""
+Diaco MES - Machine Health Counters
+======================================
+نگهداری و خواندن جدول MachineHealthCounter (توقفات روزانه هر ماشین).
+
+منطق:
+─────
+  نگهداری (maintenance/signals.py):
+    ذخیره/حذف هر DowntimeLog → سطل (روز، ماشین، خط) آن بعد از commit با یک
+    aggregate کوچک از لاگ همان روز دوباره محاسبه می‌شود (idempotent).
+    اگر روز/ماشین/خط توقف عوض شود، سطل قبلی هم محاسبه می‌شود.
+    ردیف سطل قبل از aggregate قفل می‌شود (select_for_update) و خط در کلید
+    یکتا با line_key (شناسه خط یا 0) می‌آید — مانند reports/rollup.py.
+    rebuild() برای پرکردن اولیه یا ترمیم یک بازه با یک کوئری گروه‌بندی‌شده.
+
+  خواندن:
+    window_totals      — {machine_id: (count, minutes)} پنجره N روزه
+    daily_counts       — {machine_id: {day: (count, minutes)}}
+    minutes_by_machine — دقیقه توقف هر ماشین در بازه (Availability گزارش OEE)
+    period_totals      — جمع تعداد/دقیقه/تولید از دست رفته بازه (با فیلتر خط)
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from .models import DowntimeLog, MachineHealthCounter
+
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+# ═══════════════════════════════════════════════════════════════
+# نگهداری
+# ═══════════════════════════════════════════════════════════════
+
+def instance_key(instance):
+    """کلید سطل یک توقف: (روز، ماشین، خط)."""
+    return (_day(instance.start_time), instance.machine_id, instance.production_line_id)
+
+
+def stored_key(pk):
+    """کلید سطل فعلی توقف در دیتابیس (قبل از ذخیره) — None اگر وجود ندارد."""
+    row = DowntimeLog.objects.filter(pk=pk).values_list(
+        'start_time', 'machine_id', 'production_line_id',
+    ).first()
+    return (_day(row[0]), row[1], row[2]) if row else None
+
+
+def _lock_counter(lookup, line_id):
+    """ردیف سطل با قفل ردیف؛ اگر نباشد ساخته می‌شود (ساخت همزمان → همان ردیف قفل می‌شود)."""
+    qs = MachineHealthCounter.objects.select_for_update().filter(**lookup)
+    row = qs.first()
+    if row is not None:
+        return row
+    try:
+        with transaction.atomic():
+            return MachineHealthCounter.objects.create(production_line_id=line_id, **lookup)
+    except IntegrityError:
+        return qs.get()
+
+
+def refresh_counter(key):
+    """محاسبه دوباره یک سطل از لاگ خام زیر قفل ردیف سطل؛ سطل خالی حذف می‌شود."""
+    day, machine_id, line_id = key
+    lookup = {'date': day, 'machine_id': machine_id, 'line_key': line_id or 0}
+    with transaction.atomic():
+        row = _lock_counter(lookup, line_id)
+        agg = DowntimeLog.objects.filter(
+            start_time__date=day, machine_id=machine_id, production_line_id=line_id,
+        ).aggregate(count=Count('id'), minutes=Sum('duration_min'), loss=Sum('production_loss'))
+        if not agg['count']:
+            row.delete()
+            return
+        row.downtime_count = agg['count']
+        row.downtime_min = agg['minutes'] or 0
+        row.production_loss = agg['loss'] or 0
+        row.save()
+
+
+def rebuild(date_from=None, date_to=None):
+    """
+    بازسازی کامل شمارنده‌ها (یا یک بازه تاریخ) با یک کوئری گروه‌بندی‌شده.
+    خروجی: تعداد ردیف ساخته‌شده.
+    """
+    source = DowntimeLog.objects.all()
+    target = MachineHealthCounter.objects.all()
+    if date_from:
+        source = source.filter(start_time__date__gte=date_from)
+        target = target.filter(date__gte=date_from)
+    if date_to:
+        source = source.filter(start_time__date__lte=date_to)
+        target = target.filter(date__lte=date_to)
+
+    groups = source.annotate(day=TruncDate('start_time')).values(
+        'day', 'machine_id', 'production_line_id',
+    ).annotate(count=Count('id'), minutes=Sum('duration_min'), loss=Sum('production_loss')).order_by()
+
+    rows = [
+        MachineHealthCounter(
+            date=g['day'], machine_id=g['machine_id'], production_line_id=g['production_line_id'],
+            line_key=g['production_line_id'] or 0,
+            downtime_count=g['count'], downtime_min=g['minutes'] or 0, production_loss=g['loss'] or 0,
+        )
+        for g in groups.iterator()
+    ]
+    with transaction.atomic():
+        target.delete()
+        MachineHealthCounter.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن
+# ═══════════════════════════════════════════════════════════════
+
+def window_start(days):
+    """اولین روز پنجره days روزه منتهی به امروز."""
+    return date.today() - timedelta(days=days)
+
+
+def window_totals(machine_ids, days=30):
+    """{machine_id: (count, minutes)} پنجره days روزه — یک کوئری روی شمارنده‌ها."""
+    rows = MachineHealthCounter.objects.filter(
+        machine_id__in=list(machine_ids), date__gte=window_start(days),
+    ).values('machine_id').annotate(
+        count=Sum('downtime_count'), minutes=Sum('downtime_min'),
+    ).order_by()
+    return {r['machine_id']: (r['count'], r['minutes']) for r in rows}
+
+
+def daily_counts(machine_ids, date_from):
+    """{machine_id: {day: (count, minutes)}} از date_from تا امروز."""
+    rows = MachineHealthCounter.objects.filter(
+        machine_id__in=list(machine_ids), date__gte=date_from,
+    ).values('machine_id', 'date').annotate(
+        count=Sum('downtime_count'), minutes=Sum('downtime_min'),
+    ).order_by()
+    out = {}
+    for r in rows:
+        out.setdefault(r['machine_id'], {})[r['date']] = (r['count'], r['minutes'])
+    return out
+
+
+def minutes_by_machine(date_from, date_to):
+    """{machine_id: دقیقه توقف} در بازه."""
+    rows = MachineHealthCounter.objects.filter(
+        date__range=(date_from, date_to),
+    ).values('machine_id').annotate(minutes=Sum('downtime_min')).order_by()
+    return {r['machine_id']: r['minutes'] for r in rows}
+
+
+def period_totals(date_from, date_to, line=None):
+    """{minutes, count, loss} توقفات بازه (با فیلتر خط توقف — اختیاری)."""
+    qs = MachineHealthCounter.objects.filter(date__range=(date_from, date_to))
+    if line:
+        qs = qs.filter(production_line=line)
+    agg = qs.aggregate(minutes=Sum('downtime_min'), count=Sum('downtime_count'), loss=Sum('production_loss'))
+    return {
+        'minutes': agg['minutes'] or 0,
+        'count': agg['count'] or 0,
+        'loss': agg['loss'] or Decimal(0),
+    }
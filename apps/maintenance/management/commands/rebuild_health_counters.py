@@ -0,0 +1,33 @@
+"""
+Diaco MES - Rebuild Machine Health Counters
+==============================================
+پرکردن اولیه یا ترمیم جدول MachineHealthCounter از DowntimeLog.
+برای اجرای یکباره بعد از migrate یا cron شبانه (ترمیم).
+
+Usage:
+    python manage.py rebuild_health_counters
+    python manage.py rebuild_health_counters --from 2025-01-01 --to 2025-03-31
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.maintenance.counters import rebuild
+
+
+class Command(BaseCommand):
+    help = 'بازسازی شمارنده‌های روزانه توقف ماشین‌ها (MachineHealthCounter)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=str, help='از تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, help='تا تاریخ (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as exc:
+            raise CommandError(f'تاریخ نامعتبر: {exc}')
+
+        count = rebuild(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} ردیف MachineHealthCounter بازسازی شد'))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_machine_type_v2_carpet_yarn'),
+        ('maintenance', '0002_downtimelog_production_line'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineHealthCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('downtime_count', models.PositiveIntegerField(default=0, verbose_name='تعداد توقف')),
+                ('downtime_min', models.PositiveIntegerField(default=0, verbose_name='مدت توقف (دقیقه)')),
+                ('production_loss', models.DecimalField(decimal_places=3, default=0, max_digits=14, verbose_name='تولید از دست رفته (kg)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_counters', to='core.machine', verbose_name='ماشین')),
+                ('production_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='health_counters', to='core.productionline', verbose_name='خط تولید')),
+            ],
+            options={
+                'verbose_name': 'شمارنده سلامت ماشین',
+                'verbose_name_plural': 'شمارنده\u200cهای سلامت ماشین',
+                'db_table': 'maintenance_machine_health_counter',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['machine', 'date'], name='idx_hc_machine_date'), models.Index(fields=['date'], name='idx_hc_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='machinehealthcounter',
+            constraint=models.UniqueConstraint(fields=('date', 'machine', 'production_line'), name='uq_health_counter_key'),
+        ),
+    ]
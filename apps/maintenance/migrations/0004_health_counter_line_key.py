@@ -0,0 +1,38 @@
+# Generated by Django 4.2.21 on 2026-10-18 14:19
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_line_key(apps, schema_editor):
+    """line_key از production_line؛ ردیف‌های تکراری کلید (خط تهی) → فقط جدیدترین می‌ماند."""
+    Counter = apps.get_model('maintenance', 'MachineHealthCounter')
+    Counter.objects.filter(production_line__isnull=False).update(line_key=models.F('production_line_id'))
+    keep = Counter.objects.values(
+        'date', 'machine_id', 'line_key',
+    ).annotate(keep_id=Max('id')).values_list('keep_id', flat=True)
+    Counter.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0003_machine_health_counter'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='machinehealthcounter',
+            name='uq_health_counter_key',
+        ),
+        migrations.AddField(
+            model_name='machinehealthcounter',
+            name='line_key',
+            field=models.PositiveIntegerField(default=0, verbose_name='کلید خط (0 = بدون خط)'),
+        ),
+        migrations.RunPython(fill_line_key, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='machinehealthcounter',
+            constraint=models.UniqueConstraint(fields=('date', 'machine', 'line_key'), name='uq_health_counter_key'),
+        ),
+    ]
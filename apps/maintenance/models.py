@@ -279,6 +279,57 @@ class DowntimeLog(models.Model):
         return f"{self.machine.code} | {self.get_reason_category_display()} | {self.duration_min} دقیقه"
 
 
+# ═══════════════════════════════════════════════════════════════
+# MACHINE HEALTH COUNTER (شمارنده روزانه توقفات)
+# ═══════════════════════════════════════════════════════════════
+
+class MachineHealthCounter(models.Model):
+    """
+    شمارنده روزانه توقفات هر ماشین (روز = تاریخ start_time).
+    با ذخیره/حذف DowntimeLog بروز می‌شود (maintenance/counters.py)؛
+    پنجره ۳۰ روزه = جمع حداکثر ۳۰ ردیف کوچک به‌جای aggregate روی لاگ خام.
+    """
+
+    date = models.DateField(verbose_name='تاریخ')
+    machine = models.ForeignKey(
+        'core.Machine', on_delete=models.CASCADE,
+        verbose_name='ماشین', related_name='health_counters',
+    )
+    production_line = models.ForeignKey(
+        'core.ProductionLine', on_delete=models.SET_NULL,
+        blank=True, null=True,
+        verbose_name='خط تولید', related_name='health_counters',
+    )
+    # کلید یکتای خط: شناسه خط یا 0 (بدون خط) — MySQL دو NULL را در UNIQUE تکراری نمی‌شمارد
+    line_key = models.PositiveIntegerField(default=0, verbose_name='کلید خط (0 = بدون خط)')
+    downtime_count = models.PositiveIntegerField(default=0, verbose_name='تعداد توقف')
+    downtime_min = models.PositiveIntegerField(default=0, verbose_name='مدت توقف (دقیقه)')
+    production_loss = models.DecimalField(
+        max_digits=14, decimal_places=3, default=0,
+        verbose_name='تولید از دست رفته (kg)',
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
+
+    class Meta:
+        db_table = 'maintenance_machine_health_counter'
+        verbose_name = 'شمارنده سلامت ماشین'
+        verbose_name_plural = 'شمارنده‌های سلامت ماشین'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'machine', 'line_key'],
+                name='uq_health_counter_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['machine', 'date'], name='idx_hc_machine_date'),
+            models.Index(fields=['date'], name='idx_hc_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id} | {self.date} | {self.downtime_count} توقف"
+
+
 # ═══════════════════════════════════════════════════════════════
 # MACHINE SERVICE DATE (سوابق سرویس)
 # ═══════════════════════════════════════════════════════════════
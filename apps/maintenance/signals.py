@@ -0,0 +1,35 @@
+"""
+Diaco MES - Maintenance Signals
+=================================
+نگهداری افزایشی MachineHealthCounter.
+
+  pre_save    → کلید فعلی توقف در دیتابیس (اگر روز/ماشین/خط عوض شود)
+  post_save   → سطل قبلی و جدید بعد از commit دوباره محاسبه می‌شوند
+  post_delete → سطل توقف حذف‌شده دوباره محاسبه می‌شود
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import instance_key, refresh_counter, stored_key
+from .models import DowntimeLog
+
+
+def _schedule(keys):
+    for key in {k for k in keys if k is not None}:
+        transaction.on_commit(lambda key=key: refresh_counter(key))
+
+
+@receiver(pre_save, sender=DowntimeLog)
+def capture_counter_key(sender, instance, **kwargs):
+    instance._counter_old_key = stored_key(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=DowntimeLog)
+def update_counter_on_save(sender, instance, **kwargs):
+    _schedule([getattr(instance, '_counter_old_key', None), instance_key(instance)])
+
+
+@receiver(post_delete, sender=DowntimeLog)
+def update_counter_on_delete(sender, instance, **kwargs):
+    _schedule([instance_key(instance)])
@@ -4,3 +4,6 @@ class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reports'
     verbose_name = 'گزارشات'
+
+    def ready(self):
+        import apps.reports.signals  # noqa: F401
@@ -0,0 +1,278 @@
+"""
+Diaco MES - Closed-Day Report Cache
+======================================
+نتایج جزئی روزانه گزارش‌ها برای روزهای بسته‌شده.
+
+منطق:
+─────
+  روز «بسته» = قدیمی‌تر از REPORT_CLOSE_DAYS روز قبل؛ نتیجه جزئی آن
+  (به کلید گزارش، روز، خط، پارامترها) یک بار محاسبه و در ReportDayCache
+  ذخیره می‌شود و دیگر تغییر نمی‌کند.
+
+  day_partials(name, from, to):
+      روزهای بسته  → یک کوئری روی ReportDayCache؛ روزهای جاافتاده با یک
+                     محاسبه (بازه اولین تا آخرین روز جاافتاده) پر و ذخیره می‌شوند.
+      دنباله باز   → همیشه تازه محاسبه می‌شود (ذخیره نمی‌شود).
+  خروجی: {day: partial} برای همه روزهای بازه (روز بدون داده → []).
+  ادغام partialها با توابع merge_* همین ماژول.
+
+  توقفات (دقیقه/تعداد/تولید از دست رفته) اینجا نیست؛ از MachineHealthCounter
+  (maintenance/counters.py) خوانده می‌شود.
+
+  ابطال: ویرایش/حذف سابقه‌دار (تاریخ بسته) → سیگنال (reports/signals.py)
+  ردیف‌های همان روز را برای گزارش‌های وابسته به آن مدل حذف می‌کند.
+  ترمیم دستی (مثلاً بعد از bulk update): python manage.py clear_report_cache
+"""
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+
+from apps.ai_ready.utils import calculate_oee_bulk
+from apps.core.models import Machine
+from apps.spinning.models import Production as SpinningProd
+from apps.winding.models import Production as WindingProd
+from apps.tfo.models import Production as TFOProd
+from apps.heatset.models import Batch as HeatsetBatch
+from apps.maintenance.models import DowntimeLog
+
+from .models import ReportDayCache
+
+
+def closed_before():
+    """اولین روز باز؛ روزهای قبل از آن بسته‌اند."""
+    return date.today() - timedelta(days=settings.REPORT_CLOSE_DAYS)
+
+
+# ═══════════════════════════════════════════════════════════════
+# محاسبه نتایج جزئی روزانه — خروجی: {day: list} (فقط JSON-پذیر)
+# ═══════════════════════════════════════════════════════════════
+
+OEE_KEYS = ('availability', 'performance', 'quality', 'oee')
+
+
+def _oee_ring(date_from, date_to, line):
+    """[[machine_id, availability, performance, quality, oee], ...] ماشین‌های رینگ دارای تولید."""
+    ids = list(Machine.objects.filter(machine_type='ring').values_list('id', flat=True))
+    bulk = calculate_oee_bulk(ids, date_from, date_to)
+    # مقادیر روزانه مانند calculate_oee با دو رقم اعشار گرد می‌شوند
+    daily = {key: np.round(bulk[key], 2) for key in OEE_KEYS}
+    out = {}
+    for j, day in enumerate(bulk['dates']):
+        rows = [[ids[i]] + [float(daily[key][i, j]) for key in OEE_KEYS]
+                for i in np.flatnonzero(bulk['batch_count'][:, j])]
+        if rows:
+            out[day] = rows
+    return out
+
+
+OEE_DAY_KEYS = ('downtime_min', 'batch_count', 'availability', 'performance', 'quality', 'oee')
+
+
+def _oee_machines(date_from, date_to, line):
+    """[[machine_id, downtime_min, batch_count, availability, performance, quality, oee], ...]
+    همه ماشین‌های دارای توقف یا تولید رینگ (مقادیر مانند calculate_oee گرد می‌شوند)."""
+    ids = list(Machine.objects.values_list('id', flat=True))
+    bulk = calculate_oee_bulk(ids, date_from, date_to)
+    active = (bulk['downtime_min'] > 0) | (bulk['batch_count'] > 0)
+    out = {}
+    for j, day in enumerate(bulk['dates']):
+        rows = [
+            [ids[i], int(bulk['downtime_min'][i, j]), int(bulk['batch_count'][i, j])]
+            + [round(float(bulk[key][i, j]), 2) for key in OEE_KEYS]
+            for i in np.flatnonzero(active[:, j])
+        ]
+        if rows:
+            out[day] = rows
+    return out
+
+
+WINDING_GRADES = [
+    ('A (< 20)',  Q(cuts_per_100km__lt=20)),
+    ('B (20-40)', Q(cuts_per_100km__gte=20, cuts_per_100km__lt=40)),
+    ('C (40-60)', Q(cuts_per_100km__gte=40, cuts_per_100km__lt=60)),
+    ('D (≥ 60)',  Q(cuts_per_100km__gte=60)),
+]
+
+TFO_TWISTS = [
+    ('S — چپ‌تاب', Q(twist_direction='S')),
+    ('Z — راست‌تاب', Q(twist_direction='Z')),
+]
+
+HEATSET_STABILITY = [
+    ('عالی',  'excellent'),
+    ('خوب',   'good'),
+    ('متوسط', 'fair'),
+    ('ضعیف',  'poor'),
+]
+
+
+def _counts_by_day(qs, buckets):
+    """[count هر سطل] به تفکیک production_date با یک کوئری."""
+    ann = {f'c{i}': Count('id', filter=q) for i, (_label, q) in enumerate(buckets)}
+    rows = qs.values('production_date').annotate(**ann).order_by()
+    return {r['production_date']: [r[f'c{i}'] for i in range(len(buckets))] for r in rows}
+
+
+def _line_qs(Model, date_from, date_to, line):
+    qs = Model.objects.filter(production_date__range=(date_from, date_to))
+    return qs.filter(production_line=line) if line else qs
+
+
+def _winding_grades(date_from, date_to, line):
+    return _counts_by_day(_line_qs(WindingProd, date_from, date_to, line), WINDING_GRADES)
+
+
+def _tfo_twists(date_from, date_to, line):
+    return _counts_by_day(_line_qs(TFOProd, date_from, date_to, line), TFO_TWISTS)
+
+
+def _heatset_fibers(date_from, date_to, line):
+    """[[fiber, count, pass, temp_sum, temp_n, shrink_sum, shrink_n, stability counts...], ...]"""
+    ann = {f's{i}': Count('id', filter=Q(twist_stability=code)) for i, (_l, code) in enumerate(HEATSET_STABILITY)}
+    rows = _line_qs(HeatsetBatch, date_from, date_to, line).values('production_date', 'fiber_type').annotate(
+        count=Count('id'), pass_count=Count('id', filter=Q(quality_result='pass')),
+        temp_sum=Sum('temperature_c'), temp_n=Count('temperature_c'),
+        shrink_sum=Sum('shrinkage_pct'), shrink_n=Count('shrinkage_pct'),
+        **ann
+    ).order_by()
+    out = {}
+    for r in rows:
+        out.setdefault(r['production_date'], []).append([
+            r['fiber_type'], r['count'], r['pass_count'],
+            str(r['temp_sum'] or 0), r['temp_n'], str(r['shrink_sum'] or 0), r['shrink_n'],
+            *[r[f's{i}'] for i in range(len(HEATSET_STABILITY))],
+        ])
+    return out
+
+
+# name: (تابع محاسبه، آیا به خط وابسته است، [(مدل، فیلد تاریخ)] برای ابطال)
+DAY_PARTIALS = {
+    'oee_ring':        (_oee_ring, False, [(SpinningProd, 'production_date'), (DowntimeLog, 'start_time')]),
+    'oee_machines':    (_oee_machines, False, [(SpinningProd, 'production_date'), (DowntimeLog, 'start_time')]),
+    'winding_grades':  (_winding_grades, True, [(WindingProd, 'production_date')]),
+    'tfo_twists':      (_tfo_twists, True, [(TFOProd, 'production_date')]),
+    'heatset_fibers':  (_heatset_fibers, True, [(HeatsetBatch, 'production_date')]),
+}
+
+# مدل → [(نام partial، فیلد تاریخ)]
+PARTIALS_FOR_MODEL = {}
+for _name, (_fn, _by_line, _sources) in DAY_PARTIALS.items():
+    for _Model, _field in _sources:
+        PARTIALS_FOR_MODEL.setdefault(_Model, []).append((_name, _field))
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن / نوشتن
+# ═══════════════════════════════════════════════════════════════
+
+def _params_hash(params):
+    if not params:
+        return ''
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _json(partials):
+    """گرد کردن به شکل ذخیره‌شده (tuple → list) تا روز باز و بسته یکسان باشند."""
+    return json.loads(json.dumps(partials, default=str))
+
+
+def day_partials(name, date_from, date_to, line=None, **params):
+    """{day: partial} برای همه روزهای بازه — روزهای بسته از کش، دنباله باز تازه."""
+    compute, by_line, _sources = DAY_PARTIALS[name]
+    line = line if by_line else None
+    key = {'report': name, 'line_id': line.pk if line else 0, 'params_hash': _params_hash(params)}
+    days = {}
+
+    first_open = closed_before()
+    closed_to = min(date_to, first_open - timedelta(days=1))
+    if date_from <= closed_to:
+        days.update(
+            ReportDayCache.objects.filter(day__range=(date_from, closed_to), **key)
+            .values_list('day', 'payload')
+        )
+        missing = [date_from + timedelta(days=i) for i in range((closed_to - date_from).days + 1)]
+        missing = [d for d in missing if d not in days]
+        if missing:
+            fresh = compute(missing[0], missing[-1], line, **params)
+            rows = []
+            for d in missing:
+                days[d] = _json(fresh.get(d, []))
+                rows.append(ReportDayCache(day=d, payload=days[d], **key))
+            ReportDayCache.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+    open_from = max(date_from, first_open)
+    if open_from <= date_to:
+        fresh = compute(open_from, date_to, line, **params)
+        for i in range((date_to - open_from).days + 1):
+            d = open_from + timedelta(days=i)
+            days[d] = _json(fresh.get(d, []))
+    return days
+
+
+def invalidate_days(days, names=None):
+    """حذف نتایج جزئی روزهای داده‌شده (همه گزارش‌ها یا names)."""
+    qs = ReportDayCache.objects.filter(day__in=list(days))
+    if names is not None:
+        qs = qs.filter(report__in=list(names))
+    deleted, _ = qs.delete()
+    return deleted
+
+
+def day_of(value):
+    """تاریخ یک فیلد date/datetime."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+# ═══════════════════════════════════════════════════════════════
+# ادغام
+# ═══════════════════════════════════════════════════════════════
+
+def merge_oee_ring(days):
+    """{machine_id: {availability, performance, quality, oee}} — میانگین روزهای دارای تولید."""
+    acc = {}
+    for d in sorted(days):
+        for mid, *values in days[d]:
+            totals = acc.setdefault(mid, [0.0] * len(OEE_KEYS) + [0])
+            for k, v in enumerate(values):
+                totals[k] += v
+            totals[-1] += 1
+    return {
+        mid: {key: round(totals[k] / totals[-1], 1) for k, key in enumerate(OEE_KEYS)}
+        for mid, totals in acc.items()
+    }
+
+
+def merge_counts(days, buckets):
+    """{برچسب: تعداد} از partialهای _counts_by_day."""
+    totals = [0] * len(buckets)
+    for counts in days.values():
+        for i, c in enumerate(counts):
+            totals[i] += c
+    return {label: totals[i] for i, (label, _q) in enumerate(buckets)}
+
+
+def merge_heatset_fibers(days):
+    """(by_fiber مرتب بر اساس تعداد، stability_dist)."""
+    fibers = {}
+    stability = [0] * len(HEATSET_STABILITY)
+    for rows in days.values():
+        for fiber, count, passed, t_sum, t_n, s_sum, s_n, *stab in rows:
+            f = fibers.setdefault(fiber, [0, 0, Decimal(0), 0, Decimal(0), 0])
+            f[0] += count; f[1] += passed
+            f[2] += Decimal(t_sum); f[3] += t_n
+            f[4] += Decimal(s_sum); f[5] += s_n
+            for i, c in enumerate(stab):
+                stability[i] += c
+    by_fiber = sorted(
+        ({'fiber_type': fiber, 'count': f[0], 'pass_count': f[1],
+          'avg_temp': f[2] / f[3] if f[3] else None,
+          'avg_shrinkage': f[4] / f[5] if f[5] else None}
+         for fiber, f in fibers.items()),
+        key=lambda r: (-r['count'], r['fiber_type']),
+    )
+    return by_fiber, {label: stability[i] for i, (label, _code) in enumerate(HEATSET_STABILITY)}
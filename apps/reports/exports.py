@@ -0,0 +1,233 @@
+"""
+Diaco MES - Streaming Report Exports
+=======================================
+خروجی Excel/CSV گزارش‌ها با حافظه ثابت.
+
+منطق:
+─────
+  هر خروجی = یک ردیف در EXPORTS: عنوان شیت، رنگ سرستون، سرستون‌ها،
+  فیلدهای values_list و تابع تبدیل ردیف. داده با
+  values_list().iterator(chunk_size) خوانده می‌شود؛ هیچ شیء مدلی ساخته نمی‌شود.
+
+  CSV  (?format=csv): هر ردیف همان لحظه با StreamingHttpResponse ارسال می‌شود.
+  XLSX: openpyxl در حالت write-only ردیف‌ها را مستقیم روی فایل موقت
+        می‌نویسد و فایل نهایی تکه‌تکه (FileResponse) از دیسک استریم می‌شود؛
+        حافظه مستقل از تعداد ردیف است.
+"""
+import csv
+import tempfile
+
+import jdatetime
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+from apps.spinning.models import Production as SpinningProd
+from apps.winding.models import Production as WindingProd
+from apps.heatset.models import Batch as HeatsetBatch
+from apps.maintenance.models import DowntimeLog
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+# ═══════════════════════════════════════════════════════════════
+# ابزار تبدیل مقدار
+# ═══════════════════════════════════════════════════════════════
+
+def _jdate(d):
+    return jdatetime.date.fromgregorian(date=d).strftime('%Y/%m/%d')
+
+
+def _jdatetime(dt):
+    return jdatetime.datetime.fromgregorian(datetime=dt).strftime('%Y/%m/%d %H:%M') if dt else ''
+
+
+def _full_name(first, last):
+    """هم‌ارز User.get_full_name."""
+    return f"{first or ''} {last or ''}".strip()
+
+
+def _shift_str(name, code, start, end):
+    """هم‌ارز Shift.__str__ (شیفت خالی → رشته خالی)."""
+    if name is None:
+        return ''
+    return f"{name} ({code}) | {start:%H:%M}-{end:%H:%M}"
+
+
+def _labels(model, field):
+    """نگاشت مقدار → برچسب choices (مانند get_FOO_display)."""
+    return {k: str(v) for k, v in model._meta.get_field(field).flatchoices}
+
+
+def _display(labels, value):
+    return labels.get(value, value)
+
+
+OPERATOR_FIELDS = ('operator__first_name', 'operator__last_name')
+SHIFT_FIELDS = ('shift__name', 'shift__code', 'shift__start_time', 'shift__end_time')
+
+SP_STATUS    = _labels(SpinningProd, 'status')
+WD_STATUS    = _labels(WindingProd, 'status')
+WD_PACKAGE   = _labels(WindingProd, 'package_type')
+HS_TYPE      = _labels(HeatsetBatch, 'machine_type_hs')
+HS_FIBER     = _labels(HeatsetBatch, 'fiber_type')
+HS_QUALITY   = _labels(HeatsetBatch, 'quality_result')
+HS_STABILITY = _labels(HeatsetBatch, 'twist_stability')
+DT_REASON    = _labels(DowntimeLog, 'reason_category')
+
+
+# ═══════════════════════════════════════════════════════════════
+# تعریف خروجی‌ها
+# ═══════════════════════════════════════════════════════════════
+
+def _production_row(r):
+    (batch, day, machine, op_first, op_last, sh_name, sh_code, sh_start, sh_end,
+     yarn_count, tpm, spindles, inp, out, breakage, eff, st) = r
+    return [batch, _jdate(day), machine, _full_name(op_first, op_last),
+            _shift_str(sh_name, sh_code, sh_start, sh_end), yarn_count, float(tpm or 0), spindles,
+            float(inp or 0), float(out or 0), breakage, float(eff or 0), _display(SP_STATUS, st)]
+
+
+def _winding_row(r):
+    (batch, day, machine, op_first, op_last, sh_name, sh_code, sh_start, sh_end,
+     inp, out, waste, cuts, splices, eff, pkg, st) = r
+    return [batch, _jdate(day), machine, _full_name(op_first, op_last),
+            _shift_str(sh_name, sh_code, sh_start, sh_end), float(inp or 0), float(out or 0),
+            float(waste or 0), cuts, splices, float(eff or 0), _display(WD_PACKAGE, pkg), _display(WD_STATUS, st)]
+
+
+def _heatset_row(r):
+    (batch, day, machine, op_first, op_last, mtype, ftype, temp, pressure, duration,
+     weight, packages, result, shrinkage, stab) = r
+    return [batch, _jdate(day), machine, _full_name(op_first, op_last),
+            _display(HS_TYPE, mtype), _display(HS_FIBER, ftype), float(temp), float(pressure or 0),
+            duration, float(weight), packages, _display(HS_QUALITY, result) if result else '',
+            float(shrinkage or 0), _display(HS_STABILITY, stab) if stab else '']
+
+
+def _downtime_row(r):
+    (machine, start, duration, category, detail, loss, op_first, op_last,
+     sh_name, sh_code, sh_start, sh_end) = r
+    return [machine, _jdatetime(start), duration, _display(DT_REASON, category), detail,
+            float(loss or 0), _full_name(op_first, op_last), _shift_str(sh_name, sh_code, sh_start, sh_end)]
+
+
+# name: {model, date_lookup, order, fields, row, title, color, headers, filename}
+EXPORTS = {
+    'production': {
+        'model': SpinningProd, 'date_lookup': 'production_date__range', 'order': 'production_date',
+        'fields': ('batch_number', 'production_date', 'machine__code', *OPERATOR_FIELDS, *SHIFT_FIELDS,
+                   'yarn_count', 'twist_tpm', 'num_spindles_active', 'input_weight', 'output_weight',
+                   'breakage_count', 'efficiency_pct', 'status'),
+        'row': _production_row,
+        'title': 'تولید رینگ', 'color': '4361EE', 'filename': 'spinning',
+        'headers': ['شماره بچ', 'تاریخ', 'ماشین', 'اپراتور', 'شیفت', 'نمره نخ', 'تاب', 'دوک',
+                    'ورودی(kg)', 'خروجی(kg)', 'پارگی', 'راندمان%', 'وضعیت'],
+    },
+    'winding': {
+        'model': WindingProd, 'date_lookup': 'production_date__range', 'order': 'production_date',
+        'fields': ('batch_number', 'production_date', 'machine__code', *OPERATOR_FIELDS, *SHIFT_FIELDS,
+                   'input_weight_kg', 'output_weight_kg', 'waste_weight_kg', 'cuts_per_100km',
+                   'splices_per_100km', 'efficiency_pct', 'package_type', 'status'),
+        'row': _winding_row,
+        'title': 'بوبین‌پیچی', 'color': '0891B2', 'filename': 'winding',
+        'headers': ['شماره بچ', 'تاریخ', 'ماشین', 'اپراتور', 'شیفت', 'ورودی(kg)', 'خروجی(kg)',
+                    'ضایعات(kg)', 'برش/100km', 'اتصال/100km', 'راندمان%', 'نوع بوبین', 'وضعیت'],
+    },
+    'heatset': {
+        'model': HeatsetBatch, 'date_lookup': 'production_date__range', 'order': 'production_date',
+        'fields': ('batch_number', 'production_date', 'machine__code', *OPERATOR_FIELDS,
+                   'machine_type_hs', 'fiber_type', 'temperature_c', 'steam_pressure_bar', 'duration_min',
+                   'batch_weight_kg', 'packages_count', 'quality_result', 'shrinkage_pct', 'twist_stability'),
+        'row': _heatset_row,
+        'title': 'هیت‌ست', 'color': 'DC2626', 'filename': 'heatset',
+        'headers': ['شماره بچ', 'تاریخ', 'ماشین', 'اپراتور', 'نوع دستگاه', 'نوع الیاف', 'دما(°C)',
+                    'فشار(bar)', 'مدت(min)', 'وزن(kg)', 'تعداد بوبین', 'نتیجه', 'آنکاژ%', 'پایداری تاب'],
+    },
+    'downtime': {
+        'model': DowntimeLog, 'date_lookup': 'start_time__date__range', 'order': 'start_time',
+        'fields': ('machine__code', 'start_time', 'duration_min', 'reason_category', 'reason_detail',
+                   'production_loss', *OPERATOR_FIELDS, *SHIFT_FIELDS),
+        'row': _downtime_row,
+        'title': 'توقفات', 'color': 'DC3545', 'filename': 'downtime',
+        'headers': ['ماشین', 'تاریخ شروع', 'مدت(min)', 'دسته دلیل', 'جزئیات', 'تلفات(kg)', 'اپراتور', 'شیفت'],
+    },
+}
+
+
+def export_rows(name, date_from, date_to):
+    """ژنراتور ردیف‌های آماده خروجی — خواندن تکه‌ای بدون ساخت شیء مدل."""
+    spec = EXPORTS[name]
+    qs = spec['model'].objects.filter(
+        **{spec['date_lookup']: (date_from, date_to)}
+    ).order_by(spec['order']).values_list(*spec['fields'])
+    row = spec['row']
+    for r in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row(r)
+
+
+# ═══════════════════════════════════════════════════════════════
+# پاسخ‌های استریم
+# ═══════════════════════════════════════════════════════════════
+
+class _Echo:
+    """فایل شبه‌نوشتنی برای csv.writer — خط تولیدشده را برمی‌گرداند."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_stream(name, date_from, date_to):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM تا Excel فارسی را UTF-8 بخواند
+    yield writer.writerow(EXPORTS[name]['headers'])
+    for row in export_rows(name, date_from, date_to):
+        yield writer.writerow(row)
+
+
+def _xlsx_file(name, date_from, date_to):
+    """ساخت xlsx در حالت write-only روی فایل موقت؛ خروجی: فایل باز در ابتدای آن."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    spec = EXPORTS[name]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(spec['title'])
+    ws.sheet_view.rightToLeft = True
+    hf = PatternFill(start_color=spec['color'], end_color=spec['color'], fill_type='solid')
+    header = []
+    for col, h in enumerate(spec['headers'], 1):
+        ws.column_dimensions[get_column_letter(col)].width = 16
+        c = WriteOnlyCell(ws, value=h)
+        c.fill = hf
+        c.font = Font(bold=True, color='FFFFFF', size=11)
+        c.alignment = Alignment(horizontal='center')
+        header.append(c)
+    ws.append(header)
+    for row in export_rows(name, date_from, date_to):
+        ws.append(row)
+
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def export_response(name, date_from, date_to, fmt='xlsx'):
+    """پاسخ استریم خروجی name در بازه؛ fmt: xlsx | csv."""
+    filename = f"{EXPORTS[name]['filename']}_{date_from}_{date_to}"
+    if fmt == 'csv':
+        response = StreamingHttpResponse(
+            _csv_stream(name, date_from, date_to), content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename={filename}.csv'
+        return response
+
+    try:
+        tmp = _xlsx_file(name, date_from, date_to)
+    except ImportError:
+        return HttpResponse('openpyxl نصب نیست', status=500)
+    response = FileResponse(tmp, content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename={filename}.xlsx'
+    return response
@@ -0,0 +1,170 @@
+"""
+Diaco MES - Background Report Jobs
+=====================================
+اجرای گزارش‌های سنگین خارج از درخواست وب.
+
+منطق:
+─────
+  view  → submit_job(): ردیف ReportJob (pending) — درخواست یکسان (همان
+          گزارش و پارامترها) تا JOB_RESULT_TTL از همان ردیف استفاده می‌کند.
+  worker (run_report_jobs) → claim_pending(): ردیف‌ها را اتمیک running می‌کند
+          و execute_job() را در پروسه‌های ProcessPoolExecutor اجرا می‌کند.
+  execute_job() → تابع داده گزارش (*_data در views) → context به JSON در result.
+  صفحه انتظار وضعیت را poll می‌کند و پس از done همان آدرس را دوباره باز می‌کند؛
+  view این بار context را از result (job_result) رندر می‌کند.
+"""
+import hashlib
+import json
+import traceback
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.core.models import ProductionLine
+
+from .models import ReportJob
+
+JOB_RESULT_TTL = timedelta(minutes=15)     # استفاده مجدد از نتیجه آماده
+JOB_STALE_AFTER = timedelta(minutes=30)    # running رهاشده (worker قطع شده) → دوباره در صف
+JOB_RETENTION = timedelta(days=7)          # حذف ردیف‌های پایان‌یافته قدیمی
+
+# report: {data: تابع داده، template، title، date_params: پارامترهای تاریخ}
+REPORT_JOBS = {
+    'oee': {
+        'data': 'apps.reports.views.oee_report_data',
+        'template': 'reports/oee_report.html',
+        'title': 'گزارش راندمان و OEE',
+        'date_params': ('date_from', 'date_to'),
+    },
+    'compare': {
+        'data': 'apps.reports.views.compare_periods_data',
+        'template': 'reports/compare_periods.html',
+        'title': 'مقایسه بازه زمانی',
+        'date_params': ('a_from', 'a_to', 'b_from', 'b_to'),
+    },
+    'chain': {
+        'data': 'apps.reports.views.production_chain_data',
+        'template': 'reports/production_chain.html',
+        'title': 'گزارش زنجیره تولید',
+        'date_params': ('date_from', 'date_to'),
+    },
+}
+
+
+def runs_in_background(span_days):
+    """آیا گزارشی با این طول بازه باید در پس‌زمینه اجرا شود."""
+    min_days = settings.REPORT_JOB_MIN_DAYS
+    return bool(min_days) and span_days >= min_days
+
+
+# ═══════════════════════════════════════════════════════════════
+# پارامترها (JSON ↔ پایتون)
+# ═══════════════════════════════════════════════════════════════
+
+def _dump_params(report, params):
+    out = {key: params[key].isoformat() for key in REPORT_JOBS[report]['date_params']}
+    line = params.get('line')
+    out['line'] = line.pk if line else None
+    return out
+
+
+def _load_params(report, stored):
+    params = {key: date.fromisoformat(stored[key]) for key in REPORT_JOBS[report]['date_params']}
+    line_id = stored.get('line')
+    params['line'] = ProductionLine.objects.filter(pk=line_id).first() if line_id else None
+    return params
+
+
+def _params_hash(report, stored):
+    return hashlib.sha1(json.dumps([report, stored], sort_keys=True).encode()).hexdigest()
+
+
+# ═══════════════════════════════════════════════════════════════
+# سمت وب
+# ═══════════════════════════════════════════════════════════════
+
+def submit_job(report, params, user=None):
+    """ReportJob فعال/تازه با همین پارامترها یا یک ردیف pending جدید."""
+    stored = _dump_params(report, params)
+    params_hash = _params_hash(report, stored)
+    fresh_since = timezone.now() - JOB_RESULT_TTL
+    existing = ReportJob.objects.filter(
+        params_hash=params_hash, report=report,
+        status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING, ReportJob.Status.DONE],
+    ).order_by('-created_at').first()
+    if existing and (existing.status != ReportJob.Status.DONE or existing.finished_at >= fresh_since):
+        return existing
+    return ReportJob.objects.create(
+        report=report, params=stored, params_hash=params_hash,
+        created_by=user if user and user.is_authenticated else None,
+    )
+
+
+def job_result(job):
+    """context ذخیره‌شده با تاریخ‌های بازگردانده به date (برای فیلترهای قالب)."""
+    ctx = dict(job.result)
+    for key in REPORT_JOBS[job.report]['date_params']:
+        ctx[key] = date.fromisoformat(ctx[key])
+    return ctx
+
+
+# ═══════════════════════════════════════════════════════════════
+# سمت worker
+# ═══════════════════════════════════════════════════════════════
+
+def claim_pending(limit):
+    """حداکثر limit ردیف pending را اتمیک running می‌کند؛ خروجی: شناسه‌ها."""
+    claimed = []
+    candidates = ReportJob.objects.filter(
+        status=ReportJob.Status.PENDING,
+    ).order_by('created_at').values_list('pk', flat=True)[:limit]
+    for pk in candidates:
+        # update شرطی: اگر worker دیگری زودتر برداشته باشد 0 برمی‌گرداند
+        if ReportJob.objects.filter(pk=pk, status=ReportJob.Status.PENDING).update(
+            status=ReportJob.Status.RUNNING, started_at=timezone.now(),
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def execute_job(pk):
+    """اجرای یک ReportJob برداشته‌شده (در پروسه worker)؛ خروجی: وضعیت نهایی."""
+    job = ReportJob.objects.get(pk=pk)
+    spec = REPORT_JOBS[job.report]
+    try:
+        ctx = import_string(spec['data'])(**_load_params(job.report, job.params))
+        job.result = json.loads(json.dumps(ctx, cls=DjangoJSONEncoder))
+        job.status = ReportJob.Status.DONE
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = ReportJob.Status.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'finished_at'])
+    return job.status
+
+
+def mark_failed(pk, error):
+    """ثبت شکست ردیفی که پروسه آن از کار افتاده است."""
+    ReportJob.objects.filter(pk=pk, status=ReportJob.Status.RUNNING).update(
+        status=ReportJob.Status.FAILED, error=error, finished_at=timezone.now(),
+    )
+
+
+def requeue_stale():
+    """ردیف‌های running رهاشده (worker قطع شده) دوباره در صف قرار می‌گیرند."""
+    return ReportJob.objects.filter(
+        status=ReportJob.Status.RUNNING,
+        started_at__lt=timezone.now() - JOB_STALE_AFTER,
+    ).update(status=ReportJob.Status.PENDING, started_at=None)
+
+
+def prune_jobs():
+    """حذف ردیف‌های پایان‌یافته قدیمی‌تر از JOB_RETENTION."""
+    deleted, _ = ReportJob.objects.filter(
+        status__in=[ReportJob.Status.DONE, ReportJob.Status.FAILED],
+        created_at__lt=timezone.now() - JOB_RETENTION,
+    ).delete()
+    return deleted
@@ -0,0 +1,48 @@
+"""
+Diaco MES - Clear Closed-Day Report Cache
+============================================
+حذف نتایج جزئی روزانه (ReportDayCache) — بعد از ویرایش گروهی داده‌ها
+(update/bulk_create بدون سیگنال) یا تغییر منطق گزارش.
+
+Usage:
+    python manage.py clear_report_cache
+    python manage.py clear_report_cache --report oee_ring
+    python manage.py clear_report_cache --from 2025-01-01 --to 2025-03-31
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reports.daycache import DAY_PARTIALS
+from apps.reports.models import ReportDayCache
+
+
+class Command(BaseCommand):
+    help = 'حذف کش روزانه گزارش‌ها (ReportDayCache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--report', type=str, default='all',
+            help=f'نتیجه جزئی مشخص ({"/".join(DAY_PARTIALS)}) یا all',
+        )
+        parser.add_argument('--from', dest='date_from', type=str, help='از تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, help='تا تاریخ (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        qs = ReportDayCache.objects.all()
+        target = options['report']
+        if target != 'all':
+            if target not in DAY_PARTIALS:
+                raise CommandError(f'گزارش نامعتبر: {target}')
+            qs = qs.filter(report=target)
+
+        try:
+            if options['date_from']:
+                qs = qs.filter(day__gte=date.fromisoformat(options['date_from']))
+            if options['date_to']:
+                qs = qs.filter(day__lte=date.fromisoformat(options['date_to']))
+        except ValueError as exc:
+            raise CommandError(f'تاریخ نامعتبر: {exc}')
+
+        deleted, _ = qs.delete()
+        self.stdout.write(self.style.SUCCESS(f'✓ {deleted} ردیف کش روزانه حذف شد'))
@@ -0,0 +1,48 @@
+"""
+Diaco MES - Rebuild Daily Stage Rollup
+=========================================
+پرکردن اولیه یا ترمیم جدول DailyStageRollup از داده خام تولید.
+برای اجرای یکباره بعد از migrate یا cron شبانه (ترمیم).
+
+Usage:
+    python manage.py rebuild_rollup
+    python manage.py rebuild_rollup --stage winding
+    python manage.py rebuild_rollup --from 2025-01-01 --to 2025-03-31
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reports.rollup import ROLLUP_STAGES, rebuild
+
+
+class Command(BaseCommand):
+    help = 'بازسازی جدول خلاصه روزانه مراحل تولید (DailyStageRollup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stage', type=str, default='all',
+            help=f'مرحله مشخص ({"/".join(ROLLUP_STAGES)}) یا all',
+        )
+        parser.add_argument('--from', dest='date_from', type=str, help='از تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, help='تا تاریخ (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        target = options['stage']
+        if target != 'all' and target not in ROLLUP_STAGES:
+            raise CommandError(f'مرحله نامعتبر: {target}')
+        stages = list(ROLLUP_STAGES) if target == 'all' else [target]
+
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as exc:
+            raise CommandError(f'تاریخ نامعتبر: {exc}')
+
+        total = 0
+        for stage in stages:
+            count = rebuild(stage, date_from, date_to)
+            total += count
+            self.stdout.write(self.style.SUCCESS(f'  ✓ {stage}: {count} ردیف خلاصه'))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ کل: {total} ردیف DailyStageRollup بازسازی شد'))
@@ -0,0 +1,84 @@
+"""
+Diaco MES - Report Job Worker
+================================
+اجرای صف ReportJob (گزارش‌های سنگین با بازه بلند) در پروسه‌های موازی.
+بیرون از Passenger اجرا شود (systemd / supervisor) یا با --once از cron.
+
+Usage:
+    python manage.py run_report_jobs
+    python manage.py run_report_jobs --workers 4
+    python manage.py run_report_jobs --once
+"""
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# ── سمت پروسه فرزند ───────────────────────────────────────────
+# پروسه‌ها با spawn ساخته می‌شوند (اتصال دیتابیس والد به ارث نمی‌رسد)؛
+# این ماژول در فرزند قبل از django.setup() import می‌شود، پس import مدل‌ها
+# داخل توابع است.
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _run_job(pk):
+    from apps.reports.jobs import execute_job
+    return execute_job(pk)
+
+
+class Command(BaseCommand):
+    help = 'اجرای صف گزارش‌های پس‌زمینه (ReportJob) با ProcessPoolExecutor'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.REPORT_JOB_WORKERS,
+            help='تعداد پروسه‌های موازی',
+        )
+        parser.add_argument('--once', action='store_true', help='اجرای صف فعلی و خروج')
+        parser.add_argument('--poll', type=float, default=2.0, help='فاصله بررسی صف (ثانیه)')
+
+    def handle(self, *args, **options):
+        from django.db import close_old_connections
+        from apps.reports.jobs import claim_pending, mark_failed, prune_jobs, requeue_stale
+
+        workers = max(1, options['workers'])
+        requeued = requeue_stale()
+        pruned = prune_jobs()
+        self.stdout.write(f'worker: {workers} پروسه | {requeued} ردیف رهاشده دوباره در صف | {pruned} ردیف قدیمی حذف شد')
+
+        in_flight = {}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        ) as pool:
+            while True:
+                close_old_connections()
+                free = workers - len(in_flight)
+                if free > 0:
+                    for pk in claim_pending(free):
+                        in_flight[pool.submit(_run_job, pk)] = pk
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                done, _ = wait(in_flight, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    pk = in_flight.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as exc:
+                        # پروسه از کار افتاده (مثلاً کمبود حافظه)
+                        mark_failed(pk, repr(exc))
+                        status = 'failed'
+                    style = self.style.SUCCESS if status == 'done' else self.style.ERROR
+                    self.stdout.write(style(f'  ReportJob #{pk}: {status}'))
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0003_machine_type_v2_carpet_yarn'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('stage', models.CharField(max_length=15, verbose_name='مرحله')),
+                ('status', models.CharField(max_length=20, verbose_name='وضعیت')),
+                ('batch_count', models.PositiveIntegerField(default=0, verbose_name='تعداد بچ')),
+                ('input_kg', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='ورودی (kg)')),
+                ('output_kg', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='خروجی (kg)')),
+                ('waste_kg', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='ضایعات (kg)')),
+                ('breakage', models.PositiveIntegerField(default=0, verbose_name='پارگی')),
+                ('efficiency_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='جمع راندمان')),
+                ('efficiency_n', models.PositiveIntegerField(default=0, verbose_name='تعداد راندمان')),
+                ('cuts_sum', models.PositiveIntegerField(default=0, verbose_name='جمع cuts/100km')),
+                ('cuts_n', models.PositiveIntegerField(default=0, verbose_name='تعداد cuts')),
+                ('splices_sum', models.PositiveIntegerField(default=0, verbose_name='جمع splices/100km')),
+                ('splices_n', models.PositiveIntegerField(default=0, verbose_name='تعداد splices')),
+                ('tpm_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='جمع TPM')),
+                ('tpm_n', models.PositiveIntegerField(default=0, verbose_name='تعداد TPM')),
+                ('temperature_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='جمع دما')),
+                ('temperature_n', models.PositiveIntegerField(default=0, verbose_name='تعداد دما')),
+                ('duration_sum', models.PositiveIntegerField(default=0, verbose_name='جمع مدت (دقیقه)')),
+                ('duration_n', models.PositiveIntegerField(default=0, verbose_name='تعداد مدت')),
+                ('shrinkage_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='جمع آنکاژ')),
+                ('shrinkage_n', models.PositiveIntegerField(default=0, verbose_name='تعداد آنکاژ')),
+                ('pass_count', models.PositiveIntegerField(default=0, verbose_name='قبول')),
+                ('fail_count', models.PositiveIntegerField(default=0, verbose_name='رد')),
+                ('conditional_count', models.PositiveIntegerField(default=0, verbose_name='مشروط')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.machine', verbose_name='ماشین')),
+                ('production_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_rollups', to='core.productionline', verbose_name='خط تولید')),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.shift', verbose_name='شیفت')),
+            ],
+            options={
+                'verbose_name': 'خلاصه روزانه مرحله',
+                'verbose_name_plural': 'خلاصه\u200cهای روزانه مراحل',
+                'db_table': 'reports_daily_stage_rollup',
+                'ordering': ['-date', 'stage'],
+                'indexes': [models.Index(fields=['stage', 'date'], name='idx_rollup_stage_date'), models.Index(fields=['machine', 'date'], name='idx_rollup_machine_date'), models.Index(fields=['production_line', 'stage', 'date'], name='idx_rollup_line_stage_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailystagerollup',
+            constraint=models.UniqueConstraint(fields=('date', 'stage', 'machine', 'production_line', 'shift', 'status'), name='uq_rollup_key'),
+        ),
+    ]
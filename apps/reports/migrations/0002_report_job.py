@@ -0,0 +1,39 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(max_length=20, verbose_name='گزارش')),
+                ('params', models.JSONField(default=dict, verbose_name='پارامترها')),
+                ('params_hash', models.CharField(db_index=True, max_length=40, verbose_name='هش پارامترها')),
+                ('status', models.CharField(choices=[('pending', 'در صف'), ('running', 'در حال اجرا'), ('done', 'آماده'), ('failed', 'ناموفق')], default='pending', max_length=10, verbose_name='وضعیت')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='نتیجه')),
+                ('error', models.TextField(blank=True, default='', verbose_name='خطا')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='ایجاد')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='شروع')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='پایان')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='درخواست\u200cدهنده')),
+            ],
+            options={
+                'verbose_name': 'اجرای گزارش',
+                'verbose_name_plural': 'اجراهای گزارش',
+                'db_table': 'reports_report_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='idx_reportjob_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_report_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDayCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(max_length=30, verbose_name='گزارش')),
+                ('day', models.DateField(verbose_name='روز')),
+                ('line_id', models.PositiveIntegerField(default=0, verbose_name='خط تولید (0 = همه)')),
+                ('params_hash', models.CharField(blank=True, default='', max_length=40, verbose_name='هش پارامترها')),
+                ('payload', models.JSONField(verbose_name='نتیجه جزئی')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='ایجاد')),
+            ],
+            options={
+                'verbose_name': 'کش روزانه گزارش',
+                'verbose_name_plural': 'کش\u200cهای روزانه گزارش',
+                'db_table': 'reports_day_cache',
+                'indexes': [models.Index(fields=['day'], name='idx_daycache_day')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportdaycache',
+            constraint=models.UniqueConstraint(fields=('report', 'line_id', 'params_hash', 'day'), name='uq_daycache_key'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.21 on 2026-10-18 14:18
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_line_key(apps, schema_editor):
+    """line_key از production_line؛ ردیف‌های تکراری کلید (خط تهی) → فقط جدیدترین می‌ماند."""
+    Rollup = apps.get_model('reports', 'DailyStageRollup')
+    Rollup.objects.filter(production_line__isnull=False).update(line_key=models.F('production_line_id'))
+    keep = Rollup.objects.values(
+        'date', 'stage', 'machine_id', 'line_key', 'shift_id', 'status',
+    ).annotate(keep_id=Max('id')).values_list('keep_id', flat=True)
+    Rollup.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_report_day_cache'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailystagerollup',
+            name='uq_rollup_key',
+        ),
+        migrations.AddField(
+            model_name='dailystagerollup',
+            name='line_key',
+            field=models.PositiveIntegerField(default=0, verbose_name='کلید خط (0 = بدون خط)'),
+        ),
+        migrations.RunPython(fill_line_key, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailystagerollup',
+            constraint=models.UniqueConstraint(fields=('date', 'stage', 'machine', 'line_key', 'shift', 'status'), name='uq_rollup_key'),
+        ),
+    ]
@@ -0,0 +1,173 @@
+"""
+Diaco MES - Reports Models
+============================
+DailyStageRollup: جدول خلاصه روزانه تولید برای گزارش‌ها.
+
+منطق:
+─────
+  هر ردیف = جمع بچ‌های یک مرحله در یک روز برای یک ترکیب
+  (ماشین، خط، شیفت، وضعیت). وضعیت جزو کلید است چون برخی
+  گزارش‌ها فقط بچ‌های completed را می‌شمارند.
+
+  میانگین‌ها به‌صورت (جمع، تعداد مقادیر غیرخالی) ذخیره می‌شوند تا
+  میانگین هر بازه دلخواه دقیقاً برابر Avg روی ردیف‌های خام باشد:
+      avg = Sum(x_sum) / Sum(x_n)
+
+  بروزرسانی: سیگنال‌های post_save/post_delete (reports/signals.py)
+  همان سطل کلید را از داده خام دوباره محاسبه می‌کنند.
+  ترمیم/پرکردن اولیه: python manage.py rebuild_rollup
+
+ReportJob: صف اجرای پس‌زمینه گزارش‌های سنگین (jobs.py / run_report_jobs).
+ReportDayCache: نتایج جزئی روزانه روزهای بسته‌شده (daycache.py).
+"""
+from django.conf import settings
+from django.db import models
+
+
+class DailyStageRollup(models.Model):
+    """خلاصه روزانه یک مرحله تولید به تفکیک ماشین/خط/شیفت/وضعیت."""
+
+    # ── کلید ─────────────────────────────────────────────
+    date = models.DateField(verbose_name='تاریخ')
+    stage = models.CharField(max_length=15, verbose_name='مرحله')
+    machine = models.ForeignKey(
+        'core.Machine', on_delete=models.CASCADE,
+        verbose_name='ماشین', related_name='daily_rollups',
+    )
+    production_line = models.ForeignKey(
+        'core.ProductionLine', on_delete=models.SET_NULL,
+        blank=True, null=True,
+        verbose_name='خط تولید', related_name='daily_rollups',
+    )
+    # کلید یکتای خط: شناسه خط یا 0 (بدون خط) — MySQL دو NULL را در UNIQUE تکراری نمی‌شمارد
+    line_key = models.PositiveIntegerField(default=0, verbose_name='کلید خط (0 = بدون خط)')
+    shift = models.ForeignKey(
+        'core.Shift', on_delete=models.CASCADE,
+        verbose_name='شیفت', related_name='daily_rollups',
+    )
+    status = models.CharField(max_length=20, verbose_name='وضعیت')
+
+    # ── شمارش و وزن ──────────────────────────────────────
+    batch_count = models.PositiveIntegerField(default=0, verbose_name='تعداد بچ')
+    input_kg = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name='ورودی (kg)')
+    output_kg = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name='خروجی (kg)')
+    waste_kg = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name='ضایعات (kg)')
+    breakage = models.PositiveIntegerField(default=0, verbose_name='پارگی')
+
+    # ── جمع/تعداد برای میانگین ───────────────────────────
+    efficiency_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='جمع راندمان')
+    efficiency_n = models.PositiveIntegerField(default=0, verbose_name='تعداد راندمان')
+    cuts_sum = models.PositiveIntegerField(default=0, verbose_name='جمع cuts/100km')
+    cuts_n = models.PositiveIntegerField(default=0, verbose_name='تعداد cuts')
+    splices_sum = models.PositiveIntegerField(default=0, verbose_name='جمع splices/100km')
+    splices_n = models.PositiveIntegerField(default=0, verbose_name='تعداد splices')
+    tpm_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='جمع TPM')
+    tpm_n = models.PositiveIntegerField(default=0, verbose_name='تعداد TPM')
+    temperature_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='جمع دما')
+    temperature_n = models.PositiveIntegerField(default=0, verbose_name='تعداد دما')
+    duration_sum = models.PositiveIntegerField(default=0, verbose_name='جمع مدت (دقیقه)')
+    duration_n = models.PositiveIntegerField(default=0, verbose_name='تعداد مدت')
+    shrinkage_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='جمع آنکاژ')
+    shrinkage_n = models.PositiveIntegerField(default=0, verbose_name='تعداد آنکاژ')
+
+    # ── کیفیت ────────────────────────────────────────────
+    pass_count = models.PositiveIntegerField(default=0, verbose_name='قبول')
+    fail_count = models.PositiveIntegerField(default=0, verbose_name='رد')
+    conditional_count = models.PositiveIntegerField(default=0, verbose_name='مشروط')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
+
+    class Meta:
+        db_table = 'reports_daily_stage_rollup'
+        verbose_name = 'خلاصه روزانه مرحله'
+        verbose_name_plural = 'خلاصه‌های روزانه مراحل'
+        ordering = ['-date', 'stage']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'stage', 'machine', 'line_key', 'shift', 'status'],
+                name='uq_rollup_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['stage', 'date'], name='idx_rollup_stage_date'),
+            models.Index(fields=['machine', 'date'], name='idx_rollup_machine_date'),
+            models.Index(fields=['production_line', 'stage', 'date'], name='idx_rollup_line_stage_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.stage} | {self.machine_id} | {self.batch_count} بچ"
+
+
+class ReportJob(models.Model):
+    """
+    اجرای پس‌زمینه گزارش‌های سنگین (oee / compare / chain).
+
+    درخواست بازه بلند → ردیف pending؛ worker (python manage.py run_report_jobs)
+    آن را در ProcessPoolExecutor اجرا و context گزارش را در result ذخیره می‌کند.
+    درخواست‌های یکسان (params_hash) تا JOB_RESULT_TTL از همان نتیجه استفاده می‌کنند.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'در صف'
+        RUNNING = 'running', 'در حال اجرا'
+        DONE = 'done', 'آماده'
+        FAILED = 'failed', 'ناموفق'
+
+    report = models.CharField(max_length=20, verbose_name='گزارش')
+    params = models.JSONField(default=dict, verbose_name='پارامترها')
+    params_hash = models.CharField(max_length=40, db_index=True, verbose_name='هش پارامترها')
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name='وضعیت',
+    )
+    result = models.JSONField(blank=True, null=True, verbose_name='نتیجه')
+    error = models.TextField(blank=True, default='', verbose_name='خطا')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        blank=True, null=True, verbose_name='درخواست‌دهنده', related_name='report_jobs',
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='ایجاد')
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name='شروع')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='پایان')
+
+    class Meta:
+        db_table = 'reports_report_job'
+        verbose_name = 'اجرای گزارش'
+        verbose_name_plural = 'اجراهای گزارش'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='idx_reportjob_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.report} #{self.pk} | {self.get_status_display()}"
+
+
+class ReportDayCache(models.Model):
+    """
+    نتیجه جزئی یک گزارش برای یک روز بسته‌شده (تغییرناپذیر).
+    فقط با ویرایش سابقه‌دار همان روز (سیگنال) یا clear_report_cache حذف می‌شود.
+    """
+
+    report = models.CharField(max_length=30, verbose_name='گزارش')
+    day = models.DateField(verbose_name='روز')
+    line_id = models.PositiveIntegerField(default=0, verbose_name='خط تولید (0 = همه)')
+    params_hash = models.CharField(max_length=40, blank=True, default='', verbose_name='هش پارامترها')
+    payload = models.JSONField(verbose_name='نتیجه جزئی')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='ایجاد')
+
+    class Meta:
+        db_table = 'reports_day_cache'
+        verbose_name = 'کش روزانه گزارش'
+        verbose_name_plural = 'کش‌های روزانه گزارش'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['report', 'line_id', 'params_hash', 'day'],
+                name='uq_daycache_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='idx_daycache_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.report} | {self.day} | خط {self.line_id}"
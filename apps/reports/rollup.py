@@ -0,0 +1,262 @@
+"""
+Diaco MES - Daily Stage Rollup Engine
+========================================
+نگهداری و خواندن جدول DailyStageRollup.
+
+منطق:
+─────
+  نگهداری:
+    ذخیره/حذف هر بچ → همان سطل کلید (تاریخ، مرحله، ماشین، خط، شیفت، وضعیت)
+    با یک aggregate کوچک از داده خام دوباره محاسبه می‌شود (idempotent؛
+    خطای تجمعی ندارد). اگر کلید بچ عوض شود، سطل قبلی هم محاسبه می‌شود.
+    ردیف سطل قبل از aggregate قفل می‌شود (select_for_update) تا دو commit
+    همزمان نتیجه قدیمی‌تر را روی جدیدتر ننویسند. خط در کلید یکتا با line_key
+    (شناسه خط یا 0) می‌آید نه production_line تهی‌پذیر.
+    rebuild() برای پرکردن اولیه یا ترمیم یک بازه با یک کوئری گروه‌بندی‌شده.
+
+  خواندن:
+    stage_totals / stage_series / stage_by_machine
+    جمع‌ها و میانگین‌های دقیق (Sum(x_sum)/Sum(x_n)) را از ردیف‌های خلاصه
+    برمی‌گردانند؛ گزارش سه‌ماهه چند هزار ردیف خلاصه می‌خواند نه همه بچ‌ها.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+
+from apps.blowroom.models import Batch as BlowroomBatch
+from apps.carding.models import Production as CardingProd
+from apps.passage.models import Production as PassageProd
+from apps.finisher.models import Production as FinisherProd
+from apps.spinning.models import Production as SpinningProd
+from apps.dyeing.models import Batch as DyeingBatch
+from apps.winding.models import Production as WindingProd
+from apps.tfo.models import Production as TFOProd
+from apps.heatset.models import Batch as HeatsetBatch
+
+from .models import DailyStageRollup
+from .timeseries import grouped_series
+
+
+# ═══════════════════════════════════════════════════════════════
+# تعریف مراحل
+# ═══════════════════════════════════════════════════════════════
+
+# stage: (Model, line_field, {ستون جمع: فیلد}, {ستون میانگین: فیلد}, آیا quality_result دارد)
+ROLLUP_STAGES = {
+    'blowroom': (BlowroomBatch, 'production_line',
+                 {'input_kg': 'total_input_weight', 'output_kg': 'output_weight', 'waste_kg': 'waste_weight'},
+                 {}, False),
+    'carding':  (CardingProd, 'production_line',
+                 {'input_kg': 'input_weight', 'output_kg': 'output_weight', 'waste_kg': 'waste_weight'},
+                 {}, False),
+    'passage':  (PassageProd, 'production_line',
+                 {'input_kg': 'input_total_weight', 'output_kg': 'output_weight'},
+                 {}, False),
+    'finisher': (FinisherProd, 'production_line',
+                 {'input_kg': 'input_weight', 'output_kg': 'output_weight'},
+                 {}, False),
+    'spinning': (SpinningProd, 'production_line',
+                 {'input_kg': 'input_weight', 'output_kg': 'output_weight', 'breakage': 'breakage_count'},
+                 {'efficiency': 'efficiency_pct', 'tpm': 'twist_tpm'}, False),
+    'winding':  (WindingProd, 'production_line',
+                 {'input_kg': 'input_weight_kg', 'output_kg': 'output_weight_kg', 'waste_kg': 'waste_weight_kg'},
+                 {'efficiency': 'efficiency_pct', 'cuts': 'cuts_per_100km', 'splices': 'splices_per_100km'}, False),
+    'tfo':      (TFOProd, 'production_line',
+                 {'input_kg': 'input_weight_kg', 'output_kg': 'output_weight_kg', 'waste_kg': 'waste_weight_kg',
+                  'breakage': 'breakage_count'},
+                 {'efficiency': 'efficiency_pct', 'tpm': 'twist_tpm'}, False),
+    'heatset':  (HeatsetBatch, 'production_line',
+                 {'output_kg': 'batch_weight_kg'},
+                 {'temperature': 'temperature_c', 'duration': 'duration_min', 'shrinkage': 'shrinkage_pct'}, True),
+    'dyeing':   (DyeingBatch, 'machine__production_line',
+                 {'output_kg': 'fiber_weight'},
+                 {'temperature': 'temperature', 'duration': 'duration_min'}, True),
+}
+
+SUM_FIELDS = ('batch_count', 'input_kg', 'output_kg', 'waste_kg', 'breakage',
+              'pass_count', 'fail_count', 'conditional_count')
+AVG_FIELDS = ('efficiency', 'cuts', 'splices', 'tpm', 'temperature', 'duration', 'shrinkage')
+ROLLUP_FIELDS = SUM_FIELDS + tuple(
+    f'{name}_{part}' for name in AVG_FIELDS for part in ('sum', 'n')
+)
+
+ROLLUP_STAGE_FOR_MODEL = {spec[0]: stage for stage, spec in ROLLUP_STAGES.items()}
+
+
+def stage_has(stage, column):
+    """آیا مرحله این ستون جمع را از داده خام پر می‌کند (مثلاً waste_kg)."""
+    return column in ROLLUP_STAGES[stage][2]
+
+
+# ═══════════════════════════════════════════════════════════════
+# نگهداری
+# ═══════════════════════════════════════════════════════════════
+
+def _source_annotations(stage):
+    _Model, _lf, sums, avgs, has_quality = ROLLUP_STAGES[stage]
+    ann = {'batch_count': Count('id')}
+    for column, field in sums.items():
+        ann[column] = Sum(field)
+    for column, field in avgs.items():
+        ann[f'{column}_sum'] = Sum(field)
+        ann[f'{column}_n'] = Count(field)
+    if has_quality:
+        ann['pass_count'] = Count('id', filter=Q(quality_result='pass'))
+        ann['fail_count'] = Count('id', filter=Q(quality_result='fail'))
+        ann['conditional_count'] = Count('id', filter=Q(quality_result='conditional'))
+    return ann
+
+
+def _row_values(agg):
+    return {field: agg[field] or 0 for field in ROLLUP_FIELDS if field in agg}
+
+
+def instance_key(stage, instance):
+    """کلید سطل یک بچ: (تاریخ، ماشین، خط، شیفت، وضعیت)."""
+    line_field = ROLLUP_STAGES[stage][1]
+    if line_field == 'production_line':
+        line_id = instance.production_line_id
+    else:
+        line_id = instance.machine.production_line_id
+    return (instance.production_date, instance.machine_id, line_id,
+            instance.shift_id, instance.status)
+
+
+def stored_key(stage, pk):
+    """کلید سطل فعلی بچ در دیتابیس (قبل از ذخیره) — None اگر وجود ندارد."""
+    Model, line_field, *_ = ROLLUP_STAGES[stage]
+    row = Model.objects.filter(pk=pk).values_list(
+        'production_date', 'machine_id', line_field, 'shift_id', 'status'
+    ).first()
+    return tuple(row) if row else None
+
+
+def _lock_bucket(lookup, line_id):
+    """ردیف سطل با قفل ردیف؛ اگر نباشد ساخته می‌شود (ساخت همزمان → همان ردیف قفل می‌شود)."""
+    qs = DailyStageRollup.objects.select_for_update().filter(**lookup)
+    row = qs.first()
+    if row is not None:
+        return row
+    try:
+        with transaction.atomic():
+            return DailyStageRollup.objects.create(production_line_id=line_id, **lookup)
+    except IntegrityError:
+        return qs.get()
+
+
+def refresh_bucket(stage, key):
+    """محاسبه دوباره یک سطل از داده خام زیر قفل ردیف سطل؛ سطل خالی حذف می‌شود."""
+    Model, line_field, *_ = ROLLUP_STAGES[stage]
+    day, machine_id, line_id, shift_id, status = key
+    lookup = {
+        'date': day, 'stage': stage, 'machine_id': machine_id,
+        'line_key': line_id or 0, 'shift_id': shift_id, 'status': status,
+    }
+    with transaction.atomic():
+        row = _lock_bucket(lookup, line_id)
+        agg = Model.objects.filter(
+            production_date=day, machine_id=machine_id, shift_id=shift_id, status=status,
+            **{line_field: line_id}
+        ).aggregate(**_source_annotations(stage))
+        if not agg['batch_count']:
+            row.delete()
+            return
+        for field, value in _row_values(agg).items():
+            setattr(row, field, value)
+        row.save()
+
+
+def rebuild(stage, date_from=None, date_to=None):
+    """
+    بازسازی کامل یک مرحله (یا یک بازه تاریخ) با یک کوئری گروه‌بندی‌شده.
+    خروجی: تعداد ردیف خلاصه ساخته‌شده.
+    """
+    Model, line_field, *_ = ROLLUP_STAGES[stage]
+    source = Model.objects.all()
+    target = DailyStageRollup.objects.filter(stage=stage)
+    if date_from:
+        source = source.filter(production_date__gte=date_from)
+        target = target.filter(date__gte=date_from)
+    if date_to:
+        source = source.filter(production_date__lte=date_to)
+        target = target.filter(date__lte=date_to)
+
+    groups = source.values(
+        'production_date', 'machine_id', line_field, 'shift_id', 'status'
+    ).annotate(**_source_annotations(stage)).order_by()
+
+    rows = [
+        DailyStageRollup(
+            date=g['production_date'], stage=stage, machine_id=g['machine_id'],
+            production_line_id=g[line_field], line_key=g[line_field] or 0,
+            shift_id=g['shift_id'], status=g['status'],
+            **_row_values(g)
+        )
+        for g in groups.iterator()
+    ]
+    with transaction.atomic():
+        target.delete()
+        DailyStageRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# ═══════════════════════════════════════════════════════════════
+# خواندن
+# ═══════════════════════════════════════════════════════════════
+
+def rollup_qs(stage, date_from, date_to, line=None, status=None, machine=None):
+    qs = DailyStageRollup.objects.filter(stage=stage, date__range=(date_from, date_to))
+    if line:
+        qs = qs.filter(production_line=line)
+    if status:
+        qs = qs.filter(status=status)
+    if machine:
+        qs = qs.filter(machine=machine)
+    return qs
+
+
+def _sum_annotations():
+    # پیشوند t_ — نام aggregate نباید با نام ستون یکی باشد
+    ann = {f't_{field}': Sum(field) for field in ROLLUP_FIELDS}
+    ann['t_completed'] = Sum('batch_count', filter=Q(status='completed'))
+    return ann
+
+
+def _finish(row):
+    """جمع‌های خالی → 0؛ میانگین‌ها = جمع / تعداد (None اگر مقداری نبود)."""
+    out = {key[2:] if key.startswith('t_') else key: value for key, value in row.items()}
+    for field in SUM_FIELDS + ('completed',):
+        out[field] = out.get(field) or 0
+    for name in AVG_FIELDS:
+        total = out.pop(f'{name}_sum', None)
+        n = out.pop(f'{name}_n', None) or 0
+        # Decimal / n → Decimal (مانند Avg روی DecimalField)
+        out[f'avg_{name}'] = total / n if n else None
+    return out
+
+
+def stage_totals(stage, date_from, date_to, line=None, status=None, machine=None):
+    """جمع کل یک مرحله در بازه."""
+    qs = rollup_qs(stage, date_from, date_to, line, status, machine)
+    return _finish(qs.aggregate(**_sum_annotations()))
+
+
+def stage_series(stage, date_from, date_to, line=None, status=None, bucket='day'):
+    """
+    جمع یک مرحله به تفکیک سطل زمانی (day | week | month):
+    {شروع سطل: totals} — سطل‌های بدون داده حذف‌اند (timeseries.fill).
+    """
+    qs = rollup_qs(stage, date_from, date_to, line, status)
+    series = grouped_series(qs, 'date', bucket, **_sum_annotations())
+    return {period: _finish(row) for period, row in series.items()}
+
+
+def stage_by_machine(stage, date_from, date_to, line=None, status=None):
+    """جمع یک مرحله به تفکیک ماشین: {machine_id: totals + machine__code}."""
+    qs = rollup_qs(stage, date_from, date_to, line, status)
+    rows = qs.values('machine_id', 'machine__code').annotate(**_sum_annotations()).order_by()
+    return {row['machine_id']: _finish(row) for row in rows}
+
+
+def empty_totals():
+    """totals خالی (برای ماشین/روز بدون داده)."""
+    return _finish({})
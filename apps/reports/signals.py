@@ -0,0 +1,84 @@
+"""
+Diaco MES - Reports Signals
+=============================
+نگهداری افزایشی DailyStageRollup.
+
+  pre_save    → کلید فعلی بچ در دیتابیس (اگر تاریخ/ماشین/شیفت/وضعیت عوض شود)
+  post_save   → سطل قبلی و جدید بعد از commit دوباره محاسبه می‌شوند
+  post_delete → سطل بچ حذف‌شده دوباره محاسبه می‌شود
+
+ابطال ReportDayCache:
+  ذخیره/حذف رکوردی با تاریخ (قبلی یا جدید) در روزهای بسته → نتایج جزئی
+  همان روز برای گزارش‌های وابسته به آن مدل بعد از commit حذف می‌شوند.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .daycache import PARTIALS_FOR_MODEL, closed_before, day_of, invalidate_days
+from .rollup import ROLLUP_STAGE_FOR_MODEL, instance_key, refresh_bucket, stored_key
+
+
+def _schedule(stage, keys):
+    for key in {k for k in keys if k is not None}:
+        transaction.on_commit(lambda key=key: refresh_bucket(stage, key))
+
+
+def capture_rollup_key(sender, instance, **kwargs):
+    stage = ROLLUP_STAGE_FOR_MODEL[sender]
+    instance._rollup_old_key = stored_key(stage, instance.pk) if instance.pk else None
+
+
+def update_rollup_on_save(sender, instance, **kwargs):
+    stage = ROLLUP_STAGE_FOR_MODEL[sender]
+    old_key = getattr(instance, '_rollup_old_key', None)
+    _schedule(stage, [old_key, instance_key(stage, instance)])
+
+
+def update_rollup_on_delete(sender, instance, **kwargs):
+    stage = ROLLUP_STAGE_FOR_MODEL[sender]
+    _schedule(stage, [instance_key(stage, instance)])
+
+
+for _Model in ROLLUP_STAGE_FOR_MODEL:
+    _uid = _Model._meta.label_lower
+    pre_save.connect(capture_rollup_key, sender=_Model, dispatch_uid=f'rollup_pre_{_uid}')
+    post_save.connect(update_rollup_on_save, sender=_Model, dispatch_uid=f'rollup_save_{_uid}')
+    post_delete.connect(update_rollup_on_delete, sender=_Model, dispatch_uid=f'rollup_delete_{_uid}')
+
+
+# ═══════════════════════════════════════════════════════════════
+# ابطال کش روزهای بسته
+# ═══════════════════════════════════════════════════════════════
+
+def _invalidate_closed(sender, days):
+    first_open = closed_before()
+    closed = {d for d in days if d is not None and d < first_open}
+    if closed:
+        names = [name for name, _field in PARTIALS_FOR_MODEL[sender]]
+        transaction.on_commit(lambda: invalidate_days(closed, names))
+
+
+def _date_field(sender):
+    return PARTIALS_FOR_MODEL[sender][0][1]
+
+
+def capture_cache_day(sender, instance, **kwargs):
+    field = _date_field(sender)
+    old = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first() if instance.pk else None
+    instance._daycache_old_day = day_of(old)
+
+
+def invalidate_cache_on_save(sender, instance, **kwargs):
+    field = _date_field(sender)
+    _invalidate_closed(sender, [getattr(instance, '_daycache_old_day', None), day_of(getattr(instance, field))])
+
+
+def invalidate_cache_on_delete(sender, instance, **kwargs):
+    _invalidate_closed(sender, [day_of(getattr(instance, _date_field(sender)))])
+
+
+for _Model in PARTIALS_FOR_MODEL:
+    _uid = _Model._meta.label_lower
+    pre_save.connect(capture_cache_day, sender=_Model, dispatch_uid=f'daycache_pre_{_uid}')
+    post_save.connect(invalidate_cache_on_save, sender=_Model, dispatch_uid=f'daycache_save_{_uid}')
+    post_delete.connect(invalidate_cache_on_delete, sender=_Model, dispatch_uid=f'daycache_delete_{_uid}')
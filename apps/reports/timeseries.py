@@ -0,0 +1,106 @@
+"""
+Diaco MES - Report Time Series
+================================
+سری زمانی گزارش‌ها: یک کوئری گروه‌بندی‌شده برای هر متریک
+و پرکردن سطل‌های خالی در پایتون (به‌جای یک کوئری برای هر روز).
+
+منطق:
+─────
+  اندازه سطل بر اساس طول بازه انتخاب می‌شود:
+      ≤ 92 روز   → روزانه  (فیلد تاریخ / TruncDate)
+      ≤ 730 روز  → هفتگی  (TruncWeek — شروع هفته دوشنبه، مانند پایگاه داده)
+      بیشتر      → ماهانه (TruncMonth)
+  کلید هر سطل = تاریخ شروع آن. گزارش یک‌ساله = ۵۳ سطل هفتگی با یک کوئری.
+"""
+from datetime import timedelta
+
+from django.db.models import DateField, DateTimeField, F
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+BUCKET_DAY_MAX_DAYS = 92
+BUCKET_WEEK_MAX_DAYS = 730
+
+BUCKET_LABELS = {
+    'day':   'روزانه',
+    'week':  'هفتگی',
+    'month': 'ماهانه',
+}
+
+
+def pick_bucket(date_from, date_to):
+    """اندازه سطل مناسب برای طول بازه: day | week | month."""
+    days = (date_to - date_from).days + 1
+    if days <= BUCKET_DAY_MAX_DAYS:
+        return 'day'
+    if days <= BUCKET_WEEK_MAX_DAYS:
+        return 'week'
+    return 'month'
+
+
+def bucket_start(d, bucket):
+    """شروع سطلی که تاریخ d در آن است (هم‌ارز Trunc پایگاه داده)."""
+    if bucket == 'week':
+        return d - timedelta(days=d.weekday())
+    if bucket == 'month':
+        return d.replace(day=1)
+    return d
+
+
+def _next_bucket(d, bucket):
+    if bucket == 'week':
+        return d + timedelta(days=7)
+    if bucket == 'month':
+        return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return d + timedelta(days=1)
+
+
+def bucket_keys(date_from, date_to, bucket):
+    """کلید همه سطل‌هایی که بازه را پوشش می‌دهند (به ترتیب)."""
+    keys = []
+    current = bucket_start(date_from, bucket)
+    while current <= date_to:
+        keys.append(current)
+        current = _next_bucket(current, bucket)
+    return keys
+
+
+def _is_datetime(model, path):
+    """آیا مسیر فیلد (مثلاً batch__production_date) به DateTimeField می‌رسد."""
+    opts = model._meta
+    field = None
+    for part in path.split('__'):
+        field = opts.get_field(part)
+        if field.is_relation:
+            opts = field.related_model._meta
+    return isinstance(field, DateTimeField)
+
+
+def trunc(model, path, bucket):
+    """عبارت گروه‌بندی سطل برای فیلد تاریخ/زمان — خروجی همیشه date."""
+    is_datetime = _is_datetime(model, path)
+    if bucket == 'day':
+        return TruncDate(path) if is_datetime else F(path)
+    func = TruncWeek if bucket == 'week' else TruncMonth
+    return func(path, output_field=DateField())
+
+
+def grouped_series(qs, path, bucket, **aggregates):
+    """
+    یک کوئری: aggregates به تفکیک سطل.
+    Returns: {شروع سطل: {نام aggregate: مقدار}} — فقط سطل‌های دارای داده.
+    """
+    rows = qs.annotate(period=trunc(qs.model, path, bucket)).values('period').annotate(
+        **aggregates
+    ).order_by()
+    return {row.pop('period'): row for row in rows}
+
+
+def fill(series, date_from, date_to, bucket, empty):
+    """
+    لیست (تاریخ، مقدار) برای همه سطل‌های بازه؛ سطل بدون داده → empty.
+    تاریخ سطل اول به date_from محدود می‌شود (هفته/ماه ناقص ابتدای بازه).
+    """
+    return [
+        (max(key, date_from), series.get(key, empty))
+        for key in bucket_keys(date_from, date_to, bucket)
+    ]
@@ -18,6 +18,8 @@ urlpatterns = [
     path('tfo/',             views.tfo_report,              name='tfo_report'),
     path('heatset/',         views.heatset_report,          name='heatset_report'),
     path('chain/',           views.production_chain,        name='production_chain'),
+    # گزارش پس‌زمینه
+    path('jobs/<int:pk>/',   views.job_status,              name='job_status'),
     # خروجی Excel
     path('export/production/', views.export_production_excel, name='export_production'),
     path('export/winding/',    views.export_winding_excel,    name='export_winding'),
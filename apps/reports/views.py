@@ -10,23 +10,33 @@ from datetime import date, timedelta
 from decimal import Decimal
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Avg, Q, F, DecimalField
+from django.db.models import Sum, Count, Avg, Max, Q, F, DecimalField
 from django.db.models.functions import Coalesce
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils.module_loading import import_string
 
-from apps.blowroom.models import Batch as BlowroomBatch
-from apps.carding.models import Production as CardingProd
-from apps.passage.models import Production as PassageProd
-from apps.finisher.models import Production as FinisherProd
 from apps.spinning.models import Production as SpinningProd
-from apps.dyeing.models import Batch as DyeingBatch, ChemicalUsage
+from apps.dyeing.models import ChemicalUsage
 from apps.inventory.models import FiberStock, DyeStock, ChemicalStock
 from apps.core.models import ProductionLine
 from apps.maintenance.models import WorkOrder, DowntimeLog, Schedule
+from apps.maintenance.counters import minutes_by_machine, period_totals
 from apps.winding.models import Production as WindingProd
 from apps.tfo.models import Production as TFOProd
 from apps.heatset.models import Batch as HeatsetBatch
+from apps.heatset.analytics import METRIC_LABELS, DEFAULT_METRIC_SORT, metric_filters, metric_ordering
+
+from .rollup import stage_totals, stage_series, stage_by_machine, stage_has, empty_totals
+from .timeseries import BUCKET_LABELS, pick_bucket, grouped_series, fill
+from .exports import export_response
+from .daycache import (
+    day_partials, merge_oee_ring, merge_counts, merge_heatset_fibers,
+    WINDING_GRADES, TFO_TWISTS,
+)
+from .jobs import REPORT_JOBS, runs_in_background, submit_job, job_result
+from .models import ReportJob
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -78,6 +88,43 @@ def _jstr(d):
     return jdatetime.date.fromgregorian(date=d).strftime('%Y/%m/%d')
 
 
+def _heavy_report(request, report, ctx, span_days, **params):
+    """
+    گزارش سنگین (oee / compare / chain):
+      بازه کوتاه → همین‌جا محاسبه و رندر می‌شود.
+      بازه بلند  → ReportJob (worker: run_report_jobs)؛ تا آماده شدن نتیجه
+                   صفحه انتظار با polling نمایش داده می‌شود.
+    """
+    spec = REPORT_JOBS[report]
+    if not runs_in_background(span_days):
+        ctx.update(import_string(spec['data'])(**params))
+        return render(request, spec['template'], ctx)
+
+    job = submit_job(report, params, request.user)
+    if job.status == ReportJob.Status.DONE:
+        ctx.update(job_result(job))
+        return render(request, spec['template'], ctx)
+    return render(request, 'reports/report_job.html', {
+        'job': job,
+        'page_title': spec['title'],
+        'status_url': reverse('reports:job_status', args=[job.pk]),
+    })
+
+
+# بخش‌های گزارش تولید روزانه: (برچسب، مرحله DailyStageRollup)
+DAILY_SECTIONS = [
+    ('حلاجی',      'blowroom'),
+    ('کاردینگ',    'carding'),
+    ('پاساژ',      'passage'),
+    ('فینیشر',     'finisher'),
+    ('رینگ',       'spinning'),
+    ('بوبین‌پیچی', 'winding'),
+    ('دولاتابی',   'tfo'),
+    ('هیت‌ست',     'heatset'),
+    ('رنگرزی',     'dyeing'),
+]
+
+
 # ═══════════════════════════════════════════════════════════════
 # 9.1 گزارش تولید روزانه
 # ═══════════════════════════════════════════════════════════════
@@ -90,64 +137,30 @@ def production_daily(request):
     line = ctx['selected_line']
 
     sections = []
-    for label, Model, weight_field in [
-        ('حلاجی',   BlowroomBatch, 'output_weight'),
-        ('کاردینگ', CardingProd,   'output_weight'),
-        ('پاساژ',   PassageProd,   'output_weight_gperm'),
-        ('فینیشر',  FinisherProd,  'output_weight'),
-        ('رینگ',    SpinningProd,  'output_weight'),
-    ]:
-        qs  = _filter_by_line(
-            Model.objects.filter(production_date__range=(date_from, date_to)), line
-        )
-        agg = qs.aggregate(
-            total=Count('id'),
-            completed=Count('id', filter=Q(status='completed')),
-            total_weight=Sum(weight_field),
-        )
+    for label, stage in DAILY_SECTIONS:
+        t = stage_totals(stage, date_from, date_to, line)
         sections.append({
             'label': label,
-            'total': agg['total'],
-            'completed': agg['completed'],
-            'total_weight': agg['total_weight'] or 0,
+            'total': t['batch_count'],
+            # هیت‌ست: «تکمیل» = قبول کیفی
+            'completed': t['pass_count'] if stage == 'heatset' else t['completed'],
+            'total_weight': t['output_kg'],
         })
 
-    # بوبین‌پیچی
-    wd_qs  = _filter_by_line(WindingProd.objects.filter(production_date__range=(date_from, date_to)), line)
-    wd_agg = wd_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(status='completed')), total_weight=Sum('output_weight_kg'))
-    sections.append({'label': 'بوبین‌پیچی', 'total': wd_agg['total'], 'completed': wd_agg['completed'], 'total_weight': wd_agg['total_weight'] or 0})
-
-    # دولاتابی
-    tfo_qs  = _filter_by_line(TFOProd.objects.filter(production_date__range=(date_from, date_to)), line)
-    tfo_agg = tfo_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(status='completed')), total_weight=Sum('output_weight_kg'))
-    sections.append({'label': 'دولاتابی', 'total': tfo_agg['total'], 'completed': tfo_agg['completed'], 'total_weight': tfo_agg['total_weight'] or 0})
-
-    # هیت‌ست
-    hs_qs  = _filter_by_line(HeatsetBatch.objects.filter(production_date__range=(date_from, date_to)), line)
-    hs_agg = hs_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(quality_result='pass')), total_weight=Sum('batch_weight_kg'))
-    sections.append({'label': 'هیت‌ست', 'total': hs_agg['total'], 'completed': hs_agg['completed'], 'total_weight': hs_agg['total_weight'] or 0})
-
-    # رنگرزی
-    dye_qs  = DyeingBatch.objects.filter(production_date__range=(date_from, date_to))
-    if line:
-        dye_qs = dye_qs.filter(machine__production_line=line)
-    dye_agg = dye_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(status='completed')), total_weight=Sum('fiber_weight'))
-    sections.append({'label': 'رنگرزی', 'total': dye_agg['total'], 'completed': dye_agg['completed'], 'total_weight': dye_agg['total_weight'] or 0})
-
-    # نمودار روزانه رینگ
-    chart_data = []
-    current = date_from
-    while current <= date_to:
-        sp_qs = _filter_by_line(SpinningProd.objects.filter(production_date=current, status='completed'), line)
-        weight = sp_qs.aggregate(w=Sum('output_weight'))['w'] or 0
-        chart_data.append({'date': _jstr(current), 'weight': float(weight)})
-        current += timedelta(days=1)
+    # نمودار روند رینگ (روزانه/هفتگی/ماهانه بسته به طول بازه)
+    bucket = pick_bucket(date_from, date_to)
+    sp_series = stage_series('spinning', date_from, date_to, line, status='completed', bucket=bucket)
+    chart_data = [
+        {'date': _jstr(day), 'weight': float(t['output_kg'])}
+        for day, t in fill(sp_series, date_from, date_to, bucket, empty_totals())
+    ]
 
     ctx.update({
         'sections': sections,
         'date_from': date_from,
         'date_to': date_to,
         'chart_data': json.dumps(chart_data),
+        'trend_label': BUCKET_LABELS[bucket],
         'page_title': 'گزارش تولید روزانه',
     })
     return render(request, 'reports/production_daily.html', ctx)
@@ -171,12 +184,15 @@ def material_consumption(request):
 
     fiber_stock_total = FiberStock.objects.filter(status='available').aggregate(total=Sum('current_weight'))['total'] or 0
 
-    chart_data = []
-    current = date_from
-    while current <= date_to:
-        w = BatchInput.objects.filter(batch__production_date=current).aggregate(s=Sum('weight_used'))['s'] or 0
-        chart_data.append({'date': _jstr(current), 'weight': float(w)})
-        current += timedelta(days=1)
+    bucket = pick_bucket(date_from, date_to)
+    usage_series = grouped_series(
+        BatchInput.objects.filter(batch__production_date__range=(date_from, date_to)),
+        'batch__production_date', bucket, weight=Sum('weight_used'),
+    )
+    chart_data = [
+        {'date': _jstr(day), 'weight': float(row['weight'] or 0)}
+        for day, row in fill(usage_series, date_from, date_to, bucket, {'weight': 0})
+    ]
 
     return render(request, 'reports/material_consumption.html', {
         'fiber_usage': fiber_usage,
@@ -187,6 +203,7 @@ def material_consumption(request):
         'date_from': date_from,
         'date_to': date_to,
         'chart_data': json.dumps(chart_data),
+        'trend_label': BUCKET_LABELS[bucket],
         'page_title': 'گزارش مصرف مواد',
     })
 
@@ -233,63 +250,43 @@ def waste_report(request):
     ctx  = _report_base_context(request)
     line = ctx['selected_line']
     sections = []
-    for label, Model, input_f, output_f, waste_f in [
-        ('حلاجی',  BlowroomBatch, 'total_input_weight', 'output_weight', 'waste_weight'),
-        ('کاردینگ', CardingProd,  'input_weight',       'output_weight', 'waste_weight'),
-        ('فینیشر',  FinisherProd, 'input_weight',       'output_weight', None),
-        ('رینگ',    SpinningProd, 'input_weight',       'output_weight', None),
+    for label, stage in [
+        ('حلاجی',      'blowroom'),
+        ('کاردینگ',    'carding'),
+        ('فینیشر',     'finisher'),
+        ('رینگ',       'spinning'),
+        ('بوبین‌پیچی', 'winding'),
+        ('دولاتابی',   'tfo'),
     ]:
-        qs = _filter_by_line(Model.objects.filter(production_date__range=(date_from, date_to), status='completed'), line)
-        agg_kwargs = {'total_input': Sum(input_f), 'total_output': Sum(output_f), 'batch_count': Count('id')}
-        if waste_f:
-            agg_kwargs['total_waste'] = Sum(waste_f)
-        agg = qs.aggregate(**agg_kwargs)
-        total_in  = float(agg['total_input']  or 0)
-        total_out = float(agg['total_output'] or 0)
-        total_waste = float(agg.get('total_waste') or (total_in - total_out if not waste_f else 0))
-        sections.append({'label': label, 'batch_count': agg['batch_count'],
+        t = stage_totals(stage, date_from, date_to, line, status='completed')
+        total_in  = float(t['input_kg'])
+        total_out = float(t['output_kg'])
+        # مراحل بدون فیلد ضایعات: ورودی − خروجی
+        total_waste = float(t['waste_kg']) if stage_has(stage, 'waste_kg') else total_in - total_out
+        sections.append({'label': label, 'batch_count': t['batch_count'],
                          'total_input': total_in, 'total_output': total_out,
                          'total_waste': total_waste,
                          'waste_pct': round(total_waste / total_in * 100, 2) if total_in > 0 else 0})
 
-    # بوبین‌پیچی ضایعات
-    wd_qs = _filter_by_line(WindingProd.objects.filter(production_date__range=(date_from, date_to), status='completed'), line)
-    wd_w  = wd_qs.aggregate(i=Sum('input_weight_kg'), o=Sum('output_weight_kg'), w=Sum('waste_weight_kg'), c=Count('id'))
-    wi = float(wd_w['i'] or 0); wo = float(wd_w['o'] or 0); ww = float(wd_w['w'] or 0)
-    sections.append({'label': 'بوبین‌پیچی', 'batch_count': wd_w['c'], 'total_input': wi,
-                     'total_output': wo, 'total_waste': ww,
-                     'waste_pct': round(ww / wi * 100, 2) if wi > 0 else 0})
-
-    # دولاتابی ضایعات
-    tfo_qs = _filter_by_line(TFOProd.objects.filter(production_date__range=(date_from, date_to), status='completed'), line)
-    tfo_w  = tfo_qs.aggregate(i=Sum('input_weight_kg'), o=Sum('output_weight_kg'), w=Sum('waste_weight_kg'), c=Count('id'))
-    ti = float(tfo_w['i'] or 0); to_ = float(tfo_w['o'] or 0); tw = float(tfo_w['w'] or 0)
-    sections.append({'label': 'دولاتابی', 'batch_count': tfo_w['c'], 'total_input': ti,
-                     'total_output': to_, 'total_waste': tw,
-                     'waste_pct': round(tw / ti * 100, 2) if ti > 0 else 0})
-
     by_machine = []
-    for label, Model in [('حلاجی', BlowroomBatch), ('کاردینگ', CardingProd)]:
-        qs = _filter_by_line(Model.objects.filter(production_date__range=(date_from, date_to), status='completed'), line)
-        inp_f = 'total_input_weight' if label == 'حلاجی' else 'input_weight'
-        for m in qs.values('machine__code').annotate(tw=Sum('waste_weight'), ti=Sum(inp_f), c=Count('id')).order_by('-tw'):
-            inp = float(m['ti'] or 0); wst = float(m['tw'] or 0)
+    for label, stage in [('حلاجی', 'blowroom'), ('کاردینگ', 'carding')]:
+        for m in stage_by_machine(stage, date_from, date_to, line, status='completed').values():
+            inp = float(m['input_kg']); wst = float(m['waste_kg'])
             by_machine.append({'section': label, 'machine': m['machine__code'], 'waste_kg': wst,
-                               'waste_pct': round(wst / inp * 100, 2) if inp > 0 else 0, 'batch_count': m['c']})
+                               'waste_pct': round(wst / inp * 100, 2) if inp > 0 else 0, 'batch_count': m['batch_count']})
     by_machine.sort(key=lambda x: x['waste_kg'], reverse=True)
 
+    bucket = pick_bucket(date_from, date_to)
+    bl_series = stage_series('blowroom', date_from, date_to, line, status='completed', bucket=bucket)
     trend_data = []
-    current = date_from
-    while current <= date_to:
-        bl_qs = _filter_by_line(BlowroomBatch.objects.filter(production_date=current, status='completed'), line)
-        agg = bl_qs.aggregate(w=Sum('waste_weight'), i=Sum('total_input_weight'))
-        inp = float(agg['i'] or 0); wst = float(agg['w'] or 0)
-        trend_data.append({'date': _jstr(current), 'waste_pct': round(wst / inp * 100, 2) if inp > 0 else 0, 'waste_kg': wst})
-        current += timedelta(days=1)
+    for day, t in fill(bl_series, date_from, date_to, bucket, empty_totals()):
+        inp = float(t['input_kg']); wst = float(t['waste_kg'])
+        trend_data.append({'date': _jstr(day), 'waste_pct': round(wst / inp * 100, 2) if inp > 0 else 0, 'waste_kg': wst})
 
     ctx.update({'sections': sections, 'by_machine': by_machine[:15], 'date_from': date_from, 'date_to': date_to,
                 'chart_data': json.dumps([{'label': s['label'], 'value': s['waste_pct']} for s in sections]),
-                'trend_data': json.dumps(trend_data), 'page_title': 'گزارش ضایعات'})
+                'trend_data': json.dumps(trend_data), 'trend_label': BUCKET_LABELS[bucket],
+                'page_title': 'گزارش ضایعات'})
     return render(request, 'reports/waste_report.html', ctx)
 
 
@@ -301,48 +298,56 @@ def waste_report(request):
 def oee_report(request):
     """
     F.3 — OEE گسترش‌یافته: رینگ + بوبین‌پیچی + دولاتابی + هیت‌ست.
+    بازه‌های بلند در پس‌زمینه (ReportJob) محاسبه می‌شوند.
+    """
+    date_from, date_to = _parse_date_range(request)
+    ctx = _report_base_context(request)
+    return _heavy_report(request, 'oee', ctx, (date_to - date_from).days + 1,
+                         date_from=date_from, date_to=date_to, line=ctx['selected_line'])
+
+
+def oee_report_data(date_from, date_to, line=None):
+    """
+    داده گزارش OEE.
     OEE = Availability × Performance × Quality
     برای WD/TFO: Quality از efficiency_pct تخمین زده می‌شود.
     برای HS: Quality = pass_rate.
     """
     from apps.core.models import Machine
-    from apps.ai_ready.utils import calculate_oee
-    date_from, date_to = _parse_date_range(request)
-    ctx  = _report_base_context(request)
-    line = ctx['selected_line']
 
-    # ── رینگ (روش اصلی با calculate_oee) ───────────────────────
+    # ── رینگ (روش اصلی با calculate_oee_bulk، روزهای بسته از کش) ─
     ring_machines = Machine.objects.filter(status='active', machine_type='ring')
     if line:
         ring_machines = ring_machines.filter(production_line=line)
 
+    # جمع‌های هر ماشین از DailyStageRollup + دقیقه توقف هر ماشین (MachineHealthCounter)
+    sp_stats  = stage_by_machine('spinning', date_from, date_to, status='completed')
+    wd_stats  = stage_by_machine('winding', date_from, date_to)
+    tfo_stats = stage_by_machine('tfo', date_from, date_to)
+    hs_stats  = stage_by_machine('heatset', date_from, date_to)
+    downtime_by_machine = minutes_by_machine(date_from, date_to)
+    days = max(1, (date_to - date_from).days + 1)
+    total_planned_min = days * 8 * 60  # ۸ ساعت/روز
+
+    def _availability(machine_id):
+        downtime_min = downtime_by_machine.get(machine_id) or 0
+        return max(0.0, min(100.0,
+            (total_planned_min - downtime_min) / total_planned_min * 100
+        ))
+
+    # OEE روزانه ماشین‌های رینگ → میانگین روزهای دارای تولید
+    ring_oee = merge_oee_ring(day_partials('oee_ring', date_from, date_to))
+
     machine_oee = []
     for m in ring_machines:
-        oee_sum = {'availability': 0, 'performance': 0, 'quality': 0, 'oee': 0}
-        valid_days = 0
-        current = date_from
-        while current <= date_to:
-            day_oee = calculate_oee(m.id, current)
-            if day_oee['batch_count'] > 0:
-                for k in oee_sum:
-                    oee_sum[k] += day_oee[k]
-                valid_days += 1
-            current += timedelta(days=1)
-        if valid_days > 0:
-            for k in oee_sum:
-                oee_sum[k] = round(oee_sum[k] / valid_days, 1)
-        sp_agg = SpinningProd.objects.filter(
-            machine=m, production_date__range=(date_from, date_to), status='completed'
-        ).aggregate(
-            avg_eff=Avg('efficiency_pct'), total_breakage=Sum('breakage_count'),
-            total_output=Sum('output_weight'), batch_count=Count('id')
-        )
+        oee_sum = ring_oee.get(m.id) or {'availability': 0, 'performance': 0, 'quality': 0, 'oee': 0}
+        sp_agg = sp_stats.get(m.id) or empty_totals()
         machine_oee.append({
             'code': m.code, 'name': m.name, 'section': 'رینگ',
             **oee_sum,
-            'avg_efficiency': round(float(sp_agg['avg_eff'] or 0), 1),
-            'total_breakage': sp_agg['total_breakage'] or 0,
-            'total_output_kg': float(sp_agg['total_output'] or 0),
+            'avg_efficiency': round(float(sp_agg['avg_efficiency'] or 0), 1),
+            'total_breakage': sp_agg['breakage'],
+            'total_output_kg': float(sp_agg['output_kg']),
             'batch_count': sp_agg['batch_count'],
         })
 
@@ -352,31 +357,15 @@ def oee_report(request):
         wd_machines = wd_machines.filter(production_line=line)
 
     for m in wd_machines:
-        wd_agg = WindingProd.objects.filter(
-            machine=m, production_date__range=(date_from, date_to)
-        ).aggregate(
-            batch_count   = Count('id'),
-            avg_eff       = Avg('efficiency_pct'),
-            avg_cuts      = Avg('cuts_per_100km'),
-            total_output  = Sum('output_weight_kg'),
-            total_input   = Sum('input_weight_kg'),
-            total_waste   = Sum('waste_weight_kg'),
-        )
-        avg_eff   = float(wd_agg['avg_eff']  or 0)
+        wd_agg = wd_stats.get(m.id) or empty_totals()
+        avg_eff   = float(wd_agg['avg_efficiency'] or 0)
         avg_cuts  = float(wd_agg['avg_cuts'] or 0)
         # OEE کیفیت WD: cuts < 20 = 100%, cuts > 80 = 20%، خطی بین این دو
         quality_score = max(20.0, min(100.0, 100 - (avg_cuts - 20) * (80 / 60))) if avg_cuts > 20 else 100.0
         # OEE Performance از efficiency مستقیم
         performance  = avg_eff
         # Availability: داده توقف برای WD در حال حاضر از DowntimeLog
-        downtime_min = DowntimeLog.objects.filter(
-            machine=m, start_time__date__range=(date_from, date_to)
-        ).aggregate(total=Sum('duration_min'))['total'] or 0
-        days = max(1, (date_to - date_from).days + 1)
-        total_planned_min = days * 8 * 60  # ۸ ساعت/روز
-        availability = max(0.0, min(100.0,
-            (total_planned_min - downtime_min) / total_planned_min * 100
-        ))
+        availability = _availability(m.id)
         oee = round(availability * performance * quality_score / 10000, 1)
         machine_oee.append({
             'code': m.code, 'name': m.name, 'section': 'بوبین‌پیچی',
@@ -386,7 +375,7 @@ def oee_report(request):
             'oee':          oee,
             'avg_efficiency': round(avg_eff, 1),
             'total_breakage': 0,
-            'total_output_kg': float(wd_agg['total_output'] or 0),
+            'total_output_kg': float(wd_agg['output_kg']),
             'batch_count': wd_agg['batch_count'],
             'extra': {'avg_cuts_per_100km': round(avg_cuts, 1)},
         })
@@ -397,29 +386,15 @@ def oee_report(request):
         tfo_machines = tfo_machines.filter(production_line=line)
 
     for m in tfo_machines:
-        tfo_agg = TFOProd.objects.filter(
-            machine=m, production_date__range=(date_from, date_to)
-        ).aggregate(
-            batch_count      = Count('id'),
-            avg_eff          = Avg('efficiency_pct'),
-            total_breakage   = Sum('breakage_count'),
-            total_output     = Sum('output_weight_kg'),
-        )
-        avg_eff      = float(tfo_agg['avg_eff']       or 0)
-        total_brk    = tfo_agg['total_breakage'] or 0
+        tfo_agg = tfo_stats.get(m.id) or empty_totals()
+        avg_eff      = float(tfo_agg['avg_efficiency'] or 0)
+        total_brk    = tfo_agg['breakage']
         batch_count  = tfo_agg['batch_count'] or 1
         # OEE کیفیت TFO: breakage < 5/بچ = 100%، > 20/بچ = 50%
         brk_per_batch = total_breakage / batch_count if (total_breakage := total_brk) else 0
         quality_score = max(50.0, min(100.0, 100 - (brk_per_batch - 5) * (50 / 15))) if brk_per_batch > 5 else 100.0
         performance   = avg_eff
-        downtime_min  = DowntimeLog.objects.filter(
-            machine=m, start_time__date__range=(date_from, date_to)
-        ).aggregate(total=Sum('duration_min'))['total'] or 0
-        days = max(1, (date_to - date_from).days + 1)
-        total_planned_min = days * 8 * 60
-        availability = max(0.0, min(100.0,
-            (total_planned_min - downtime_min) / total_planned_min * 100
-        ))
+        availability  = _availability(m.id)
         oee = round(availability * performance * quality_score / 10000, 1)
         machine_oee.append({
             'code': m.code, 'name': m.name, 'section': 'دولاتابی',
@@ -429,7 +404,7 @@ def oee_report(request):
             'oee':          oee,
             'avg_efficiency': round(avg_eff, 1),
             'total_breakage': total_brk,
-            'total_output_kg': float(tfo_agg['total_output'] or 0),
+            'total_output_kg': float(tfo_agg['output_kg']),
             'batch_count': tfo_agg['batch_count'],
             'extra': {'breakage_per_batch': round(brk_per_batch, 1)},
         })
@@ -440,31 +415,16 @@ def oee_report(request):
         hs_machines = hs_machines.filter(production_line=line)
 
     for m in hs_machines:
-        hs_agg = HeatsetBatch.objects.filter(
-            machine=m, production_date__range=(date_from, date_to)
-        ).aggregate(
-            batch_count  = Count('id'),
-            pass_count   = Count('id', filter=Q(quality_result='pass')),
-            fail_count   = Count('id', filter=Q(quality_result='fail')),
-            total_kg     = Sum('batch_weight_kg'),
-            avg_duration = Avg('duration_min'),
-        )
-        total_b = hs_agg['batch_count'] or 0
-        pass_count = hs_agg['pass_count'] or 0
+        hs_agg = hs_stats.get(m.id) or empty_totals()
+        total_b = hs_agg['batch_count']
+        pass_count = hs_agg['pass_count']
         # OEE کیفیت HS = نرخ قبولی مستقیم
         quality_score = round(pass_count / total_b * 100, 1) if total_b > 0 else 0.0
         # Performance HS: نسبت مدت واقعی / مدت استاندارد (فرض ۱۲۰ دقیقه استاندارد)
         avg_dur = float(hs_agg['avg_duration'] or 0)
         standard_cycle = 120  # دقیقه
         performance = min(100.0, round(standard_cycle / avg_dur * 100, 1)) if avg_dur > 0 else 0.0
-        downtime_min = DowntimeLog.objects.filter(
-            machine=m, start_time__date__range=(date_from, date_to)
-        ).aggregate(total=Sum('duration_min'))['total'] or 0
-        days = max(1, (date_to - date_from).days + 1)
-        total_planned_min = days * 8 * 60
-        availability = max(0.0, min(100.0,
-            (total_planned_min - downtime_min) / total_planned_min * 100
-        ))
+        availability = _availability(m.id)
         oee = round(availability * performance * quality_score / 10000, 1)
         machine_oee.append({
             'code': m.code, 'name': m.name, 'section': 'هیت‌ست',
@@ -473,28 +433,36 @@ def oee_report(request):
             'quality':      quality_score,
             'oee':          oee,
             'avg_efficiency': quality_score,   # pass rate نمایش
-            'total_breakage': hs_agg['fail_count'] or 0,
-            'total_output_kg': float(hs_agg['total_kg'] or 0),
+            'total_breakage': hs_agg['fail_count'],
+            'total_output_kg': float(hs_agg['output_kg']),
             'batch_count': total_b,
             'extra': {'pass_rate': quality_score, 'avg_cycle_min': round(avg_dur, 1)},
         })
 
     machine_oee.sort(key=lambda x: x['oee'], reverse=True)
 
-    # ── trend راندمان روزانه (همه بخش‌ها) ─────────────────────
-    trend_data = []
-    current = date_from
-    while current <= date_to:
-        sp_day  = _filter_by_line(SpinningProd.objects.filter(production_date=current, status='completed'), line)
-        wd_day  = _filter_by_line(WindingProd.objects.filter(production_date=current), line)
-        tfo_day = _filter_by_line(TFOProd.objects.filter(production_date=current), line)
-        trend_data.append({
-            'date':       _jstr(current),
-            'ring':       float(sp_day.aggregate(a=Avg('efficiency_pct'))['a']  or 0),
-            'winding':    float(wd_day.aggregate(a=Avg('efficiency_pct'))['a']  or 0),
-            'tfo':        float(tfo_day.aggregate(a=Avg('efficiency_pct'))['a'] or 0),
-        })
-        current += timedelta(days=1)
+    # ── trend راندمان (همه بخش‌ها، روزانه/هفتگی/ماهانه) ─────────
+    bucket = pick_bucket(date_from, date_to)
+    sp_series  = stage_series('spinning', date_from, date_to, line, status='completed', bucket=bucket)
+    wd_series  = stage_series('winding', date_from, date_to, line, bucket=bucket)
+    tfo_series = stage_series('tfo', date_from, date_to, line, bucket=bucket)
+
+    def _eff(t):
+        return float(t['avg_efficiency'] or 0)
+
+    trend_data = [
+        {
+            'date':       _jstr(day),
+            'ring':       _eff(sp_t),
+            'winding':    _eff(wd_t),
+            'tfo':        _eff(tfo_t),
+        }
+        for (day, sp_t), (_, wd_t), (_, tfo_t) in zip(
+            fill(sp_series, date_from, date_to, bucket, empty_totals()),
+            fill(wd_series, date_from, date_to, bucket, empty_totals()),
+            fill(tfo_series, date_from, date_to, bucket, empty_totals()),
+        )
+    ]
 
     # OEE میانگین کل
     oee_avg = round(sum(m['oee'] for m in machine_oee) / len(machine_oee), 1) if machine_oee else 0
@@ -504,7 +472,7 @@ def oee_report(request):
         items = [m for m in machine_oee if m.get('section') == section and m['batch_count'] > 0]
         return max(items, key=lambda x: x['oee']) if items else None
 
-    ctx.update({
+    return {
         'machine_oee':   machine_oee,
         'oee_avg':       oee_avg,
         'best_ring':     _best('رینگ'),
@@ -515,9 +483,9 @@ def oee_report(request):
         'date_to':       date_to,
         'chart_data':    json.dumps([{'label': m['code'], 'value': m['oee'], 'section': m.get('section', '')} for m in machine_oee]),
         'trend_data':    json.dumps(trend_data),
+        'trend_label':   BUCKET_LABELS[bucket],
         'page_title':    'گزارش راندمان و OEE',
-    })
-    return render(request, 'reports/oee_report.html', ctx)
+    }
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -526,20 +494,16 @@ def oee_report(request):
 
 def _period_stats(date_from, date_to, line=None):
     stats = {}
-    sp_qs = _filter_by_line(SpinningProd.objects.filter(production_date__range=(date_from, date_to), status='completed'), line)
-    sp = sp_qs.aggregate(total_output=Sum('output_weight'), total_input=Sum('input_weight'),
-                         avg_efficiency=Avg('efficiency_pct'), total_breakage=Sum('breakage_count'), batch_count=Count('id'))
-    stats.update({'spinning_output': float(sp['total_output'] or 0), 'spinning_efficiency': round(float(sp['avg_efficiency'] or 0), 1),
-                  'spinning_breakage': sp['total_breakage'] or 0, 'spinning_batches': sp['batch_count']})
-
-    bl_qs = _filter_by_line(BlowroomBatch.objects.filter(production_date__range=(date_from, date_to), status='completed'), line)
-    bl = bl_qs.aggregate(total_waste=Sum('waste_weight'), total_input=Sum('total_input_weight'))
-    bl_in  = float(bl['total_input'] or 0); bl_wst = float(bl['total_waste'] or 0)
+    sp = stage_totals('spinning', date_from, date_to, line, status='completed')
+    stats.update({'spinning_output': float(sp['output_kg']), 'spinning_efficiency': round(float(sp['avg_efficiency'] or 0), 1),
+                  'spinning_breakage': sp['breakage'], 'spinning_batches': sp['batch_count']})
+
+    bl = stage_totals('blowroom', date_from, date_to, line, status='completed')
+    bl_in  = float(bl['input_kg']); bl_wst = float(bl['waste_kg'])
     stats['blowroom_waste_pct'] = round(bl_wst / bl_in * 100, 2) if bl_in > 0 else 0
 
-    dt_qs = _filter_by_line(DowntimeLog.objects.filter(start_time__date__range=(date_from, date_to)), line)
-    dt = dt_qs.aggregate(total_min=Sum('duration_min'), count=Count('id'), total_loss=Sum('production_loss'))
-    stats.update({'downtime_min': dt['total_min'] or 0, 'downtime_count': dt['count'], 'production_loss': float(dt['total_loss'] or 0)})
+    dt = period_totals(date_from, date_to, line)
+    stats.update({'downtime_min': dt['minutes'], 'downtime_count': dt['count'], 'production_loss': float(dt['loss'])})
 
     from apps.orders.models import Order
     stats['orders_delivered'] = Order.objects.filter(status='delivered', updated_at__date__range=(date_from, date_to)).count()
@@ -548,8 +512,7 @@ def _period_stats(date_from, date_to, line=None):
 
 @login_required
 def compare_periods(request):
-    ctx  = _report_base_context(request)
-    line = ctx['selected_line']
+    ctx = _report_base_context(request)
     today = date.today()
     try:
         a_from = date.fromisoformat(request.GET.get('a_from', ''))
@@ -562,6 +525,14 @@ def compare_periods(request):
     except (ValueError, TypeError):
         b_from = today - timedelta(days=7); b_to = today
 
+    span_days = (a_to - a_from).days + (b_to - b_from).days + 2
+    return _heavy_report(request, 'compare', ctx, span_days,
+                         a_from=a_from, a_to=a_to, b_from=b_from, b_to=b_to,
+                         line=ctx['selected_line'])
+
+
+def compare_periods_data(a_from, a_to, b_from, b_to, line=None):
+    """داده مقایسه دو بازه زمانی."""
     period_a = _period_stats(a_from, a_to, line)
     period_b = _period_stats(b_from, b_to, line)
     comparisons = []
@@ -577,12 +548,11 @@ def compare_periods(request):
         comparisons.append({'label': label, 'unit': unit, 'val_a': val_a, 'val_b': val_b,
                             'change_pct': change_pct, 'is_better': (change_pct > 0) == higher_is_better,
                             'is_same': change_pct == 0})
-    ctx.update({'a_from': a_from, 'a_to': a_to, 'b_from': b_from, 'b_to': b_to, 'comparisons': comparisons,
-                'chart_data': json.dumps({'labels': [c['label'] for c in comparisons[:6]],
-                                          'period_a': [c['val_a'] for c in comparisons[:6]],
-                                          'period_b': [c['val_b'] for c in comparisons[:6]]}),
-                'page_title': 'مقایسه بازه زمانی'})
-    return render(request, 'reports/compare_periods.html', ctx)
+    return {'a_from': a_from, 'a_to': a_to, 'b_from': b_from, 'b_to': b_to, 'comparisons': comparisons,
+            'chart_data': json.dumps({'labels': [c['label'] for c in comparisons[:6]],
+                                      'period_a': [c['val_a'] for c in comparisons[:6]],
+                                      'period_b': [c['val_b'] for c in comparisons[:6]]}),
+            'page_title': 'مقایسه بازه زمانی'}
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -628,44 +598,42 @@ def winding_report(request):
         WindingProd.objects.filter(production_date__range=(date_from, date_to))
                            .select_related('machine', 'operator', 'shift'), line
     )
-    agg = qs.aggregate(
-        total_batches=Count('id'),
-        completed=Count('id', filter=Q(status='completed')),
-        total_input_kg=Sum('input_weight_kg'),
-        total_output_kg=Sum('output_weight_kg'),
-        total_waste_kg=Sum('waste_weight_kg'),
-        avg_cuts=Avg('cuts_per_100km'),
-        avg_splices=Avg('splices_per_100km'),
-        avg_efficiency=Avg('efficiency_pct'),
-    )
+    t = stage_totals('winding', date_from, date_to, line)
+    agg = {
+        'total_batches':   t['batch_count'],
+        'completed':       t['completed'],
+        'total_input_kg':  t['input_kg'],
+        'total_output_kg': t['output_kg'],
+        'total_waste_kg':  t['waste_kg'],
+        'avg_cuts':        t['avg_cuts'],
+        'avg_splices':     t['avg_splices'],
+        'avg_efficiency':  t['avg_efficiency'],
+    }
     total_in = float(agg['total_input_kg'] or 0)
     total_waste = float(agg['total_waste_kg'] or 0)
     waste_pct = round(total_waste / total_in * 100, 2) if total_in > 0 else 0
 
-    grade_dist = {
-        'A (< 20)':   qs.filter(cuts_per_100km__lt=20).count(),
-        'B (20-40)':  qs.filter(cuts_per_100km__gte=20, cuts_per_100km__lt=40).count(),
-        'C (40-60)':  qs.filter(cuts_per_100km__gte=40, cuts_per_100km__lt=60).count(),
-        'D (≥ 60)':   qs.filter(cuts_per_100km__gte=60).count(),
-    }
-    by_machine = qs.filter(cuts_per_100km__isnull=False).values('machine__code').annotate(
-        avg_cuts=Avg('cuts_per_100km'), avg_eff=Avg('efficiency_pct'),
-        total_output=Sum('output_weight_kg'), count=Count('id')).order_by('avg_cuts')[:10]
-
+    grade_dist = merge_counts(day_partials('winding_grades', date_from, date_to, line), WINDING_GRADES)
+    by_machine = sorted(
+        ({'machine__code': m['machine__code'], 'avg_cuts': m['avg_cuts'], 'avg_eff': m['avg_efficiency'],
+          'total_output': m['output_kg'], 'count': m['batch_count']}
+         for m in stage_by_machine('winding', date_from, date_to, line).values()
+         if m['avg_cuts'] is not None),
+        key=lambda m: m['avg_cuts'],
+    )[:10]
+
+    bucket = pick_bucket(date_from, date_to)
+    series = stage_series('winding', date_from, date_to, line, bucket=bucket)
     trend_data = []
-    current = date_from
-    while current <= date_to:
-        d_qs = qs.filter(production_date=current)
-        d_agg = d_qs.aggregate(avg_cuts=Avg('cuts_per_100km'), avg_eff=Avg('efficiency_pct'), total_kg=Sum('output_weight_kg'))
-        trend_data.append({'date': _jstr(current), 'cuts': round(float(d_agg['avg_cuts'] or 0), 1),
-                           'efficiency': round(float(d_agg['avg_eff'] or 0), 1),
-                           'kg': round(float(d_agg['total_kg'] or 0), 1)})
-        current += timedelta(days=1)
+    for day, d_agg in fill(series, date_from, date_to, bucket, empty_totals()):
+        trend_data.append({'date': _jstr(day), 'cuts': round(float(d_agg['avg_cuts'] or 0), 1),
+                           'efficiency': round(float(d_agg['avg_efficiency'] or 0), 1),
+                           'kg': round(float(d_agg['output_kg']), 1)})
 
     ctx.update({
         'agg': agg, 'waste_pct': waste_pct, 'grade_dist': grade_dist,
         'by_machine': by_machine, 'recent_batches': qs.order_by('-production_date', '-created_at')[:15],
-        'trend_data': json.dumps(trend_data),
+        'trend_data': json.dumps(trend_data), 'trend_label': BUCKET_LABELS[bucket],
         'grade_chart': json.dumps([{'label': k, 'value': v} for k, v in grade_dist.items()]),
         'date_from': date_from, 'date_to': date_to, 'page_title': 'گزارش بوبین‌پیچی',
     })
@@ -686,42 +654,41 @@ def tfo_report(request):
         TFOProd.objects.filter(production_date__range=(date_from, date_to))
                        .select_related('machine', 'operator', 'shift'), line
     )
-    agg = qs.aggregate(
-        total_batches=Count('id'),
-        completed=Count('id', filter=Q(status='completed')),
-        total_input_kg=Sum('input_weight_kg'),
-        total_output_kg=Sum('output_weight_kg'),
-        total_waste_kg=Sum('waste_weight_kg'),
-        avg_tpm=Avg('twist_tpm'),
-        avg_efficiency=Avg('efficiency_pct'),
-        total_breakage=Sum('breakage_count'),
-    )
+    t = stage_totals('tfo', date_from, date_to, line)
+    agg = {
+        'total_batches':   t['batch_count'],
+        'completed':       t['completed'],
+        'total_input_kg':  t['input_kg'],
+        'total_output_kg': t['output_kg'],
+        'total_waste_kg':  t['waste_kg'],
+        'avg_tpm':         t['avg_tpm'],
+        'avg_efficiency':  t['avg_efficiency'],
+        'total_breakage':  t['breakage'],
+    }
     total_in = float(agg['total_input_kg'] or 0)
     total_waste = float(agg['total_waste_kg'] or 0)
     waste_pct = round(total_waste / total_in * 100, 2) if total_in > 0 else 0
 
-    twist_dist = {
-        'S — چپ‌تاب': qs.filter(twist_direction='S').count(),
-        'Z — راست‌تاب': qs.filter(twist_direction='Z').count(),
-    }
-    by_machine = qs.values('machine__code').annotate(
-        avg_eff=Avg('efficiency_pct'), avg_breakage=Avg('breakage_count'),
-        avg_tpm=Avg('twist_tpm'), total_output=Sum('output_weight_kg'), count=Count('id')
-    ).order_by('-avg_eff')[:10]
-
+    twist_dist = merge_counts(day_partials('tfo_twists', date_from, date_to, line), TFO_TWISTS)
+    by_machine = sorted(
+        ({'machine__code': m['machine__code'], 'avg_eff': m['avg_efficiency'],
+          'avg_breakage': m['breakage'] / m['batch_count'], 'avg_tpm': m['avg_tpm'],
+          'total_output': m['output_kg'], 'count': m['batch_count']}
+         for m in stage_by_machine('tfo', date_from, date_to, line).values()),
+        key=lambda m: (m['avg_eff'] is not None, m['avg_eff'] or 0), reverse=True,
+    )[:10]
+
+    bucket = pick_bucket(date_from, date_to)
+    series = stage_series('tfo', date_from, date_to, line, bucket=bucket)
     trend_data = []
-    current = date_from
-    while current <= date_to:
-        d_agg = qs.filter(production_date=current).aggregate(
-            avg_eff=Avg('efficiency_pct'), total_breakage=Sum('breakage_count'), total_kg=Sum('output_weight_kg'))
-        trend_data.append({'date': _jstr(current), 'efficiency': round(float(d_agg['avg_eff'] or 0), 1),
-                           'breakage': d_agg['total_breakage'] or 0, 'kg': round(float(d_agg['total_kg'] or 0), 1)})
-        current += timedelta(days=1)
+    for day, d_agg in fill(series, date_from, date_to, bucket, empty_totals()):
+        trend_data.append({'date': _jstr(day), 'efficiency': round(float(d_agg['avg_efficiency'] or 0), 1),
+                           'breakage': d_agg['breakage'], 'kg': round(float(d_agg['output_kg']), 1)})
 
     ctx.update({
         'agg': agg, 'waste_pct': waste_pct, 'twist_dist': twist_dist,
         'by_machine': by_machine, 'recent_batches': qs.order_by('-production_date', '-created_at')[:15],
-        'trend_data': json.dumps(trend_data),
+        'trend_data': json.dumps(trend_data), 'trend_label': BUCKET_LABELS[bucket],
         'twist_chart': json.dumps([{'label': k, 'value': v} for k, v in twist_dist.items()]),
         'date_from': date_from, 'date_to': date_to, 'page_title': 'گزارش دولاتابی TFO',
     })
@@ -734,7 +701,12 @@ def tfo_report(request):
 
 @login_required
 def heatset_report(request):
-    """گزارش تخصصی هیت‌ست: pass/fail، دما، آنکاژ."""
+    """گزارش تخصصی هیت‌ست: pass/fail، دما، آنکاژ، شاخص‌های منحنی چرخه.
+
+    شاخص‌های منحنی (CycleMetrics — heatset/analytics.py):
+      ?metric_sort=[-]<field>          مرتب‌سازی جدول شاخص‌ها
+      ?<field>_min= / ?<field>_max=    فیلتر (مقدار نامعتبر نادیده گرفته می‌شود)
+    """
     date_from, date_to = _parse_date_range(request)
     ctx  = _report_base_context(request)
     line = ctx['selected_line']
@@ -742,48 +714,62 @@ def heatset_report(request):
         HeatsetBatch.objects.filter(production_date__range=(date_from, date_to))
                             .select_related('machine', 'operator', 'shift'), line
     )
-    agg = qs.aggregate(
-        total_batches=Count('id'),
-        pass_count=Count('id', filter=Q(quality_result='pass')),
-        fail_count=Count('id', filter=Q(quality_result='fail')),
-        conditional_count=Count('id', filter=Q(quality_result='conditional')),
-        total_weight_kg=Sum('batch_weight_kg'),
-        avg_temp=Avg('temperature_c'),
-        avg_duration=Avg('duration_min'),
-        avg_shrinkage=Avg('shrinkage_pct'),
-    )
+    t = stage_totals('heatset', date_from, date_to, line)
+    agg = {
+        'total_batches':     t['batch_count'],
+        'pass_count':        t['pass_count'],
+        'fail_count':        t['fail_count'],
+        'conditional_count': t['conditional_count'],
+        'total_weight_kg':   t['output_kg'] if t['batch_count'] else None,
+        'avg_temp':          t['avg_temperature'],
+        'avg_duration':      t['avg_duration'],
+        'avg_shrinkage':     t['avg_shrinkage'],
+    }
     total = agg['total_batches'] or 1
     pass_rate = round((agg['pass_count'] or 0) / total * 100, 1)
 
-    by_fiber = qs.values('fiber_type').annotate(
-        count=Count('id'), pass_count=Count('id', filter=Q(quality_result='pass')),
-        avg_temp=Avg('temperature_c'), avg_shrinkage=Avg('shrinkage_pct')).order_by('-count')
-
-    stability_dist = {
-        'عالی':  qs.filter(twist_stability='excellent').count(),
-        'خوب':   qs.filter(twist_stability='good').count(),
-        'متوسط': qs.filter(twist_stability='fair').count(),
-        'ضعیف':  qs.filter(twist_stability='poor').count(),
-    }
+    by_fiber, stability_dist = merge_heatset_fibers(day_partials('heatset_fibers', date_from, date_to, line))
 
+    bucket = pick_bucket(date_from, date_to)
+    series = stage_series('heatset', date_from, date_to, line, bucket=bucket)
     trend_data = []
-    current = date_from
-    while current <= date_to:
-        d_qs   = qs.filter(production_date=current)
-        d_tot  = d_qs.count()
-        d_pass = d_qs.filter(quality_result='pass').count()
-        d_agg  = d_qs.aggregate(avg_temp=Avg('temperature_c'))
-        trend_data.append({'date': _jstr(current), 'total': d_tot, 'pass': d_pass,
+    for day, d_agg in fill(series, date_from, date_to, bucket, empty_totals()):
+        d_tot  = d_agg['batch_count']
+        d_pass = d_agg['pass_count']
+        trend_data.append({'date': _jstr(day), 'total': d_tot, 'pass': d_pass,
                            'fail': d_tot - d_pass,
                            'pass_rate': round(d_pass / d_tot * 100, 1) if d_tot > 0 else 0,
-                           'avg_temp': round(float(d_agg['avg_temp'] or 0), 1)})
-        current += timedelta(days=1)
+                           'avg_temp': round(float(d_agg['avg_temperature'] or 0), 1)})
+
+    # ── شاخص‌های منحنی چرخه (ستون‌های CycleMetrics، بدون خواندن CycleLog) ──
+    try:
+        lookups = metric_filters(request.GET)
+    except ValueError:
+        lookups = {}
+    metric_sort = request.GET.get('metric_sort') or DEFAULT_METRIC_SORT
+    try:
+        ordering = metric_ordering(metric_sort)
+    except ValueError:
+        metric_sort = DEFAULT_METRIC_SORT
+        ordering = metric_ordering(metric_sort)
+    measured = qs.filter(cycle_metrics__isnull=False, **lookups)
+    cycle_agg = measured.aggregate(
+        count              = Count('id'),
+        avg_peak           = Avg('cycle_metrics__peak_temperature_c'),
+        max_peak           = Max('cycle_metrics__peak_temperature_c'),
+        avg_time_above     = Avg('cycle_metrics__time_above_setpoint_min'),
+        avg_heat_up        = Avg('cycle_metrics__heat_up_rate_c_min'),
+        avg_pressure_cv    = Avg('cycle_metrics__pressure_cv_pct'),
+    )
 
     ctx.update({
         'agg': agg, 'pass_rate': pass_rate, 'by_fiber': by_fiber,
         'stability_dist': stability_dist,
+        'cycle_agg': cycle_agg,
+        'cycle_batches': measured.select_related('cycle_metrics').order_by(ordering, '-production_date')[:15],
+        'metric_labels': METRIC_LABELS, 'metric_sort': metric_sort,
         'recent_batches': qs.order_by('-production_date', '-created_at')[:15],
-        'trend_data': json.dumps(trend_data),
+        'trend_data': json.dumps(trend_data), 'trend_label': BUCKET_LABELS[bucket],
         'quality_chart': json.dumps([
             {'label': 'قبول',    'value': agg['pass_count'] or 0},
             {'label': 'رد',      'value': agg['fail_count'] or 0},
@@ -803,35 +789,38 @@ def heatset_report(request):
 def production_chain(request):
     """گزارش زنجیره SP→WD→TFO→HS: خلاصه تولید + ضایعات تجمعی."""
     date_from, date_to = _parse_date_range(request)
-    ctx  = _report_base_context(request)
-    line = ctx['selected_line']
+    ctx = _report_base_context(request)
+    return _heavy_report(request, 'chain', ctx, (date_to - date_from).days + 1,
+                         date_from=date_from, date_to=date_to, line=ctx['selected_line'])
 
-    def _lf(qs):
-        return qs.filter(production_line=line) if line else qs
+
+def production_chain_data(date_from, date_to, line=None):
+    """داده گزارش زنجیره تولید."""
+
+    sp  = stage_totals('spinning', date_from, date_to, line)
+    wd  = stage_totals('winding',  date_from, date_to, line)
+    tfo = stage_totals('tfo',      date_from, date_to, line)
+    hs  = stage_totals('heatset',  date_from, date_to, line)
 
     # ── رینگ ──────────────────────────────────────────────────────
-    sp_qs  = _lf(SpinningProd.objects.filter(production_date__range=(date_from, date_to)))
-    sp_agg = sp_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(status='completed')),
-                              total_kg=Sum('output_weight'), avg_eff=Avg('efficiency_pct'))
+    sp_agg = {'total': sp['batch_count'], 'completed': sp['completed'],
+              'total_kg': sp['output_kg'], 'avg_eff': sp['avg_efficiency']}
 
     # ── بوبین‌پیچی ─────────────────────────────────────────────────
-    wd_qs  = _lf(WindingProd.objects.filter(production_date__range=(date_from, date_to)))
-    wd_agg = wd_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(status='completed')),
-                              total_input_kg=Sum('input_weight_kg'), total_kg=Sum('output_weight_kg'),
-                              waste_kg=Sum('waste_weight_kg'), avg_eff=Avg('efficiency_pct'),
-                              avg_cuts=Avg('cuts_per_100km'))
+    wd_agg = {'total': wd['batch_count'], 'completed': wd['completed'],
+              'total_input_kg': wd['input_kg'], 'total_kg': wd['output_kg'],
+              'waste_kg': wd['waste_kg'], 'avg_eff': wd['avg_efficiency'],
+              'avg_cuts': wd['avg_cuts']}
 
     # ── دولاتابی ───────────────────────────────────────────────────
-    tfo_qs  = _lf(TFOProd.objects.filter(production_date__range=(date_from, date_to)))
-    tfo_agg = tfo_qs.aggregate(total=Count('id'), completed=Count('id', filter=Q(status='completed')),
-                                total_kg=Sum('output_weight_kg'), waste_kg=Sum('waste_weight_kg'),
-                                avg_eff=Avg('efficiency_pct'), total_breakage=Sum('breakage_count'))
+    tfo_agg = {'total': tfo['batch_count'], 'completed': tfo['completed'],
+               'total_kg': tfo['output_kg'], 'waste_kg': tfo['waste_kg'],
+               'avg_eff': tfo['avg_efficiency'], 'total_breakage': tfo['breakage']}
 
     # ── هیت‌ست ─────────────────────────────────────────────────────
-    hs_qs  = _lf(HeatsetBatch.objects.filter(production_date__range=(date_from, date_to)))
-    hs_agg = hs_qs.aggregate(total=Count('id'), pass_count=Count('id', filter=Q(quality_result='pass')),
-                               fail_count=Count('id', filter=Q(quality_result='fail')),
-                               total_kg=Sum('batch_weight_kg'), avg_temp=Avg('temperature_c'))
+    hs_agg = {'total': hs['batch_count'], 'pass_count': hs['pass_count'],
+              'fail_count': hs['fail_count'], 'total_kg': hs['output_kg'],
+              'avg_temp': hs['avg_temperature']}
     hs_t = hs_agg['total'] or 1
     hs_agg['pass_rate'] = round((hs_agg['pass_count'] or 0) / hs_t * 100, 1)
 
@@ -862,142 +851,77 @@ def production_chain(request):
         {'label': 'HS خروجی',   'value': round(hs_out, 1)},
     ])
 
-    # ── روند روزانه همه مراحل ──────────────────────────────────────
+    # ── روند همه مراحل (روزانه/هفتگی/ماهانه) ──────────────────────
+    bucket = pick_bucket(date_from, date_to)
+    filled = {
+        stage: fill(stage_series(stage, date_from, date_to, line, bucket=bucket),
+                    date_from, date_to, bucket, empty_totals())
+        for stage in ('spinning', 'winding', 'tfo', 'heatset')
+    }
+
     trend_data = []
-    current = date_from
-    while current <= date_to:
-        sp_d  = _lf(SpinningProd.objects.filter(production_date=current)).aggregate(kg=Sum('output_weight'))['kg'] or 0
-        wd_d  = _lf(WindingProd.objects.filter(production_date=current)).aggregate(kg=Sum('output_weight_kg'))['kg'] or 0
-        tfo_d = _lf(TFOProd.objects.filter(production_date=current)).aggregate(kg=Sum('output_weight_kg'))['kg'] or 0
-        hs_d  = _lf(HeatsetBatch.objects.filter(production_date=current)).aggregate(kg=Sum('batch_weight_kg'))['kg'] or 0
-        trend_data.append({'date': _jstr(current),
-                           'sp': round(float(sp_d), 1), 'wd': round(float(wd_d), 1),
-                           'tfo': round(float(tfo_d), 1), 'hs': round(float(hs_d), 1)})
-        current += timedelta(days=1)
+    for (day, sp_d), (_, wd_d), (_, tfo_d), (_, hs_d) in zip(
+        filled['spinning'], filled['winding'], filled['tfo'], filled['heatset'],
+    ):
+        trend_data.append({'date': _jstr(day),
+                           'sp': round(float(sp_d['output_kg']), 1), 'wd': round(float(wd_d['output_kg']), 1),
+                           'tfo': round(float(tfo_d['output_kg']), 1), 'hs': round(float(hs_d['output_kg']), 1)})
 
-    ctx.update({
+    return {
         'sp_agg': sp_agg, 'wd_agg': wd_agg, 'tfo_agg': tfo_agg, 'hs_agg': hs_agg,
         'chain_losses': chain_losses,
         'stage_chart': stage_chart,
-        'trend_data': json.dumps(trend_data),
+        'trend_data': json.dumps(trend_data), 'trend_label': BUCKET_LABELS[bucket],
         'date_from': date_from, 'date_to': date_to,
         'page_title': 'گزارش زنجیره تولید',
-    })
-    return render(request, 'reports/production_chain.html', ctx)
+    }
 
 
 # ═══════════════════════════════════════════════════════════════
-# Excel exports
+# Excel / CSV exports (استریم — exports.py)
 # ═══════════════════════════════════════════════════════════════
 
-def _excel_response(filename):
-    r = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    r['Content-Disposition'] = f'attachment; filename={filename}'
-    return r
-
-
-def _excel_header(ws, headers, color):
-    from openpyxl.styles import Font, Alignment, PatternFill
-    hf = PatternFill(start_color=color, end_color=color, fill_type='solid')
-    for col, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=col, value=h)
-        c.fill = hf
-        c.font = Font(bold=True, color='FFFFFF', size=11)
-        c.alignment = Alignment(horizontal='center')
-        ws.column_dimensions[chr(64 + col)].width = 16
-
-
 @login_required
 def export_production_excel(request):
-    try:
-        from openpyxl import Workbook
-    except ImportError:
-        return HttpResponse('openpyxl نصب نیست', status=500)
     date_from, date_to = _parse_date_range(request)
-    qs = SpinningProd.objects.filter(production_date__range=(date_from, date_to)).select_related('machine', 'operator', 'shift').order_by('production_date')
-    wb = Workbook(); ws = wb.active; ws.title = 'تولید رینگ'; ws.sheet_view.rightToLeft = True
-    headers = ['شماره بچ', 'تاریخ', 'ماشین', 'اپراتور', 'شیفت', 'نمره نخ', 'تاب', 'دوک', 'ورودی(kg)', 'خروجی(kg)', 'پارگی', 'راندمان%', 'وضعیت']
-    _excel_header(ws, headers, '4361EE')
-    for row, p in enumerate(qs, 2):
-        jd = jdatetime.date.fromgregorian(date=p.production_date)
-        vals = [p.batch_number, jd.strftime('%Y/%m/%d'), p.machine.code, p.operator.get_full_name(),
-                str(p.shift or ''), p.yarn_count, float(p.twist_tpm or 0), p.num_spindles_active,
-                float(p.input_weight or 0), float(p.output_weight or 0), p.breakage_count,
-                float(p.efficiency_pct or 0), p.get_status_display()]
-        for col, v in enumerate(vals, 1):
-            ws.cell(row=row, column=col, value=v)
-    response = _excel_response(f'spinning_{date_from}_{date_to}.xlsx')
-    wb.save(response)
-    return response
+    return export_response('production', date_from, date_to, request.GET.get('format', 'xlsx'))
 
 
 @login_required
 def export_winding_excel(request):
-    try:
-        from openpyxl import Workbook
-    except ImportError:
-        return HttpResponse('openpyxl نصب نیست', status=500)
     date_from, date_to = _parse_date_range(request)
-    qs = WindingProd.objects.filter(production_date__range=(date_from, date_to)).select_related('machine', 'operator', 'shift').order_by('production_date')
-    wb = Workbook(); ws = wb.active; ws.title = 'بوبین‌پیچی'; ws.sheet_view.rightToLeft = True
-    headers = ['شماره بچ', 'تاریخ', 'ماشین', 'اپراتور', 'شیفت', 'ورودی(kg)', 'خروجی(kg)', 'ضایعات(kg)', 'برش/100km', 'اتصال/100km', 'راندمان%', 'نوع بوبین', 'وضعیت']
-    _excel_header(ws, headers, '0891B2')
-    for row, p in enumerate(qs, 2):
-        jd = jdatetime.date.fromgregorian(date=p.production_date)
-        vals = [p.batch_number, jd.strftime('%Y/%m/%d'), p.machine.code, p.operator.get_full_name(),
-                str(p.shift or ''), float(p.input_weight_kg or 0), float(p.output_weight_kg or 0),
-                float(p.waste_weight_kg or 0), p.cuts_per_100km, p.splices_per_100km,
-                float(p.efficiency_pct or 0), p.get_package_type_display(), p.get_status_display()]
-        for col, v in enumerate(vals, 1):
-            ws.cell(row=row, column=col, value=v)
-    response = _excel_response(f'winding_{date_from}_{date_to}.xlsx')
-    wb.save(response)
-    return response
+    return export_response('winding', date_from, date_to, request.GET.get('format', 'xlsx'))
 
 
 @login_required
 def export_heatset_excel(request):
-    try:
-        from openpyxl import Workbook
-    except ImportError:
-        return HttpResponse('openpyxl نصب نیست', status=500)
     date_from, date_to = _parse_date_range(request)
-    qs = HeatsetBatch.objects.filter(production_date__range=(date_from, date_to)).select_related('machine', 'operator', 'shift').order_by('production_date')
-    wb = Workbook(); ws = wb.active; ws.title = 'هیت‌ست'; ws.sheet_view.rightToLeft = True
-    headers = ['شماره بچ', 'تاریخ', 'ماشین', 'اپراتور', 'نوع دستگاه', 'نوع الیاف', 'دما(°C)', 'فشار(bar)', 'مدت(min)', 'وزن(kg)', 'تعداد بوبین', 'نتیجه', 'آنکاژ%', 'پایداری تاب']
-    _excel_header(ws, headers, 'DC2626')
-    for row, b in enumerate(qs, 2):
-        jd = jdatetime.date.fromgregorian(date=b.production_date)
-        vals = [b.batch_number, jd.strftime('%Y/%m/%d'), b.machine.code, b.operator.get_full_name(),
-                b.get_machine_type_hs_display(), b.get_fiber_type_display(),
-                float(b.temperature_c), float(b.steam_pressure_bar or 0),
-                b.duration_min, float(b.batch_weight_kg), b.packages_count,
-                b.get_quality_result_display() if b.quality_result else '',
-                float(b.shrinkage_pct or 0), b.get_twist_stability_display() if b.twist_stability else '']
-        for col, v in enumerate(vals, 1):
-            ws.cell(row=row, column=col, value=v)
-    response = _excel_response(f'heatset_{date_from}_{date_to}.xlsx')
-    wb.save(response)
-    return response
+    return export_response('heatset', date_from, date_to, request.GET.get('format', 'xlsx'))
 
 
 @login_required
 def export_downtime_excel(request):
-    try:
-        from openpyxl import Workbook
-    except ImportError:
-        return HttpResponse('openpyxl نصب نیست', status=500)
     date_from, date_to = _parse_date_range(request)
-    qs = DowntimeLog.objects.filter(start_time__date__range=(date_from, date_to)).select_related('machine', 'operator', 'shift').order_by('start_time')
-    wb = Workbook(); ws = wb.active; ws.title = 'توقفات'; ws.sheet_view.rightToLeft = True
-    headers = ['ماشین', 'تاریخ شروع', 'مدت(min)', 'دسته دلیل', 'جزئیات', 'تلفات(kg)', 'اپراتور', 'شیفت']
-    _excel_header(ws, headers, 'DC3545')
-    for row, d in enumerate(qs, 2):
-        jdt_str = jdatetime.datetime.fromgregorian(datetime=d.start_time).strftime('%Y/%m/%d %H:%M') if d.start_time else ''
-        vals = [d.machine.code, jdt_str, d.duration_min, d.get_reason_category_display(),
-                d.reason_detail, float(d.production_loss or 0), d.operator.get_full_name(), str(d.shift or '')]
-        for col, v in enumerate(vals, 1):
-            ws.cell(row=row, column=col, value=v)
-    response = _excel_response(f'downtime_{date_from}_{date_to}.xlsx')
-    wb.save(response)
-    return response
+    return export_response('downtime', date_from, date_to, request.GET.get('format', 'xlsx'))
+
+
+# ═══════════════════════════════════════════════════════════════
+# وضعیت گزارش پس‌زمینه
+# ═══════════════════════════════════════════════════════════════
+
+@login_required
+def job_status(request, pk):
+    """وضعیت ReportJob برای polling صفحه انتظار.
+    GET /reports/jobs/<id>/
+    """
+    job = get_object_or_404(ReportJob, pk=pk)
+    return JsonResponse({
+        'id': job.pk,
+        'report': job.report,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error.splitlines()[-1] if job.error else '',
+    })
@@ -10,11 +10,18 @@ F.1 — شاخص‌های کیفی خودکار:
   breakage_count > 10 → هشدار
   breakage_count > 25 → بحرانی
   efficiency_pct < 70 → هشدار راندمان
+
+metadata و هشدارها در pre_save مسیر مشترک ai_ready/signals.py (رجیستری
+ENRICHERS) با build_metadata همین ماژول محاسبه می‌شوند — ردیف یک بار نوشته
+می‌شود؛ post_save این ماژول هشدارهای بحرانی را لاگ و هشدارها را در جدول
+QualityAlert (ai_ready/alerts.py) همگام می‌کند.
 """
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from apps.ai_ready.alerts import delete_alerts, sync_alerts
+
 from .models import Production
 
 logger = logging.getLogger(__name__)
@@ -24,42 +31,8 @@ BREAKAGE_CRITICAL  = 25   # پارگی بالاتر از این → بحرانی
 EFFICIENCY_MIN     = 70   # راندمان پایین‌تر → هشدار
 
 
-@receiver(pre_save, sender=Production)
-def tfo_pre_save(sender, instance, **kwargs):
-    """
-    قبل از ذخیره:
-    ✦ مقداردهی اولیه metadata
-    ✦ محاسبه waste_pct
-    """
-    if not instance.metadata or not isinstance(instance.metadata, dict):
-        instance.metadata = {}
-
-    # پایه AI-Ready
-    if 'ai_quality' not in instance.metadata:
-        instance.metadata['ai_quality'] = {
-            'torque_log':     [],   # لاگ گشتاور دوک (برای آینده)
-            'vibration_log':  [],   # لاگ ارتعاش (برای آینده)
-            'alerts':         [],
-        }
-
-    # محاسبه waste_pct
-    if instance.input_weight_kg and instance.waste_weight_kg:
-        try:
-            waste_pct = round(
-                float(instance.waste_weight_kg) / float(instance.input_weight_kg) * 100, 2
-            )
-            instance.metadata['waste_pct_calculated'] = waste_pct
-        except (ZeroDivisionError, TypeError):
-            pass
-
-
-@receiver(post_save, sender=Production)
-def tfo_post_save(sender, instance, created, **kwargs):
-    """
-    بعد از ذخیره:
-    ✦ بررسی breakage_count
-    ✦ بررسی efficiency_pct
-    """
+def quality_alerts(instance):
+    """هشدارهای کیفی بچ (تابع خالص)."""
     alerts = []
 
     # بررسی پارگی
@@ -70,10 +43,6 @@ def tfo_post_save(sender, instance, created, **kwargs):
                 'code':  'HIGH_BREAKAGE',
                 'msg':   f'پارگی بحرانی: {instance.breakage_count} بار (حد: {BREAKAGE_CRITICAL})',
             })
-            logger.warning(
-                'TFO CRITICAL BREAKAGE | batch=%s | breakage=%s',
-                instance.batch_number, instance.breakage_count
-            )
         elif instance.breakage_count >= BREAKAGE_WARNING:
             alerts.append({
                 'level': 'warning',
@@ -89,11 +58,50 @@ def tfo_post_save(sender, instance, created, **kwargs):
                 'code':  'LOW_EFFICIENCY',
                 'msg':   f'راندمان پایین: {instance.efficiency_pct}% (حداقل: {EFFICIENCY_MIN}%)',
             })
+    return alerts
+
+
+def build_metadata(instance):
+    """
+    metadata کامل بچ (تابع خالص — instance.metadata تغییر نمی‌کند):
+    ✦ ساختار AI-Ready و waste_pct_calculated
+    ✦ هشدارهای کیفی فعلی (هشدارهای قبلی جایگزین می‌شوند) و has_alerts
+    """
+    meta = dict(instance.metadata) if isinstance(instance.metadata, dict) else {}
+    ai_q = dict(meta.get('ai_quality') or {
+        'torque_log':     [],
+        'vibration_log':  [],
+    })
+    ai_q['alerts'] = quality_alerts(instance)
+    meta['ai_quality'] = ai_q
+    meta['has_alerts'] = bool(ai_q['alerts'])
+
+    if instance.input_weight_kg and instance.waste_weight_kg:
+        try:
+            meta['waste_pct_calculated'] = round(
+                float(instance.waste_weight_kg) / float(instance.input_weight_kg) * 100, 2
+            )
+        except (ZeroDivisionError, TypeError):
+            pass
+    return meta
+
+
+@receiver(post_save, sender=Production)
+def tfo_post_save(sender, instance, created, **kwargs):
+    """
+    بعد از ذخیره:
+    ✦ لاگ پارگی بحرانی (metadata قبلاً در pre_save کامل شده است)
+    ✦ همگام‌سازی جدول QualityAlert
+    """
+    alerts = quality_alerts(instance)
+    if any(a['code'] == 'HIGH_BREAKAGE' for a in alerts):
+        logger.warning(
+            'TFO CRITICAL BREAKAGE | batch=%s | breakage=%s',
+            instance.batch_number, instance.breakage_count
+        )
+    sync_alerts('tfo', instance, alerts)
+
 
-    if alerts:
-        meta = instance.metadata or {}
-        ai_q = meta.get('ai_quality', {'alerts': []})
-        ai_q['alerts'] = alerts
-        meta['ai_quality'] = ai_q
-        meta['has_alerts'] = True
-        Production.objects.filter(pk=instance.pk).update(metadata=meta)
+@receiver(post_delete, sender=Production)
+def tfo_post_delete(sender, instance, **kwargs):
+    delete_alerts('tfo', instance.pk)
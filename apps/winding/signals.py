@@ -10,11 +10,18 @@ F.1 — شاخص‌های کیفی خودکار:
   cuts_per_100km < 20  → کیفیت A (عالی)
   cuts_per_100km ≥ 50  → هشدار کیفی → ثبت در metadata
   efficiency_pct  < 65 → هشدار راندمان
+
+metadata و هشدارها در pre_save مسیر مشترک ai_ready/signals.py (رجیستری
+ENRICHERS) با build_metadata همین ماژول محاسبه می‌شوند — ردیف یک بار نوشته
+می‌شود؛ post_save این ماژول هشدارهای بحرانی را لاگ و هشدارها را در جدول
+QualityAlert (ai_ready/alerts.py) همگام می‌کند.
 """
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from apps.ai_ready.alerts import delete_alerts, sync_alerts
+
 from .models import Production
 
 logger = logging.getLogger(__name__)
@@ -25,44 +32,8 @@ CUTS_CRITICAL_THRESHOLD  = 80   # برش/۱۰۰km بالاتر از این → 
 EFFICIENCY_MIN           = 65   # راندمان پایین‌تر از این → هشدار
 
 
-@receiver(pre_save, sender=Production)
-def winding_pre_save(sender, instance, **kwargs):
-    """
-    قبل از ذخیره:
-    ✦ مقداردهی اولیه metadata اگر خالی است
-    ✦ محاسبه waste_pct و ذخیره در metadata
-    """
-    # اطمینان از وجود metadata
-    if not instance.metadata or not isinstance(instance.metadata, dict):
-        instance.metadata = {}
-
-    # پایه AI-Ready
-    if 'ai_quality' not in instance.metadata:
-        instance.metadata['ai_quality'] = {
-            'sensor_tension_log': [],   # لاگ کشش سنسور (برای آینده)
-            'speed_log':          [],   # لاگ سرعت (برای آینده)
-            'alerts':             [],
-        }
-
-    # محاسبه waste_pct و ذخیره
-    if instance.input_weight_kg and instance.waste_weight_kg:
-        try:
-            waste_pct = round(
-                float(instance.waste_weight_kg) / float(instance.input_weight_kg) * 100, 2
-            )
-            instance.metadata['waste_pct_calculated'] = waste_pct
-        except (ZeroDivisionError, TypeError):
-            pass
-
-
-@receiver(post_save, sender=Production)
-def winding_post_save(sender, instance, created, **kwargs):
-    """
-    بعد از ذخیره:
-    ✦ بررسی آستانه cuts_per_100km و ثبت هشدار در metadata
-    ✦ بررسی efficiency_pct
-    ✦ ذخیره مجدد فقط اگر metadata تغییر کرده
-    """
+def quality_alerts(instance):
+    """هشدارهای کیفی بچ (تابع خالص)."""
     alerts = []
 
     # بررسی کیفیت برش
@@ -73,20 +44,12 @@ def winding_post_save(sender, instance, created, **kwargs):
                 'code':  'HIGH_CUTS',
                 'msg':   f'برش بحرانی: {instance.cuts_per_100km}/100km (حد بحرانی: {CUTS_CRITICAL_THRESHOLD})',
             })
-            logger.warning(
-                'WINDING CRITICAL CUTS | batch=%s | cuts=%s',
-                instance.batch_number, instance.cuts_per_100km
-            )
         elif instance.cuts_per_100km >= CUTS_WARNING_THRESHOLD:
             alerts.append({
                 'level': 'warning',
                 'code':  'ELEVATED_CUTS',
                 'msg':   f'برش بالا: {instance.cuts_per_100km}/100km (حد هشدار: {CUTS_WARNING_THRESHOLD})',
             })
-            logger.info(
-                'WINDING CUTS WARNING | batch=%s | cuts=%s',
-                instance.batch_number, instance.cuts_per_100km
-            )
 
     # بررسی راندمان
     if instance.efficiency_pct is not None:
@@ -96,12 +59,60 @@ def winding_post_save(sender, instance, created, **kwargs):
                 'code':  'LOW_EFFICIENCY',
                 'msg':   f'راندمان پایین: {instance.efficiency_pct}% (حداقل: {EFFICIENCY_MIN}%)',
             })
+    return alerts
+
+
+def build_metadata(instance):
+    """
+    metadata کامل بچ (تابع خالص — instance.metadata تغییر نمی‌کند):
+    ✦ ساختار AI-Ready و waste_pct_calculated
+    ✦ هشدارهای کیفی فعلی (هشدارهای قبلی جایگزین می‌شوند) و has_alerts
+    """
+    meta = dict(instance.metadata) if isinstance(instance.metadata, dict) else {}
+    ai_q = dict(meta.get('ai_quality') or {
+        'sensor_tension_log': [],
+        'speed_log':          [],
+    })
+    ai_q['alerts'] = quality_alerts(instance)
+    meta['ai_quality'] = ai_q
+    meta['has_alerts'] = bool(ai_q['alerts'])
+
+    if instance.input_weight_kg and instance.waste_weight_kg:
+        try:
+            meta['waste_pct_calculated'] = round(
+                float(instance.waste_weight_kg) / float(instance.input_weight_kg) * 100, 2
+            )
+        except (ZeroDivisionError, TypeError):
+            pass
+    return meta
+
+
+def _log_alerts(instance, alerts):
+    for alert in alerts:
+        if alert['code'] == 'HIGH_CUTS':
+            logger.warning(
+                'WINDING CRITICAL CUTS | batch=%s | cuts=%s',
+                instance.batch_number, instance.cuts_per_100km
+            )
+        elif alert['code'] == 'ELEVATED_CUTS':
+            logger.info(
+                'WINDING CUTS WARNING | batch=%s | cuts=%s',
+                instance.batch_number, instance.cuts_per_100km
+            )
+
+
+@receiver(post_save, sender=Production)
+def winding_post_save(sender, instance, created, **kwargs):
+    """
+    بعد از ذخیره:
+    ✦ لاگ برش بحرانی/بالا (metadata قبلاً در pre_save کامل شده است)
+    ✦ همگام‌سازی جدول QualityAlert
+    """
+    alerts = quality_alerts(instance)
+    _log_alerts(instance, alerts)
+    sync_alerts('winding', instance, alerts)
+
 
-    # اگر هشداری وجود دارد → ذخیره در metadata (بدون loop)
-    if alerts:
-        meta = instance.metadata or {}
-        ai_q = meta.get('ai_quality', {'alerts': []})
-        ai_q['alerts'] = alerts
-        meta['ai_quality'] = ai_q
-        meta['has_alerts'] = True
-        Production.objects.filter(pk=instance.pk).update(metadata=meta)
+@receiver(post_delete, sender=Production)
+def winding_post_delete(sender, instance, **kwargs):
+    delete_alerts('winding', instance.pk)
@@ -254,7 +254,7 @@ class MachineServiceDateViewSet(viewsets.ModelViewSet):
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Avg, Count, Sum, Q
+from django.db.models import Avg, Count, Max, Sum, Q
 from datetime import date
 
 # ── Winding ───────────────────────────────────────────────
@@ -411,10 +411,13 @@ class TFOProductionViewSet(viewsets.ModelViewSet):
 
 # ── HeatSet ──────────────────────────────────────────────
 
-from apps.heatset.models import Batch as HeatsetBatch, CycleLog
+from apps.heatset.models import Batch as HeatsetBatch
 from apps.heatset.api.serializers import (
     HeatsetBatchSerializer, HeatsetBatchListSerializer, CycleLogSerializer
 )
+from apps.heatset.ingest import IngestError, ingest as ingest_cycle_logs
+from apps.heatset.curves import cycle_arrays, downsample_indices, logs_from_arrays, parse_max_points
+from apps.heatset.analytics import METRIC_LABELS, metric_filters, metric_ordering
 
 
 class HeatsetBatchViewSet(viewsets.ModelViewSet):
@@ -422,20 +425,33 @@ class HeatsetBatchViewSet(viewsets.ModelViewSet):
     
     - GET  /api/v1/heatset/              → لیست
     - GET  /api/v1/heatset/{id}/         → جزئیات + لاگ چرخه
-    - GET  /api/v1/heatset/{id}/cycles/  → لاگ‌های دما/فشار (AI time-series)
-    - GET  /api/v1/heatset/kpi/          → شاخص‌های کلیدی
+    - GET  /api/v1/heatset/{id}/cycles/  → لاگ‌های دما/فشار (AI time-series، ?max_points=N)
+    - POST /api/v1/heatset/cycles/bulk/  → ثبت گروهی لاگ چرخه (کنترلرها)
+    - GET  /api/v1/heatset/kpi/          → شاخص‌های کلیدی (+ شاخص‌های منحنی چرخه)
+
+    شاخص‌های منحنی (CycleMetrics): فیلتر ?cycle_metrics__peak_temperature_c__gte=
+    و مرتب‌سازی ?ordering=-cycle_metrics__pressure_cv_pct
+    تطابق پروفایل (CycleConformance): ?cycle_conformance__result=critical
     """
     queryset = HeatsetBatch.objects.select_related(
         'machine', 'production_line', 'operator', 'shift',
-        'order', 'tfo_production'
-    ).prefetch_related('cycle_logs').order_by('-production_date', '-created_at')
+        'order', 'tfo_production', 'cycle_metrics', 'cycle_conformance'
+    ).order_by('-production_date', '-created_at')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = [
-        'status', 'machine', 'production_line', 'production_date',
-        'machine_type_hs', 'fiber_type', 'quality_result',
-    ]
+    filterset_fields = {
+        'status': ['exact'], 'machine': ['exact'], 'production_line': ['exact'],
+        'production_date': ['exact'], 'machine_type_hs': ['exact'],
+        'fiber_type': ['exact'], 'quality_result': ['exact'],
+        **{f'cycle_metrics__{f}': ['gte', 'lte'] for f in METRIC_LABELS},
+        'cycle_conformance__result': ['exact'],
+        'cycle_conformance__temp_out_of_band_min': ['gte', 'lte'],
+    }
     search_fields = ['batch_number']
-    ordering_fields = ['production_date', 'temperature_c', 'batch_weight_kg', 'shrinkage_pct']
+    ordering_fields = [
+        'production_date', 'temperature_c', 'batch_weight_kg', 'shrinkage_pct',
+        *(f'cycle_metrics__{f}' for f in METRIC_LABELS),
+        'cycle_conformance__temp_out_of_band_min', 'cycle_conformance__conformance_pct',
+    ]
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -448,24 +464,60 @@ class HeatsetBatchViewSet(viewsets.ModelViewSet):
         
         endpoint: GET /api/v1/heatset/{id}/cycles/
         خروجی: سری زمانی دما/فشار برای رسم منحنی چرخه
+          ?max_points=500 → کاهش نقاط با LTTB؛ قله‌ها و مرز مراحل حفظ می‌شوند
+                            (cycle_count همچنان تعداد کل لاگ‌هاست)
         """
+        try:
+            max_points = parse_max_points(request.query_params.get('max_points'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=400)
         batch = self.get_object()
-        logs = batch.cycle_logs.order_by('log_time')
+        arrays = cycle_arrays(batch.pk)     # آرشیو فشرده + لاگ‌های زنده
+        count = len(arrays['pk'])
+        selected = logs_from_arrays(arrays, downsample_indices(arrays, max_points))
         return Response({
             'batch_id':     batch.id,
             'batch_number': batch.batch_number,
             'temperature_target': float(batch.temperature_c),
             'duration_min': batch.duration_min,
-            'cycle_count':  logs.count(),
-            'cycles': CycleLogSerializer(logs, many=True).data,
+            'cycle_count':  count,
+            'cycles': CycleLogSerializer(selected, many=True).data,
         })
 
+    @action(detail=False, methods=['post'], url_path='cycles/bulk')
+    def cycles_bulk(self, request):
+        """ثبت گروهی لاگ چرخه چند بچ — داده لحظه‌ای کنترلرهای اتوکلاو.
+
+        endpoint: POST /api/v1/heatset/cycles/bulk/
+        ورودی ستونی (apps/heatset/ingest.py):
+          {"batches": [{"batch": 12, "elapsed_min": [...], "temperature_c": [...],
+                        "pressure_bar": [...], "phase": "steam"}]}
+        همه یا هیچ: هر خطا → 400 با لیست errors (بدون ثبت هیچ ردیفی).
+        """
+        try:
+            counts = ingest_cycle_logs(request.data)
+        except IngestError as exc:
+            return Response({'error': str(exc), 'errors': exc.errors}, status=400)
+        return Response({
+            'inserted': sum(counts.values()),
+            'batches':  [{'batch_id': pk, 'inserted': n} for pk, n in counts.items()],
+        }, status=201)
+
     @action(detail=False, methods=['get'], url_path='kpi')
     def kpi(self, request):
-        """شاخص‌های کلیدی هیت‌ست."""
+        """شاخص‌های کلیدی هیت‌ست.
+
+        فیلتر شاخص منحنی: ?peak_temperature_c_min=… / ?pressure_cv_pct_max=…
+        ?metric_sort=-pressure_cv_pct → ranked_batches (۱۰ بچ اول)
+        """
         date_from = request.query_params.get('from', str(date.today()))
         date_to   = request.query_params.get('to',   str(date.today()))
-        qs = self.queryset.filter(production_date__range=(date_from, date_to))
+        try:
+            lookups = metric_filters(request.query_params)
+            ordering = metric_ordering(request.query_params.get('metric_sort'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=400)
+        qs = self.queryset.filter(production_date__range=(date_from, date_to), **lookups)
 
         agg = qs.aggregate(
             total_batches  = Count('id'),
@@ -494,6 +546,20 @@ class HeatsetBatchViewSet(viewsets.ModelViewSet):
                     'pass_rate': round(mt_pass / mt_count * 100, 1),
                 }
 
+        # شاخص‌های منحنی چرخه — ستون‌های CycleMetrics (بدون خواندن CycleLog)
+        measured = qs.filter(cycle_metrics__isnull=False)
+        cycle = measured.aggregate(
+            avg_peak_temperature_c      = Avg('cycle_metrics__peak_temperature_c'),
+            max_peak_temperature_c      = Max('cycle_metrics__peak_temperature_c'),
+            avg_time_above_setpoint_min = Avg('cycle_metrics__time_above_setpoint_min'),
+            avg_heat_up_rate_c_min      = Avg('cycle_metrics__heat_up_rate_c_min'),
+            avg_cool_down_rate_c_min    = Avg('cycle_metrics__cool_down_rate_c_min'),
+            avg_pressure_cv_pct         = Avg('cycle_metrics__pressure_cv_pct'),
+        )
+        ranked = measured.order_by(ordering, '-production_date').values(
+            'id', 'batch_number', *(f'cycle_metrics__{f}' for f in METRIC_LABELS),
+        )[:10]
+
         return Response({
             'period':          {'from': date_from, 'to': date_to},
             'total_batches':   total,
@@ -506,6 +572,17 @@ class HeatsetBatchViewSet(viewsets.ModelViewSet):
             'avg_shrinkage_pct': round(float(agg['avg_shrinkage'] or 0), 2),
             'avg_duration_min':  round(float(agg['avg_duration']  or 0), 1),
             'by_machine_type': by_machine_type,
+            'cycle_metrics': {
+                'batch_count': measured.count(),
+                **{k: round(v, 2) if v is not None else None for k, v in cycle.items()},
+            },
+            'ranked_batches': [
+                {
+                    'batch_id': row['id'], 'batch_number': row['batch_number'],
+                    **{f: row[f'cycle_metrics__{f}'] for f in METRIC_LABELS},
+                }
+                for row in ranked
+            ],
         })
 
 
@@ -615,6 +692,9 @@ class ProductionChainView(APIView):
 # خروجی: همه هشدارهای کیفی فعال در WD / TFO / HS
 # فیلتر: ?from=YYYY-MM-DD&to=YYYY-MM-DD&level=critical|warning
 # ═══════════════════════════════════════════════════════════════
+from apps.ai_ready.alerts import (
+    ALERTS_MAX_PAGE_SIZE, ALERTS_PAGE_SIZE, alert_counts, alerts_page, alerts_queryset,
+)
 
 
 class QualityAlertsView(APIView):
@@ -627,6 +707,11 @@ class QualityAlertsView(APIView):
       ?level=critical      → فقط بحرانی
       ?level=warning       → فقط هشدار
       ?section=winding     → فقط بوبین‌پیچی
+    صفحه‌بندی (keyset):
+      ?limit=100           → اندازه صفحه (حداکثر ۵۰۰)
+      ?cursor=...          → next_cursor پاسخ قبلی
+
+    داده از جدول QualityAlert (ai_ready/alerts.py) — ترتیب: critical اول، بعد تاریخ.
     """
 
     def get(self, request):
@@ -636,89 +721,24 @@ class QualityAlertsView(APIView):
         level_filter   = request.query_params.get('level',   None)  # critical/warning
         section_filter = request.query_params.get('section', None)  # winding/tfo/heatset
 
-        all_alerts = []
-
-        # ── بوبین‌پیچی ───────────────────────────────────────────
-        if not section_filter or section_filter == 'winding':
-            wd_qs = WindingProduction.objects.filter(
-                production_date__range=(date_from, date_to),
-                metadata__has_alerts=True,
-            ).select_related('machine').order_by('-production_date')
-            for batch in wd_qs:
-                ai_q = (batch.metadata or {}).get('ai_quality', {})
-                for alert in ai_q.get('alerts', []):
-                    if level_filter and alert.get('level') != level_filter:
-                        continue
-                    all_alerts.append({
-                        'section':      'winding',
-                        'section_label': 'بوبین‌پیچی',
-                        'batch_id':     batch.id,
-                        'batch_number': batch.batch_number,
-                        'machine':      batch.machine.code,
-                        'date':         str(batch.production_date),
-                        'level':        alert.get('level'),
-                        'code':         alert.get('code'),
-                        'message':      alert.get('msg'),
-                    })
-
-        # ── دولاتابی ───────────────────────────────────────────────
-        if not section_filter or section_filter == 'tfo':
-            tfo_qs = TFOProduction.objects.filter(
-                production_date__range=(date_from, date_to),
-                metadata__has_alerts=True,
-            ).select_related('machine').order_by('-production_date')
-            for batch in tfo_qs:
-                ai_q = (batch.metadata or {}).get('ai_quality', {})
-                for alert in ai_q.get('alerts', []):
-                    if level_filter and alert.get('level') != level_filter:
-                        continue
-                    all_alerts.append({
-                        'section':      'tfo',
-                        'section_label': 'دولاتابی',
-                        'batch_id':     batch.id,
-                        'batch_number': batch.batch_number,
-                        'machine':      batch.machine.code,
-                        'date':         str(batch.production_date),
-                        'level':        alert.get('level'),
-                        'code':         alert.get('code'),
-                        'message':      alert.get('msg'),
-                    })
-
-        # ── هیت‌ست ─────────────────────────────────────────────────
-        if not section_filter or section_filter == 'heatset':
-            hs_qs = HeatsetBatch.objects.filter(
-                production_date__range=(date_from, date_to),
-                metadata__has_alerts=True,
-            ).select_related('machine').order_by('-production_date')
-            for batch in hs_qs:
-                ai_q = (batch.metadata or {}).get('ai_quality', {})
-                for alert in ai_q.get('alerts', []):
-                    if level_filter and alert.get('level') != level_filter:
-                        continue
-                    all_alerts.append({
-                        'section':      'heatset',
-                        'section_label': 'هیت‌ست',
-                        'batch_id':     batch.id,
-                        'batch_number': batch.batch_number,
-                        'machine':      batch.machine.code,
-                        'date':         str(batch.production_date),
-                        'level':        alert.get('level'),
-                        'code':         alert.get('code'),
-                        'message':      alert.get('msg'),
-                    })
-
-        # ── مرتب‌سازی و خلاصه ─────────────────────────────────
-        # critical اول باشد، بعد تاریخ
-        level_order = {'critical': 0, 'warning': 1}
-        all_alerts.sort(key=lambda a: (level_order.get(a['level'], 9), a['date']), reverse=False)
-
-        critical_count = sum(1 for a in all_alerts if a['level'] == 'critical')
-        warning_count  = sum(1 for a in all_alerts if a['level'] == 'warning')
+        try:
+            limit = int(request.query_params.get('limit', ALERTS_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'limit نامعتبر'}, status=400)
+        limit = max(1, min(limit, ALERTS_MAX_PAGE_SIZE))
+
+        qs = alerts_queryset(date_from, date_to, level_filter, section_filter)
+        try:
+            alerts, next_cursor = alerts_page(qs, request.query_params.get('cursor'), limit)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=400)
+        counts = alert_counts(qs)
 
         return Response({
             'period':         {'from': date_from, 'to': date_to},
-            'total_alerts':   len(all_alerts),
-            'critical_count': critical_count,
-            'warning_count':  warning_count,
-            'alerts':         all_alerts,
+            'total_alerts':   counts['total'],
+            'critical_count': counts['critical'],
+            'warning_count':  counts['warning'],
+            'alerts':         alerts,
+            'next_cursor':    next_cursor,
         })
@@ -122,6 +122,39 @@ DATABASES = {
     }
 }
 
+# =============================================================================
+# CACHE - مشترک بین پروسه‌های Passenger (کش KPI داشبورد)
+# =============================================================================
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'tmp' / 'cache')),
+    }
+}
+
+# =============================================================================
+# REPORT JOBS - گزارش‌های سنگین با بازه بلند در پس‌زمینه
+# (worker: python manage.py run_report_jobs)
+# =============================================================================
+# بازه (روز) از این مقدار به بالا در پس‌زمینه اجرا می‌شود؛ 0 = همیشه همزمان
+REPORT_JOB_MIN_DAYS = config('REPORT_JOB_MIN_DAYS', default=93, cast=int)
+REPORT_JOB_WORKERS = config('REPORT_JOB_WORKERS', default=2, cast=int)
+
+# روزهای قدیمی‌تر از این تعداد روز «بسته» و نتیجه جزئی آن‌ها کش دائمی است
+REPORT_CLOSE_DAYS = config('REPORT_CLOSE_DAYS', default=2, cast=int)
+
+# =============================================================================
+# LIVE STREAM (SSE) - مانیتور خطوط و نقشه کارگاه (apps/dashboard/live.py)
+# =============================================================================
+# هر استریم یک worker همزمان را تا ۵ دقیقه نگه می‌دارد؛ تعداد worker
+# (PassengerMaxPoolSize) باید ≥ LIVE_STREAM_MAX + درخواست‌های عادی همزمان باشد.
+# خاموش یا ظرفیت پر → صفحات با polling هر ۳۰ ثانیه کار می‌کنند.
+LIVE_STREAM_ENABLED = config('LIVE_STREAM_ENABLED', default=True, cast=bool)
+LIVE_STREAM_MAX = config('LIVE_STREAM_MAX', default=4, cast=int)
+
 
 # =============================================================================
 # CUSTOM USER MODEL
@@ -39,6 +39,12 @@ DATABASES = {
     }
 }
 
+# =============================================================================
+# LIVE STREAM — Passenger: هر استریم SSE یک worker را نگه می‌دارد؛ فقط وقتی
+# PassengerMaxPoolSize ≥ LIVE_STREAM_MAX + درخواست‌های همزمان است در .env روشن کنید
+# =============================================================================
+LIVE_STREAM_ENABLED = config('LIVE_STREAM_ENABLED', default=False, cast=bool)
+
 # =============================================================================
 # STATIC FILES — whitenoise برای سرو فایل‌های استاتیک
 # =============================================================================